@@ -45,6 +45,7 @@ class OpenAIConfig:
     temperature: float = field(default_factory=lambda: float(os.getenv('OPENAI_TEMPERATURE', '0.7')))
     timeout: int = field(default_factory=lambda: int(os.getenv('OPENAI_TIMEOUT', '30')))
     max_retries: int = field(default_factory=lambda: int(os.getenv('OPENAI_MAX_RETRIES', '3')))
+    base_url: Optional[str] = field(default_factory=lambda: os.getenv('OPENAI_BASE_URL') or None)
 
 
 @dataclass
@@ -0,0 +1,32 @@
+"""
+Migration 005: Add decision embedding table for similar-decision lookup
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from models import db
+
+def upgrade(app):
+    """Apply the migration."""
+    with app.app_context():
+        # Use SQLAlchemy's create_all to create tables from models
+        db.create_all()
+        print("✓ Created decision embedding table and indexes")
+        print("  Run scripts/rebuild_decision_index.py to embed existing decisions")
+
+def downgrade(app):
+    """Rollback the migration."""
+    with app.app_context():
+        with db.engine.connect() as conn:
+            conn.execute(db.text("DROP TABLE IF EXISTS decision_embedding"))
+        
+        print("✓ Dropped decision embedding table")
+
+if __name__ == "__main__":
+    from app import create_app
+    app = create_app()
+    upgrade(app)
@@ -0,0 +1,32 @@
+"""
+Migration 006: Add token usage record and rollup tables for the usage ledger
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from models import db
+
+def upgrade(app):
+    """Apply the migration."""
+    with app.app_context():
+        # Use SQLAlchemy's create_all to create tables from models
+        db.create_all()
+        print("✓ Created token usage record and rollup tables")
+
+def downgrade(app):
+    """Rollback the migration."""
+    with app.app_context():
+        with db.engine.connect() as conn:
+            conn.execute(db.text("DROP TABLE IF EXISTS token_usage_rollup"))
+            conn.execute(db.text("DROP TABLE IF EXISTS token_usage_record"))
+        
+        print("✓ Dropped token usage tables")
+
+if __name__ == "__main__":
+    from app import create_app
+    app = create_app()
+    upgrade(app)
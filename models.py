@@ -770,6 +770,63 @@ class Decision(db.Model):
         return f'<Decision {self.id}: {self.title}>'
 
 
+class DecisionEmbedding(db.Model):
+    """Embedding of a decision's context and text, for finding similar past decisions."""
+    
+    id = db.Column(db.Integer, primary_key=True)  # Increases with every write; workers sync past the last id seen
+    decision_id = db.Column(db.Integer, db.ForeignKey('decision.id', ondelete='CASCADE'), nullable=False, unique=True, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    executive_type = db.Column(db.String(10), nullable=False)
+    model = db.Column(db.String(100), nullable=False)
+    dimensions = db.Column(db.Integer, nullable=False)
+    vector = db.Column(db.LargeBinary, nullable=False)  # Unit-length float32
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    decision = db.relationship('Decision', backref=db.backref('embedding', uselist=False, cascade='all, delete-orphan'))
+    
+    def __repr__(self):
+        return f'<DecisionEmbedding {self.decision_id}: {self.model}>'
+
+
+class TokenUsageRecord(db.Model):
+    """Token usage and cost of one OpenAI call, written in batches by the usage ledger."""
+    
+    id = db.Column(db.Integer, primary_key=True)
+    timestamp = db.Column(db.Float, nullable=False)
+    day = db.Column(db.String(10), nullable=False)  # UTC day as YYYY-MM-DD
+    user_id = db.Column(db.String(64), nullable=True)
+    executive_type = db.Column(db.String(10), nullable=True)
+    model = db.Column(db.String(100), nullable=False)
+    request_type = db.Column(db.String(50), nullable=False)
+    prompt_tokens = db.Column(db.Integer, nullable=False)
+    completion_tokens = db.Column(db.Integer, nullable=False)
+    total_tokens = db.Column(db.Integer, nullable=False)
+    cost = db.Column(db.Float, nullable=False)
+    
+    __table_args__ = (
+        db.Index('idx_token_usage_record_user_time', 'user_id', 'timestamp'),
+    )
+    
+    def __repr__(self):
+        return f'<TokenUsageRecord {self.model}: {self.total_tokens}>'
+
+
+class TokenUsageRollup(db.Model):
+    """Running usage totals per (scope, key, day); day '*' holds the all-time row."""
+    
+    scope = db.Column(db.String(20), primary_key=True)
+    key = db.Column(db.String(100), primary_key=True)
+    day = db.Column(db.String(10), primary_key=True)
+    requests = db.Column(db.Integer, nullable=False, default=0)
+    prompt_tokens = db.Column(db.Integer, nullable=False, default=0)
+    completion_tokens = db.Column(db.Integer, nullable=False, default=0)
+    total_tokens = db.Column(db.Integer, nullable=False, default=0)
+    cost = db.Column(db.Float, nullable=False, default=0.0)
+    
+    def __repr__(self):
+        return f'<TokenUsageRollup {self.scope}/{self.key}/{self.day}: {self.total_tokens}>'
+
+
 class DocumentType(Enum):
     FINANCIAL = 'financial'
     TECHNICAL = 'technical'
@@ -4,16 +4,23 @@ Executive Routes
 API endpoints for AI executive decision making with real AI integration.
 """
 
+import json
 import logging
-from flask import Blueprint, request, jsonify, session
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, request, jsonify, session, Response, stream_with_context, current_app
 from flask_login import login_required, current_user
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 
-from models import db, Decision, DecisionStatus, DecisionPriority, ExecutiveType, RiskLevel, Document
-from services.ai_integration import AIIntegrationService
+from models import db, Decision, DecisionEmbedding, DecisionStatus, DecisionPriority, ExecutiveType, RiskLevel, Document
+from services.ai_integration import AIIntegrationService, count_text_tokens
+from services.usage_budgets import BudgetExceededError
+from services.context_packer import ContextChunk, ContextPacker
+from services.decision_index import encode_vector, decode_vector
 from services.document_processing import DocumentProcessingService
-from services.vector_database import VectorDatabaseService
+from services.vector_database import get_vector_database_service
 from config.settings import config_manager
 
 logger = logging.getLogger(__name__)
@@ -38,7 +45,7 @@ def init_services():
         doc_service = DocumentProcessingService(doc_config)
         
         vector_config = config_manager.get_service_config('ai_integration')['vector_db']
-        vector_service = VectorDatabaseService(vector_config)
+        vector_service = get_vector_database_service(vector_config)
         
         logger.info("Executive services initialized successfully")
     except Exception as e:
@@ -50,6 +57,251 @@ def init_services():
 init_services()
 
 
+@executive_bp.record_once
+def _bind_usage_ledger(state):
+    """Point the usage ledger at the application database once the app registers the blueprint"""
+    if ai_service is not None and ai_service.usage_ledger is not None:
+        ai_service.usage_ledger.init_app(state.app)
+
+
+PRIORITY_MAP = {
+    'low': DecisionPriority.LOW,
+    'medium': DecisionPriority.MEDIUM,
+    'high': DecisionPriority.HIGH,
+    'critical': DecisionPriority.CRITICAL
+}
+
+RISK_MAP = {
+    'low': RiskLevel.LOW,
+    'medium': RiskLevel.MEDIUM,
+    'high': RiskLevel.HIGH,
+    'critical': RiskLevel.CRITICAL
+}
+
+# Document context packing: candidates fetched per referenced document, the
+# overall cap, the budget used when no AI service is configured, and the
+# relevance given to a summary of a document with no matching chunks
+DOCUMENT_SEARCH_RESULTS_PER_DOC = 4
+DOCUMENT_SEARCH_MAX_RESULTS = 20
+DEFAULT_DOCUMENT_CONTEXT_TOKENS = 1500
+DOCUMENT_SUMMARY_SCORE = 0.5
+
+# Similar past decisions: how often a worker loads embeddings written by other
+# workers, how far below the highest loaded id it looks again for rows whose
+# transactions committed late, and the single thread that embeds new
+# decisions off the request path
+DECISION_INDEX_SYNC_SECONDS = 5.0
+DECISION_INDEX_SYNC_BATCH = 1000
+DECISION_INDEX_SYNC_WINDOW = 500
+_decision_index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="decision-index")
+_decision_index_lock = threading.Lock()
+_decision_index_sync = {'last_id': 0, 'synced_at': 0.0, 'loaded_ids': set()}
+
+PANEL_EXECUTIVES = {
+    'ceo': ExecutiveType.CEO,
+    'cto': ExecutiveType.CTO,
+    'cfo': ExecutiveType.CFO
+}
+
+
+def _get_document_context(document_ids: List[int], context: str, executive_type: str = 'ceo'):
+    """Pack summaries and relevant chunks of the user's referenced documents into the prompt budget"""
+    document_context = ""
+    referenced_documents = []
+    
+    if not document_ids:
+        return document_context, referenced_documents
+    
+    try:
+        chunks = []
+        titles = {}
+        for doc_id in document_ids:
+            document = Document.query.get(doc_id)
+            if not document or document.user_id != current_user.id:
+                continue
+            
+            referenced_documents.append(document)
+            titles[str(doc_id)] = document.filename
+            if document.summary:
+                # Summaries lead their document and rank with its best chunk
+                chunks.append(ContextChunk(
+                    content=f"Summary: {document.summary}",
+                    score=DOCUMENT_SUMMARY_SCORE,
+                    chunk_id=f"{doc_id}_summary",
+                    document_id=str(doc_id),
+                    chunk_index=-1,
+                    title=document.filename
+                ))
+        
+        if vector_service and titles:
+            # One ranked search across all referenced documents
+            search_results = vector_service.search_similar_content(
+                query=context,
+                n_results=min(DOCUMENT_SEARCH_RESULTS_PER_DOC * len(titles), DOCUMENT_SEARCH_MAX_RESULTS),
+                document_ids=list(titles)
+            )
+            for result in search_results:
+                chunks.append(ContextChunk.from_search_result(result, title=titles.get(result.document_id, "")))
+            
+            best_scores = {}
+            for chunk in chunks:
+                if chunk.chunk_index >= 0:
+                    best_scores[chunk.document_id] = max(best_scores.get(chunk.document_id, 0.0), chunk.score)
+            for chunk in chunks:
+                if chunk.chunk_index < 0 and chunk.document_id in best_scores:
+                    chunk.score = max(chunk.score, best_scores[chunk.document_id])
+        
+        if ai_service:
+            packed = ai_service.pack_document_context(chunks, executive_type, context)
+        else:
+            packed = ContextPacker(count_text_tokens).pack(chunks, DEFAULT_DOCUMENT_CONTEXT_TOKENS)
+        document_context = packed.text
+    
+    except Exception as e:
+        logger.warning(f"Failed to get document context: {e}")
+    
+    return document_context, referenced_documents
+
+
+def _sync_decision_index(force: bool = False):
+    """Add decision embeddings persisted since the last sync, including other workers' writes"""
+    if not ai_service or ai_service.decision_index is None:
+        return
+    # Requests arriving during a sync search what is already loaded
+    if not _decision_index_lock.acquire(blocking=force):
+        return
+    try:
+        if not force and time.monotonic() - _decision_index_sync['synced_at'] < DECISION_INDEX_SYNC_SECONDS:
+            return
+        embedding_model = ai_service.openai_client.embedding_model
+        rows = db.session.query(
+            DecisionEmbedding.id,
+            DecisionEmbedding.decision_id,
+            DecisionEmbedding.user_id,
+            DecisionEmbedding.executive_type,
+            DecisionEmbedding.model,
+            DecisionEmbedding.vector
+        ).filter(
+            # Ids are assigned before commit, so a lower id can appear after a higher one
+            DecisionEmbedding.id > _decision_index_sync['last_id'] - DECISION_INDEX_SYNC_WINDOW
+        ).order_by(DecisionEmbedding.id).yield_per(DECISION_INDEX_SYNC_BATCH)
+        
+        loaded_ids = _decision_index_sync['loaded_ids']
+        for row_id, decision_id, user_id, executive_type, model, vector in rows:
+            if row_id in loaded_ids:
+                continue
+            # Vectors from another embedding model are not comparable; rebuild them instead
+            if model == embedding_model:
+                ai_service.decision_index.add(decision_id, decode_vector(vector), user_id, executive_type)
+            loaded_ids.add(row_id)
+            _decision_index_sync['last_id'] = max(_decision_index_sync['last_id'], row_id)
+        
+        floor = _decision_index_sync['last_id'] - DECISION_INDEX_SYNC_WINDOW
+        _decision_index_sync['loaded_ids'] = {row_id for row_id in loaded_ids if row_id > floor}
+        _decision_index_sync['synced_at'] = time.monotonic()
+    finally:
+        _decision_index_lock.release()
+
+
+def _find_similar_decisions(context: str, executive_type: str):
+    """The current user's past decisions for a similar context, as (decision, similarity), most similar first"""
+    if not ai_service or ai_service.decision_index is None:
+        return []
+    
+    try:
+        _sync_decision_index()
+        matches = ai_service.find_similar_decisions(context, user_id=current_user.id, executive_type=executive_type)
+        if not matches:
+            return []
+        decisions = {
+            decision.id: decision
+            for decision in Decision.query.filter(
+                Decision.id.in_([match.decision_id for match in matches]),
+                Decision.user_id == current_user.id
+            )
+        }
+        # Decisions deleted since they were indexed drop out here
+        return [(decisions[match.decision_id], match.similarity) for match in matches if match.decision_id in decisions]
+    except Exception as e:
+        logger.warning(f"Similar decision lookup failed: {e}")
+        return []
+
+
+def _similar_decisions_payload(similar_decisions) -> List[Dict[str, Any]]:
+    return [
+        {
+            'id': decision.id,
+            'title': decision.title,
+            'decision': decision.decision,
+            'similarity': round(similarity, 4),
+            'created_at': decision.created_at.isoformat() if decision.created_at else None
+        }
+        for decision, similarity in similar_decisions
+    ]
+
+
+def _reuse_similar_decision(data: Dict[str, Any], similar_decisions, executive_label: str):
+    """Response returning a near-identical prior decision when the client opted in with reuse_similar"""
+    if not similar_decisions or not data.get('reuse_similar', False):
+        return None
+    
+    prior, similarity = similar_decisions[0]
+    if similarity < ai_service.decision_reuse_threshold:
+        return None
+    
+    logger.info(f"Reused {executive_label} decision {prior.id} for user {current_user.id} (similarity {similarity:.3f})")
+    return jsonify({
+        'success': True,
+        'decision': prior.to_dict(),
+        'reused': True,
+        'similarity': round(similarity, 4),
+        'similar_decisions': _similar_decisions_payload(similar_decisions),
+        'message': f'Returned a prior {executive_label} decision for a near-identical context'
+    }), 200
+
+
+def _budget_exceeded_response(error: BudgetExceededError):
+    """429 for a request that did not fit the user's usage budget even degraded"""
+    logger.warning(f"Usage budget exceeded for user {current_user.id}: {error}")
+    response = jsonify({'error': 'Usage budget exceeded', 'budget': error.to_dict()})
+    response.status_code = 429
+    if error.retry_after is not None:
+        response.headers['Retry-After'] = str(max(1, int(error.retry_after + 0.999)))
+    return response
+
+
+def _index_decision(decision: Decision):
+    """Embed and persist a new decision in the background so later requests can find it"""
+    if not ai_service or ai_service.decision_index is None:
+        return
+    _decision_index_executor.submit(
+        _store_decision_embedding,
+        current_app._get_current_object(),
+        decision.id,
+        decision.context,
+        decision.decision,
+        decision.user_id,
+        decision.executive_type.value
+    )
+
+
+def _store_decision_embedding(app, decision_id: int, context: str, decision_text: str, user_id: int, executive_type: str):
+    try:
+        embedding = ai_service.index_decision(decision_id, context, decision_text, user_id, executive_type)
+        with app.app_context():
+            db.session.add(DecisionEmbedding(
+                decision_id=decision_id,
+                user_id=user_id,
+                executive_type=executive_type,
+                model=ai_service.openai_client.embedding_model,
+                dimensions=len(embedding),
+                vector=encode_vector(embedding)
+            ))
+            db.session.commit()
+    except Exception as e:
+        logger.warning(f"Failed to index decision {decision_id}: {e}")
+
+
 @executive_bp.route('/ceo/decision', methods=['POST'])
 @login_required
 def create_ceo_decision():
@@ -63,7 +315,8 @@ def create_ceo_decision():
         "category": "strategic|operational|financial",
         "priority": "low|medium|high|critical",
         "options": ["Option 1", "Option 2"],  // optional
-        "document_ids": [1, 2, 3]  // optional document references
+        "document_ids": [1, 2, 3],  // optional document references
+        "reuse_similar": false  // optional; return a near-identical prior decision instead of generating
     }
     """
     try:
@@ -96,36 +349,14 @@ def create_ceo_decision():
         }
         priority = priority_map.get(priority_str, DecisionPriority.MEDIUM)
         
-        # Get document context if document IDs provided
-        document_context = ""
-        referenced_documents = []
+        # Past decisions for a similar context; a near-identical one can be returned as-is
+        similar_decisions = _find_similar_decisions(context, 'ceo')
+        reused = _reuse_similar_decision(data, similar_decisions, 'CEO')
+        if reused is not None:
+            return reused
         
-        if document_ids and vector_service:
-            try:
-                for doc_id in document_ids:
-                    document = Document.query.get(doc_id)
-                    if document and document.user_id == current_user.id:
-                        referenced_documents.append(document)
-                        
-                        # Get relevant context from document
-                        if document.summary:
-                            document_context += f"\n\nDocument: {document.filename}\nSummary: {document.summary}"
-                        
-                        # Get semantic search results for the context
-                        search_results = vector_service.search_similar_content(
-                            query=context,
-                            collection_name=f"user_{current_user.id}_documents",
-                            limit=3
-                        )
-                        
-                        for result in search_results:
-                            if result.get('document_id') == str(doc_id):
-                                document_context += f"\nRelevant content: {result.get('content', '')[:500]}..."
-                                break
-                                
-            except Exception as e:
-                logger.warning(f"Failed to get document context: {e}")
-                # Continue without document context
+        # Get document context if document IDs provided
+        document_context, referenced_documents = _get_document_context(document_ids, context, 'ceo')
         
         # Get conversation history from session
         conversation_history = session.get('ceo_conversation_history', [])
@@ -138,7 +369,8 @@ def create_ceo_decision():
                     context=context,
                     conversation_history=conversation_history,
                     document_context=document_context,
-                    options=options
+                    options=options,
+                    user_id=current_user.id
                 )
                 
                 # Extract decision components from AI response
@@ -157,6 +389,8 @@ def create_ceo_decision():
                 }
                 risk_level = risk_map.get(risk_level_str, RiskLevel.MEDIUM)
                 
+            except BudgetExceededError as e:
+                return _budget_exceeded_response(e)
             except Exception as e:
                 logger.error(f"AI service failed, using fallback: {e}")
                 # Fallback to basic response
@@ -186,7 +420,7 @@ def create_ceo_decision():
             confidence_score=confidence_score,
             financial_impact=financial_impact,
             risk_level=risk_level,
-            ai_model_version=ai_service.client.model if ai_service else 'fallback',
+            ai_model_version=ai_service.openai_client.model if ai_service else 'fallback',
             prompt_version='1.0'
         )
         
@@ -218,10 +452,12 @@ def create_ceo_decision():
         db.session.commit()
         
         logger.info(f"CEO decision created: {decision.id} for user {current_user.id}")
+        _index_decision(decision)
         
         return jsonify({
             'success': True,
             'decision': decision.to_dict(),
+            'similar_decisions': _similar_decisions_payload(similar_decisions),
             'message': 'CEO decision created successfully'
         }), 201
         
@@ -448,6 +684,7 @@ def create_cto_decision():
         "priority": "low|medium|high|critical",
         "options": ["Option 1", "Option 2"],  // optional
         "document_ids": [1, 2, 3],  // optional document references
+        "reuse_similar": false,  // optional; return a near-identical prior decision instead of generating
         "technical_requirements": {  // optional technical specifications
             "scalability": "high|medium|low",
             "performance": "critical|important|normal",
@@ -487,35 +724,14 @@ def create_cto_decision():
         }
         priority = priority_map.get(priority_str, DecisionPriority.MEDIUM)
         
-        # Get document context if document IDs provided
-        document_context = ""
-        referenced_documents = []
+        # Past decisions for a similar context; a near-identical one can be returned as-is
+        similar_decisions = _find_similar_decisions(context, 'cto')
+        reused = _reuse_similar_decision(data, similar_decisions, 'CTO')
+        if reused is not None:
+            return reused
         
-        if document_ids and vector_service:
-            try:
-                for doc_id in document_ids:
-                    document = Document.query.get(doc_id)
-                    if document and document.user_id == current_user.id:
-                        referenced_documents.append(document)
-                        
-                        # Get relevant context from document
-                        if document.summary:
-                            document_context += f"\n\nDocument: {document.filename}\nSummary: {document.summary}"
-                        
-                        # Get semantic search results for the context
-                        search_results = vector_service.search_similar_content(
-                            query=context,
-                            collection_name=f"user_{current_user.id}_documents",
-                            limit=3
-                        )
-                        
-                        for result in search_results:
-                            if result.get('document_id') == str(doc_id):
-                                document_context += f"\nRelevant content: {result.get('content', '')[:500]}..."
-                                break
-                                
-            except Exception as e:
-                logger.warning(f"Failed to get document context: {e}")
+        # Get document context if document IDs provided
+        document_context, referenced_documents = _get_document_context(document_ids, context, 'cto')
         
         # Add technical requirements to context
         if tech_requirements:
@@ -535,7 +751,8 @@ def create_cto_decision():
                     context=context,
                     conversation_history=conversation_history,
                     document_context=document_context,
-                    options=options
+                    options=options,
+                    user_id=current_user.id
                 )
                 
                 # Extract decision components from AI response
@@ -554,6 +771,8 @@ def create_cto_decision():
                 }
                 risk_level = risk_map.get(risk_level_str, RiskLevel.MEDIUM)
                 
+            except BudgetExceededError as e:
+                return _budget_exceeded_response(e)
             except Exception as e:
                 logger.error(f"AI service failed, using fallback: {e}")
                 # Fallback to basic response
@@ -583,7 +802,7 @@ def create_cto_decision():
             confidence_score=confidence_score,
             financial_impact=financial_impact,
             risk_level=risk_level,
-            ai_model_version=ai_service.client.model if ai_service else 'fallback',
+            ai_model_version=ai_service.openai_client.model if ai_service else 'fallback',
             prompt_version='1.0'
         )
         
@@ -615,10 +834,12 @@ def create_cto_decision():
         db.session.commit()
         
         logger.info(f"CTO decision created: {decision.id} for user {current_user.id}")
+        _index_decision(decision)
         
         return jsonify({
             'success': True,
             'decision': decision.to_dict(),
+            'similar_decisions': _similar_decisions_payload(similar_decisions),
             'message': 'CTO decision created successfully'
         }), 201
         
@@ -747,7 +968,8 @@ def get_architecture_analysis():
                 executive_response = ai_service.generate_executive_response(
                     executive_type='cto',
                     context=analysis_context,
-                    conversation_history=conversation_history
+                    conversation_history=conversation_history,
+                    user_id=current_user.id
                 )
                 
                 analysis = {
@@ -759,6 +981,8 @@ def get_architecture_analysis():
                     "ai_powered": True
                 }
                 
+            except BudgetExceededError as e:
+                return _budget_exceeded_response(e)
             except Exception as e:
                 logger.error(f"AI architecture analysis failed: {e}")
                 analysis = {
@@ -832,6 +1056,7 @@ def create_cfo_decision():
         "priority": "low|medium|high|critical",
         "options": ["Option 1", "Option 2"],  // optional
         "document_ids": [1, 2, 3],  // optional document references
+        "reuse_similar": false,  // optional; return a near-identical prior decision instead of generating
         "financial_data": {  // optional financial specifications
             "budget_amount": 100000,
             "expected_roi": 0.15,
@@ -871,35 +1096,14 @@ def create_cfo_decision():
         }
         priority = priority_map.get(priority_str, DecisionPriority.MEDIUM)
         
-        # Get document context if document IDs provided
-        document_context = ""
-        referenced_documents = []
+        # Past decisions for a similar context; a near-identical one can be returned as-is
+        similar_decisions = _find_similar_decisions(context, 'cfo')
+        reused = _reuse_similar_decision(data, similar_decisions, 'CFO')
+        if reused is not None:
+            return reused
         
-        if document_ids and vector_service:
-            try:
-                for doc_id in document_ids:
-                    document = Document.query.get(doc_id)
-                    if document and document.user_id == current_user.id:
-                        referenced_documents.append(document)
-                        
-                        # Get relevant context from document
-                        if document.summary:
-                            document_context += f"\n\nDocument: {document.filename}\nSummary: {document.summary}"
-                        
-                        # Get semantic search results for the context
-                        search_results = vector_service.search_similar_content(
-                            query=context,
-                            collection_name=f"user_{current_user.id}_documents",
-                            limit=3
-                        )
-                        
-                        for result in search_results:
-                            if result.get('document_id') == str(doc_id):
-                                document_context += f"\nRelevant content: {result.get('content', '')[:500]}..."
-                                break
-                                
-            except Exception as e:
-                logger.warning(f"Failed to get document context: {e}")
+        # Get document context if document IDs provided
+        document_context, referenced_documents = _get_document_context(document_ids, context, 'cfo')
         
         # Add financial data to context
         if financial_data:
@@ -919,7 +1123,8 @@ def create_cfo_decision():
                     context=context,
                     conversation_history=conversation_history,
                     document_context=document_context,
-                    options=options
+                    options=options,
+                    user_id=current_user.id
                 )
                 
                 # Extract decision components from AI response
@@ -938,6 +1143,8 @@ def create_cfo_decision():
                 }
                 risk_level = risk_map.get(risk_level_str, RiskLevel.MEDIUM)
                 
+            except BudgetExceededError as e:
+                return _budget_exceeded_response(e)
             except Exception as e:
                 logger.error(f"AI service failed, using fallback: {e}")
                 # Fallback to basic response
@@ -967,7 +1174,7 @@ def create_cfo_decision():
             confidence_score=confidence_score,
             financial_impact=financial_impact,
             risk_level=risk_level,
-            ai_model_version=ai_service.client.model if ai_service else 'fallback',
+            ai_model_version=ai_service.openai_client.model if ai_service else 'fallback',
             prompt_version='1.0'
         )
         
@@ -999,10 +1206,12 @@ def create_cfo_decision():
         db.session.commit()
         
         logger.info(f"CFO decision created: {decision.id} for user {current_user.id}")
+        _index_decision(decision)
         
         return jsonify({
             'success': True,
             'decision': decision.to_dict(),
+            'similar_decisions': _similar_decisions_payload(similar_decisions),
             'message': 'CFO decision created successfully'
         }), 201
         
@@ -1130,7 +1339,8 @@ def get_financial_analysis():
                 executive_response = ai_service.generate_executive_response(
                     executive_type='cfo',
                     context=analysis_context,
-                    conversation_history=conversation_history
+                    conversation_history=conversation_history,
+                    user_id=current_user.id
                 )
                 
                 analysis = {
@@ -1143,6 +1353,8 @@ def get_financial_analysis():
                     "ai_powered": True
                 }
                 
+            except BudgetExceededError as e:
+                return _budget_exceeded_response(e)
             except Exception as e:
                 logger.error(f"AI financial analysis failed: {e}")
                 analysis = {
@@ -1204,6 +1416,276 @@ def clear_cfo_conversation():
         return jsonify({'error': 'Failed to clear conversation'}), 500
 
 
+@executive_bp.route('/panel/decision', methods=['POST'])
+@login_required
+def create_panel_decision():
+    """
+    Ask several executives the same question concurrently ("board panel")
+    
+    Expected JSON payload:
+    {
+        "context": "Business context or problem statement",
+        "title": "Decision title",
+        "executives": ["ceo", "cto", "cfo"],  // optional, defaults to all three
+        "priority": "low|medium|high|critical",
+        "options": ["Option 1", "Option 2"],  // optional
+        "document_ids": [1, 2, 3],  // optional document references
+        "timeout": 30  // optional per-executive timeout in seconds
+    }
+    """
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No JSON data provided'}), 400
+        
+        # Validate required fields
+        context = data.get('context', '').strip()
+        title = data.get('title', '').strip()
+        
+        if not context:
+            return jsonify({'error': 'Context is required'}), 400
+        
+        if not title:
+            return jsonify({'error': 'Title is required'}), 400
+        
+        executives = data.get('executives') or [executive.value for executive in ExecutiveType]
+        invalid = [executive for executive in executives if executive not in PANEL_EXECUTIVES]
+        if invalid:
+            return jsonify({'error': f'Invalid executives: {invalid}'}), 400
+        
+        if not ai_service:
+            return jsonify({'error': 'AI service unavailable'}), 503
+        
+        # Extract optional fields
+        priority = PRIORITY_MAP.get(data.get('priority', 'medium'), DecisionPriority.MEDIUM)
+        options = data.get('options', [])
+        document_ids = data.get('document_ids', [])
+        timeout = data.get('timeout')
+        
+        document_context, referenced_documents = _get_document_context(document_ids, context)
+        
+        panel = ai_service.generate_panel_response(
+            context=context,
+            executive_types=executives,
+            document_context=document_context,
+            options=options,
+            timeout=timeout,
+            user_id=current_user.id
+        )
+        
+        # Persist one decision per executive that answered
+        decisions = {}
+        for executive_type, executive_response in panel.responses.items():
+            if executive_type in panel.errors:
+                continue
+            
+            decision = Decision(
+                user_id=current_user.id,
+                title=title,
+                context=context,
+                decision=executive_response.decision,
+                rationale=executive_response.rationale,
+                executive_type=PANEL_EXECUTIVES[executive_type],
+                category=executive_response.category,
+                priority=priority,
+                confidence_score=executive_response.confidence_score,
+                financial_impact=executive_response.financial_impact,
+                risk_level=RISK_MAP.get(executive_response.risk_level, RiskLevel.MEDIUM),
+                ai_model_version=executive_response.model,
+                prompt_version=ai_service.prompt_manager.active_versions.get('decision_prompt', '1.0')
+            )
+            for doc in referenced_documents:
+                decision.add_document(doc)
+            
+            db.session.add(decision)
+            decisions[executive_type] = decision
+        
+        db.session.commit()
+        
+        logger.info(
+            f"Panel decision created for user {current_user.id}: "
+            f"{len(decisions)} answered, {len(panel.errors)} failed in {panel.response_time:.2f}s"
+        )
+        for decision in decisions.values():
+            _index_decision(decision)
+        
+        return jsonify({
+            'success': not panel.errors,
+            'decisions': {
+                executive_type: decision.to_dict()
+                for executive_type, decision in decisions.items()
+            },
+            'responses': {
+                executive_type: {
+                    'decision': executive_response.decision,
+                    'rationale': executive_response.rationale,
+                    'confidence_score': executive_response.confidence_score,
+                    'priority': executive_response.priority,
+                    'category': executive_response.category,
+                    'risk_level': executive_response.risk_level,
+                    'financial_impact': executive_response.financial_impact,
+                    'model': executive_response.model,
+                    'response_time': executive_response.response_time,
+                    'metadata': executive_response.metadata
+                }
+                for executive_type, executive_response in panel.responses.items()
+            },
+            'errors': panel.errors,
+            'response_time': panel.response_time
+        }), 201 if decisions else 502
+        
+    except BudgetExceededError as e:
+        return _budget_exceeded_response(e)
+    except Exception as e:
+        logger.error(f"Error creating panel decision: {e}")
+        db.session.rollback()
+        return jsonify({'error': 'Failed to create panel decision'}), 500
+
+
+@executive_bp.route('/<executive_type>/decision/stream', methods=['POST'])
+@login_required
+def stream_executive_decision(executive_type):
+    """
+    Stream an executive decision as server-sent events
+    
+    Accepts the same JSON payload as the /<executive>/decision routes. Emits
+    "token" events with text deltas as the model generates them, a
+    "decision_ready" event as soon as the decision, rationale and confidence
+    have streamed (the decision is persisted at that point), then a
+    "decision" event with the completed decision, or an "error" event
+    (with a "budget" entry when the request did not fit the usage budget).
+    
+    The session conversation history is read but not updated, since the
+    response headers are sent before generation finishes.
+    """
+    if executive_type not in PANEL_EXECUTIVES:
+        return jsonify({'error': f'Invalid executive: {executive_type}'}), 404
+    
+    data = request.get_json()
+    if not data:
+        return jsonify({'error': 'No JSON data provided'}), 400
+    
+    # Validate required fields
+    context = data.get('context', '').strip()
+    title = data.get('title', '').strip()
+    
+    if not context:
+        return jsonify({'error': 'Context is required'}), 400
+    
+    if not title:
+        return jsonify({'error': 'Title is required'}), 400
+    
+    if not ai_service:
+        return jsonify({'error': 'AI service unavailable'}), 503
+    
+    # Extract optional fields
+    priority = PRIORITY_MAP.get(data.get('priority', 'medium'), DecisionPriority.MEDIUM)
+    options = data.get('options', [])
+    document_context, referenced_documents = _get_document_context(data.get('document_ids', []), context, executive_type)
+    conversation_history = session.get(f'{executive_type}_conversation_history', [])
+    
+    def sse(event: str, payload: Dict[str, Any]) -> str:
+        return f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+    
+    def new_decision(fields: Dict[str, Any]) -> Decision:
+        confidence_score = fields.get('confidence_score')
+        decision = Decision(
+            user_id=current_user.id,
+            title=title,
+            context=context,
+            decision=fields.get('decision', ''),
+            rationale=fields.get('rationale', ''),
+            executive_type=PANEL_EXECUTIVES[executive_type],
+            category=data.get('category', fields.get('category')),
+            priority=priority,
+            confidence_score=max(0.0, min(1.0, float(confidence_score))) if confidence_score is not None else None,
+            risk_level=RISK_MAP.get(fields.get('risk_level'), RiskLevel.MEDIUM),
+            ai_model_version=ai_service.openai_client.model,
+            prompt_version=ai_service.prompt_manager.active_versions.get('decision_prompt', '1.0')
+        )
+        for doc in referenced_documents:
+            decision.add_document(doc)
+        return decision
+    
+    def generate():
+        try:
+            executive_response = None
+            decision = None
+            for event in ai_service.stream_executive_response(
+                executive_type=executive_type,
+                context=context,
+                conversation_history=conversation_history,
+                document_context=document_context,
+                options=options,
+                user_id=current_user.id,
+                emit_fields=True
+            ):
+                if event['type'] == 'token':
+                    yield sse('token', {'content': event['content']})
+                elif event['type'] == 'ready':
+                    # Persist as soon as the required fields are in; the rest fill in when the stream ends
+                    decision = new_decision(event['fields'])
+                    db.session.add(decision)
+                    db.session.commit()
+                    yield sse('decision_ready', {'decision': decision.to_dict()})
+                elif event['type'] == 'response':
+                    executive_response = event['response']
+            
+            if decision is None:
+                decision = new_decision({})
+                db.session.add(decision)
+            decision.decision = executive_response.decision
+            decision.rationale = executive_response.rationale
+            decision.category = data.get('category', executive_response.category)
+            decision.confidence_score = executive_response.confidence_score
+            decision.financial_impact = executive_response.financial_impact
+            decision.risk_level = RISK_MAP.get(executive_response.risk_level, RiskLevel.MEDIUM)
+            decision.ai_model_version = executive_response.model
+            db.session.commit()
+            
+            logger.info(f"Streamed {executive_type.upper()} decision created: {decision.id} for user {current_user.id}")
+            _index_decision(decision)
+            yield sse('decision', {
+                'decision': decision.to_dict(),
+                'metadata': executive_response.metadata
+            })
+            
+        except BudgetExceededError as e:
+            logger.warning(f"Usage budget exceeded for user {current_user.id}: {e}")
+            yield sse('error', {'error': 'Usage budget exceeded', 'budget': e.to_dict()})
+        except Exception as e:
+            logger.error(f"Error streaming {executive_type.upper()} decision: {e}")
+            db.session.rollback()
+            yield sse('error', {'error': 'Failed to create decision'})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
+@executive_bp.route('/budget', methods=['GET'])
+@login_required
+def get_budget_usage():
+    """Current user's usage budget consumption: tokens this minute, dollars today and calls in flight"""
+    if not ai_service:
+        return jsonify({'error': 'AI service unavailable'}), 503
+    
+    try:
+        return jsonify({
+            'success': True,
+            'budget': ai_service.get_budget_usage(current_user.id),
+            'timestamp': datetime.utcnow().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"Error getting budget usage: {e}")
+        return jsonify({'error': 'Failed to get budget usage'}), 500
+
+
 @executive_bp.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint for executive services"""
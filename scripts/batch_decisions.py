@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Batch decision generation for offline workloads
+
+Reads decision requests from a JSON lines file, generates them with bounded
+concurrency and writes the resulting Decision rows in bulk. Progress is
+checkpointed, so rerunning the same command after a crash resumes where the
+previous run stopped.
+
+Each input line is a JSON object:
+    {"request_id": "q3-rescore-17", "executive_type": "cfo", "user_id": 1,
+     "title": "...", "context": "...", "priority": "high",
+     "document_context": "...", "options": ["..."]}
+
+Usage:
+    python scripts/batch_decisions.py requests.jsonl --concurrency 16 \
+        --checkpoint data/batch_checkpoints/nightly.jsonl
+"""
+
+import argparse
+import json
+import logging
+import sys
+from dataclasses import asdict
+from pathlib import Path
+from typing import List
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app import create_app
+from config.settings import config
+from models import db, Decision, DecisionPriority, ExecutiveType, RiskLevel
+from services.ai_integration import AIIntegrationService, BatchDecisionRequest, BatchDecisionResult
+
+logger = logging.getLogger(__name__)
+
+RISK_LEVELS = {level.value: level for level in RiskLevel}
+
+
+def load_requests(path: str) -> List[BatchDecisionRequest]:
+    """Parse batch requests from a JSON lines file"""
+    requests = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            requests.append(BatchDecisionRequest(
+                request_id=str(item.get("request_id", line_number)),
+                executive_type=item["executive_type"],
+                context=item["context"],
+                document_context=item.get("document_context", ""),
+                options=item.get("options"),
+                metadata={
+                    "user_id": item["user_id"],
+                    "title": item.get("title") or item["context"][:100],
+                    "context": item["context"],
+                    "priority": item.get("priority", "medium"),
+                    "category": item.get("category")
+                }
+            ))
+    return requests
+
+
+def make_decision_writer(app, prompt_version: str):
+    """Build a result writer that inserts one chunk of decisions per transaction"""
+
+    def write_decisions(results: List[BatchDecisionResult]):
+        with app.app_context():
+            decisions = []
+            for result in results:
+                response = result.response
+                metadata = result.metadata
+                decisions.append(Decision(
+                    user_id=metadata["user_id"],
+                    title=metadata["title"],
+                    context=metadata["context"],
+                    decision=response.decision,
+                    rationale=response.rationale,
+                    executive_type=ExecutiveType(result.executive_type),
+                    category=metadata.get("category") or response.category,
+                    priority=DecisionPriority(metadata.get("priority", "medium")),
+                    confidence_score=response.confidence_score,
+                    financial_impact=response.financial_impact,
+                    risk_level=RISK_LEVELS.get(response.risk_level, RiskLevel.MEDIUM),
+                    ai_model_version=response.model,
+                    prompt_version=prompt_version
+                ))
+            db.session.add_all(decisions)
+            db.session.commit()
+            logger.info(f"Wrote {len(decisions)} decisions")
+
+    return write_decisions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate executive decisions in bulk")
+    parser.add_argument("input", help="JSON lines file of decision requests")
+    parser.add_argument("--concurrency", type=int, default=8, help="Completions in flight at once")
+    parser.add_argument("--checkpoint", help="Checkpoint file (defaults to <input>.checkpoint.jsonl)")
+    parser.add_argument("--write-batch-size", type=int, default=50, help="Decisions per database transaction")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    app = create_app()
+    ai_service = AIIntegrationService({'openai': asdict(config.openai)})
+    requests = load_requests(args.input)
+
+    try:
+        report = ai_service.generate_executive_responses_batch(
+            requests,
+            concurrency=args.concurrency,
+            checkpoint_path=args.checkpoint or f"{args.input}.checkpoint.jsonl",
+            result_writer=make_decision_writer(
+                app, ai_service.prompt_manager.active_versions.get('decision_prompt', '1.0')
+            ),
+            write_batch_size=args.write_batch_size,
+            timeout=args.timeout
+        )
+    finally:
+        ai_service.shutdown()
+
+    print(
+        f"Generated {report.completed}, resumed {report.resumed}, failed {report.failed} "
+        f"in {report.response_time:.1f}s ({report.throughput:.2f} decisions/s)"
+    )
+    for result in report.results:
+        if not result.succeeded:
+            print(f"  {result.request_id}: {result.error}")
+    sys.exit(1 if report.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Rebuild the similar-decision index
+
+Embeds decisions that have no stored embedding (or one from a different
+embedding model) in batches and writes them to the decision_embedding table.
+Running workers pick the new rows up on their next sync, so no restart is
+needed. Use --full after changing the embedding model or the embedded text.
+
+Usage:
+    python scripts/rebuild_decision_index.py --batch-size 100
+    python scripts/rebuild_decision_index.py --full --user-id 7
+"""
+
+import argparse
+import logging
+import sys
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app import create_app
+from config.settings import config
+from models import db, Decision, DecisionEmbedding
+from services.ai_integration import AIIntegrationService
+from services.decision_index import encode_vector
+
+logger = logging.getLogger(__name__)
+
+
+def pending_decisions(embedding_model: str, full: bool, user_id: int = None):
+    """Query for decisions to embed, in id order"""
+    query = Decision.query.outerjoin(DecisionEmbedding, DecisionEmbedding.decision_id == Decision.id)
+    if not full:
+        query = query.filter(db.or_(DecisionEmbedding.id.is_(None), DecisionEmbedding.model != embedding_model))
+    if user_id is not None:
+        query = query.filter(Decision.user_id == user_id)
+    return query.order_by(Decision.id)
+
+
+def embed_batch(ai_service: AIIntegrationService, decisions) -> int:
+    """Embed one batch and replace its stored embeddings in a single transaction"""
+    embeddings = ai_service.embed_decisions([
+        {'context': decision.context, 'decision': decision.decision} for decision in decisions
+    ])
+    model = ai_service.openai_client.embedding_model
+
+    # Replaced rows get new ids, so workers syncing past their last seen id reload them
+    DecisionEmbedding.query.filter(
+        DecisionEmbedding.decision_id.in_([decision.id for decision in decisions])
+    ).delete(synchronize_session=False)
+    db.session.add_all([
+        DecisionEmbedding(
+            decision_id=decision.id,
+            user_id=decision.user_id,
+            executive_type=decision.executive_type.value,
+            model=model,
+            dimensions=len(embedding),
+            vector=encode_vector(embedding)
+        )
+        for decision, embedding in zip(decisions, embeddings)
+    ])
+    db.session.commit()
+    return len(decisions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed decisions for similar-decision lookup")
+    parser.add_argument("--full", action="store_true", help="Re-embed every decision, not just missing or stale ones")
+    parser.add_argument("--batch-size", type=int, default=100, help="Decisions per embedding request and transaction")
+    parser.add_argument("--user-id", type=int, help="Only embed this user's decisions")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    app = create_app()
+    ai_service = AIIntegrationService({'openai': asdict(config.openai)})
+    embedded = 0
+    failed = 0
+    start = time.time()
+
+    try:
+        with app.app_context():
+            db.create_all()
+            query = pending_decisions(ai_service.openai_client.embedding_model, args.full, args.user_id)
+            last_id = 0
+            while True:
+                # Keyset pagination; rows written by this run drop out of the non-full query
+                batch = query.filter(Decision.id > last_id).limit(args.batch_size).all()
+                if not batch:
+                    break
+                last_id = batch[-1].id
+                try:
+                    embedded += embed_batch(ai_service, batch)
+                    logger.info(f"Embedded {embedded} decisions (through id {last_id})")
+                except Exception as e:
+                    db.session.rollback()
+                    failed += len(batch)
+                    logger.error(f"Failed to embed decisions up to id {last_id}: {e}")
+    finally:
+        ai_service.shutdown()
+
+    elapsed = time.time() - start
+    print(f"Embedded {embedded} decisions, {failed} failed in {elapsed:.1f}s")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,19 +6,42 @@ for the AI Executive Suite.
 """
 
 import logging
+import os
 import time
 import json
 import asyncio
-from typing import List, Dict, Optional, Any, Union
-from dataclasses import dataclass, field
+import bisect
+import hashlib
+import math
+import threading
+import heapq
+import itertools
+import string
+import uuid
+from collections import OrderedDict, ChainMap, deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Dict, Optional, Any, Union, Callable, Deque
+from dataclasses import dataclass, field, replace
 from datetime import datetime, timedelta
 from enum import Enum
+from types import MappingProxyType
 import tiktoken
 import openai
 from openai import OpenAI, AsyncOpenAI
 from openai.types.chat import ChatCompletion
 import backoff
 
+from services.context_store import ContextStore, MemoryContextStore, create_context_store
+from services.openai_clients import get_openai_client, get_async_openai_client, get_openai_client_factory
+from services.context_packer import ContextChunk, ContextPacker, PackedContext
+from services.decision_index import DecisionIndex, DecisionMatch
+from services.structured_output import (
+    EXECUTIVE_RESPONSE_SCHEMA, REQUIRED_DECISION_FIELDS, STRUCTURED_OUTPUT_JSON_OBJECT,
+    IncrementalJSONParser, build_response_format, parse_json_object
+)
+from services.usage_ledger import UsageLedger, UsageTotals, get_usage_ledger, SCOPE_TOTAL, SCOPE_USER, SCOPE_EXECUTIVE, ALL_KEYS, ALL_DAYS
+from services.usage_budgets import UsageBudgets, BudgetReservation, BudgetExceededError, LIMIT_CONCURRENT
+
 logger = logging.getLogger(__name__)
 
 
@@ -49,7 +72,7 @@ class AIResponse:
     metadata: Dict[str, Any] = field(default_factory=dict)
 
 
-@dataclass
+@dataclass(kw_only=True)
 class ExecutiveResponse(AIResponse):
     """Response from an AI executive"""
     decision: str
@@ -62,7 +85,7 @@ class ExecutiveResponse(AIResponse):
     executive_type: str = ""
 
 
-@dataclass
+@dataclass(kw_only=True)
 class DocumentInsights(AIResponse):
     """Insights extracted from documents"""
     summary: str
@@ -71,7 +94,7 @@ class DocumentInsights(AIResponse):
     confidence_score: float
 
 
-@dataclass
+@dataclass(kw_only=True)
 class PatternAnalysis(AIResponse):
     """Analysis of decision patterns"""
     trends: Dict[str, Any]
@@ -79,6 +102,185 @@ class PatternAnalysis(AIResponse):
     recommendations: List[str]
 
 
+@dataclass
+class PanelResponse:
+    """Responses from several executives asked the same question concurrently"""
+    responses: Dict[str, ExecutiveResponse]
+    errors: Dict[str, str]
+    response_time: float
+    timestamp: datetime = field(default_factory=datetime.utcnow)
+
+
+@dataclass
+class BudgetPlan:
+    """How an executive request fits its user's usage budget"""
+    messages: List[Dict[str, str]]
+    reservation: Optional[BudgetReservation] = None
+    model: Optional[str] = None  # Cheaper model pinned instead of routing
+    prompt_tokens: Optional[int] = None  # Exact prompt size of messages, when already known
+    degraded: List[str] = field(default_factory=list)  # Degradation steps taken, in order
+    cached_response: Optional[ExecutiveResponse] = None  # Earlier answer served instead of a call
+    
+    def settle(self, ai_response: Optional["AIResponse"] = None):
+        """Release the reservation, charging the response's actual usage"""
+        if self.reservation is None:
+            return
+        if ai_response is None or ai_response.metadata.get("cache_hit") or ai_response.metadata.get("coalesced"):
+            self.reservation.settle()
+        else:
+            self.reservation.settle(ai_response.token_usage.total_tokens, ai_response.token_usage.estimated_cost)
+
+
+@dataclass
+class BatchDecisionRequest:
+    """One decision to generate in an offline batch"""
+    request_id: str
+    executive_type: str
+    context: str
+    document_context: str = ""
+    options: Optional[List[str]] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class BatchDecisionResult:
+    """Outcome of one batch request"""
+    request_id: str
+    executive_type: str
+    response: Optional[ExecutiveResponse] = None
+    error: Optional[str] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    resumed: bool = False  # Restored from a checkpoint rather than generated in this run
+    record: Optional[Dict[str, Any]] = None  # Checkpointed summary of a resumed result
+    
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+    
+    def to_record(self) -> Dict[str, Any]:
+        """JSON-serializable summary written to the checkpoint"""
+        if self.record is not None:
+            return self.record
+        response = self.response
+        return {
+            "request_id": self.request_id,
+            "executive_type": self.executive_type,
+            "metadata": self.metadata,
+            "decision": response.decision,
+            "rationale": response.rationale,
+            "confidence_score": response.confidence_score,
+            "priority": response.priority,
+            "category": response.category,
+            "financial_impact": response.financial_impact,
+            "risk_level": response.risk_level,
+            "model": response.model,
+            "total_tokens": response.token_usage.total_tokens,
+            "estimated_cost": response.token_usage.estimated_cost,
+            "response_time": response.response_time
+        }
+
+
+@dataclass
+class BatchReport:
+    """Summary of a batch run"""
+    results: List[BatchDecisionResult]
+    completed: int
+    failed: int
+    resumed: int
+    response_time: float
+    
+    @property
+    def throughput(self) -> float:
+        """Decisions generated per second in this run"""
+        return self.completed / self.response_time if self.response_time > 0 else 0.0
+
+
+class BatchCheckpoint:
+    """Append-only JSON lines record of finished batch requests"""
+    
+    def __init__(self, path: str):
+        self.path = path
+    
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """Read finished records by request_id; a torn final line from a crash is ignored"""
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[record["request_id"]] = record
+        return records
+    
+    def append(self, records: List[Dict[str, Any]]):
+        """Durably append records"""
+        if not records:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(record, default=str) + "\n" for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+# Chat format overhead, matching OpenAIClient.count_message_tokens
+MESSAGE_TOKEN_OVERHEAD = 4
+CONVERSATION_TOKEN_OVERHEAD = 2
+
+# Recent conversation turns rendered into an executive decision prompt
+EXECUTIVE_HISTORY_MESSAGES = 6
+
+_token_encoders: Dict[str, Any] = {}
+_token_encoders_lock = threading.Lock()
+
+
+def get_token_encoder(model: str = "gpt-4"):
+    """
+    Get the tiktoken encoding for a model, loaded once per process
+    
+    Args:
+        model: Model name used to select the encoding
+        
+    Returns:
+        Encoding object, or None if no encoding could be loaded
+    """
+    encoder = _token_encoders.get(model)
+    if encoder is not None or model in _token_encoders:
+        return encoder
+    
+    with _token_encoders_lock:
+        if model not in _token_encoders:
+            try:
+                try:
+                    encoder = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    # Fallback to cl100k_base for newer models
+                    encoder = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                # e.g. the encoding cannot be downloaded; callers estimate instead
+                logging.getLogger(__name__).warning(f"Tokenizer unavailable for {model}: {e}")
+                encoder = None
+            _token_encoders[model] = encoder
+        return _token_encoders[model]
+
+
+def count_text_tokens(text: str, model: str = "gpt-4") -> int:
+    """Count tokens in text with the shared encoding for a model"""
+    encoder = get_token_encoder(model)
+    if encoder is not None:
+        try:
+            return len(encoder.encode(text))
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Token counting failed: {e}")
+    # Rough estimation: 1 token ≈ 4 characters
+    return len(text) // 4
+
+
 @dataclass
 class ConversationMessage:
     """Single conversation message"""
@@ -86,23 +288,111 @@ class ConversationMessage:
     content: str
     timestamp: datetime = field(default_factory=datetime.utcnow)
     metadata: Dict[str, Any] = field(default_factory=dict)
+    token_count: int = 0  # Content tokens, counted once at insertion
+    message_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    
+    @property
+    def prompt_tokens(self) -> int:
+        """Tokens this message contributes to a chat prompt"""
+        return self.token_count + MESSAGE_TOKEN_OVERHEAD
 
 
 @dataclass
 class ConversationContext:
     """Conversation context with history"""
-    messages: List[ConversationMessage]
+    messages: Deque[ConversationMessage]
     total_tokens: int = 0
     max_tokens: int = 4000
+    token_counter: Optional[Callable[[str], int]] = None
+    
+    def __post_init__(self):
+        # Deque so the oldest messages can be trimmed in O(1)
+        if not isinstance(self.messages, deque):
+            self.messages = deque(self.messages)
+        if self.token_counter is None:
+            self.token_counter = count_text_tokens
+        self.total_tokens = sum(msg.prompt_tokens for msg in self.messages)
     
-    def add_message(self, role: str, content: str, metadata: Dict[str, Any] = None):
-        """Add a message to the conversation"""
+    def add_message(self, role: str, content: str, metadata: Dict[str, Any] = None) -> ConversationMessage:
+        """Add a message to the conversation, counting its tokens once"""
         message = ConversationMessage(
             role=role,
             content=content,
-            metadata=metadata or {}
+            metadata=metadata or {},
+            token_count=self.token_counter(content)
         )
         self.messages.append(message)
+        self.total_tokens += message.prompt_tokens
+        return message
+    
+    def insert_message(
+        self, 
+        index: int, 
+        role: str, 
+        content: str, 
+        metadata: Dict[str, Any] = None
+    ) -> ConversationMessage:
+        """Insert a message at a position, counting its tokens once"""
+        message = ConversationMessage(
+            role=role,
+            content=content,
+            metadata=metadata or {},
+            token_count=self.token_counter(content)
+        )
+        self.messages.insert(index, message)
+        self.total_tokens += message.prompt_tokens
+        return message
+    
+    def remove_message(self, index: int) -> ConversationMessage:
+        """Remove a message by position, keeping the running total exact"""
+        message = self.messages[index]
+        del self.messages[index]
+        self.total_tokens -= message.prompt_tokens
+        return message
+    
+    def prompt_tokens(self, messages: List[ConversationMessage] = None) -> int:
+        """Exact chat prompt size for the given messages (default: all)"""
+        if messages is None:
+            return self.total_tokens + CONVERSATION_TOKEN_OVERHEAD
+        return sum(msg.prompt_tokens for msg in messages) + CONVERSATION_TOKEN_OVERHEAD
+    
+    def estimate_size(self) -> int:
+        """Approximate in-memory footprint in bytes, used by bounded context stores"""
+        # Fixed costs cover the dataclass, timestamp and metadata dict per message
+        return 600 + sum(400 + len(msg.content) for msg in self.messages)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize for shared context stores"""
+        return {
+            "max_tokens": self.max_tokens,
+            "messages": [
+                {
+                    "role": msg.role,
+                    "content": msg.content,
+                    "timestamp": msg.timestamp.isoformat(),
+                    "metadata": msg.metadata,
+                    "token_count": msg.token_count,
+                    "message_id": msg.message_id
+                }
+                for msg in self.messages
+            ]
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ConversationContext':
+        """Rebuild a context serialized with to_dict; token counts are reused, not recounted"""
+        messages = deque(
+            ConversationMessage(
+                role=msg["role"],
+                content=msg["content"],
+                timestamp=datetime.fromisoformat(msg["timestamp"]),
+                metadata=msg.get("metadata") or {},
+                token_count=msg.get("token_count", 0),
+                message_id=msg.get("message_id") or uuid.uuid4().hex
+            )
+            for msg in data.get("messages", [])
+        )
+        return cls(messages=messages, max_tokens=data.get("max_tokens", 4000))
     
     def to_openai_format(self) -> List[Dict[str, str]]:
         """Convert to OpenAI chat format"""
@@ -127,189 +417,1274 @@ class RateLimitError(OpenAIError):
     pass
 
 
-class OpenAIClient:
-    """OpenAI API client with retry logic and error handling"""
+class QualityTier(Enum):
+    """Minimum model quality a request needs"""
+    ECONOMY = "economy"
+    STANDARD = "standard"
+    PREMIUM = "premium"
+
+
+QUALITY_RANK = {
+    QualityTier.ECONOMY: 1,
+    QualityTier.STANDARD: 2,
+    QualityTier.PREMIUM: 3
+}
+
+
+@dataclass
+class ModelSpec:
+    """Catalogue entry for a chat model"""
+    name: str
+    context_window: int
+    input_price: float  # USD per 1K prompt tokens
+    output_price: float  # USD per 1K completion tokens
+    quality: QualityTier
+    latency: float  # Expected seconds per request; updated from observations
+    latency_samples: int = 0
+    structured_output: Optional[str] = None  # "json_schema", "json_object" or None
     
-    # Token pricing per 1K tokens (as of 2024)
-    TOKEN_PRICING = {
-        "gpt-4": {"input": 0.03, "output": 0.06},
-        "gpt-4-turbo": {"input": 0.01, "output": 0.03},
-        "gpt-3.5-turbo": {"input": 0.0015, "output": 0.002},
-    }
+    def fits(self, prompt_tokens: int, max_output_tokens: int) -> bool:
+        """Whether a prompt plus the completion budget fits the context window"""
+        return prompt_tokens + max_output_tokens <= self.context_window
     
-    def __init__(self, config: Dict[str, Any]):
-        self.config = config
-        self.logger = logging.getLogger(__name__)
-        
-        # Initialize OpenAI clients
-        self.client = OpenAI(
-            api_key=config.get('api_key'),
-            timeout=config.get('timeout', 30)
-        )
-        self.async_client = AsyncOpenAI(
-            api_key=config.get('api_key'),
-            timeout=config.get('timeout', 30)
-        )
-        
-        # Initialize tokenizer
-        self.model = config.get('model', 'gpt-4')
-        try:
-            self.tokenizer = tiktoken.encoding_for_model(self.model)
-        except KeyError:
-            # Fallback to cl100k_base for newer models
-            self.tokenizer = tiktoken.get_encoding("cl100k_base")
-        
-        # Configuration
-        self.max_tokens = config.get('max_tokens', 2000)
-        self.temperature = config.get('temperature', 0.7)
-        self.max_retries = config.get('max_retries', 3)
+    def estimate_cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        return (prompt_tokens / 1000) * self.input_price + (completion_tokens / 1000) * self.output_price
+
+
+@dataclass
+class RoutingDecision:
+    """Model chosen for a request, and why"""
+    model: str
+    requested_model: str
+    quality: str
+    reason: str
+    fallback: bool
+    prompt_tokens: int
+    context_window: int
+    estimated_cost: float
+    expected_latency: float
     
-    def count_tokens(self, text: str) -> int:
-        """Count tokens in text"""
-        try:
-            return len(self.tokenizer.encode(text))
-        except Exception as e:
-            self.logger.warning(f"Token counting failed: {e}")
-            # Rough estimation: 1 token ≈ 4 characters
-            return len(text) // 4
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "requested_model": self.requested_model,
+            "quality": self.quality,
+            "reason": self.reason,
+            "fallback": self.fallback,
+            "prompt_tokens": self.prompt_tokens,
+            "context_window": self.context_window,
+            "estimated_cost": self.estimated_cost,
+            "expected_latency": self.expected_latency
+        }
+
+
+@dataclass
+class RequestEstimate:
+    """Pre-flight size and worst-case cost of a chat request"""
+    model: str
+    prompt_tokens: int
+    max_completion_tokens: int
+    cost: float  # If the completion uses its whole budget
     
-    def count_message_tokens(self, messages: List[Dict[str, str]]) -> int:
-        """Count tokens in a list of messages"""
-        total_tokens = 0
-        for message in messages:
-            # Add tokens for message content
-            total_tokens += self.count_tokens(message.get('content', ''))
-            # Add overhead tokens for message structure
-            total_tokens += 4  # Overhead per message
-        
-        # Add overhead for the conversation
-        total_tokens += 2
-        return total_tokens
+    @property
+    def tokens(self) -> int:
+        return self.prompt_tokens + self.max_completion_tokens
+
+
+class ModelCatalog:
+    """Context windows, pricing, quality and observed latency of available models"""
     
-    def calculate_cost(self, prompt_tokens: int, completion_tokens: int, model: str = None) -> float:
-        """Calculate estimated cost for token usage"""
-        model = model or self.model
-        pricing = self.TOKEN_PRICING.get(model, self.TOKEN_PRICING["gpt-4"])
+    DEFAULT_MODELS = {
+        "gpt-3.5-turbo": {"context_window": 16385, "input_price": 0.0015, "output_price": 0.002,
+                          "quality": "economy", "latency": 1.5, "structured_output": "json_object"},
+        "gpt-4o-mini": {"context_window": 128000, "input_price": 0.00015, "output_price": 0.0006,
+                        "quality": "standard", "latency": 2.0, "structured_output": "json_schema"},
+        "gpt-4o": {"context_window": 128000, "input_price": 0.005, "output_price": 0.015,
+                   "quality": "premium", "latency": 3.0, "structured_output": "json_schema"},
+        "gpt-4-turbo": {"context_window": 128000, "input_price": 0.01, "output_price": 0.03,
+                        "quality": "premium", "latency": 5.0, "structured_output": "json_object"},
+        "gpt-4": {"context_window": 8192, "input_price": 0.03, "output_price": 0.06,
+                  "quality": "premium", "latency": 6.0},
+        "gpt-4-32k": {"context_window": 32768, "input_price": 0.06, "output_price": 0.12,
+                      "quality": "premium", "latency": 8.0},
+    }
+    
+    def __init__(self, models: Dict[str, Dict[str, Any]] = None, latency_smoothing: float = 0.2):
+        """
+        Initialize the catalogue
         
-        prompt_cost = (prompt_tokens / 1000) * pricing["input"]
-        completion_cost = (completion_tokens / 1000) * pricing["output"]
+        Args:
+            models: Entries to add or override, keyed by model name
+            latency_smoothing: Weight of each new observation in the latency average
+        """
+        self.latency_smoothing = latency_smoothing
+        self._lock = threading.Lock()
+        self._models: Dict[str, ModelSpec] = {}
         
-        return prompt_cost + completion_cost
+        for name, spec in {**self.DEFAULT_MODELS, **(models or {})}.items():
+            self.register(name, **spec)
     
-    @backoff.on_exception(
-        backoff.expo,
-        (openai.RateLimitError, openai.APITimeoutError, openai.InternalServerError),
-        max_tries=3,
-        max_time=60
-    )
-    def _make_request(self, messages: List[Dict[str, str]], **kwargs) -> ChatCompletion:
-        """Make request to OpenAI with retry logic"""
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=self.max_tokens,
-                temperature=self.temperature,
-                **kwargs
+    def register(
+        self,
+        name: str,
+        context_window: int,
+        input_price: float,
+        output_price: float,
+        quality: str = "standard",
+        latency: float = 3.0,
+        structured_output: str = None
+    ):
+        """Add or replace a model entry"""
+        with self._lock:
+            self._models[name] = ModelSpec(
+                name=name,
+                context_window=context_window,
+                input_price=input_price,
+                output_price=output_price,
+                quality=QualityTier(quality),
+                latency=latency,
+                structured_output=structured_output
             )
-            return response
-        except openai.RateLimitError as e:
-            self.logger.warning(f"Rate limit exceeded: {e}")
-            raise RateLimitError(f"Rate limit exceeded: {e}")
-        except openai.APITimeoutError as e:
-            self.logger.error(f"API timeout: {e}")
-            raise OpenAIError(f"API timeout: {e}")
-        except openai.AuthenticationError as e:
-            self.logger.error(f"Authentication failed: {e}")
-            raise OpenAIError(f"Authentication failed: {e}")
-        except openai.BadRequestError as e:
-            self.logger.error(f"Bad request: {e}")
-            raise OpenAIError(f"Bad request: {e}")
-        except Exception as e:
-            self.logger.error(f"Unexpected error: {e}")
-            raise OpenAIError(f"Unexpected error: {e}")
     
-    def generate_completion(
+    def get(self, name: str) -> Optional[ModelSpec]:
+        return self._models.get(name)
+    
+    def models(self) -> List[ModelSpec]:
+        return list(self._models.values())
+    
+    def record_latency(self, name: str, seconds: float):
+        """Fold an observed response time into the model's expected latency"""
+        with self._lock:
+            spec = self._models.get(name)
+            if spec is None:
+                return
+            if spec.latency_samples == 0:
+                spec.latency = seconds
+            else:
+                spec.latency += self.latency_smoothing * (seconds - spec.latency)
+            spec.latency_samples += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get catalogue entries with observed latencies"""
+        with self._lock:
+            return {
+                spec.name: {
+                    "context_window": spec.context_window,
+                    "input_price": spec.input_price,
+                    "output_price": spec.output_price,
+                    "quality": spec.quality.value,
+                    "latency": round(spec.latency, 3),
+                    "latency_samples": spec.latency_samples,
+                    "structured_output": spec.structured_output
+                }
+                for spec in self._models.values()
+            }
+
+
+class ModelRouter:
+    """
+    Pick a model for each request
+    
+    With routing enabled, the cheapest (or fastest) allowed model that meets
+    the quality tier and fits the prompt wins. With it disabled the configured
+    model is used unless the prompt does not fit, in which case the request
+    falls back to a larger-window model instead of failing.
+    """
+    
+    def __init__(
         self,
-        messages: List[Dict[str, str]],
-        **kwargs
-    ) -> AIResponse:
-        """Generate completion with full tracking"""
-        start_time = time.time()
+        catalog: ModelCatalog,
+        default_model: str,
+        max_output_tokens: int,
+        enabled: bool = False,
+        strategy: str = "cost",
+        allowed_models: List[str] = None,
+        default_quality: str = None
+    ):
+        """
+        Initialize the router
         
-        # Count input tokens
-        prompt_tokens = self.count_message_tokens(messages)
+        Args:
+            catalog: Model catalogue
+            default_model: Configured model
+            max_output_tokens: Completion budget reserved in the context window
+            enabled: Route every request rather than only overflowing ones
+            strategy: 'cost' or 'latency'
+            allowed_models: Models the router may choose (default: whole catalogue)
+            default_quality: Tier used when a request does not name one
+                (default: the configured model's tier)
+        """
+        if strategy not in ("cost", "latency"):
+            raise ValueError(f"Unknown routing strategy: {strategy}")
         
-        # Check token limits
-        if prompt_tokens > (4096 - self.max_tokens):  # Leave room for completion
-            raise TokenLimitError(f"Prompt too long: {prompt_tokens} tokens")
+        self.catalog = catalog
+        self.default_model = default_model
+        self.max_output_tokens = max_output_tokens
+        self.enabled = enabled
+        self.strategy = strategy
+        self.allowed_models = allowed_models
         
-        try:
-            # Make the request
-            response = self._make_request(messages, **kwargs)
-            
-            # Calculate metrics
-            response_time = time.time() - start_time
-            completion_tokens = response.usage.completion_tokens
-            total_tokens = response.usage.total_tokens
-            estimated_cost = self.calculate_cost(prompt_tokens, completion_tokens)
-            
-            # Create token usage object
-            token_usage = TokenUsage(
-                prompt_tokens=prompt_tokens,
-                completion_tokens=completion_tokens,
-                total_tokens=total_tokens,
-                estimated_cost=estimated_cost
-            )
-            
-            # Extract content
-            content = response.choices[0].message.content
+        default_spec = catalog.get(default_model)
+        self.default_quality = QualityTier(
+            default_quality or (default_spec.quality.value if default_spec else "standard")
+        )
+        
+        self._lock = threading.Lock()
+        self.routed_counts: Dict[str, int] = {}
+        self.fallbacks = 0
+    
+    def _candidates(self, quality: QualityTier) -> List[ModelSpec]:
+        rank = QUALITY_RANK[quality]
+        return [
+            spec for spec in self.catalog.models()
+            if (self.allowed_models is None or spec.name in self.allowed_models)
+            and QUALITY_RANK[spec.quality] >= rank
+        ]
+    
+    def _score(self, spec: ModelSpec, prompt_tokens: int) -> tuple:
+        cost = spec.estimate_cost(prompt_tokens, self.max_output_tokens)
+        if self.strategy == "latency":
+            return (spec.latency, cost)
+        return (cost, spec.latency)
+    
+    def route(self, prompt_tokens: int, quality: str = None, model: str = None, record: bool = True) -> RoutingDecision:
+        """
+        Choose a model for a prompt
+        
+        Args:
+            prompt_tokens: Prompt size in tokens
+            quality: Minimum quality tier ('economy', 'standard', 'premium')
+            model: Use this model if the prompt fits it, e.g. a cheaper one chosen
+                to stay within a usage budget
+            record: Count the decision in the routing statistics; estimates do not
             
-            return AIResponse(
-                content=content,
-                model=self.model,
-                token_usage=token_usage,
-                response_time=response_time,
-                metadata={
-                    'finish_reason': response.choices[0].finish_reason,
-                    'response_id': response.id
-                }
-            )
+        Returns:
+            RoutingDecision
             
-        except Exception as e:
-            self.logger.error(f"Failed to generate completion: {e}")
-            raise
-    
-    async def generate_completion_async(
-        self,
-        messages: List[Dict[str, str]],
-        **kwargs
-    ) -> AIResponse:
-        """Async version of generate_completion"""
-        start_time = time.time()
+        Raises:
+            TokenLimitError: If no catalogued model can fit the prompt
+        """
+        tier = QualityTier(quality) if quality else self.default_quality
+        default_spec = self.catalog.get(self.default_model)
         
-        # Count input tokens
-        prompt_tokens = self.count_message_tokens(messages)
+        pinned_spec = self.catalog.get(model) if model else None
+        if pinned_spec is not None and pinned_spec.fits(prompt_tokens, self.max_output_tokens):
+            return self._decision(pinned_spec, model, tier, prompt_tokens, "pinned", False, record)
         
-        # Check token limits
-        if prompt_tokens > (4096 - self.max_tokens):
-            raise TokenLimitError(f"Prompt too long: {prompt_tokens} tokens")
+        if not self.enabled and (default_spec is None or default_spec.fits(prompt_tokens, self.max_output_tokens)):
+            # Unknown models keep the legacy 4096-token window
+            if default_spec is None and prompt_tokens > (4096 - self.max_output_tokens):
+                raise TokenLimitError(f"Prompt too long: {prompt_tokens} tokens")
+            return self._decision(default_spec, self.default_model, tier, prompt_tokens, "configured", False, record)
         
-        try:
-            # Make the async request
-            response = await self.async_client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=self.max_tokens,
-                temperature=self.temperature,
-                **kwargs
-            )
-            
-            # Calculate metrics
-            response_time = time.time() - start_time
-            completion_tokens = response.usage.completion_tokens
+        fitting = [spec for spec in self._candidates(tier) if spec.fits(prompt_tokens, self.max_output_tokens)]
+        if self.enabled and fitting:
+            best = min(fitting, key=lambda spec: self._score(spec, prompt_tokens))
+            fallback = default_spec is not None and not default_spec.fits(prompt_tokens, self.max_output_tokens)
+            reason = "cheapest" if self.strategy == "cost" else "fastest"
+            return self._decision(best, best.name, tier, prompt_tokens, reason, fallback, record)
+        
+        # Prompt overflows the configured model: prefer the same tier, then any larger window
+        if not fitting:
+            fitting = [
+                spec for spec in self.catalog.models()
+                if spec.fits(prompt_tokens, self.max_output_tokens)
+            ]
+        if not fitting:
+            raise TokenLimitError(f"Prompt too long for every available model: {prompt_tokens} tokens")
+        
+        best = min(fitting, key=lambda spec: self._score(spec, prompt_tokens))
+        return self._decision(best, best.name, tier, prompt_tokens, "context_window_fallback", True, record)
+    
+    def _decision(
+        self,
+        spec: Optional[ModelSpec],
+        model: str,
+        tier: QualityTier,
+        prompt_tokens: int,
+        reason: str,
+        fallback: bool,
+        record: bool = True
+    ) -> RoutingDecision:
+        if record:
+            with self._lock:
+                self.routed_counts[model] = self.routed_counts.get(model, 0) + 1
+                if fallback:
+                    self.fallbacks += 1
+        
+        return RoutingDecision(
+            model=model,
+            requested_model=self.default_model,
+            quality=tier.value,
+            reason=reason,
+            fallback=fallback,
+            prompt_tokens=prompt_tokens,
+            context_window=spec.context_window if spec else 4096,
+            estimated_cost=spec.estimate_cost(prompt_tokens, self.max_output_tokens) if spec else 0.0,
+            expected_latency=spec.latency if spec else 0.0
+        )
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get routing statistics"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "strategy": self.strategy,
+                "default_model": self.default_model,
+                "default_quality": self.default_quality.value,
+                "routed": dict(self.routed_counts),
+                "fallbacks": self.fallbacks
+            }
+
+
+class RequestPriority(Enum):
+    """Queue priority for rate-limited requests; lower values are served first"""
+    INTERACTIVE = 0
+    STANDARD = 1
+    BACKGROUND = 2
+
+
+class RateLimitPermit:
+    """Admission to make one request; release it when the request finishes"""
+    
+    def __init__(self, limiter: "RateLimiter"):
+        self._limiter = limiter
+        self._released = False
+    
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._limiter._release()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class _RateLimitWaiter:
+    """Queued acquire() call"""
+    
+    def __init__(self, priority: int, sequence: int, tokens: int):
+        self.priority = priority
+        self.sequence = sequence
+        self.tokens = tokens
+        self.shed = False
+    
+    def __lt__(self, other: "_RateLimitWaiter") -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+class RateLimiter:
+    """
+    Process-wide client-side limiter for OpenAI calls
+    
+    Requests-per-minute and tokens-per-minute budgets are token buckets that
+    refill continuously. Callers queue by priority (interactive before
+    background) and a concurrency cap bounds in-flight calls. When the queue
+    is full the lowest-priority waiter is shed with RateLimitError.
+    """
+    
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_concurrent: Optional[int] = None,
+        max_queue_size: int = 1000,
+        max_wait_seconds: float = 60.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize the limiter
+        
+        Args:
+            requests_per_minute: RPM budget (None for unlimited)
+            tokens_per_minute: TPM budget (None for unlimited)
+            max_concurrent: Cap on in-flight requests (None for unlimited)
+            max_queue_size: Waiters beyond this are shed
+            max_wait_seconds: Default time a caller may wait before failing
+            clock: Monotonic time source
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrent = max_concurrent
+        self.max_queue_size = max_queue_size
+        self.max_wait_seconds = max_wait_seconds
+        self.clock = clock
+        
+        self._condition = threading.Condition()
+        self._queue: List[_RateLimitWaiter] = []
+        self._sequence = itertools.count()
+        self._request_allowance = float(requests_per_minute or 0)
+        self._token_allowance = float(tokens_per_minute or 0)
+        self._last_refill = clock()
+        self.in_flight = 0
+        
+        # Metrics
+        self.admitted = 0
+        self.shed = 0
+        self.timeouts = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.max_queue_depth = 0
+        self.admitted_by_priority: Dict[str, int] = {priority.name.lower(): 0 for priority in RequestPriority}
+        self._recent_waits: deque = deque(maxlen=1000)
+    
+    @property
+    def unlimited(self) -> bool:
+        return not (self.requests_per_minute or self.tokens_per_minute or self.max_concurrent)
+    
+    def _refill(self, now: float):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.requests_per_minute:
+            self._request_allowance = min(
+                float(self.requests_per_minute),
+                self._request_allowance + elapsed * self.requests_per_minute / 60.0
+            )
+        if self.tokens_per_minute:
+            self._token_allowance = min(
+                float(self.tokens_per_minute),
+                self._token_allowance + elapsed * self.tokens_per_minute / 60.0
+            )
+    
+    def _time_until_available(self, tokens: int) -> float:
+        """Seconds until the buckets can admit a request; 0 if they can now"""
+        wait = 0.0
+        if self.requests_per_minute and self._request_allowance < 1:
+            wait = max(wait, (1 - self._request_allowance) * 60.0 / self.requests_per_minute)
+        if self.tokens_per_minute and self._token_allowance < tokens:
+            wait = max(wait, (tokens - self._token_allowance) * 60.0 / self.tokens_per_minute)
+        return wait
+    
+    def acquire(
+        self,
+        tokens: int = 0,
+        priority: RequestPriority = RequestPriority.STANDARD,
+        timeout: float = None
+    ) -> RateLimitPermit:
+        """
+        Wait for budget and a concurrency slot
+        
+        Args:
+            tokens: Tokens the request will consume (prompt plus completion budget)
+            priority: Queue priority
+            timeout: Seconds to wait (defaults to max_wait_seconds)
+            
+        Returns:
+            RateLimitPermit to release when the request finishes
+            
+        Raises:
+            RateLimitError: If the request is shed or times out
+        """
+        priority = RequestPriority(priority)
+        if self.tokens_per_minute:
+            # A request larger than the whole budget could never be admitted
+            tokens = min(tokens, self.tokens_per_minute)
+        
+        start = self.clock()
+        deadline = start + (self.max_wait_seconds if timeout is None else timeout)
+        
+        with self._condition:
+            if self.unlimited:
+                self.in_flight += 1
+                self._record_admission(priority, 0.0)
+                return RateLimitPermit(self)
+            
+            waiter = _RateLimitWaiter(priority.value, next(self._sequence), tokens)
+            if len(self._queue) >= self.max_queue_size:
+                self._shed_for(waiter)
+            heapq.heappush(self._queue, waiter)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+            
+            try:
+                while True:
+                    if waiter.shed:
+                        raise RateLimitError("Request shed by client-side rate limiter: queue full")
+                    
+                    now = self.clock()
+                    self._refill(now)
+                    wait = None
+                    if self._queue[0] is waiter:
+                        if self.max_concurrent is None or self.in_flight < self.max_concurrent:
+                            wait = self._time_until_available(tokens)
+                            if wait == 0:
+                                break
+                    
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise RateLimitError(
+                            f"Timed out after {now - start:.1f}s waiting for client-side rate limit"
+                        )
+                    self._condition.wait(min(remaining, wait) if wait else remaining)
+            except BaseException:
+                self._remove_waiter(waiter)
+                raise
+            
+            heapq.heappop(self._queue)
+            if self.requests_per_minute:
+                self._request_allowance -= 1
+            if self.tokens_per_minute:
+                self._token_allowance -= tokens
+            self.in_flight += 1
+            self._record_admission(priority, self.clock() - start)
+            # The next waiter may be admissible too
+            self._condition.notify_all()
+            return RateLimitPermit(self)
+    
+    async def acquire_async(
+        self,
+        tokens: int = 0,
+        priority: RequestPriority = RequestPriority.STANDARD,
+        timeout: float = None
+    ) -> RateLimitPermit:
+        """Async version of acquire; waits in a worker thread so the event loop keeps running"""
+        if self.unlimited:
+            return self.acquire(tokens, priority, timeout)
+        
+        future = asyncio.get_running_loop().run_in_executor(None, self.acquire, tokens, priority, timeout)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # The waiting thread cannot be interrupted; release its permit once admitted
+            future.add_done_callback(self._release_abandoned)
+            raise
+    
+    @staticmethod
+    def _release_abandoned(future: asyncio.Future):
+        if not future.cancelled() and future.exception() is None:
+            future.result().release()
+    
+    def _shed_for(self, newcomer: _RateLimitWaiter):
+        """Make room for a newcomer by shedding the lowest-priority waiter, or reject the newcomer"""
+        victim = max(self._queue)
+        if newcomer < victim:
+            victim.shed = True
+            self._remove_waiter(victim)
+            self.shed += 1
+            self._condition.notify_all()
+        else:
+            self.shed += 1
+            raise RateLimitError("Request shed by client-side rate limiter: queue full")
+    
+    def _remove_waiter(self, waiter: _RateLimitWaiter):
+        if waiter in self._queue:
+            self._queue.remove(waiter)
+            heapq.heapify(self._queue)
+            self._condition.notify_all()
+    
+    def _record_admission(self, priority: RequestPriority, wait_time: float):
+        self.admitted += 1
+        self.admitted_by_priority[priority.name.lower()] += 1
+        self.total_wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+        self._recent_waits.append(wait_time)
+    
+    def _release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get limiter statistics, including queue depth and wait times"""
+        with self._condition:
+            self._refill(self.clock())
+            recent = sorted(self._recent_waits)
+            return {
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+                "max_concurrent": self.max_concurrent,
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self.max_queue_depth,
+                "in_flight": self.in_flight,
+                "admitted": self.admitted,
+                "admitted_by_priority": dict(self.admitted_by_priority),
+                "shed": self.shed,
+                "timeouts": self.timeouts,
+                "avg_wait_time": self.total_wait_time / self.admitted if self.admitted else 0.0,
+                "p95_wait_time": recent[int(0.95 * (len(recent) - 1))] if recent else 0.0,
+                "max_wait_time": self.max_wait_time,
+                "available_requests": self._request_allowance if self.requests_per_minute else None,
+                "available_tokens": self._token_allowance if self.tokens_per_minute else None
+            }
+
+
+_rate_limiters: Dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(config: Dict[str, Any] = None) -> RateLimiter:
+    """
+    Get the process-wide rate limiter for a provider account
+    
+    Every OpenAIClient with the same limiter name shares one instance; the
+    first configuration seen for a name wins.
+    
+    Args:
+        config: Limiter configuration (name, requests_per_minute,
+            tokens_per_minute, max_concurrent, max_queue_size, max_wait_seconds)
+        
+    Returns:
+        Shared RateLimiter
+    """
+    config = config or {}
+    name = config.get('name', 'openai')
+    with _rate_limiters_lock:
+        if name not in _rate_limiters:
+            _rate_limiters[name] = RateLimiter(
+                requests_per_minute=config.get('requests_per_minute'),
+                tokens_per_minute=config.get('tokens_per_minute'),
+                max_concurrent=config.get('max_concurrent'),
+                max_queue_size=config.get('max_queue_size', 1000),
+                max_wait_seconds=config.get('max_wait_seconds', 60.0)
+            )
+        return _rate_limiters[name]
+
+
+class RequestCoalescer:
+    """
+    Single-flight coalescing of identical in-flight requests
+    
+    The first caller for a key (the leader) performs the request; callers
+    that arrive while it is in flight wait for, and share, its result or
+    exception instead of issuing a duplicate request.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._async_inflight: Dict[tuple, asyncio.Future] = {}
+        self.leader_calls = 0
+        self.coalesced_calls = 0
+        self.failed_calls = 0
+    
+    @staticmethod
+    def make_key(**components: Any) -> str:
+        """Build a canonical hash from the components that determine a request"""
+        canonical = json.dumps(components, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    
+    def run(self, key: str, func: Callable[[], Any]) -> tuple:
+        """
+        Run func once per key across concurrent threads
+        
+        Args:
+            key: Canonical request key
+            func: Performs the request
+            
+        Returns:
+            Tuple of (result, coalesced); coalesced is True for callers that
+            shared another caller's request
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.leader_calls += 1
+            else:
+                self.coalesced_calls += 1
+        
+        if not leader:
+            # Re-raises the leader's exception
+            return future.result(), True
+        
+        try:
+            result = func()
+        except BaseException as e:
+            with self._lock:
+                self.failed_calls += 1
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+    
+    async def run_async(self, key: str, coro_factory: Callable[[], Any]) -> tuple:
+        """
+        Await coro_factory() once per key across concurrent tasks on a loop
+        
+        The request runs as its own task, so a cancelled caller does not
+        cancel it for the others.
+        
+        Args:
+            key: Canonical request key
+            coro_factory: Returns the coroutine performing the request
+            
+        Returns:
+            Tuple of (result, coalesced)
+        """
+        loop = asyncio.get_running_loop()
+        inflight_key = (id(loop), key)
+        
+        with self._lock:
+            task = self._async_inflight.get(inflight_key)
+            leader = task is None
+            if leader:
+                task = loop.create_task(coro_factory())
+                self._async_inflight[inflight_key] = task
+                self.leader_calls += 1
+                task.add_done_callback(lambda done: self._finish_async(inflight_key, done))
+            else:
+                self.coalesced_calls += 1
+        
+        return await asyncio.shield(task), not leader
+    
+    def _finish_async(self, inflight_key: tuple, task: asyncio.Future):
+        with self._lock:
+            if self._async_inflight.get(inflight_key) is task:
+                del self._async_inflight[inflight_key]
+            if not task.cancelled() and task.exception() is not None:
+                # Retrieving the exception here also silences "never retrieved" warnings
+                self.failed_calls += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get coalescing statistics"""
+        with self._lock:
+            total = self.leader_calls + self.coalesced_calls
+            return {
+                "requests": total,
+                "upstream_calls": self.leader_calls,
+                "coalesced_calls": self.coalesced_calls,
+                "coalesce_rate": self.coalesced_calls / total if total else 0.0,
+                "failed_calls": self.failed_calls,
+                "in_flight": len(self._inflight) + len(self._async_inflight)
+            }
+
+
+class CompletionStream:
+    """Iterator over streamed completion text; response is set once the stream is exhausted"""
+    
+    def __init__(
+        self,
+        client: "OpenAIClient",
+        raw_stream: Any,
+        prompt_tokens: int,
+        start_time: float,
+        model: str = None,
+        routing: Dict[str, Any] = None,
+        permit: "RateLimitPermit" = None
+    ):
+        self.client = client
+        self.permit = permit
+        self.raw_stream = raw_stream
+        self.prompt_tokens = prompt_tokens
+        self.start_time = start_time
+        self.model = model or client.model
+        self.routing = routing
+        self.response: Optional[AIResponse] = None
+        self.time_to_first_token: Optional[float] = None
+    
+    def __iter__(self):
+        parts = []
+        finish_reason = None
+        response_id = None
+        usage = None
+        
+        try:
+            for chunk in self.raw_stream:
+                response_id = response_id or getattr(chunk, 'id', None)
+                if getattr(chunk, 'usage', None):
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                
+                choice = chunk.choices[0]
+                finish_reason = choice.finish_reason or finish_reason
+                delta = choice.delta.content
+                if delta:
+                    if self.time_to_first_token is None:
+                        self.time_to_first_token = time.time() - self.start_time
+                    parts.append(delta)
+                    yield delta
+        except openai.APITimeoutError as e:
+            self.client.logger.error(f"API timeout while streaming: {e}")
+            raise OpenAIError(f"API timeout: {e}")
+        except OpenAIError:
+            raise
+        except Exception as e:
+            self.client.logger.error(f"Streaming failed: {e}")
+            raise OpenAIError(f"Streaming failed: {e}")
+        finally:
+            if self.permit is not None:
+                self.permit.release()
+        
+        content = "".join(parts)
+        completion_tokens = usage.completion_tokens if usage else self.client.count_tokens(content)
+        
+        self.response = AIResponse(
+            content=content,
+            model=self.model,
+            token_usage=TokenUsage(
+                prompt_tokens=self.prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=self.prompt_tokens + completion_tokens,
+                estimated_cost=self.client.calculate_cost(self.prompt_tokens, completion_tokens, self.model)
+            ),
+            response_time=time.time() - self.start_time,
+            metadata={
+                'finish_reason': finish_reason,
+                'response_id': response_id,
+                'streamed': True,
+                'time_to_first_token': self.time_to_first_token,
+                'routing': self.routing
+            }
+        )
+
+
+class OpenAIClient:
+    """OpenAI API client with retry logic and error handling"""
+    
+    # Token pricing per 1K tokens (as of 2024)
+    TOKEN_PRICING = {
+        "gpt-4": {"input": 0.03, "output": 0.06},
+        "gpt-4-turbo": {"input": 0.01, "output": 0.03},
+        "gpt-3.5-turbo": {"input": 0.0015, "output": 0.002},
+    }
+    
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        
+        # Clients come from the process-wide factory so every service shares
+        # pooled connections; base_url points at any OpenAI-compatible server
+        self._client_options = {
+            'api_key': config.get('api_key'),
+            'base_url': config.get('base_url'),
+            'timeout': config.get('timeout')
+        }
+        self.client = get_openai_client('chat', client_class=OpenAI, **self._client_options)
+        self._async_client = None
+        
+        # Shared tokenizer; None when no encoding could be loaded
+        self.model = config.get('model', 'gpt-4')
+        self.tokenizer = get_token_encoder(self.model)
+        
+        # Configuration
+        self.max_tokens = config.get('max_tokens', 2000)
+        self.temperature = config.get('temperature', 0.7)
+        self.max_retries = config.get('max_retries', 3)
+        self.embedding_model = config.get('embedding_model', 'text-embedding-3-small')
+        
+        # Memo of recent token counts; system prompts repeat on every request
+        self.token_cache_size = config.get('token_cache_size', 1024)
+        self._token_cache: OrderedDict = OrderedDict()
+        self._token_cache_lock = threading.Lock()
+        
+        # Identical concurrent requests share one upstream call
+        self.coalesce_requests = config.get('coalesce_requests', True)
+        self.coalescer = RequestCoalescer()
+        
+        # Process-wide RPM/TPM budgets and concurrency cap
+        self.rate_limiter = get_rate_limiter(config.get('rate_limit'))
+        
+        # Model catalogue drives token limits, pricing and routing
+        self.catalog = ModelCatalog(config.get('models'))
+        routing_config = config.get('routing', {})
+        self.router = ModelRouter(
+            self.catalog,
+            default_model=self.model,
+            max_output_tokens=self.max_tokens,
+            enabled=routing_config.get('enabled', False),
+            strategy=routing_config.get('strategy', 'cost'),
+            allowed_models=routing_config.get('models'),
+            default_quality=routing_config.get('default_quality')
+        )
+    
+    @property
+    def async_client(self):
+        """Async client on the running event loop's shared connection pool"""
+        if self._async_client is not None:
+            return self._async_client
+        return get_async_openai_client('chat', client_class=AsyncOpenAI, **self._client_options)
+    
+    @async_client.setter
+    def async_client(self, client):
+        self._async_client = client
+    
+    def count_tokens(self, text: str) -> int:
+        """Count tokens in text"""
+        if self.tokenizer is None:
+            # Rough estimation: 1 token ≈ 4 characters
+            return len(text) // 4
+        
+        with self._token_cache_lock:
+            cached = self._token_cache.get(text)
+            if cached is not None:
+                self._token_cache.move_to_end(text)
+                return cached
+        
+        try:
+            tokens = len(self.tokenizer.encode(text))
+        except Exception as e:
+            self.logger.warning(f"Token counting failed: {e}")
+            # Rough estimation: 1 token ≈ 4 characters
+            return len(text) // 4
+        
+        if self.token_cache_size > 0:
+            with self._token_cache_lock:
+                self._token_cache[text] = tokens
+                while len(self._token_cache) > self.token_cache_size:
+                    self._token_cache.popitem(last=False)
+        return tokens
+    
+    def count_message_tokens(self, messages: List[Dict[str, str]]) -> int:
+        """Count tokens in a list of messages"""
+        total_tokens = 0
+        for message in messages:
+            # Add tokens for message content
+            total_tokens += self.count_tokens(message.get('content', ''))
+            # Add overhead tokens for message structure
+            total_tokens += MESSAGE_TOKEN_OVERHEAD
+        
+        # Add overhead for the conversation
+        total_tokens += CONVERSATION_TOKEN_OVERHEAD
+        return total_tokens
+    
+    def calculate_cost(self, prompt_tokens: int, completion_tokens: int, model: str = None) -> float:
+        """Calculate estimated cost for token usage"""
+        model = model or self.model
+        spec = self.catalog.get(model)
+        if spec is not None:
+            return spec.estimate_cost(prompt_tokens, completion_tokens)
+        
+        pricing = self.TOKEN_PRICING.get(model, self.TOKEN_PRICING["gpt-4"])
+        
+        prompt_cost = (prompt_tokens / 1000) * pricing["input"]
+        completion_cost = (completion_tokens / 1000) * pricing["output"]
+        
+        return prompt_cost + completion_cost
+    
+    def create_embedding(self, text: str, model: str = None) -> List[float]:
+        """Create an embedding vector for text"""
+        try:
+            response = self.client.embeddings.create(
+                model=model or self.embedding_model,
+                input=text.replace('\n', ' ')
+            )
+            return response.data[0].embedding
+        except Exception as e:
+            self.logger.error(f"Failed to create embedding: {e}")
+            raise OpenAIError(f"Embedding failed: {e}")
+    
+    def create_embeddings(self, texts: List[str], model: str = None) -> List[List[float]]:
+        """Create embedding vectors for several texts in one request, in input order"""
+        if not texts:
+            return []
+        try:
+            response = self.client.embeddings.create(
+                model=model or self.embedding_model,
+                input=[text.replace('\n', ' ') for text in texts]
+            )
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        except Exception as e:
+            self.logger.error(f"Failed to create embeddings: {e}")
+            raise OpenAIError(f"Embedding failed: {e}")
+    
+    @backoff.on_exception(
+        backoff.expo,
+        (openai.RateLimitError, openai.APITimeoutError, openai.InternalServerError),
+        max_tries=3,
+        max_time=60
+    )
+    def _make_request(self, messages: List[Dict[str, str]], model: str = None, **kwargs) -> ChatCompletion:
+        """Make request to OpenAI with retry logic"""
+        try:
+            response = self.client.chat.completions.create(
+                model=model or self.model,
+                messages=messages,
+                max_tokens=kwargs.pop('max_tokens', self.max_tokens),
+                temperature=self.temperature,
+                **kwargs
+            )
+            return response
+        except openai.RateLimitError as e:
+            self.logger.warning(f"Rate limit exceeded: {e}")
+            raise RateLimitError(f"Rate limit exceeded: {e}")
+        except openai.APITimeoutError as e:
+            self.logger.error(f"API timeout: {e}")
+            raise OpenAIError(f"API timeout: {e}")
+        except openai.AuthenticationError as e:
+            self.logger.error(f"Authentication failed: {e}")
+            raise OpenAIError(f"Authentication failed: {e}")
+        except openai.BadRequestError as e:
+            self.logger.error(f"Bad request: {e}")
+            raise OpenAIError(f"Bad request: {e}")
+        except Exception as e:
+            self.logger.error(f"Unexpected error: {e}")
+            raise OpenAIError(f"Unexpected error: {e}")
+    
+    def _request_key(self, messages: List[Dict[str, str]], model: str = None, **kwargs) -> str:
+        """Canonical key for a chat request, covering everything that shapes the response"""
+        return RequestCoalescer.make_key(
+            model=model or self.model,
+            messages=messages,
+            max_tokens=kwargs.pop('max_tokens', self.max_tokens),
+            temperature=self.temperature,
+            options=kwargs
+        )
+    
+    def _make_limited_request(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = None,
+        prompt_tokens: int = 0,
+        priority: RequestPriority = RequestPriority.STANDARD,
+        **kwargs
+    ) -> ChatCompletion:
+        """Make a request once the rate limiter admits it"""
+        # Providers count the completion budget against TPM at request time
+        with self.rate_limiter.acquire(prompt_tokens + kwargs.get('max_tokens', self.max_tokens), priority):
+            return self._make_request(messages, model=model, **kwargs)
+    
+    def _make_coalesced_request(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = None,
+        prompt_tokens: int = 0,
+        priority: RequestPriority = RequestPriority.STANDARD,
+        **kwargs
+    ) -> tuple:
+        """
+        Make a rate-limited request, sharing it with identical requests already in flight
+        
+        Only the leader of a coalesced group consumes rate limit budget.
+        
+        Returns:
+            Tuple of (ChatCompletion, coalesced)
+        """
+        def request():
+            return self._make_limited_request(messages, model, prompt_tokens, priority, **kwargs)
+        
+        if not self.coalesce_requests or kwargs.get('stream'):
+            return request(), False
+        return self.coalescer.run(self._request_key(messages, model=model, **kwargs), request)
+    
+    async def _make_coalesced_request_async(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = None,
+        prompt_tokens: int = 0,
+        priority: RequestPriority = RequestPriority.STANDARD,
+        **kwargs
+    ) -> tuple:
+        """Async version of _make_coalesced_request"""
+        max_tokens = kwargs.pop('max_tokens', self.max_tokens)
+        
+        async def request():
+            permit = await self.rate_limiter.acquire_async(prompt_tokens + max_tokens, priority)
+            try:
+                return await self.async_client.chat.completions.create(
+                    model=model or self.model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=self.temperature,
+                    **kwargs
+                )
+            finally:
+                permit.release()
+        
+        if not self.coalesce_requests or kwargs.get('stream'):
+            return await request(), False
+        return await self.coalescer.run_async(
+            self._request_key(messages, model=model, max_tokens=max_tokens, **kwargs), request
+        )
+    
+    def _structured_output_kwargs(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        response_schema: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """response_format for the routed model when a schema was requested and the model supports one"""
+        if not response_schema:
+            return {}
+        spec = self.catalog.get(model)
+        mode = spec.structured_output if spec else None
+        # JSON mode is rejected unless the messages themselves ask for JSON
+        if mode == STRUCTURED_OUTPUT_JSON_OBJECT and not any(
+            "json" in (message.get("content") or "").lower() for message in messages
+        ):
+            return {}
+        response_format = build_response_format(mode, response_schema)
+        return {'response_format': response_format} if response_format else {}
+    
+    def route_request(self, prompt_tokens: int, quality: str = None, model: str = None) -> RoutingDecision:
+        """Pick the model for a prompt; raises TokenLimitError if nothing fits"""
+        return self.router.route(prompt_tokens, quality, model=model)
+    
+    def estimate_request(
+        self,
+        messages: List[Dict[str, str]],
+        quality: str = None,
+        model: str = None,
+        prompt_tokens: Optional[int] = None
+    ) -> RequestEstimate:
+        """
+        Size and worst-case cost of a request before it is sent
+        
+        Args:
+            messages: Messages to send
+            quality: Minimum quality tier, as for generate_completion
+            model: Model to use if the prompt fits it, as for generate_completion
+            prompt_tokens: Exact prompt size when already known, as for generate_completion
+        
+        Returns:
+            RequestEstimate priced at the model the request would be routed to
+        """
+        if prompt_tokens is None:
+            prompt_tokens = self.count_message_tokens(messages)
+        routing = self.router.route(prompt_tokens, quality, model=model, record=False)
+        return RequestEstimate(
+            model=routing.model,
+            prompt_tokens=prompt_tokens,
+            max_completion_tokens=self.max_tokens,
+            cost=self.calculate_cost(prompt_tokens, self.max_tokens, routing.model)
+        )
+    
+    def generate_completion(
+        self,
+        messages: List[Dict[str, str]],
+        prompt_tokens: Optional[int] = None,
+        quality: str = None,
+        priority: RequestPriority = RequestPriority.STANDARD,
+        response_schema: Optional[Dict[str, Any]] = None,
+        model: Optional[str] = None,
+        **kwargs
+    ) -> AIResponse:
+        """Generate completion with full tracking"""
+        start_time = time.time()
+        
+        # Count input tokens, unless the caller already holds an exact count
+        if prompt_tokens is None:
+            prompt_tokens = self.count_message_tokens(messages)
+        
+        # Pick a model whose context window fits (raises TokenLimitError otherwise)
+        routing = self.route_request(prompt_tokens, quality, model=model)
+        kwargs.update(self._structured_output_kwargs(routing.model, messages, response_schema))
+        
+        try:
+            # Make the request (or join an identical one already in flight)
+            response, coalesced = self._make_coalesced_request(
+                messages, model=routing.model, prompt_tokens=prompt_tokens, priority=priority, **kwargs
+            )
+            
+            # Calculate metrics
+            response_time = time.time() - start_time
+            if not coalesced:
+                self.catalog.record_latency(routing.model, response_time)
+            completion_tokens = response.usage.completion_tokens
+            total_tokens = response.usage.total_tokens
+            estimated_cost = self.calculate_cost(prompt_tokens, completion_tokens, routing.model)
+            
+            # Create token usage object
+            token_usage = TokenUsage(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=total_tokens,
+                estimated_cost=estimated_cost
+            )
+            
+            # Extract content
+            content = response.choices[0].message.content
+            
+            return AIResponse(
+                content=content,
+                model=routing.model,
+                token_usage=token_usage,
+                response_time=response_time,
+                metadata={
+                    'finish_reason': response.choices[0].finish_reason,
+                    'response_id': response.id,
+                    'coalesced': coalesced,
+                    'routing': routing.to_dict()
+                }
+            )
+            
+        except Exception as e:
+            self.logger.error(f"Failed to generate completion: {e}")
+            raise
+    
+    def generate_completion_stream(
+        self,
+        messages: List[Dict[str, str]],
+        prompt_tokens: Optional[int] = None,
+        quality: str = None,
+        priority: RequestPriority = RequestPriority.STANDARD,
+        response_schema: Optional[Dict[str, Any]] = None,
+        model: Optional[str] = None,
+        **kwargs
+    ) -> CompletionStream:
+        """Start a streamed completion; iterate the result for text deltas"""
+        start_time = time.time()
+        
+        # Count input tokens, unless the caller already holds an exact count
+        if prompt_tokens is None:
+            prompt_tokens = self.count_message_tokens(messages)
+        
+        # Pick a model whose context window fits (raises TokenLimitError otherwise)
+        routing = self.route_request(prompt_tokens, quality, model=model)
+        kwargs.update(self._structured_output_kwargs(routing.model, messages, response_schema))
+        
+        # The permit is held until the stream is consumed, so streams count toward the concurrency cap
+        permit = self.rate_limiter.acquire(prompt_tokens + kwargs.get('max_tokens', self.max_tokens), priority)
+        try:
+            raw_stream = self._make_request(
+                messages,
+                model=routing.model,
+                stream=True,
+                stream_options={"include_usage": True},
+                **kwargs
+            )
+        except Exception:
+            permit.release()
+            raise
+        return CompletionStream(
+            self, raw_stream, prompt_tokens, start_time,
+            model=routing.model, routing=routing.to_dict(), permit=permit
+        )
+    
+    async def generate_completion_async(
+        self,
+        messages: List[Dict[str, str]],
+        prompt_tokens: Optional[int] = None,
+        quality: str = None,
+        priority: RequestPriority = RequestPriority.STANDARD,
+        response_schema: Optional[Dict[str, Any]] = None,
+        model: Optional[str] = None,
+        **kwargs
+    ) -> AIResponse:
+        """Async version of generate_completion"""
+        start_time = time.time()
+        
+        # Count input tokens, unless the caller already holds an exact count
+        if prompt_tokens is None:
+            prompt_tokens = self.count_message_tokens(messages)
+        
+        # Pick a model whose context window fits (raises TokenLimitError otherwise)
+        routing = self.route_request(prompt_tokens, quality, model=model)
+        kwargs.update(self._structured_output_kwargs(routing.model, messages, response_schema))
+        
+        try:
+            # Make the async request (or join an identical one already in flight)
+            response, coalesced = await self._make_coalesced_request_async(
+                messages, model=routing.model, prompt_tokens=prompt_tokens, priority=priority, **kwargs
+            )
+            
+            # Calculate metrics
+            response_time = time.time() - start_time
+            if not coalesced:
+                self.catalog.record_latency(routing.model, response_time)
+            completion_tokens = response.usage.completion_tokens
             total_tokens = response.usage.total_tokens
-            estimated_cost = self.calculate_cost(prompt_tokens, completion_tokens)
+            estimated_cost = self.calculate_cost(prompt_tokens, completion_tokens, routing.model)
             
             # Create token usage object
             token_usage = TokenUsage(
@@ -324,12 +1699,14 @@ class OpenAIClient:
             
             return AIResponse(
                 content=content,
-                model=self.model,
+                model=routing.model,
                 token_usage=token_usage,
                 response_time=response_time,
                 metadata={
                     'finish_reason': response.choices[0].finish_reason,
-                    'response_id': response.id
+                    'response_id': response.id,
+                    'coalesced': coalesced,
+                    'routing': routing.to_dict()
                 }
             )
             
@@ -342,24 +1719,77 @@ class PromptTemplate:
     """Template for AI prompts with variable substitution"""
     
     def __init__(self, template: str, variables: List[str] = None):
-        self.template = template
-        self.variables = variables or []
+        self._template = template
+        self._variables = tuple(variables or ())
+        self._segments = _compile_template(template)
+        # Templates without placeholders render to the same string every time
+        self._static = None
+        if self._segments is not None and all(name is None for _, name, _, _ in self._segments):
+            self._static = "".join(literal for literal, _, _, _ in self._segments)
+    
+    @property
+    def template(self) -> str:
+        return self._template
+    
+    @property
+    def variables(self) -> List[str]:
+        return list(self._variables)
     
     def format(self, **kwargs) -> str:
         """Format template with provided variables"""
+        if self._static is not None:
+            return self._static
         try:
-            return self.template.format(**kwargs)
+            if self._segments is None:
+                return self._template.format(**kwargs)
+            
+            parts = []
+            for literal, name, conversion, format_spec in self._segments:
+                if literal:
+                    parts.append(literal)
+                if name is None:
+                    continue
+                value = kwargs[name]
+                if conversion:
+                    value = _CONVERSIONS[conversion](value)
+                if format_spec or type(value) is not str:
+                    value = format(value, format_spec)
+                parts.append(value)
+            return "".join(parts)
         except KeyError as e:
             raise ValueError(f"Missing required variable: {e}")
     
     def validate_variables(self, **kwargs) -> bool:
         """Validate that all required variables are provided"""
-        missing = [var for var in self.variables if var not in kwargs]
+        missing = [var for var in self._variables if var not in kwargs]
         if missing:
             raise ValueError(f"Missing required variables: {missing}")
         return True
 
 
+_TEMPLATE_FORMATTER = string.Formatter()
+_CONVERSIONS = {"s": str, "r": repr, "a": ascii}
+
+
+def _compile_template(template: str) -> Optional[tuple]:
+    """
+    Pre-parse a str.format template into (literal, name, conversion, spec) segments
+    
+    Returns None for templates that need the full str.format machinery
+    (positional, attribute or index fields, nested format specs) or that are
+    malformed, so they keep their original formatting and error behaviour.
+    """
+    segments = []
+    try:
+        for literal, name, format_spec, conversion in _TEMPLATE_FORMATTER.parse(template):
+            if name is not None and (not name.isidentifier() or "{" in (format_spec or "")):
+                return None
+            segments.append((literal, name, conversion, format_spec or ""))
+    except ValueError:
+        return None
+    return tuple(segments)
+
+
 class PromptVersion:
     """Represents a versioned prompt template"""
     
@@ -370,6 +1800,149 @@ class PromptVersion:
         self.created_at = datetime.utcnow()
 
 
+class RunningStats:
+    """Welford running mean and variance in constant memory"""
+    
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+    
+    def add(self, value: float):
+        """Fold one observation into the running statistics"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+    
+    @property
+    def variance(self) -> float:
+        """Sample variance (n - 1 denominator)"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+    
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self.variance)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {"count": self.count, "mean": self.mean, "m2": self.m2, "min": self.min, "max": self.max}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RunningStats':
+        stats = cls()
+        stats.count = data["count"]
+        stats.mean = data["mean"]
+        stats.m2 = data["m2"]
+        stats.min = data.get("min")
+        stats.max = data.get("max")
+        return stats
+
+
+class Histogram:
+    """Fixed-bucket histogram with approximate quantiles"""
+    
+    def __init__(self, bounds: List[float], counts: List[int] = None):
+        self.bounds = list(bounds)
+        # One extra overflow bucket for values above the last bound
+        self.counts = list(counts) if counts else [0] * (len(self.bounds) + 1)
+        self.total = sum(self.counts)
+    
+    def add(self, value: float):
+        """Count a value in the first bucket whose upper bound holds it"""
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += 1
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket containing the q-th quantile"""
+        if not self.total:
+            return None
+        target = q * self.total
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                return self.bounds[index] if index < len(self.bounds) else float("inf")
+        return float("inf")
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {"bounds": self.bounds, "counts": self.counts}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Histogram':
+        return cls(data["bounds"], data["counts"])
+
+
+LATENCY_BUCKETS = [0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0]
+TOKEN_BUCKETS = [250, 500, 1000, 2000, 4000, 8000, 16000, 32000]
+
+
+class ABVariantStats:
+    """Streaming accumulators for one arm of a prompt A/B test"""
+    
+    MAX_METRICS = 32
+    
+    def __init__(self):
+        self.count = 0
+        self.metrics: Dict[str, RunningStats] = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.tokens = Histogram(TOKEN_BUCKETS)
+    
+    def record(self, result_data: Dict[str, Any]):
+        """Fold a result's numeric fields, latency and token usage into the accumulators"""
+        self.count += 1
+        for key, value in result_data.items():
+            if not isinstance(value, (int, float)):
+                continue
+            stats = self.metrics.get(key)
+            if stats is None:
+                if len(self.metrics) >= self.MAX_METRICS:
+                    continue
+                stats = self.metrics[key] = RunningStats()
+            stats.add(value)
+        
+        response_time = result_data.get("response_time")
+        if isinstance(response_time, (int, float)):
+            self.latency.add(response_time)
+        tokens = result_data.get("total_tokens", result_data.get("tokens_used"))
+        if isinstance(tokens, (int, float)):
+            self.tokens.add(tokens)
+    
+    def summary(self) -> Dict[str, Any]:
+        """Constant-time summary of this variant"""
+        return {
+            "count": self.count,
+            "metrics": {
+                key: {"mean": stats.mean, "stddev": stats.stddev, "count": stats.count}
+                for key, stats in self.metrics.items()
+            },
+            "latency_p50": self.latency.quantile(0.5),
+            "latency_p95": self.latency.quantile(0.95),
+            "tokens_p50": self.tokens.quantile(0.5),
+            "tokens_p95": self.tokens.quantile(0.95)
+        }
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "metrics": {key: stats.to_dict() for key, stats in self.metrics.items()},
+            "latency": self.latency.to_dict(),
+            "tokens": self.tokens.to_dict()
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ABVariantStats':
+        stats = cls()
+        stats.count = data["count"]
+        stats.metrics = {key: RunningStats.from_dict(value) for key, value in data["metrics"].items()}
+        stats.latency = Histogram.from_dict(data["latency"])
+        stats.tokens = Histogram.from_dict(data["tokens"])
+        return stats
+
+
 class ABTestConfig:
     """Configuration for A/B testing prompts"""
     
@@ -379,7 +1952,8 @@ class ABTestConfig:
         version_a: str,
         version_b: str,
         traffic_split: float = 0.5,
-        success_metric: str = "confidence_score"
+        success_metric: str = "confidence_score",
+        max_recent_results: int = 50
     ):
         self.template_name = template_name
         self.version_a = version_a
@@ -387,21 +1961,96 @@ class ABTestConfig:
         self.traffic_split = traffic_split  # Percentage of traffic to version B
         self.success_metric = success_metric
         self.created_at = datetime.utcnow()
-        self.results = {"a": [], "b": []}  # Store test results
+        self.max_recent_results = max_recent_results
+        self.results = {"a": [], "b": []}  # Most recent raw results, for inspection only
+        self.stats = {"a": ABVariantStats(), "b": ABVariantStats()}
+    
+    def variant_for(self, version: str) -> Optional[str]:
+        """Map a template version to its arm ("a" or "b")"""
+        if version == self.version_a:
+            return "a"
+        if version == self.version_b:
+            return "b"
+        return None
+    
+    def record(self, variant: str, result_data: Dict[str, Any]):
+        """Record a result for one arm"""
+        self.stats[variant].record(result_data)
+        recent = self.results[variant]
+        recent.append(result_data)
+        if len(recent) > self.max_recent_results:
+            del recent[0]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "template_name": self.template_name,
+            "version_a": self.version_a,
+            "version_b": self.version_b,
+            "traffic_split": self.traffic_split,
+            "success_metric": self.success_metric,
+            "created_at": self.created_at.isoformat(),
+            "max_recent_results": self.max_recent_results,
+            "stats": {variant: stats.to_dict() for variant, stats in self.stats.items()}
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ABTestConfig':
+        config = cls(
+            template_name=data["template_name"],
+            version_a=data["version_a"],
+            version_b=data["version_b"],
+            traffic_split=data["traffic_split"],
+            success_metric=data["success_metric"],
+            max_recent_results=data.get("max_recent_results", 50)
+        )
+        config.created_at = datetime.fromisoformat(data["created_at"])
+        config.stats = {variant: ABVariantStats.from_dict(stats) for variant, stats in data["stats"].items()}
+        return config
+
+
+def create_ab_test_store(config: Dict[str, Any]) -> ContextStore:
+    """
+    Create a persistent store for A/B test accumulators
+    
+    Args:
+        config: Context store configuration; tests never expire unless
+            idle_ttl_seconds is set
+    
+    Returns:
+        ContextStore of ABTestConfig keyed by template name
+    """
+    store_config = {
+        'path': 'data/prompt_ab_tests.db',
+        'key_prefix': 'ai_ab_test:',
+        'idle_ttl_seconds': None,
+        **config
+    }
+    return create_context_store(store_config, encoder=ABTestConfig.to_dict, decoder=ABTestConfig.from_dict)
 
 
 class PromptManager:
     """Manages prompt templates for different executive roles with versioning and A/B testing"""
     
-    def __init__(self):
-        self.templates = {}
-        self.versions = {}  # template_name -> {version -> PromptVersion}
-        self.active_versions = {}  # template_name -> version
-        self.ab_tests = {}  # template_name -> ABTestConfig
-        self._load_default_templates()
+    def __init__(self, ab_test_store: Optional[ContextStore] = None):
+        """
+        Initialize the prompt manager
+        
+        Args:
+            ab_test_store: Optional persistent store for A/B tests; kept in
+                process memory when omitted
+        """
+        # Defaults are shared read-only; writes land in this instance's own layer
+        defaults = get_default_prompt_registry()
+        self.templates = ChainMap({}, defaults.templates)
+        self.versions = ChainMap({}, defaults.versions)  # template_name -> {version -> PromptVersion}
+        self.active_versions = ChainMap({}, defaults.active_versions)  # template_name -> version
+        self.ab_tests = ab_test_store if ab_test_store is not None else {}  # template_name -> ABTestConfig
+        self._ab_lock = threading.Lock()
+        self._version_listeners: List[Callable[[str, Optional[str], str], None]] = []
     
-    def _load_default_templates(self):
-        """Load default prompt templates with enhanced executive-specific prompts"""
+    @staticmethod
+    def _build_default_templates() -> List[tuple]:
+        """Build the default prompt templates as (name, template, version, description) entries"""
         
         # Enhanced CEO System Prompt
         ceo_system_v1 = PromptTemplate(
@@ -657,29 +2306,47 @@ class PromptManager:
             variables=["context"]
         )
         
-        # Store templates with versions
-        self._add_template_version("ceo_system", ceo_system_v1, "1.0", "Enhanced CEO prompt with strategic frameworks")
-        self._add_template_version("cto_system", cto_system_v1, "1.0", "Enhanced CTO prompt with technical leadership focus")
-        self._add_template_version("cfo_system", cfo_system_v1, "1.0", "Enhanced CFO prompt with financial analysis frameworks")
-        self._add_template_version("decision_prompt", decision_prompt_v1, "1.0", "Enhanced decision prompt with structured analysis")
-        self._add_template_version("strategic_decision", strategic_decision_prompt, "1.0", "Strategic decision analysis prompt")
-        self._add_template_version("financial_decision", financial_decision_prompt, "1.0", "Financial decision analysis prompt")
-        self._add_template_version("technical_decision", technical_decision_prompt, "1.0", "Technical decision analysis prompt")
+        conversation_summary_prompt = PromptTemplate(
+            """Maintain a running summary of an executive advisory conversation.
+            
+            Current summary:
+            {previous_summary}
+            
+            New conversation turns:
+            {conversation}
+            
+            Write an updated summary that merges the new turns into the current summary.
+            Preserve decisions made, key facts and figures, constraints, open questions and
+            the user's goals. Omit pleasantries. Use at most 200 words of plain prose.""",
+            variables=["previous_summary", "conversation"]
+        )
         
-        # Set active versions
-        for template_name in self.versions.keys():
-            self.active_versions[template_name] = "1.0"
+        return [
+            ("ceo_system", ceo_system_v1, "1.0", "Enhanced CEO prompt with strategic frameworks"),
+            ("cto_system", cto_system_v1, "1.0", "Enhanced CTO prompt with technical leadership focus"),
+            ("cfo_system", cfo_system_v1, "1.0", "Enhanced CFO prompt with financial analysis frameworks"),
+            ("decision_prompt", decision_prompt_v1, "1.0", "Enhanced decision prompt with structured analysis"),
+            ("strategic_decision", strategic_decision_prompt, "1.0", "Strategic decision analysis prompt"),
+            ("financial_decision", financial_decision_prompt, "1.0", "Financial decision analysis prompt"),
+            ("technical_decision", technical_decision_prompt, "1.0", "Technical decision analysis prompt"),
+            ("conversation_summary", conversation_summary_prompt, "1.0", "Rolling conversation summary prompt"),
+        ]
     
     def _add_template_version(self, name: str, template: PromptTemplate, version: str, description: str = ""):
         """Add a versioned template"""
-        if name not in self.versions:
-            self.versions[name] = {}
+        if name not in self.versions.maps[0]:
+            # Copy-on-write so the shared default versions are never mutated
+            self.versions[name] = dict(self.versions.get(name, {}))
         
         prompt_version = PromptVersion(template, version, description)
         self.versions[name][version] = prompt_version
         
         # Also add to legacy templates dict for backward compatibility
         self.templates[name] = template
+        
+        # Replacing the content of the active version changes rendered prompts
+        if self.active_versions.get(name) == version:
+            self._notify_version_listeners(name, version, version)
     
     def get_template(self, template_name: str, version: str = None) -> PromptTemplate:
         """Get a prompt template by name and optional version"""
@@ -707,9 +2374,25 @@ class PromptManager:
         if version not in self.versions[template_name]:
             raise ValueError(f"Version '{version}' not found for template '{template_name}'")
         
+        previous_version = self.active_versions.get(template_name)
         self.active_versions[template_name] = version
         # Update legacy templates dict
         self.templates[template_name] = self.versions[template_name][version].template
+        
+        if previous_version != version:
+            self._notify_version_listeners(template_name, previous_version, version)
+    
+    def add_version_listener(self, listener: Callable[[str, Optional[str], str], None]):
+        """Register a callback invoked as listener(template_name, old_version, new_version)"""
+        self._version_listeners.append(listener)
+    
+    def _notify_version_listeners(self, template_name: str, old_version: Optional[str], new_version: str):
+        """Notify listeners that the active template for a name has changed"""
+        for listener in self._version_listeners:
+            try:
+                listener(template_name, old_version, new_version)
+            except Exception as e:
+                logger.warning(f"Prompt version listener failed for {template_name}: {e}")
     
     def get_template_versions(self, template_name: str) -> List[Dict[str, Any]]:
         """Get all versions of a template"""
@@ -867,52 +2550,59 @@ class PromptManager:
         result_data: Dict[str, Any]
     ):
         """Record result for A/B test analysis"""
-        if template_name not in self.ab_tests:
+        ab_config = self.ab_tests.get(template_name)
+        if ab_config is None:
             return  # No active test
         
-        ab_config = self.ab_tests[template_name]
+        variant = ab_config.variant_for(version)
+        if variant is None:
+            return
         
-        if version == ab_config.version_a:
-            ab_config.results["a"].append(result_data)
-        elif version == ab_config.version_b:
-            ab_config.results["b"].append(result_data)
+        if isinstance(self.ab_tests, ContextStore):
+            # Read-modify-write through the store so every worker's results are kept
+            try:
+                self.ab_tests.modify(template_name, lambda config: config.record(variant, result_data))
+            except KeyError:
+                pass  # Test stopped concurrently
+        else:
+            with self._ab_lock:
+                ab_config.record(variant, result_data)
     
     def _analyze_ab_test_results(self, ab_config: ABTestConfig) -> Dict[str, Any]:
-        """Analyze A/B test results"""
-        results_a = ab_config.results["a"]
-        results_b = ab_config.results["b"]
+        """Analyze A/B test results from the streaming accumulators"""
+        stats_a = ab_config.stats["a"]
+        stats_b = ab_config.stats["b"]
         
-        if not results_a or not results_b:
+        if not stats_a.count or not stats_b.count:
             return {
                 "status": "insufficient_data",
-                "version_a_count": len(results_a),
-                "version_b_count": len(results_b)
+                "version_a_count": stats_a.count,
+                "version_b_count": stats_b.count
             }
         
         # Calculate metrics
         metric = ab_config.success_metric
         
-        values_a = [r.get(metric, 0) for r in results_a if metric in r]
-        values_b = [r.get(metric, 0) for r in results_b if metric in r]
+        metric_a = stats_a.metrics.get(metric)
+        metric_b = stats_b.metrics.get(metric)
         
-        if not values_a or not values_b:
+        if metric_a is None or metric_b is None:
             return {
                 "status": "no_metric_data",
                 "metric": metric,
-                "version_a_count": len(results_a),
-                "version_b_count": len(results_b)
+                "version_a_count": stats_a.count,
+                "version_b_count": stats_b.count
             }
         
-        avg_a = sum(values_a) / len(values_a)
-        avg_b = sum(values_b) / len(values_b)
+        avg_a = metric_a.mean
+        avg_b = metric_b.mean
         
         improvement = ((avg_b - avg_a) / avg_a) * 100 if avg_a > 0 else 0
         
         # Simple statistical significance test (t-test approximation)
-        import math
-        n_a, n_b = len(values_a), len(values_b)
-        var_a = sum((x - avg_a) ** 2 for x in values_a) / (n_a - 1) if n_a > 1 else 0
-        var_b = sum((x - avg_b) ** 2 for x in values_b) / (n_b - 1) if n_b > 1 else 0
+        n_a, n_b = metric_a.count, metric_b.count
+        var_a = metric_a.variance
+        var_b = metric_b.variance
         
         pooled_se = math.sqrt(var_a / n_a + var_b / n_b) if var_a > 0 or var_b > 0 else 0
         t_stat = (avg_b - avg_a) / pooled_se if pooled_se > 0 else 0
@@ -939,11 +2629,10 @@ class PromptManager:
     
     def get_ab_test_status(self, template_name: str) -> Dict[str, Any]:
         """Get current status of A/B test"""
-        if template_name not in self.ab_tests:
+        ab_config = self.ab_tests.get(template_name)
+        if ab_config is None:
             return {"active": False}
         
-        ab_config = self.ab_tests[template_name]
-        
         return {
             "active": True,
             "template_name": template_name,
@@ -952,28 +2641,126 @@ class PromptManager:
             "traffic_split": ab_config.traffic_split,
             "success_metric": ab_config.success_metric,
             "started_at": ab_config.created_at.isoformat(),
-            "results_count_a": len(ab_config.results["a"]),
-            "results_count_b": len(ab_config.results["b"])
+            "results_count_a": ab_config.stats["a"].count,
+            "results_count_b": ab_config.stats["b"].count,
+            "variants": {
+                "a": ab_config.stats["a"].summary(),
+                "b": ab_config.stats["b"].summary()
+            },
+            "analysis": self._analyze_ab_test_results(ab_config)
         }
 
 
+class DefaultPromptRegistry:
+    """Immutable, process-wide catalogue of the default prompt templates"""
+    
+    def __init__(self, entries: List[tuple]):
+        versions: Dict[str, Dict[str, PromptVersion]] = {}
+        for name, template, version, description in entries:
+            versions.setdefault(name, {})[version] = PromptVersion(template, version, description)
+        
+        self.versions = MappingProxyType({
+            name: MappingProxyType(by_version) for name, by_version in versions.items()
+        })
+        self.active_versions = MappingProxyType({
+            name: version for name, _, version, _ in entries
+        })
+        self.templates = MappingProxyType({
+            name: self.versions[name][version].template
+            for name, version in self.active_versions.items()
+        })
+
+
+_default_prompt_registry: Optional[DefaultPromptRegistry] = None
+_default_prompt_registry_lock = threading.Lock()
+
+
+def get_default_prompt_registry() -> DefaultPromptRegistry:
+    """
+    Get the shared default prompt registry, building it on first use
+    
+    Returns:
+        DefaultPromptRegistry shared by every PromptManager in the process
+    """
+    global _default_prompt_registry
+    if _default_prompt_registry is None:
+        with _default_prompt_registry_lock:
+            if _default_prompt_registry is None:
+                _default_prompt_registry = DefaultPromptRegistry(PromptManager._build_default_templates())
+    return _default_prompt_registry
+
+
 class ContextManager:
     """Manages conversation context and history"""
     
-    def __init__(self, max_context_tokens: int = 4000, max_history_length: int = 20):
+    SUMMARY_PREFIX = "Summary of earlier conversation:\n"
+    
+    def __init__(
+        self, 
+        max_context_tokens: int = 4000, 
+        max_history_length: int = 20, 
+        model: str = "gpt-4",
+        store: ContextStore = None,
+        summarizer: Callable[[str, List[ConversationMessage]], str] = None,
+        compaction_threshold_tokens: int = None,
+        keep_recent_messages: int = 6,
+        summary_max_tokens: int = None
+    ):
+        """
+        Initialize the context manager
+        
+        Args:
+            max_context_tokens: Hard token limit; older turns are dropped beyond it
+            max_history_length: Hard message-count limit
+            model: Model whose tokenizer counts message tokens
+            store: Context store (defaults to a bounded in-process store)
+            summarizer: Callable(previous_summary, messages) -> summary; enables
+                rolling compaction when provided
+            compaction_threshold_tokens: Context size that triggers compaction
+                (defaults to half of max_context_tokens)
+            keep_recent_messages: Most recent turns kept verbatim when compacting
+            summary_max_tokens: Cap on the running summary (defaults to a quarter
+                of the compaction threshold); longer summaries are truncated, so
+                compaction cannot refill the context on its own
+        """
         self.max_context_tokens = max_context_tokens
         self.max_history_length = max_history_length
-        self.contexts: Dict[str, ConversationContext] = {}
+        self.model = model
+        # Bounded by default; pass a shared store so all workers see the same contexts
+        self.contexts: ContextStore = store if store is not None else MemoryContextStore()
         self.logger = logging.getLogger(__name__)
+        
+        # Rolling compaction, run off the request path on a single worker thread
+        self.summarizer = summarizer
+        self.compaction_threshold_tokens = compaction_threshold_tokens or max_context_tokens // 2
+        self.keep_recent_messages = keep_recent_messages
+        self.summary_max_tokens = summary_max_tokens or self.compaction_threshold_tokens // 4
+        self._compaction_executor: Optional[ThreadPoolExecutor] = None
+        self._pending_compactions: Dict[str, Future] = {}
+        self._compaction_lock = threading.Lock()
+        self.compactions = 0
+        self.compaction_failures = 0
+        self.summarized_messages = 0
+        self.compacted_tokens = 0
+    
+    def count_tokens(self, text: str) -> int:
+        """Count tokens in text with the tokenizer for this manager's model"""
+        return count_text_tokens(text, self.model)
+    
+    def _new_context(self) -> ConversationContext:
+        return ConversationContext(
+            messages=deque(),
+            max_tokens=self.max_context_tokens,
+            token_counter=self.count_tokens
+        )
     
     def get_or_create_context(self, context_id: str) -> ConversationContext:
         """Get existing context or create new one"""
-        if context_id not in self.contexts:
-            self.contexts[context_id] = ConversationContext(
-                messages=[],
-                max_tokens=self.max_context_tokens
-            )
-        return self.contexts[context_id]
+        context = self.contexts.get(context_id)
+        if context is None:
+            context = self._new_context()
+            self.contexts[context_id] = context
+        return context
     
     def add_message(
         self, 
@@ -983,11 +2770,18 @@ class ContextManager:
         metadata: Dict[str, Any] = None
     ) -> ConversationContext:
         """Add a message to the conversation context"""
-        context = self.get_or_create_context(context_id)
-        context.add_message(role, content, metadata)
+        def append(context: ConversationContext):
+            context.token_counter = self.count_tokens
+            context.add_message(role, content, metadata)
+            
+            # Prune context if it gets too long
+            self._prune_context(context)
+        
+        # Atomic in the store, so concurrent workers cannot lose messages
+        context = self.contexts.modify(context_id, append, self._new_context)
         
-        # Prune context if it gets too long
-        self._prune_context(context)
+        if self._needs_compaction(context):
+            self._schedule_compaction(context_id)
         
         return context
     
@@ -998,19 +2792,89 @@ class ContextManager:
         max_messages: int = None
     ) -> List[Dict[str, str]]:
         """Get messages in OpenAI format"""
-        if context_id not in self.contexts:
-            return []
+        return [
+            {"role": msg.role, "content": msg.content}
+            for msg in self._select_messages(context_id, include_system, max_messages)
+        ]
+    
+    def count_context_tokens(
+        self, 
+        context_id: str, 
+        include_system: bool = True,
+        max_messages: int = None
+    ) -> int:
+        """
+        Exact prompt tokens for the messages get_context_messages would return
         
-        context = self.contexts[context_id]
-        messages = context.to_openai_format()
+        Uses the counts cached on each message, so nothing is re-tokenized.
+        
+        Args:
+            context_id: Conversation context identifier
+            include_system: Whether system messages are included
+            max_messages: Limit on non-system messages, as in get_context_messages
+            
+        Returns:
+            Token count including chat format overhead
+        """
+        context = self.contexts.get(context_id)
+        if context is None:
+            return 0
+        
+        if include_system and not max_messages:
+            return context.prompt_tokens()
+        return context.prompt_tokens(self._select_context_messages(context, include_system, max_messages))
+    
+    def count_history_tokens(self, context_id: str, max_messages: int = None) -> int:
+        """
+        Tokens the running summary and recent turns add to a rendered prompt
+        
+        Uses the counts cached on each message; each message's format overhead
+        stands in for its role label in the history section.
+        
+        Args:
+            context_id: Conversation context identifier
+            max_messages: Limit on recent turns, as in get_context_messages
+            
+        Returns:
+            Token count of the summary and turns, without conversation overhead
+        """
+        context = self.contexts.get(context_id)
+        if context is None:
+            return 0
+        
+        messages = self._select_context_messages(context, include_system=False, max_messages=max_messages)
+        summary_message = self._find_summary(context)
+        if summary_message is not None:
+            messages.append(summary_message)
+        return sum(msg.prompt_tokens for msg in messages)
+    
+    def _select_messages(
+        self, 
+        context_id: str, 
+        include_system: bool = True,
+        max_messages: int = None
+    ) -> List[ConversationMessage]:
+        """Select context messages, keeping system messages ahead of the recent exchanges"""
+        context = self.contexts.get(context_id)
+        if context is None:
+            return []
+        return self._select_context_messages(context, include_system, max_messages)
+    
+    @staticmethod
+    def _select_context_messages(
+        context: ConversationContext, 
+        include_system: bool = True,
+        max_messages: int = None
+    ) -> List[ConversationMessage]:
+        messages = list(context.messages)
         
         if not include_system:
-            messages = [msg for msg in messages if msg["role"] != "system"]
+            messages = [msg for msg in messages if msg.role != "system"]
         
         if max_messages:
             # Keep system messages and limit user/assistant messages
-            system_messages = [msg for msg in messages if msg["role"] == "system"]
-            other_messages = [msg for msg in messages if msg["role"] != "system"]
+            system_messages = [msg for msg in messages if msg.role == "system"]
+            other_messages = [msg for msg in messages if msg.role != "system"]
             other_messages = other_messages[-max_messages:]
             messages = system_messages + other_messages
         
@@ -1018,15 +2882,14 @@ class ContextManager:
     
     def clear_context(self, context_id: str):
         """Clear conversation context"""
-        if context_id in self.contexts:
-            del self.contexts[context_id]
+        self.contexts.pop(context_id, None)
     
     def get_context_summary(self, context_id: str) -> Dict[str, Any]:
         """Get summary of context state"""
-        if context_id not in self.contexts:
+        context = self.contexts.get(context_id)
+        if context is None:
             return {"exists": False}
         
-        context = self.contexts[context_id]
         return {
             "exists": True,
             "message_count": len(context.messages),
@@ -1036,67 +2899,242 @@ class ContextManager:
         }
     
     def _prune_context(self, context: ConversationContext):
-        """Prune context to stay within token limits"""
+        """Prune context to stay within token and message limits"""
         if len(context.messages) <= 2:  # Keep at least system + one exchange
             return
         
-        # Estimate tokens (rough calculation)
-        total_estimated_tokens = sum(
-            len(msg.content) // 4 for msg in context.messages  # ~4 chars per token
-        )
+        # Remove the oldest non-system messages while over either limit.
+        # System messages sit at the front, so the scan is short and deque
+        # deletion near the left end is O(1).
+        while (context.total_tokens > context.max_tokens and len(context.messages) > 2) or \
+                len(context.messages) > self.max_history_length:
+            index = self._first_non_system_index(context)
+            if index is None:
+                # If only system messages left, stop
+                break
+            
+            removed_msg = context.remove_message(index)
+            self.logger.debug(
+                f"Pruned message from context: {removed_msg.role} ({removed_msg.token_count} tokens)"
+            )
+    
+    @staticmethod
+    def _first_non_system_index(context: ConversationContext) -> Optional[int]:
+        """Position of the oldest non-system message, or None"""
+        for i, msg in enumerate(context.messages):
+            if msg.role != "system":
+                return i
+        return None
+    
+    def get_running_summary(self, context_id: str) -> str:
+        """Get the compacted summary of earlier turns, or an empty string"""
+        context = self.contexts.get(context_id)
+        if context is None:
+            return ""
+        summary_message = self._find_summary(context)
+        if summary_message is None:
+            return ""
+        return summary_message.content[len(self.SUMMARY_PREFIX):]
+    
+    def _needs_compaction(self, context: ConversationContext) -> bool:
+        """Whether a context has outgrown its budget and has turns to fold"""
+        if self.summarizer is None:
+            return False
+        if (context.total_tokens <= self.compaction_threshold_tokens and
+                len(context.messages) < self.max_history_length):
+            return False
+        return len(self._messages_to_fold(context)) > 0
+    
+    def _messages_to_fold(self, context: ConversationContext) -> List[ConversationMessage]:
+        """Oldest conversational turns, excluding the most recent ones kept verbatim"""
+        turns = [msg for msg in context.messages if msg.role != "system"]
+        if len(turns) <= self.keep_recent_messages:
+            return []
+        return turns[:len(turns) - self.keep_recent_messages]
+    
+    @staticmethod
+    def _find_summary(context: ConversationContext) -> Optional[ConversationMessage]:
+        for msg in context.messages:
+            if msg.metadata.get("type") == "conversation_summary":
+                return msg
+        return None
+    
+    def _schedule_compaction(self, context_id: str):
+        """Queue a background compaction unless one is already pending for the context"""
+        with self._compaction_lock:
+            if context_id in self._pending_compactions:
+                return
+            if self._compaction_executor is None:
+                self._compaction_executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="context-compaction"
+                )
+            future = self._compaction_executor.submit(self._compact_context, context_id)
+            self._pending_compactions[context_id] = future
+        future.add_done_callback(lambda _: self._finish_compaction(context_id))
+    
+    def _finish_compaction(self, context_id: str):
+        with self._compaction_lock:
+            self._pending_compactions.pop(context_id, None)
+    
+    def compact_context(self, context_id: str) -> bool:
+        """
+        Fold the oldest turns of a context into its running summary now
+        
+        Args:
+            context_id: Conversation context identifier
+            
+        Returns:
+            True if the context was compacted
+        """
+        return self._compact_context(context_id)
+    
+    def _compact_context(self, context_id: str) -> bool:
+        if self.summarizer is None:
+            return False
+        
+        context = self.contexts.get(context_id)
+        if context is None:
+            return False
+        
+        folded = self._messages_to_fold(context)
+        if not folded:
+            return False
         
-        # If we're over the limit, remove older messages (but keep system messages)
-        while (total_estimated_tokens > context.max_tokens and 
-               len(context.messages) > 2):
-            
-            # Find first non-system message to remove
-            for i, msg in enumerate(context.messages):
-                if msg.role != "system":
-                    removed_msg = context.messages.pop(i)
-                    total_estimated_tokens -= len(removed_msg.content) // 4
-                    self.logger.debug(f"Pruned message from context: {removed_msg.role}")
-                    break
-            else:
-                # If only system messages left, break
-                break
+        previous_summary = self._find_summary(context)
+        previous_text = previous_summary.content[len(self.SUMMARY_PREFIX):] if previous_summary else ""
+        previous_count = previous_summary.metadata.get("summarized_messages", 0) if previous_summary else 0
+        
+        # The slow part: runs without holding any store lock
+        try:
+            summary = self._fit_summary(self.summarizer(previous_text, folded))
+        except Exception as e:
+            self.logger.warning(f"Context compaction failed for {context_id}: {e}")
+            with self._compaction_lock:
+                self.compaction_failures += 1
+            return False
         
-        # Also limit by message count
-        if len(context.messages) > self.max_history_length:
-            # Keep system messages and most recent exchanges
-            system_messages = [msg for msg in context.messages if msg.role == "system"]
-            other_messages = [msg for msg in context.messages if msg.role != "system"]
+        folded_ids = {msg.message_id for msg in folded}
+        result = {}
+        
+        def apply(context: ConversationContext):
+            context.token_counter = self.count_tokens
+            tokens_before = context.total_tokens
             
-            # Keep most recent messages
-            keep_count = self.max_history_length - len(system_messages)
-            other_messages = other_messages[-keep_count:] if keep_count > 0 else []
+            # Turns may have been pruned meanwhile; only drop the ones still present
+            for i in range(len(context.messages) - 1, -1, -1):
+                msg = context.messages[i]
+                if msg.message_id in folded_ids or msg.metadata.get("type") == "conversation_summary":
+                    context.remove_message(i)
             
-            context.messages = system_messages + other_messages
-            self.logger.debug(f"Pruned context to {len(context.messages)} messages")
+            # Summary goes right after the leading system prompt(s)
+            index = 0
+            while index < len(context.messages) and context.messages[index].role == "system":
+                index += 1
+            context.insert_message(
+                index,
+                "system",
+                self.SUMMARY_PREFIX + summary,
+                {"type": "conversation_summary", "summarized_messages": previous_count + len(folded)}
+            )
+            result["saved_tokens"] = tokens_before - context.total_tokens
         
-        # Update token count
-        context.total_tokens = total_estimated_tokens
+        try:
+            self.contexts.modify(context_id, apply)
+        except KeyError:
+            # Context was cleared or evicted while summarizing
+            return False
+        
+        with self._compaction_lock:
+            self.compactions += 1
+            self.summarized_messages += len(folded)
+            self.compacted_tokens += max(0, result.get("saved_tokens", 0))
+        self.logger.debug(f"Compacted {len(folded)} messages in context {context_id}")
+        return True
+    
+    def _fit_summary(self, summary: str) -> str:
+        """Truncate a summary at a word boundary until it fits summary_max_tokens"""
+        tokens = self.count_tokens(summary)
+        while tokens > self.summary_max_tokens:
+            limit = int(len(summary) * self.summary_max_tokens / tokens)
+            cut = summary.rfind(" ", 0, limit)
+            summary = summary[:cut if cut > 0 else limit]
+            tokens = self.count_tokens(summary)
+        return summary
+    
+    def wait_for_compactions(self, timeout: float = None):
+        """Block until queued compactions have finished"""
+        with self._compaction_lock:
+            futures = list(self._pending_compactions.values())
+        for future in futures:
+            future.result(timeout=timeout)
+    
+    def get_compaction_stats(self) -> Dict[str, Any]:
+        """Get rolling compaction statistics"""
+        with self._compaction_lock:
+            return {
+                "enabled": self.summarizer is not None,
+                "threshold_tokens": self.compaction_threshold_tokens,
+                "summary_max_tokens": self.summary_max_tokens,
+                "keep_recent_messages": self.keep_recent_messages,
+                "pending": len(self._pending_compactions),
+                "compactions": self.compactions,
+                "failures": self.compaction_failures,
+                "summarized_messages": self.summarized_messages,
+                "compacted_tokens": self.compacted_tokens
+            }
+    
+    def shutdown(self, wait: bool = True):
+        """Stop the compaction worker and release the context store"""
+        with self._compaction_lock:
+            executor = self._compaction_executor
+            self._compaction_executor = None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+        self.contexts.close()
     
     def inject_document_context(
         self, 
         context_id: str, 
         documents: List[str], 
-        max_doc_length: int = 500
+        max_doc_length: int = 500,
+        max_tokens: int = None
     ):
-        """Inject document context into conversation"""
+        """
+        Inject document context into conversation
+        
+        Args:
+            context_id: Conversation to add the documents to
+            documents: Document texts, most relevant first
+            max_doc_length: Character cut-off per document when no token budget is given
+            max_tokens: Token budget; when set, whole documents are packed by rank
+                instead of truncating the first three
+        """
         if not documents:
             return
         
-        # Truncate documents if too long
-        truncated_docs = []
-        for doc in documents[:3]:  # Limit to 3 documents
-            if len(doc) > max_doc_length:
-                truncated_docs.append(doc[:max_doc_length] + "...")
-            else:
-                truncated_docs.append(doc)
-        
-        doc_context = "\n\n--- Document Context ---\n" + "\n\n".join(
-            f"Document {i+1}:\n{doc}" for i, doc in enumerate(truncated_docs)
-        ) + "\n--- End Document Context ---\n"
+        if max_tokens is not None:
+            packed = ContextPacker(self.count_tokens).pack(
+                [
+                    ContextChunk(content=doc, score=float(len(documents) - i), chunk_index=i, title=f"Document {i+1}")
+                    for i, doc in enumerate(documents)
+                ],
+                max_tokens
+            )
+            if not packed.chunks:
+                return
+            doc_context = "\n\n--- Document Context ---\n" + packed.text + "\n--- End Document Context ---\n"
+        else:
+            # Truncate documents if too long
+            truncated_docs = []
+            for doc in documents[:3]:  # Limit to 3 documents
+                if len(doc) > max_doc_length:
+                    truncated_docs.append(doc[:max_doc_length] + "...")
+                else:
+                    truncated_docs.append(doc)
+            
+            doc_context = "\n\n--- Document Context ---\n" + "\n\n".join(
+                f"Document {i+1}:\n{doc}" for i, doc in enumerate(truncated_docs)
+            ) + "\n--- End Document Context ---\n"
         
         self.add_message(
             context_id, 
@@ -1106,6 +3144,296 @@ class ContextManager:
         )
 
 
+@dataclass
+class CacheEntry:
+    """Cached AI response with eviction bookkeeping"""
+    value: AIResponse
+    size_bytes: int
+    expires_at: float
+    templates: List[str] = field(default_factory=list)
+
+
+class ResponseCache:
+    """Exact-match LRU + TTL cache for AI completions"""
+    
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        max_bytes: int = 50 * 1024 * 1024,
+        ttl_seconds: int = 3600
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.logger = logging.getLogger(__name__)
+        
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.bypasses = 0
+    
+    @staticmethod
+    def make_key(**components: Any) -> str:
+        """Build a canonical hash from the components that determine a response"""
+        canonical = json.dumps(components, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[AIResponse]:
+        """Get a cached response, or None on miss/expiry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            if entry.expires_at <= time.time():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+    
+    def set(self, key: str, value: AIResponse, templates: List[str] = None):
+        """Store a response; templates are the prompt names it was rendered from"""
+        size_bytes = self._estimate_size(value)
+        if size_bytes > self.max_bytes:
+            self.logger.debug(f"Response of {size_bytes} bytes exceeds cache size cap, not cached")
+            return
+        
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            
+            self._entries[key] = CacheEntry(
+                value=value,
+                size_bytes=size_bytes,
+                expires_at=time.time() + self.ttl_seconds,
+                templates=list(templates or [])
+            )
+            self._current_bytes += size_bytes
+            
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._current_bytes > self.max_bytes
+            ):
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+    
+    def record_bypass(self):
+        """Count a lookup that was explicitly skipped by the caller"""
+        with self._lock:
+            self.bypasses += 1
+    
+    def invalidate(self, key: str) -> bool:
+        """Remove a single entry"""
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            self.invalidations += 1
+            return True
+    
+    def invalidate_template(self, template_name: str, old_version: str = None, new_version: str = None) -> int:
+        """Remove all entries rendered from a template (PromptManager version listener)"""
+        with self._lock:
+            stale_keys = [
+                key for key, entry in self._entries.items()
+                if template_name in entry.templates
+            ]
+            for key in stale_keys:
+                self._remove(key)
+            self.invalidations += len(stale_keys)
+        
+        if stale_keys:
+            self.logger.info(
+                f"Invalidated {len(stale_keys)} cached responses for template {template_name} "
+                f"({old_version} -> {new_version})"
+            )
+        return len(stale_keys)
+    
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._current_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "bypasses": self.bypasses
+            }
+    
+    def _remove(self, key: str):
+        """Remove an entry (caller holds the lock)"""
+        entry = self._entries.pop(key)
+        self._current_bytes -= entry.size_bytes
+    
+    @staticmethod
+    def _estimate_size(value: AIResponse) -> int:
+        """Approximate memory footprint of a cached response"""
+        metadata_size = len(json.dumps(value.metadata, default=str))
+        return len((value.content or "").encode('utf-8')) + len(value.model or "") + metadata_size + 256
+
+
+@dataclass
+class SemanticCacheEntry:
+    """Prior executive response with its normalized context embedding"""
+    embedding: List[float]
+    response: ExecutiveResponse
+    created_at: float
+
+
+class SemanticCache:
+    """Embedding-similarity cache of executive responses, scoped per user/executive/prompt version"""
+    
+    def __init__(
+        self,
+        similarity_threshold: float = 0.95,
+        max_entries_per_scope: int = 200,
+        max_scopes: int = 1000,
+        ttl_seconds: int = 86400
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries_per_scope = max_entries_per_scope
+        self.max_scopes = max_scopes
+        self.ttl_seconds = ttl_seconds
+        self.logger = logging.getLogger(__name__)
+        
+        # scope -> entries (oldest first); scopes are kept in LRU order
+        self._scopes: "OrderedDict[tuple, List[SemanticCacheEntry]]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        # Counters
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+        self.saved_tokens = 0
+        self.saved_cost = 0.0
+    
+    @staticmethod
+    def make_scope(user_id: Any, executive_type: str, prompt_versions: Dict[str, Optional[str]]) -> tuple:
+        """Build the scope a response may be shared within"""
+        return (str(user_id), executive_type, tuple(sorted(prompt_versions.items())))
+    
+    @staticmethod
+    def normalize(embedding: List[float]) -> List[float]:
+        """Scale an embedding to unit length so cosine similarity is a dot product"""
+        norm = math.sqrt(sum(x * x for x in embedding))
+        if norm == 0:
+            return list(embedding)
+        return [x / norm for x in embedding]
+    
+    def lookup(self, scope: tuple, embedding: List[float]) -> Optional[tuple]:
+        """
+        Find the most similar prior response in a scope
+        
+        Args:
+            scope: Scope from make_scope
+            embedding: Normalized embedding of the incoming context
+            
+        Returns:
+            (ExecutiveResponse, similarity) above the threshold, or None
+        """
+        with self._lock:
+            self.lookups += 1
+            entries = self._scopes.get(scope)
+            if not entries:
+                return None
+            
+            self._scopes.move_to_end(scope)
+            cutoff = time.time() - self.ttl_seconds
+            live_entries = [entry for entry in entries if entry.created_at > cutoff]
+            if len(live_entries) != len(entries):
+                self.evictions += len(entries) - len(live_entries)
+                self._scopes[scope] = live_entries
+            
+            best_entry = None
+            best_similarity = -1.0
+            for entry in live_entries:
+                similarity = sum(a * b for a, b in zip(entry.embedding, embedding))
+                if similarity > best_similarity:
+                    best_entry, best_similarity = entry, similarity
+            
+            if best_entry is None or best_similarity < self.similarity_threshold:
+                return None
+            
+            self.hits += 1
+            self.saved_tokens += best_entry.response.token_usage.total_tokens
+            self.saved_cost += best_entry.response.token_usage.estimated_cost
+            return best_entry.response, best_similarity
+    
+    def add(self, scope: tuple, embedding: List[float], response: ExecutiveResponse):
+        """Index a freshly generated response"""
+        with self._lock:
+            entries = self._scopes.setdefault(scope, [])
+            self._scopes.move_to_end(scope)
+            entries.append(SemanticCacheEntry(embedding=embedding, response=response, created_at=time.time()))
+            
+            if len(entries) > self.max_entries_per_scope:
+                overflow = len(entries) - self.max_entries_per_scope
+                del entries[:overflow]
+                self.evictions += overflow
+            
+            while len(self._scopes) > self.max_scopes:
+                _, evicted = self._scopes.popitem(last=False)
+                self.evictions += len(evicted)
+    
+    def invalidate_template(self, template_name: str, old_version: str = None, new_version: str = None) -> int:
+        """Drop scopes built from a template whose active version changed"""
+        with self._lock:
+            stale_scopes = [
+                scope for scope in self._scopes
+                if any(name == template_name for name, _ in scope[2])
+            ]
+            removed = 0
+            for scope in stale_scopes:
+                removed += len(self._scopes.pop(scope))
+        return removed
+    
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._scopes.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get semantic cache statistics"""
+        with self._lock:
+            return {
+                "scopes": len(self._scopes),
+                "entries": sum(len(entries) for entries in self._scopes.values()),
+                "similarity_threshold": self.similarity_threshold,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "evictions": self.evictions,
+                "saved_tokens": self.saved_tokens,
+                "saved_cost": self.saved_cost
+            }
+
+
 class AIIntegrationService:
     """Service for managing AI model interactions"""
     
@@ -1117,190 +3445,659 @@ class AIIntegrationService:
         openai_config = config.get('openai', {})
         self.openai_client = OpenAIClient(openai_config)
         
-        # Initialize prompt manager
-        self.prompt_manager = PromptManager()
+        # Initialize prompt manager; A/B test accumulators persist when a store is configured
+        ab_test_store_config = config.get('ab_test_store')
+        self.prompt_manager = PromptManager(
+            ab_test_store=create_ab_test_store(ab_test_store_config) if ab_test_store_config else None
+        )
         
-        # Initialize context manager
+        # Initialize context manager on a bounded (optionally shared) context store
+        context_store = create_context_store(
+            config.get('context_store', {}),
+            encoder=ConversationContext.to_dict,
+            decoder=ConversationContext.from_dict
+        )
+        compaction_config = config.get('context_compaction', {})
         self.context_manager = ContextManager(
             max_context_tokens=openai_config.get('max_tokens', 4000),
-            max_history_length=20
+            max_history_length=20,
+            model=openai_config.get('model', 'gpt-4'),
+            store=context_store,
+            summarizer=self._summarize_conversation if compaction_config.get('enabled', True) else None,
+            compaction_threshold_tokens=compaction_config.get('threshold_tokens'),
+            keep_recent_messages=compaction_config.get('keep_recent_messages', 6),
+            summary_max_tokens=compaction_config.get('summary_max_tokens')
+        )
+        
+        # Exact-match response cache, invalidated when active prompt versions change
+        cache_config = config.get('response_cache', {})
+        self.response_cache_enabled = cache_config.get('enabled', True)
+        self.response_cache = ResponseCache(
+            max_entries=cache_config.get('max_entries', 1000),
+            max_bytes=cache_config.get('max_bytes', 50 * 1024 * 1024),
+            ttl_seconds=cache_config.get('ttl_seconds', 3600)
         )
+        self.prompt_manager.add_version_listener(self.response_cache.invalidate_template)
+        
+        # Optional embedding-similarity cache for paraphrased decision contexts
+        semantic_config = config.get('semantic_cache', {})
+        self.semantic_cache_enabled = semantic_config.get('enabled', False)
+        self.semantic_cache = SemanticCache(
+            similarity_threshold=semantic_config.get('similarity_threshold', 0.95),
+            max_entries_per_scope=semantic_config.get('max_entries_per_scope', 200),
+            max_scopes=semantic_config.get('max_scopes', 1000),
+            ttl_seconds=semantic_config.get('ttl_seconds', 86400)
+        )
+        self.prompt_manager.add_version_listener(self.semantic_cache.invalidate_template)
+        
+        # Optional index of past decisions, for offering one when a similar question comes back
+        decision_index_config = config.get('decision_index')
+        self.decision_index: Optional[DecisionIndex] = DecisionIndex() if decision_index_config else None
+        if decision_index_config:
+            self.decision_similarity_threshold = decision_index_config.get('similarity_threshold', 0.85)
+            self.decision_reuse_threshold = decision_index_config.get('reuse_threshold', 0.95)
+            self.decision_max_matches = decision_index_config.get('max_matches', 3)
+        
+        # Structured outputs constrain decisions to the response schema on models that support it
+        structured_config = config.get('structured_output', {})
+        self.structured_output_enabled = structured_config.get('enabled', True)
+        self._parse_lock = threading.Lock()
+        self._parse_counts = {"json": 0, "partial": 0, "fallback": 0}
         
-        # Usage tracking
+        # Document context is packed by relevance into a token budget
+        self.document_context_tokens = config.get('document_context_tokens', 1500)
+        
+        # Board panel settings; async work runs on a background event loop
+        self.panel_timeout = config.get('panel_timeout', 60)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        
+        # Usage tracking; the ledger persists per-call usage shared by all workers
         self.total_tokens_used = 0
         self.total_cost = 0.0
+        ledger_config = config.get('usage_ledger')
+        self.usage_ledger: Optional[UsageLedger] = get_usage_ledger(ledger_config) if ledger_config else None
+    
+        # Usage budgets are enforced before a request is sent; over-budget requests are degraded first
+        budgets_config = config.get('usage_budgets')
+        self.usage_budgets: Optional[UsageBudgets] = (
+            UsageBudgets.from_config(budgets_config, self.usage_ledger) if budgets_config else None
+        )
+        budgets_config = budgets_config or {}
+        self.budget_degrade_model = budgets_config.get('degrade_model')
+        self.budget_degrade_history = budgets_config.get('degrade_history_messages', 2)
+        self.budget_degrade_document_ratio = budgets_config.get('degrade_document_ratio', 0.25)
+    
+    def _get_event_loop(self) -> asyncio.AbstractEventLoop:
+        """Get the background event loop, starting it on first use"""
+        with self._loop_lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever,
+                    name="ai-integration-loop",
+                    daemon=True
+                ).start()
+            return self._loop
+    
+    def _run_async(self, coro) -> Any:
+        """Run a coroutine to completion from synchronous code"""
+        return asyncio.run_coroutine_threadsafe(coro, self._get_event_loop()).result()
+    
+    def shutdown(self):
+        """Stop the background event loop and release the context store"""
+        with self._loop_lock:
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+        self.context_manager.shutdown(wait=False)
+        if self.usage_ledger is not None:
+            self.usage_ledger.flush()
+    
+    def _summarize_conversation(self, previous_summary: str, messages: List[ConversationMessage]) -> str:
+        """
+        Fold conversation turns into a running summary (runs on the compaction thread)
         
-    def generate_executive_response(
-        self, 
-        executive_type: str, 
-        context: str, 
-        conversation_history: List[Dict] = None,
-        document_context: List[str] = None,
+        Args:
+            previous_summary: Summary of turns folded earlier, possibly empty
+            messages: Turns to fold into the summary
+            
+        Returns:
+            Updated summary text
+        """
+        conversation = "\n".join(f"{msg.role.upper()}: {msg.content}" for msg in messages)
+        prompt = self.prompt_manager.get_template("conversation_summary").format(
+            previous_summary=previous_summary or "(none)",
+            conversation=conversation
+        )
+        ai_response = self.openai_client.generate_completion([
+            {"role": "system", "content": "You summarize business conversations accurately and concisely."},
+            {"role": "user", "content": prompt}
+        ], priority=RequestPriority.BACKGROUND, max_tokens=self.context_manager.summary_max_tokens)
+        self._track_usage(ai_response, request_type="summary")
+        return ai_response.content.strip()
+    
+    def _generate_cached_completion(
+        self,
+        executive_type: str,
+        messages: List[Dict[str, str]],
         options: List[str] = None,
-        context_id: str = None
-    ) -> ExecutiveResponse:
+        use_cache: bool = True,
+        prompt_tokens: Optional[int] = None,
+        model: Optional[str] = None
+    ) -> AIResponse:
+        """
+        Generate a completion through the exact-match response cache
+        
+        Args:
+            executive_type: Type of executive the messages were rendered for
+            messages: Rendered messages sent to the model
+            options: Decision options supplied by the caller
+            use_cache: Set to False to skip the lookup; the fresh response
+                still replaces the cached entry
+            prompt_tokens: Exact prompt size when already known, e.g. from
+                the context manager's cached counts
+            model: Model to use instead of routing; its response is not cached
+                since the key does not cover the model
+            
+        Returns:
+            AIResponse, with metadata["cache_hit"] set
+        """
+        completion_kwargs = {'response_schema': self._executive_response_schema()}
+        if prompt_tokens is not None:
+            completion_kwargs['prompt_tokens'] = prompt_tokens
+        if model is not None:
+            completion_kwargs['model'] = model
+        
+        if not self.response_cache_enabled:
+            return self.openai_client.generate_completion(
+                messages, priority=RequestPriority.INTERACTIVE, **completion_kwargs
+            )
+        
+        cache_key = self._response_cache_key(executive_type, messages, options)
+        if use_cache:
+            cached_response = self._response_cache_lookup(executive_type, cache_key)
+            if cached_response is not None:
+                return cached_response
+        else:
+            self.response_cache.record_bypass()
+        
+        ai_response = self.openai_client.generate_completion(
+            messages, priority=RequestPriority.INTERACTIVE, **completion_kwargs
+        )
+        if model is None:
+            self._response_cache_store(executive_type, cache_key, ai_response)
+        return ai_response
+    
+    def _response_cache_key(
+        self,
+        executive_type: str,
+        messages: List[Dict[str, str]],
+        options: List[str] = None
+    ) -> str:
+        """Canonical response cache key for a rendered executive request"""
+        return ResponseCache.make_key(
+            executive_type=executive_type,
+            model=self.openai_client.model,
+            prompt_versions=self._prompt_versions(executive_type),
+            messages=messages,
+            options=options or []
+        )
+    
+    def _response_cache_lookup(self, executive_type: str, cache_key: str) -> Optional[AIResponse]:
+        """Return a copy of a cached completion marked as a cache hit, or None"""
+        cached_response = self.response_cache.get(cache_key)
+        if cached_response is None:
+            return None
+        
+        self.logger.info(f"Response cache hit for {executive_type} ({cache_key[:12]})")
+        return replace(
+            cached_response,
+            response_time=0.0,
+            timestamp=datetime.utcnow(),
+            metadata={
+                **cached_response.metadata,
+                "cache_hit": True,
+                "cache_layer": "exact",
+                "cache_key": cache_key
+            }
+        )
+    
+    def _response_cache_store(self, executive_type: str, cache_key: str, ai_response: AIResponse):
+        """Cache a fresh completion and mark it as a cache miss"""
+        self.response_cache.set(
+            cache_key,
+            replace(ai_response, metadata=dict(ai_response.metadata)),
+            list(self._prompt_versions(executive_type))
+        )
+        ai_response.metadata.update({"cache_hit": False, "cache_key": cache_key})
+    
+    def _prompt_versions(self, executive_type: str) -> Dict[str, Optional[str]]:
+        """Active versions of the templates an executive response is rendered from"""
+        templates = [f"{executive_type}_system", "decision_prompt"]
+        return {name: self.prompt_manager.active_versions.get(name) for name in templates}
+    
+    def _semantic_cache_lookup(
+        self,
+        executive_type: str,
+        context: str,
+        document_context: Union[str, List[str], None],
+        options: List[str],
+        user_id: Any
+    ) -> tuple:
+        """
+        Look up a prior response for a paraphrase of this decision context
+        
+        Returns:
+            (ExecutiveResponse or None, scope, embedding); scope and embedding
+            are None when the context could not be embedded
+        """
+        start_time = time.time()
+        scope = SemanticCache.make_scope(user_id, executive_type, self._prompt_versions(executive_type))
+        
+        if isinstance(document_context, list):
+            document_context = "\n".join(document_context)
+        text = "\n".join(part for part in [context, document_context, "\n".join(options or [])] if part)
+        
+        try:
+            embedding = SemanticCache.normalize(self.openai_client.create_embedding(text))
+        except Exception as e:
+            self.logger.warning(f"Semantic cache lookup skipped, embedding failed: {e}")
+            return None, None, None
+        
+        match = self.semantic_cache.lookup(scope, embedding)
+        if match is None:
+            return None, scope, embedding
+        
+        cached_response, similarity = match
+        self.logger.info(f"Semantic cache hit for {executive_type} (similarity {similarity:.3f})")
+        return replace(
+            cached_response,
+            response_time=time.time() - start_time,
+            timestamp=datetime.utcnow(),
+            metadata={
+                **cached_response.metadata,
+                "cache_hit": True,
+                "cache_layer": "semantic",
+                "similarity": similarity
+            }
+        ), scope, embedding
+    
+    def _track_usage(
+        self,
+        ai_response: AIResponse,
+        executive_type: str = None,
+        user_id: Any = None,
+        request_type: str = "completion"
+    ):
+        """Add a response's token usage to the running totals (cache hits and coalesced calls are free)"""
+        if ai_response.metadata.get("cache_hit") or ai_response.metadata.get("coalesced"):
+            return
+        usage = ai_response.token_usage
+        self.total_tokens_used += usage.total_tokens
+        self.total_cost += usage.estimated_cost
+        if self.usage_ledger is not None:
+            # Buffered in memory; the ledger's thread writes it to the database
+            self.usage_ledger.record(
+                model=ai_response.model,
+                prompt_tokens=usage.prompt_tokens,
+                completion_tokens=usage.completion_tokens,
+                total_tokens=usage.total_tokens,
+                cost=usage.estimated_cost,
+                user_id=user_id,
+                executive_type=executive_type,
+                request_type=request_type,
+                tenant_id=self.usage_budgets.tenant_for(user_id) if self.usage_budgets is not None else None
+            )
+    
+    def _reserve_budget(
+        self,
+        user_id: Any,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        prompt_tokens: Optional[int] = None
+    ) -> BudgetReservation:
+        """
+        Reserve a request's pre-flight estimate against its user's budgets
+        
+        Raises:
+            BudgetExceededError: If the estimate does not fit
+        """
+        estimate = self.openai_client.estimate_request(messages, model=model, prompt_tokens=prompt_tokens)
+        return self.usage_budgets.reserve(user_id, estimate.tokens, estimate.cost)
+    
+    def _budget_degrade_model(self, messages: List[Dict[str, str]], prompt_tokens: Optional[int] = None) -> Optional[str]:
+        """
+        Configured fallback model, or the cheapest catalogued model that fits the
+        prompt, when it costs less than the model the request is routed to
+        
+        Args:
+            messages: Messages rendered for the full request
+            prompt_tokens: Exact prompt size of messages when already known
+        
+        Returns:
+            Model name, or None if no model would make the request cheaper
+        """
+        client = self.openai_client
+        if prompt_tokens is None:
+            prompt_tokens = client.count_message_tokens(messages)
+        model = self.budget_degrade_model
+        if not model:
+            max_tokens = client.max_tokens
+            candidates = [spec for spec in client.catalog.models() if spec.fits(prompt_tokens, max_tokens)]
+            if not candidates:
+                return None
+            model = min(candidates, key=lambda spec: spec.estimate_cost(prompt_tokens, max_tokens)).name
+        
+        routed = client.estimate_request(messages, prompt_tokens=prompt_tokens)
+        fallback = client.estimate_request(messages, model=model, prompt_tokens=prompt_tokens)
+        if fallback.cost >= routed.cost:
+            return None
+        return model
+    
+    @staticmethod
+    def _shorten_document_context(document_context: Union[str, List[str], None], ratio: float) -> str:
+        """Leading share of the document context, cut at a paragraph break where possible"""
+        if isinstance(document_context, list):
+            document_context = "\n".join(document_context)
+        if not document_context:
+            return ""
+        limit = int(len(document_context) * ratio)
+        cut = document_context.rfind("\n\n", 0, limit)
+        return document_context[:cut if cut > limit // 2 else limit]
+    
+    def _plan_within_budget(
+        self,
+        executive_type: str,
+        context: str,
+        conversation_history: Optional[List[Dict]],
+        document_context: Union[str, List[str], None],
+        options: Optional[List[str]],
+        messages: List[Dict[str, str]],
+        user_id: Any,
+        semantic_checked: bool = False,
+        prompt_tokens: Optional[int] = None,
+        conversation_summary: str = ""
+    ) -> BudgetPlan:
+        """
+        Fit an executive request into its user's budgets, degrading it until it does
+        
+        The request is tried as rendered, then on a cheaper model, then on the
+        cheaper model with recent history only and a shortened document
+        context, and finally answered from the response caches. The cheaper
+        model step is skipped unless a fitting model costs less than the one
+        the request is routed to. Only the
+        cached answer helps when the limit hit is concurrency.
+        
+        Args:
+            executive_type: Type of executive
+            context: Business context or problem statement
+            conversation_history: Previous conversation messages
+            document_context: Relevant document content
+            options: Decision options
+            messages: Messages rendered for the full request
+            user_id: Requesting user
+            semantic_checked: The semantic cache was already consulted for this request
+            prompt_tokens: Exact prompt size of messages when already known
+            conversation_summary: Summary of compacted earlier turns, kept in the shorter context
+        
+        Returns:
+            BudgetPlan holding the reservation, or a cached answer
+        
+        Raises:
+            BudgetExceededError: If no degraded form fits and no cached answer exists
+        """
+        try:
+            return BudgetPlan(messages, self._reserve_budget(user_id, messages, prompt_tokens=prompt_tokens), prompt_tokens=prompt_tokens)
+        except BudgetExceededError as e:
+            error = e
+        
+        degraded = []
+        if error.limit != LIMIT_CONCURRENT:
+            model = self._budget_degrade_model(messages, prompt_tokens)
+            history = conversation_history[-self.budget_degrade_history:] if (
+                conversation_history and self.budget_degrade_history
+            ) else None
+            short_messages = self._build_executive_messages(
+                executive_type, context, history,
+                self._shorten_document_context(document_context, self.budget_degrade_document_ratio),
+                options,
+                conversation_summary=conversation_summary
+            )
+            steps = [("shorter_context", short_messages, None)]
+            if model is not None:
+                # Pinning a model that is no cheaper would just resend the same request
+                steps.insert(0, ("smaller_model", messages, prompt_tokens))
+            for step, step_messages, step_tokens in steps:
+                degraded.append(step)
+                try:
+                    reservation = self._reserve_budget(user_id, step_messages, model, step_tokens)
+                    self.logger.info(f"Degraded {executive_type} request for user {user_id} to fit budget: {degraded}")
+                    return BudgetPlan(step_messages, reservation, model, step_tokens, degraded)
+                except BudgetExceededError as e:
+                    error = e
+                    if e.limit == LIMIT_CONCURRENT:
+                        break
+        
+        degraded.append("cached_answer")
+        cached_response = self._budget_cached_answer(
+            executive_type, context, document_context, options, messages, user_id, semantic_checked
+        )
+        if cached_response is not None:
+            cached_response.metadata["budget"] = {"degraded": degraded}
+            return BudgetPlan(messages, degraded=degraded, cached_response=cached_response)
+        
+        self.logger.warning(f"Rejected {executive_type} request for user {user_id}: {error}")
+        raise error
+    
+    def _budget_cached_answer(
+        self,
+        executive_type: str,
+        context: str,
+        document_context: Union[str, List[str], None],
+        options: Optional[List[str]],
+        messages: List[Dict[str, str]],
+        user_id: Any,
+        semantic_checked: bool
+    ) -> Optional[ExecutiveResponse]:
+        """Earlier answer to this request from the exact or semantic cache, even if the caller bypassed caching"""
+        if self.response_cache_enabled:
+            cached_response = self._response_cache_lookup(
+                executive_type, self._response_cache_key(executive_type, messages, options)
+            )
+            if cached_response is not None:
+                return self._build_executive_response(executive_type, cached_response)
+        if self.semantic_cache_enabled and not semantic_checked:
+            cached_response, _, _ = self._semantic_cache_lookup(
+                executive_type, context, document_context, options, user_id
+            )
+            return cached_response
+        return None
+    
+    def get_budget_usage(self, user_id: Any) -> Dict[str, Any]:
+        """
+        Current budget consumption for the dashboard
+        
+        Args:
+            user_id: User to report on
+        
+        Returns:
+            Per subject ("user" and, when the user belongs to one, "tenant"):
+            limits, tokens available this minute, dollars spent and remaining
+            today and calls in flight ({"enabled": False} without budgets)
+        """
+        if self.usage_budgets is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.usage_budgets.get_usage(user_id)}
+    
+    def get_user_usage(self, user_id: Any, day: str = ALL_DAYS) -> Dict[str, Any]:
+        """
+        Persisted usage for one user
+        
+        Args:
+            user_id: User to report on
+            day: UTC day as YYYY-MM-DD (defaults to all time)
+            
+        Returns:
+            Request, token and cost totals (empty without a usage ledger)
+        """
+        if self.usage_ledger is None:
+            return {}
+        return self.usage_ledger.get_totals(SCOPE_USER, user_id, day).to_dict()
+    
+    def get_usage_report(self, scope: str, key: Any, start_day: str, end_day: str) -> Dict[str, Any]:
+        """
+        Per-day persisted usage for a user, executive or model over a billing period
+        
+        Args:
+            scope: "user", "executive", "model" or "total"
+            key: User id, executive type or model ("*" for total)
+            start_day: First UTC day (YYYY-MM-DD), inclusive
+            end_day: Last UTC day (YYYY-MM-DD), inclusive
+            
+        Returns:
+            Daily totals and their sum (empty without a usage ledger)
+        """
+        if self.usage_ledger is None:
+            return {}
+        daily = self.usage_ledger.get_daily_totals(scope, key, start_day, end_day)
+        period = UsageTotals()
+        for totals in daily.values():
+            period.add(totals)
+        return {
+            "scope": scope,
+            "key": str(key),
+            "start_day": start_day,
+            "end_day": end_day,
+            "total": period.to_dict(),
+            "daily": {day: totals.to_dict() for day, totals in daily.items()}
+        }
+    
+    @staticmethod
+    def decision_text(context: str, decision: str) -> str:
+        """Text embedded for a decision: the question asked and the answer given"""
+        return f"{context.strip()}\n\n{decision.strip()}"
+    
+    def embed_decisions(self, decisions: List[Dict[str, str]]) -> List[List[float]]:
+        """
+        Embed decisions in one request
+        
+        Args:
+            decisions: Dicts with 'context' and 'decision' text
+            
+        Returns:
+            One embedding per decision, in input order
+        """
+        texts = [self.decision_text(item['context'], item['decision']) for item in decisions]
+        return self.openai_client.create_embeddings(texts)
+    
+    def index_decision(
+        self,
+        decision_id: int,
+        context: str,
+        decision: str,
+        user_id: Any = None,
+        executive_type: str = None,
+        embedding: List[float] = None
+    ) -> List[float]:
+        """
+        Add a decision to the similar-decision index
+        
+        Args:
+            decision_id: Decision primary key
+            context: Question or situation the decision answered
+            decision: Decision text
+            user_id: Owner of the decision
+            executive_type: Executive that made it
+            embedding: Previously computed embedding, e.g. loaded from the database
+            
+        Returns:
+            The embedding, for persisting alongside the decision
         """
-        Generate intelligent response from AI executive
+        if embedding is None:
+            embedding = self.openai_client.create_embedding(self.decision_text(context, decision))
+        if self.decision_index is not None:
+            self.decision_index.add(decision_id, embedding, user_id, executive_type)
+        return embedding
+    
+    def find_similar_decisions(
+        self,
+        context: str,
+        user_id: Any = None,
+        executive_type: str = None,
+        k: int = None,
+        min_similarity: float = None
+    ) -> List[DecisionMatch]:
+        """
+        Find past decisions made for a context like this one
         
         Args:
-            executive_type: Type of executive (ceo, cto, cfo)
-            context: The context or question for the executive
-            conversation_history: Previous conversation messages (deprecated, use context_id)
-            document_context: Relevant document excerpts
-            options: Available options to choose from
-            context_id: ID for conversation context management
+            context: New question or situation
+            user_id: Only consider this user's decisions
+            executive_type: Only consider this executive's decisions
+            k: Maximum matches (defaults to the configured max_matches)
+            min_similarity: Cosine similarity floor (defaults to the configured similarity_threshold)
             
         Returns:
-            ExecutiveResponse with decision and reasoning
+            Matches, most similar first (empty without a decision index)
         """
-        self.logger.info(f"Generating {executive_type} response for context: {context[:100]}...")
-        
-        try:
-            # Use context manager if context_id provided
-            if context_id:
-                # Add system prompt if this is a new context
-                context_summary = self.context_manager.get_context_summary(context_id)
-                if not context_summary["exists"]:
-                    system_prompt = self.prompt_manager.get_executive_system_prompt(executive_type)
-                    self.context_manager.add_message(
-                        context_id, 
-                        "system", 
-                        system_prompt,
-                        {"executive_type": executive_type}
-                    )
-                
-                # Inject document context if provided
-                if document_context:
-                    self.context_manager.inject_document_context(context_id, document_context)
-                
-                # Add user message
-                self.context_manager.add_message(context_id, "user", context)
-                
-                # Get messages for API call
-                messages = self.context_manager.get_context_messages(context_id, max_messages=10)
-            
-            else:
-                # Fallback to legacy approach
-                messages = []
-                
-                # Add system prompt for the executive type
-                system_prompt = self.prompt_manager.get_executive_system_prompt(executive_type)
-                messages.append({"role": "system", "content": system_prompt})
-                
-                # Add conversation history if provided
-                if conversation_history:
-                    for msg in conversation_history[-5:]:  # Keep last 5 messages for context
-                        messages.append({
-                            "role": msg.get("role", "user"),
-                            "content": msg.get("content", "")
-                        })
-                
-                # Prepare document context string
-                doc_context_str = ""
-                if document_context:
-                    doc_context_str = "\n\nRelevant Documents:\n" + "\n".join(
-                        f"- {doc}" for doc in document_context[:3]  # Limit to 3 documents
-                    )
-                
-                # Prepare conversation history string
-                conv_history_str = ""
-                if conversation_history:
-                    conv_history_str = "\n\nPrevious Conversation:\n" + "\n".join(
-                        f"{msg.get('role', 'user')}: {msg.get('content', '')}"
-                        for msg in conversation_history[-3:]  # Last 3 exchanges
-                    )
-                
-                # Format the decision prompt using enhanced prompt system
-                decision_prompt = self.prompt_manager.get_decision_prompt(
-                    executive_type=executive_type,
-                    decision_type="general",  # Could be determined from context
-                    context=context,
-                    document_context=doc_context_str,
-                    conversation_history=conv_history_str
-                )
-                
-                messages.append({"role": "user", "content": decision_prompt})
-            
-            # Generate response using OpenAI
-            ai_response = self.openai_client.generate_completion(messages)
-            
-            # Add assistant response to context if using context manager
-            if context_id:
-                self.context_manager.add_message(
-                    context_id, 
-                    "assistant", 
-                    ai_response.content,
-                    {
-                        "executive_type": executive_type,
-                        "token_usage": ai_response.token_usage.__dict__,
-                        "response_time": ai_response.response_time
-                    }
-                )
-            
-            # Update usage tracking
-            self.total_tokens_used += ai_response.token_usage.total_tokens
-            self.total_cost += ai_response.token_usage.estimated_cost
-            
-            # Parse the JSON response
-            try:
-                response_data = json.loads(ai_response.content)
-            except json.JSONDecodeError:
-                # Fallback if JSON parsing fails
-                self.logger.warning("Failed to parse JSON response, using fallback")
-                response_data = {
-                    "decision": ai_response.content[:200] + "..." if len(ai_response.content) > 200 else ai_response.content,
-                    "rationale": "AI provided detailed analysis",
-                    "confidence_score": 0.7,
-                    "priority": "medium",
-                    "category": "general",
-                    "risk_level": "medium"
-                }
-            
-            # Create ExecutiveResponse
-            executive_response = ExecutiveResponse(
-                content=ai_response.content,
-                model=ai_response.model,
-                token_usage=ai_response.token_usage,
-                response_time=ai_response.response_time,
-                timestamp=ai_response.timestamp,
-                metadata=ai_response.metadata,
-                decision=response_data.get("decision", "No decision provided"),
-                rationale=response_data.get("rationale", "No rationale provided"),
-                confidence_score=float(response_data.get("confidence_score", 0.7)),
-                priority=response_data.get("priority", "medium"),
-                category=response_data.get("category", "general"),
-                financial_impact=response_data.get("financial_impact"),
-                risk_level=response_data.get("risk_level", "medium"),
-                executive_type=executive_type
-            )
-            
-            # Add context information to metadata
-            if context_id:
-                context_summary = self.context_manager.get_context_summary(context_id)
-                executive_response.metadata.update({
-                    "context_id": context_id,
-                    "context_summary": context_summary
-                })
-            
-            return executive_response
-            
-        except Exception as e:
-            self.logger.error(f"Failed to generate executive response: {e}")
-            # Return a fallback response
-            return ExecutiveResponse(
-                content=f"Error generating response: {str(e)}",
-                model=self.openai_client.model,
-                token_usage=TokenUsage(0, 0, 0, 0.0),
-                response_time=0.0,
-                decision="Unable to generate decision due to technical error",
-                rationale="Please try again or contact support",
-                confidence_score=0.0,
-                priority="low",
-                category="error",
-                risk_level="high",
-                executive_type=executive_type,
-                metadata={"error": str(e)}
-            )
+        if self.decision_index is None:
+            return []
+        # No embedding call when there is nothing to compare against
+        if self.decision_index.count(user_id) == 0:
+            return []
+        embedding = self.openai_client.create_embedding(context)
+        return self.decision_index.search(
+            embedding,
+            k=k or self.decision_max_matches,
+            user_id=user_id,
+            executive_type=executive_type,
+            min_similarity=self.decision_similarity_threshold if min_similarity is None else min_similarity
+        )
+    
+    def _ledger_stats(self) -> Dict[str, Any]:
+        """Persisted usage across all workers, by executive, plus this process's flush stats"""
+        if self.usage_ledger is None:
+            return {"enabled": False}
+        ledger = self.usage_ledger
+        today = datetime.utcnow().strftime("%Y-%m-%d")
+        return {
+            "enabled": True,
+            "total": ledger.get_totals(SCOPE_TOTAL, ALL_KEYS, ALL_DAYS).to_dict(),
+            "today": ledger.get_totals(SCOPE_TOTAL, ALL_KEYS, today).to_dict(),
+            "by_executive": {
+                executive.value: ledger.get_totals(SCOPE_EXECUTIVE, executive.value, ALL_DAYS).to_dict()
+                for executive in ExecutiveType
+            },
+            **ledger.get_stats()
+        }
+    
+    def _coalescing_stats(self) -> Dict[str, Any]:
+        """Request coalescing stats from the OpenAI client, if it provides them"""
+        coalescer = getattr(self.openai_client, 'coalescer', None)
+        if isinstance(coalescer, RequestCoalescer):
+            return coalescer.get_stats()
+        return {}
+    
+    def _rate_limiter_stats(self) -> Dict[str, Any]:
+        """Queue depth and wait time stats from the OpenAI client's rate limiter"""
+        rate_limiter = getattr(self.openai_client, 'rate_limiter', None)
+        if isinstance(rate_limiter, RateLimiter):
+            return rate_limiter.get_stats()
+        return {}
+    
+    def _routing_stats(self) -> Dict[str, Any]:
+        """Model routing and catalogue stats from the OpenAI client, if it provides them"""
+        router = getattr(self.openai_client, 'router', None)
+        if isinstance(router, ModelRouter):
+            return {**router.get_stats(), "models": router.catalog.get_stats()}
+        return {}
+    
+    def clear_response_cache(self):
+        """Clear all cached executive responses"""
+        self.response_cache.clear()
+        self.semantic_cache.clear()
+        self.logger.info("Cleared executive response caches")
     
     def get_document_insights(
         self, 
@@ -1355,12 +4152,11 @@ Format your response as JSON:
                 }
             ]
             
-            # Generate insights using OpenAI
-            ai_response = self.openai_client.generate_completion(messages)
+            # Generate insights using OpenAI (queued behind interactive decisions)
+            ai_response = self.openai_client.generate_completion(messages, priority=RequestPriority.BACKGROUND)
             
             # Update usage tracking
-            self.total_tokens_used += ai_response.token_usage.total_tokens
-            self.total_cost += ai_response.token_usage.estimated_cost
+            self._track_usage(ai_response, request_type="document_insights")
             
             # Parse the JSON response
             try:
@@ -1461,12 +4257,11 @@ Format your response as JSON:
                 }
             ]
             
-            # Generate analysis using OpenAI
-            ai_response = self.openai_client.generate_completion(messages)
+            # Generate analysis using OpenAI (queued behind interactive decisions)
+            ai_response = self.openai_client.generate_completion(messages, priority=RequestPriority.BACKGROUND)
             
             # Update usage tracking
-            self.total_tokens_used += ai_response.token_usage.total_tokens
-            self.total_cost += ai_response.token_usage.estimated_cost
+            self._track_usage(ai_response, request_type="decision_patterns")
             
             # Parse the JSON response
             try:
@@ -1512,6 +4307,18 @@ Format your response as JSON:
             "total_cost": self.total_cost,
             "model": self.openai_client.model,
             "active_contexts": len(self.context_manager.contexts),
+            "context_store": self.context_manager.contexts.get_stats(),
+            "context_compaction": self.context_manager.get_compaction_stats(),
+            "request_coalescing": self._coalescing_stats(),
+            "model_routing": self._routing_stats(),
+            "rate_limiter": self._rate_limiter_stats(),
+            "openai_connections": get_openai_client_factory().get_stats(),
+            "usage_ledger": self._ledger_stats(),
+            "response_cache": self.response_cache.get_stats(),
+            "semantic_cache": self.semantic_cache.get_stats(),
+            "structured_output": self._structured_output_stats(),
+            "decision_index": self.decision_index.get_stats() if self.decision_index is not None else {"enabled": False},
+            "usage_budgets": self.usage_budgets.get_stats() if self.usage_budgets is not None else {"enabled": False},
             "timestamp": datetime.utcnow().isoformat()
         }
     
@@ -1531,10 +4338,10 @@ Format your response as JSON:
         max_messages: int = None
     ) -> List[Dict[str, Any]]:
         """Get conversation history for a context"""
-        if context_id not in self.context_manager.contexts:
+        context = self.context_manager.contexts.get(context_id)
+        if context is None:
             return []
         
-        context = self.context_manager.contexts[context_id]
         history = []
         
         for msg in context.messages:
@@ -1558,8 +4365,10 @@ Format your response as JSON:
         context_id: str, 
         documents: List[str]
     ):
-        """Inject document context into a conversation"""
-        self.context_manager.inject_document_context(context_id, documents)
+        """Inject document context into a conversation, packed into the document token budget"""
+        self.context_manager.inject_document_context(
+            context_id, documents, max_tokens=self.document_context_tokens
+        )
         self.logger.info(f"Injected {len(documents)} documents into context {context_id}")
     
     def prune_old_contexts(self, max_age_hours: int = 24):
@@ -1567,8 +4376,10 @@ Format your response as JSON:
         cutoff_time = datetime.utcnow() - timedelta(hours=max_age_hours)
         contexts_to_remove = []
         
-        for context_id, context in self.context_manager.contexts.items():
-            if context.messages:
+        for context_id in list(self.context_manager.contexts):
+            # Stores may evict concurrently, so look each context up individually
+            context = self.context_manager.contexts.get(context_id)
+            if context is not None and context.messages:
                 last_message_time = context.messages[-1].timestamp
                 if last_message_time < cutoff_time:
                     contexts_to_remove.append(context_id)
@@ -1648,7 +4459,9 @@ Format your response as JSON:
         conversation_history: List[Dict] = None,
         document_context: str = "",
         options: List[str] = None,
-        context_id: str = None
+        context_id: str = None,
+        use_cache: bool = True,
+        user_id: Any = None
     ) -> ExecutiveResponse:
         """
         Generate an executive response using AI with role-specific prompts
@@ -1660,81 +4473,78 @@ Format your response as JSON:
             document_context: Relevant document content
             options: Optional list of decision options
             context_id: Optional context ID for conversation tracking
+            use_cache: Whether to serve an identical earlier response from the cache
+            user_id: Requesting user; semantic cache matches are scoped to this user
+                and usage budgets are enforced against them
             
         Returns:
-            ExecutiveResponse with decision, rationale, and metadata
+            ExecutiveResponse with decision, rationale, and metadata; a request
+            degraded to fit the budget has metadata["budget"]["degraded"]
+        
+        Raises:
+            BudgetExceededError: If the request cannot fit the user's budget
+                even degraded and no cached answer exists
         """
         self.logger.info(f"Generating {executive_type} response for context: {context[:100]}...")
         
         try:
-            # Get executive-specific system prompt
-            system_prompt = self.prompt_manager.get_executive_system_prompt(executive_type)
-            
-            # Prepare document context section
-            doc_context_section = ""
-            if document_context:
-                doc_context_section = f"\n\nRELEVANT DOCUMENTS:\n{document_context}"
-            
-            # Prepare conversation history section
-            history_section = ""
-            if conversation_history:
-                history_section = "\n\nCONVERSATION HISTORY:\n"
-                for msg in conversation_history[-6:]:  # Last 6 messages
-                    role = msg.get('role', 'unknown')
-                    content = msg.get('content', '')
-                    history_section += f"{role.upper()}: {content}\n"
-            
-            # Prepare options section
-            options_section = ""
-            if options:
-                options_section = f"\n\nAVAILABLE OPTIONS:\n"
-                for i, option in enumerate(options, 1):
-                    options_section += f"{i}. {option}\n"
-            
-            # Get decision prompt template
-            decision_prompt = self.prompt_manager.get_decision_prompt(
-                executive_type=executive_type,
-                context=context,
-                document_context=doc_context_section,
-                conversation_history=history_section
-            )
+            # Paraphrase lookup only applies to standalone questions; history changes the answer
+            semantic_scope = semantic_embedding = None
+            if use_cache and self.semantic_cache_enabled and not conversation_history and not context_id:
+                cached_response, semantic_scope, semantic_embedding = self._semantic_cache_lookup(
+                    executive_type, context, document_context, options, user_id
+                )
+                if cached_response is not None:
+                    return cached_response
             
-            # Add options to the prompt if provided
-            if options_section:
-                decision_prompt += options_section
+            # Tracked conversations supply their own recent turns plus the running summary
+            conversation_summary = ""
+            prompt_tokens = None
+            if context_id and conversation_history is None:
+                conversation_history = self.context_manager.get_context_messages(
+                    context_id, include_system=False, max_messages=EXECUTIVE_HISTORY_MESSAGES
+                )
+                conversation_summary = self.context_manager.get_running_summary(context_id)
+                # Their cached token counts stand in for re-tokenizing the history
+                prompt_tokens = self._executive_prompt_tokens(
+                    executive_type, context, document_context, options,
+                    self.context_manager.count_history_tokens(context_id, max_messages=EXECUTIVE_HISTORY_MESSAGES)
+                )
             
             # Build messages for OpenAI
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": decision_prompt}
-            ]
+            messages = self._build_executive_messages(
+                executive_type, context, conversation_history, document_context, options,
+                conversation_summary=conversation_summary
+            )
+            
+            # Reserve the estimated usage before sending, degrading the request if it does not fit
+            plan = BudgetPlan(messages, prompt_tokens=prompt_tokens)
+            if self.usage_budgets is not None and user_id is not None:
+                plan = self._plan_within_budget(
+                    executive_type, context, conversation_history, document_context, options, messages,
+                    user_id, semantic_checked=semantic_scope is not None, prompt_tokens=prompt_tokens,
+                    conversation_summary=conversation_summary
+                )
+                if plan.cached_response is not None:
+                    return plan.cached_response
             
-            # Generate AI response
-            ai_response = self.openai_client.generate_completion(messages)
+            # Generate AI response (or serve an identical earlier one from the cache)
+            try:
+                ai_response = self._generate_cached_completion(
+                    executive_type, plan.messages, options, use_cache,
+                    prompt_tokens=plan.prompt_tokens, model=plan.model
+                )
+            except Exception:
+                plan.settle()
+                raise
             
             # Update usage tracking
-            self.total_tokens_used += ai_response.token_usage.total_tokens
-            self.total_cost += ai_response.token_usage.estimated_cost
+            self._track_usage(ai_response, executive_type, user_id)
+            plan.settle(ai_response)
             
-            # Parse the JSON response
-            try:
-                response_data = json.loads(ai_response.content)
-            except json.JSONDecodeError:
-                # Fallback parsing if JSON is malformed
-                self.logger.warning("Failed to parse JSON response, using fallback parsing")
-                response_data = self._parse_fallback_response(ai_response.content, executive_type)
-            
-            # Extract executive response components
-            decision = response_data.get("decision", "Proceed with the recommended approach.")
-            rationale = response_data.get("rationale", "Based on comprehensive analysis of the situation.")
-            confidence_score = float(response_data.get("confidence_score", 0.7))
-            priority = response_data.get("priority", "medium")
-            category = response_data.get("category", "strategic")
-            financial_impact = response_data.get("financial_impact")
-            risk_level = response_data.get("risk_level", "medium")
-            
-            # Ensure confidence score is within valid range
-            confidence_score = max(0.0, min(1.0, confidence_score))
+            executive_response = self._build_executive_response(executive_type, ai_response)
+            if plan.degraded:
+                executive_response.metadata["budget"] = {"degraded": plan.degraded, "model": ai_response.model}
             
             # Update conversation context if context_id provided
             if context_id:
@@ -1742,31 +4552,628 @@ Format your response as JSON:
                     context_id, "user", context
                 )
                 self.context_manager.add_message(
-                    context_id, "assistant", decision
+                    context_id, "assistant", executive_response.decision
                 )
             
-            return ExecutiveResponse(
-                content=ai_response.content,
-                model=ai_response.model,
-                token_usage=ai_response.token_usage,
-                response_time=ai_response.response_time,
-                timestamp=ai_response.timestamp,
-                metadata=ai_response.metadata,
-                decision=decision,
-                rationale=rationale,
-                confidence_score=confidence_score,
-                priority=priority,
-                category=category,
-                financial_impact=financial_impact,
-                risk_level=risk_level,
-                executive_type=executive_type
-            )
+            if semantic_scope is not None and not ai_response.metadata.get("cache_hit") and not plan.degraded:
+                self.semantic_cache.add(semantic_scope, semantic_embedding, executive_response)
             
+            return executive_response
+            
+        except BudgetExceededError:
+            raise
         except Exception as e:
             self.logger.error(f"Failed to generate {executive_type} response: {e}")
             # Return fallback response
             return self._create_fallback_executive_response(executive_type, context, str(e))
     
+    async def generate_panel_response_async(
+        self,
+        context: str,
+        executive_types: List[str] = None,
+        conversation_history: List[Dict] = None,
+        document_context: str = "",
+        options: List[str] = None,
+        timeout: float = None,
+        use_cache: bool = True,
+        user_id: Any = None
+    ) -> PanelResponse:
+        """
+        Ask several executives the same question concurrently
+        
+        Args:
+            context: Business context or problem statement
+            executive_types: Executives to ask (defaults to CEO, CTO and CFO)
+            conversation_history: Previous conversation messages
+            document_context: Relevant document content
+            options: Optional list of decision options
+            timeout: Per-executive timeout in seconds
+            use_cache: Whether to serve identical earlier responses from the cache
+            user_id: Requesting user, recorded against the usage and budgets
+            
+        Returns:
+            PanelResponse; executives that failed, timed out or did not fit the
+            user's budget even degraded get a fallback response and an entry in errors
+        
+        Raises:
+            BudgetExceededError: If no executive's request fit the user's budget
+        """
+        executive_types = executive_types or [executive.value for executive in ExecutiveType]
+        for executive_type in executive_types:
+            ExecutiveType(executive_type)  # Raises ValueError for unknown executives
+        
+        timeout = timeout or self.panel_timeout
+        start_time = time.time()
+        self.logger.info(f"Generating panel response from {executive_types} for context: {context[:100]}...")
+        
+        async def ask(executive_type: str) -> ExecutiveResponse:
+            messages = self._build_executive_messages(
+                executive_type, context, conversation_history, document_context, options
+            )
+            
+            cache_key = None
+            if self.response_cache_enabled:
+                cache_key = self._response_cache_key(executive_type, messages, options)
+                if use_cache:
+                    cached_response = self._response_cache_lookup(executive_type, cache_key)
+                    if cached_response is not None:
+                        return self._build_executive_response(executive_type, cached_response)
+                else:
+                    self.response_cache.record_bypass()
+            
+            # Degrade the request, or answer from the caches, when it does not fit the
+            # budget; off the event loop, since a cached answer may need an embedding
+            plan = BudgetPlan(messages)
+            if self.usage_budgets is not None and user_id is not None:
+                plan = await asyncio.get_running_loop().run_in_executor(
+                    None,
+                    lambda: self._plan_within_budget(
+                        executive_type, context, conversation_history, document_context, options, messages, user_id
+                    )
+                )
+                if plan.cached_response is not None:
+                    return plan.cached_response
+            try:
+                ai_response = await asyncio.wait_for(
+                    self.openai_client.generate_completion_async(
+                        plan.messages, priority=RequestPriority.INTERACTIVE,
+                        response_schema=self._executive_response_schema(), model=plan.model
+                    ),
+                    timeout
+                )
+            except BaseException:
+                plan.settle()
+                raise
+            plan.settle(ai_response)
+            # A degraded answer is not an answer to the full request
+            if cache_key and not plan.degraded:
+                self._response_cache_store(executive_type, cache_key, ai_response)
+            
+            self._track_usage(ai_response, executive_type, user_id)
+            executive_response = self._build_executive_response(executive_type, ai_response)
+            if plan.degraded:
+                executive_response.metadata["budget"] = {"degraded": plan.degraded, "model": ai_response.model}
+            return executive_response
+        
+        results = await asyncio.gather(
+            *(ask(executive_type) for executive_type in executive_types),
+            return_exceptions=True
+        )
+        
+        rejections = [result for result in results if isinstance(result, BudgetExceededError)]
+        if len(rejections) == len(results):
+            raise rejections[0]
+        
+        responses = {}
+        errors = {}
+        for executive_type, result in zip(executive_types, results):
+            if isinstance(result, BaseException):
+                if isinstance(result, asyncio.TimeoutError):
+                    error = f"Timed out after {timeout}s"
+                else:
+                    error = str(result) or result.__class__.__name__
+                self.logger.error(f"Panel response from {executive_type} failed: {error}")
+                errors[executive_type] = error
+                responses[executive_type] = self._create_fallback_executive_response(
+                    executive_type, context, error
+                )
+            else:
+                responses[executive_type] = result
+        
+        return PanelResponse(
+            responses=responses,
+            errors=errors,
+            response_time=time.time() - start_time
+        )
+    
+    def generate_panel_response(
+        self,
+        context: str,
+        executive_types: List[str] = None,
+        conversation_history: List[Dict] = None,
+        document_context: str = "",
+        options: List[str] = None,
+        timeout: float = None,
+        use_cache: bool = True,
+        user_id: Any = None
+    ) -> PanelResponse:
+        """Synchronous wrapper around generate_panel_response_async"""
+        return self._run_async(self.generate_panel_response_async(
+            context=context,
+            executive_types=executive_types,
+            conversation_history=conversation_history,
+            document_context=document_context,
+            options=options,
+            timeout=timeout,
+            use_cache=use_cache,
+            user_id=user_id
+        ))
+    
+    async def generate_executive_responses_batch_async(
+        self,
+        requests: List[BatchDecisionRequest],
+        concurrency: int = 8,
+        checkpoint_path: str = None,
+        result_writer: Callable[[List[BatchDecisionResult]], None] = None,
+        write_batch_size: int = 50,
+        timeout: float = None,
+        use_cache: bool = True
+    ) -> BatchReport:
+        """
+        Generate many independent executive decisions with bounded concurrency
+        
+        Finished results are handed to result_writer in chunks of
+        write_batch_size and, once written, recorded in the checkpoint. Rerunning
+        with the same checkpoint skips requests that were already written, so a
+        crashed run resumes where it stopped. Failed requests are reported but
+        never checkpointed, so a rerun retries them.
+        
+        Args:
+            requests: Decisions to generate; request_ids must be unique
+            concurrency: Maximum completions in flight at once
+            checkpoint_path: Optional JSON lines file used to resume
+            result_writer: Optional callable persisting a chunk of successful
+                results (runs on a worker thread)
+            write_batch_size: Results per result_writer call
+            timeout: Per-request timeout in seconds
+            use_cache: Whether to serve identical earlier responses from the cache
+            
+        Returns:
+            BatchReport with one result per request, in request order
+        """
+        request_ids = [request.request_id for request in requests]
+        if len(set(request_ids)) != len(request_ids):
+            raise ValueError("Batch request_ids must be unique")
+        if concurrency < 1:
+            raise ValueError("Batch concurrency must be at least 1")
+        for request in requests:
+            ExecutiveType(request.executive_type)  # Raises ValueError for unknown executives
+        
+        start_time = time.time()
+        loop = asyncio.get_running_loop()
+        checkpoint = BatchCheckpoint(checkpoint_path) if checkpoint_path else None
+        finished = await loop.run_in_executor(None, checkpoint.load) if checkpoint else {}
+        
+        results: Dict[str, BatchDecisionResult] = {}
+        for request in requests:
+            if request.request_id in finished:
+                results[request.request_id] = BatchDecisionResult(
+                    request_id=request.request_id,
+                    executive_type=request.executive_type,
+                    metadata=request.metadata,
+                    resumed=True,
+                    record=finished[request.request_id]
+                )
+        pending = [request for request in requests if request.request_id not in results]
+        
+        self.logger.info(
+            f"Generating batch of {len(pending)} decisions ({len(results)} resumed) "
+            f"with concurrency {concurrency}"
+        )
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        write_lock = asyncio.Lock()
+        unwritten: List[BatchDecisionResult] = []
+        
+        async def generate(request: BatchDecisionRequest) -> BatchDecisionResult:
+            async with semaphore:
+                try:
+                    messages = self._build_executive_messages(
+                        request.executive_type, request.context, None, request.document_context, request.options
+                    )
+                    
+                    cache_key = None
+                    ai_response = None
+                    if self.response_cache_enabled:
+                        cache_key = self._response_cache_key(request.executive_type, messages, request.options)
+                        if use_cache:
+                            ai_response = self._response_cache_lookup(request.executive_type, cache_key)
+                        else:
+                            self.response_cache.record_bypass()
+                    
+                    if ai_response is None:
+                        ai_response = await asyncio.wait_for(
+                            self.openai_client.generate_completion_async(
+                                messages, priority=RequestPriority.BACKGROUND,
+                                response_schema=self._executive_response_schema()
+                            ),
+                            timeout or self.panel_timeout
+                        )
+                        if cache_key:
+                            self._response_cache_store(request.executive_type, cache_key, ai_response)
+                    
+                    self._track_usage(
+                        ai_response, request.executive_type, request.metadata.get("user_id"), request_type="batch"
+                    )
+                    response = self._build_executive_response(request.executive_type, ai_response)
+                    return BatchDecisionResult(
+                        request_id=request.request_id,
+                        executive_type=request.executive_type,
+                        response=response,
+                        metadata=request.metadata
+                    )
+                except Exception as e:
+                    if isinstance(e, asyncio.TimeoutError):
+                        error = f"Timed out after {timeout or self.panel_timeout}s"
+                    else:
+                        error = str(e) or e.__class__.__name__
+                    self.logger.error(f"Batch request {request.request_id} failed: {error}")
+                    return BatchDecisionResult(
+                        request_id=request.request_id,
+                        executive_type=request.executive_type,
+                        error=error,
+                        metadata=request.metadata
+                    )
+        
+        async def flush(force: bool = False):
+            async with write_lock:
+                while unwritten and (force or len(unwritten) >= write_batch_size):
+                    chunk = unwritten[:write_batch_size]
+                    del unwritten[:write_batch_size]
+                    if result_writer:
+                        await loop.run_in_executor(None, result_writer, chunk)
+                    if checkpoint:
+                        await loop.run_in_executor(None, checkpoint.append, [result.to_record() for result in chunk])
+        
+        tasks = [asyncio.ensure_future(generate(request)) for request in pending]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                results[result.request_id] = result
+                if result.succeeded:
+                    unwritten.append(result)
+                    await flush()
+            await flush(force=True)
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        ordered = [results[request_id] for request_id in request_ids]
+        completed = sum(1 for result in ordered if result.succeeded and not result.resumed)
+        failed = sum(1 for result in ordered if not result.succeeded)
+        report = BatchReport(
+            results=ordered,
+            completed=completed,
+            failed=failed,
+            resumed=len(ordered) - completed - failed,
+            response_time=time.time() - start_time
+        )
+        self.logger.info(
+            f"Batch finished: {report.completed} generated, {report.failed} failed, "
+            f"{report.resumed} resumed in {report.response_time:.1f}s ({report.throughput:.1f}/s)"
+        )
+        return report
+    
+    def generate_executive_responses_batch(
+        self,
+        requests: List[BatchDecisionRequest],
+        concurrency: int = 8,
+        checkpoint_path: str = None,
+        result_writer: Callable[[List[BatchDecisionResult]], None] = None,
+        write_batch_size: int = 50,
+        timeout: float = None,
+        use_cache: bool = True
+    ) -> BatchReport:
+        """Synchronous wrapper around generate_executive_responses_batch_async"""
+        return self._run_async(self.generate_executive_responses_batch_async(
+            requests=requests,
+            concurrency=concurrency,
+            checkpoint_path=checkpoint_path,
+            result_writer=result_writer,
+            write_batch_size=write_batch_size,
+            timeout=timeout,
+            use_cache=use_cache
+        ))
+    
+    def stream_executive_response(
+        self,
+        executive_type: str,
+        context: str,
+        conversation_history: List[Dict] = None,
+        document_context: str = "",
+        options: List[str] = None,
+        use_cache: bool = True,
+        user_id: Any = None,
+        emit_fields: bool = False
+    ):
+        """
+        Stream an executive response as it is generated
+        
+        Args:
+            executive_type: Type of executive ('ceo', 'cto', 'cfo')
+            context: Business context or problem statement
+            conversation_history: Previous conversation messages
+            document_context: Relevant document content
+            options: Optional list of decision options
+            use_cache: Whether to serve an identical earlier response from the cache
+            user_id: Requesting user, recorded against the usage and budgets
+            emit_fields: Also yield parsed fields while the response streams
+            
+        Yields:
+            {"type": "token", "content": str} for each text delta, then a single
+            {"type": "response", "response": ExecutiveResponse}. With emit_fields,
+            also {"type": "fields", "fields": dict} as top-level JSON fields
+            complete, and {"type": "ready", "fields": dict} once, as soon as the
+            fields a decision needs (decision, rationale, confidence_score) are in.
+            A request answered from the cache to fit the budget yields only the
+            response.
+        
+        Raises:
+            BudgetExceededError: If the request cannot fit the user's budget
+        """
+        self.logger.info(f"Streaming {executive_type} response for context: {context[:100]}...")
+        
+        messages = self._build_executive_messages(
+            executive_type, context, conversation_history, document_context, options
+        )
+        
+        cache_key = None
+        if self.response_cache_enabled:
+            cache_key = self._response_cache_key(executive_type, messages, options)
+            if use_cache:
+                cached_response = self._response_cache_lookup(executive_type, cache_key)
+                if cached_response is not None:
+                    yield {"type": "token", "content": cached_response.content}
+                    yield {"type": "response", "response": self._build_executive_response(executive_type, cached_response)}
+                    return
+            else:
+                self.response_cache.record_bypass()
+        
+        plan = BudgetPlan(messages)
+        if self.usage_budgets is not None and user_id is not None:
+            plan = self._plan_within_budget(
+                executive_type, context, conversation_history, document_context, options, messages, user_id
+            )
+            if plan.cached_response is not None:
+                yield {"type": "response", "response": plan.cached_response}
+                return
+        
+        ai_response = None
+        try:
+            stream = self.openai_client.generate_completion_stream(
+                plan.messages, priority=RequestPriority.INTERACTIVE,
+                response_schema=self._executive_response_schema(), model=plan.model
+            )
+            parser = IncrementalJSONParser() if emit_fields else None
+            ready = False
+            for delta in stream:
+                yield {"type": "token", "content": delta}
+                if parser is None:
+                    continue
+                completed = parser.feed(delta)
+                if completed:
+                    yield {"type": "fields", "fields": completed}
+                    if not ready and parser.has_fields(REQUIRED_DECISION_FIELDS):
+                        ready = True
+                        yield {"type": "ready", "fields": dict(parser.fields)}
+            ai_response = stream.response
+        finally:
+            # Also runs when the client disconnects and the generator is closed
+            plan.settle(ai_response)
+        
+        if cache_key and plan.model is None:
+            self._response_cache_store(executive_type, cache_key, ai_response)
+        self._track_usage(ai_response, executive_type, user_id)
+        
+        executive_response = self._build_executive_response(executive_type, ai_response)
+        if plan.degraded:
+            executive_response.metadata["budget"] = {"degraded": plan.degraded, "model": ai_response.model}
+        yield {"type": "response", "response": executive_response}
+    
+    def document_context_budget(self, prompt_tokens: int = 0) -> int:
+        """
+        Tokens available for document context
+        
+        Args:
+            prompt_tokens: Tokens of the prompt without document context
+            
+        Returns:
+            The configured document budget, reduced so the prompt plus the
+            completion's max_tokens still fit the model's context window
+        """
+        spec = self.openai_client.catalog.get(self.openai_client.model)
+        context_window = spec.context_window if spec else 4096
+        available = context_window - prompt_tokens - self.openai_client.max_tokens
+        return max(0, min(self.document_context_tokens, available))
+    
+    def pack_document_context(
+        self,
+        chunks: List[Any],
+        executive_type: str = "ceo",
+        context: str = "",
+        options: List[str] = None,
+        budget: int = None
+    ) -> PackedContext:
+        """
+        Select document chunks for a decision prompt within a token budget
+        
+        Args:
+            chunks: Ranked ContextChunk or vector SearchResult candidates
+            executive_type: Executive whose prompt the context goes into
+            context: Decision context, counted against the context window
+            options: Decision options, counted against the context window
+            budget: Explicit token budget (defaults to document_context_budget)
+            
+        Returns:
+            PackedContext with the rendered document context
+        """
+        count_tokens = self.openai_client.count_tokens
+        if budget is None:
+            messages = self._build_executive_messages(executive_type, context, options=options)
+            # The RELEVANT DOCUMENTS header is added around the packed text
+            prompt_tokens = self.openai_client.count_message_tokens(messages) + count_tokens(
+                "\n\nRELEVANT DOCUMENTS:\n"
+            )
+            budget = self.document_context_budget(prompt_tokens)
+        
+        packed = ContextPacker(count_tokens).pack(chunks, budget)
+        self.logger.info(
+            f"Packed {len(packed.chunks)}/{packed.candidates} document chunks "
+            f"into {packed.tokens}/{packed.budget} tokens"
+        )
+        return packed
+    
+    def _build_executive_messages(
+        self,
+        executive_type: str,
+        context: str,
+        conversation_history: List[Dict] = None,
+        document_context: str = "",
+        options: List[str] = None,
+        conversation_summary: str = ""
+    ) -> List[Dict[str, str]]:
+        """Render the system and decision prompts for an executive request"""
+        # Get executive-specific system prompt
+        system_prompt = self.prompt_manager.get_executive_system_prompt(executive_type)
+        
+        # Prepare document context section
+        doc_context_section = ""
+        if document_context:
+            doc_context_section = f"\n\nRELEVANT DOCUMENTS:\n{document_context}"
+        
+        # Prepare conversation history section; older turns arrive compacted as a summary
+        history_section = ""
+        if conversation_summary:
+            history_section = f"\n\nEARLIER CONVERSATION SUMMARY:\n{conversation_summary}\n"
+        if conversation_history:
+            history_section += "\n\nCONVERSATION HISTORY:\n"
+            for msg in conversation_history[-EXECUTIVE_HISTORY_MESSAGES:]:
+                role = msg.get('role', 'unknown')
+                content = msg.get('content', '')
+                history_section += f"{role.upper()}: {content}\n"
+        
+        # Prepare options section
+        options_section = ""
+        if options:
+            options_section = f"\n\nAVAILABLE OPTIONS:\n"
+            for i, option in enumerate(options, 1):
+                options_section += f"{i}. {option}\n"
+        
+        # Get decision prompt template
+        decision_prompt = self.prompt_manager.get_decision_prompt(
+            executive_type=executive_type,
+            context=context,
+            document_context=doc_context_section,
+            conversation_history=history_section
+        )
+        
+        # Add options to the prompt if provided
+        if options_section:
+            decision_prompt += options_section
+        
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": decision_prompt}
+        ]
+    
+    def _executive_prompt_tokens(
+        self,
+        executive_type: str,
+        context: str,
+        document_context: str,
+        options: Optional[List[str]],
+        history_tokens: int
+    ) -> int:
+        """
+        Prompt size of an executive request whose history tokens are already counted
+        
+        Only the system and decision prompts rendered without history are
+        tokenized; the history section is added from its cached count.
+        
+        Args:
+            executive_type: Type of executive
+            context: Business context or problem statement
+            document_context: Relevant document content
+            options: Decision options
+            history_tokens: Tokens of the conversation summary and recent turns
+        
+        Returns:
+            Prompt tokens including chat format overhead
+        """
+        messages = self._build_executive_messages(executive_type, context, None, document_context, options)
+        return sum(
+            self.context_manager.count_tokens(message["content"]) + MESSAGE_TOKEN_OVERHEAD
+            for message in messages
+        ) + CONVERSATION_TOKEN_OVERHEAD + history_tokens
+    
+    def _build_executive_response(self, executive_type: str, ai_response: AIResponse) -> ExecutiveResponse:
+        """Parse a completion into an ExecutiveResponse"""
+        # Well-formed JSON parses directly; a fenced or truncated object keeps its completed fields
+        response_data, complete = parse_json_object(ai_response.content)
+        if response_data is not None and "decision" in response_data:
+            parse_mode = "json" if complete else "partial"
+        else:
+            # Fallback parsing if there is no usable JSON
+            self.logger.warning("Failed to parse JSON response, using fallback parsing")
+            response_data = self._parse_fallback_response(ai_response.content, executive_type)
+            parse_mode = "fallback"
+        with self._parse_lock:
+            self._parse_counts[parse_mode] += 1
+        
+        # Extract executive response components
+        decision = response_data.get("decision", "Proceed with the recommended approach.")
+        rationale = response_data.get("rationale", "Based on comprehensive analysis of the situation.")
+        confidence_score = float(response_data.get("confidence_score", 0.7))
+        priority = response_data.get("priority", "medium")
+        category = response_data.get("category", "strategic")
+        financial_impact = response_data.get("financial_impact")
+        risk_level = response_data.get("risk_level", "medium")
+        
+        # Ensure confidence score is within valid range
+        confidence_score = max(0.0, min(1.0, confidence_score))
+        
+        return ExecutiveResponse(
+            content=ai_response.content,
+            model=ai_response.model,
+            token_usage=ai_response.token_usage,
+            response_time=ai_response.response_time,
+            timestamp=ai_response.timestamp,
+            metadata={**ai_response.metadata, "parse": parse_mode},
+            decision=decision,
+            rationale=rationale,
+            confidence_score=confidence_score,
+            priority=priority,
+            category=category,
+            financial_impact=financial_impact,
+            risk_level=risk_level,
+            executive_type=executive_type
+        )
+    
+    def _executive_response_schema(self) -> Optional[Dict[str, Any]]:
+        """Schema requested for executive decisions, or None when structured output is disabled"""
+        return EXECUTIVE_RESPONSE_SCHEMA if self.structured_output_enabled else None
+    
+    def _structured_output_stats(self) -> Dict[str, Any]:
+        """How executive responses were parsed"""
+        with self._parse_lock:
+            counts = dict(self._parse_counts)
+        total = sum(counts.values())
+        return {
+            "enabled": self.structured_output_enabled,
+            "parsed": counts,
+            "fallback_rate": counts["fallback"] / total if total else 0.0
+        }
+    
     def _parse_fallback_response(self, content: str, executive_type: str) -> Dict[str, Any]:
         """Parse response when JSON parsing fails"""
         # Simple fallback parsing
@@ -1857,6 +5264,7 @@ Format your response as JSON:
             result_data = {
                 "confidence_score": response.confidence_score,
                 "response_time": response.response_time,
+                "total_tokens": response.token_usage.total_tokens,
                 "user_id": user_id,
                 "timestamp": response.timestamp.isoformat()
             }
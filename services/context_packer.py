@@ -0,0 +1,331 @@
+"""
+Document Context Packer
+
+Builds the document section of a decision prompt from ranked chunks. Instead of
+cutting every document to a fixed number of characters, the packer removes
+duplicate and overlapping chunks and then picks the set of chunks with the
+highest total relevance that fits an exact token budget.
+"""
+
+import logging
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+@dataclass
+class ContextChunk:
+    """Candidate piece of document context"""
+    content: str
+    score: float
+    chunk_id: str = ""
+    document_id: str = ""
+    chunk_index: int = 0
+    title: str = ""  # Rendered as a header, e.g. the document filename
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    
+    @classmethod
+    def from_search_result(cls, result: Any, title: str = "") -> "ContextChunk":
+        """Build a chunk from a vector SearchResult or an equivalent dict"""
+        get = result.get if isinstance(result, dict) else lambda name, default=None: getattr(result, name, default)
+        metadata = get("metadata") or {}
+        return cls(
+            content=get("content", "") or "",
+            score=float(get("similarity_score", get("score", 0.0)) or 0.0),
+            chunk_id=str(get("chunk_id", "") or ""),
+            document_id=str(get("document_id", "") or metadata.get("document_id", "")),
+            chunk_index=int(get("chunk_index", 0) or metadata.get("chunk_index", 0) or 0),
+            title=title or metadata.get("filename", ""),
+            metadata=metadata
+        )
+
+
+@dataclass
+class PackedContext:
+    """Chunks chosen for a prompt and the rendered document context"""
+    text: str
+    chunks: List[ContextChunk]
+    tokens: int
+    budget: int
+    candidates: int
+    duplicates: int = 0
+    trimmed_tokens: int = 0
+    
+    @property
+    def relevance(self) -> float:
+        return sum(chunk.score for chunk in self.chunks)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "chunks": len(self.chunks),
+            "tokens": self.tokens,
+            "budget": self.budget,
+            "candidates": self.candidates,
+            "duplicates": self.duplicates,
+            "trimmed_tokens": self.trimmed_tokens,
+            "relevance": round(self.relevance, 4)
+        }
+
+
+class ContextPacker:
+    """Selects the most relevant non-redundant chunks that fit a token budget"""
+    
+    def __init__(
+        self,
+        token_counter: Callable[[str], int],
+        separator: str = "\n\n",
+        duplicate_threshold: float = 0.8,
+        max_candidates: int = 40,
+        max_overlap_chars: int = 1000,
+        max_dp_cells: int = 500000,
+        min_fragment_tokens: int = 48
+    ):
+        """
+        Initialize the packer
+        
+        Args:
+            token_counter: Tokenizer for the target model, e.g. OpenAIClient.count_tokens
+            separator: Text placed between rendered chunks
+            duplicate_threshold: Shingle containment above which a lower-ranked
+                chunk counts as a duplicate of a higher-ranked one
+            max_candidates: Highest-ranked chunks considered for selection
+            max_overlap_chars: Longest shared boundary trimmed between adjacent chunks
+            max_dp_cells: Size cap for the selection table; token costs are
+                rounded up to coarser units beyond it
+            min_fragment_tokens: Smallest leftover budget worth filling with
+                the leading part of a chunk that does not fit whole
+        """
+        self.token_counter = token_counter
+        self.separator = separator
+        self.duplicate_threshold = duplicate_threshold
+        self.max_candidates = max_candidates
+        self.max_overlap_chars = max_overlap_chars
+        self.max_dp_cells = max_dp_cells
+        self.min_fragment_tokens = min_fragment_tokens
+        self.logger = logging.getLogger(__name__)
+    
+    def render_chunk(self, chunk: ContextChunk) -> str:
+        """Text of one chunk as it appears in the prompt"""
+        if chunk.title:
+            return f"[{chunk.title}]\n{chunk.content}"
+        return chunk.content
+    
+    def render(self, chunks: Sequence[ContextChunk]) -> str:
+        return self.separator.join(self.render_chunk(chunk) for chunk in chunks)
+    
+    def pack(self, chunks: Sequence[Any], budget: int) -> PackedContext:
+        """
+        Pack ranked chunks into a token budget
+        
+        Args:
+            chunks: ContextChunk, SearchResult or dict candidates, any order
+            budget: Maximum tokens for the rendered context
+        
+        Returns:
+            PackedContext whose text never exceeds the budget
+        """
+        candidates = [
+            chunk if isinstance(chunk, ContextChunk) else ContextChunk.from_search_result(chunk)
+            for chunk in chunks
+        ]
+        candidates = [chunk for chunk in candidates if chunk.content.strip()]
+        candidates.sort(key=lambda chunk: chunk.score, reverse=True)
+        total_candidates = len(candidates)
+        
+        unique, duplicates = self._deduplicate(candidates[:self.max_candidates])
+        if budget <= 0 or not unique:
+            return PackedContext("", [], 0, max(0, budget), total_candidates, duplicates)
+        
+        costs = [self._cost(chunk) for chunk in unique]
+        chosen = self._select(unique, costs, budget)
+        
+        # Drop text shared with an adjacent selected chunk, then spend the freed
+        # tokens on the best remaining candidates
+        selected, trimmed_tokens = self._trim_overlaps([unique[index] for index in chosen])
+        used = sum(self._cost(chunk) for chunk in selected)
+        remaining = sorted(
+            (index for index in range(len(unique)) if index not in chosen),
+            key=lambda index: unique[index].score / max(costs[index], 1),
+            reverse=True
+        )
+        fragment_candidate = None
+        for index in remaining:
+            if used + costs[index] <= budget:
+                selected.append(unique[index])
+                used += costs[index]
+            elif fragment_candidate is None or unique[index].score > unique[fragment_candidate].score:
+                fragment_candidate = index
+        
+        # A chunk too large for what is left contributes its leading part
+        if fragment_candidate is not None and budget - used >= self.min_fragment_tokens:
+            fragment = self._truncate(unique[fragment_candidate], budget - used)
+            if fragment is not None:
+                selected.append(fragment)
+        
+        ordered = self._reading_order(selected)
+        text = self.render(ordered)
+        tokens = self.token_counter(text) if text else 0
+        
+        # Tokenizers can merge across chunk boundaries; enforce the budget on the final text
+        while tokens > budget and ordered:
+            weakest = min(ordered, key=lambda chunk: chunk.score / max(self._cost(chunk), 1))
+            ordered.remove(weakest)
+            text = self.render(ordered)
+            tokens = self.token_counter(text) if text else 0
+        
+        return PackedContext(text, ordered, tokens, budget, total_candidates, duplicates, trimmed_tokens)
+    
+    def _truncate(self, chunk: ContextChunk, tokens: int):
+        """Longest word-boundary prefix of a chunk whose rendering fits the token count"""
+        words = chunk.content.split(" ")
+        
+        def fragment(word_count: int) -> ContextChunk:
+            return ContextChunk(
+                content=" ".join(words[:word_count]) + "...",
+                score=chunk.score,
+                chunk_id=chunk.chunk_id,
+                document_id=chunk.document_id,
+                chunk_index=chunk.chunk_index,
+                title=chunk.title,
+                metadata=chunk.metadata
+            )
+        
+        low, high = 0, len(words) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self._cost(fragment(middle)) <= tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return fragment(low) if low > 0 else None
+    
+    def _cost(self, chunk: ContextChunk) -> int:
+        return self.token_counter(self.render_chunk(chunk) + self.separator)
+    
+    def _select(self, chunks: List[ContextChunk], costs: List[int], budget: int) -> List[int]:
+        """0/1 knapsack maximizing total relevance within the budget; returns chunk indices"""
+        unit = max(1, math.ceil(len(chunks) * budget / self.max_dp_cells))
+        capacity = budget // unit
+        weights = [math.ceil(cost / unit) for cost in costs]
+        
+        # best[c] = (relevance, chosen bitmask) using at most c units
+        best = [(0.0, 0)] * (capacity + 1)
+        for index, (chunk, weight) in enumerate(zip(chunks, weights)):
+            if weight > capacity or chunk.score <= 0:
+                continue
+            bit = 1 << index
+            for c in range(capacity, weight - 1, -1):
+                value, mask = best[c - weight]
+                if value + chunk.score > best[c][0]:
+                    best[c] = (value + chunk.score, mask | bit)
+        
+        _, mask = best[capacity]
+        return [index for index in range(len(chunks)) if mask >> index & 1]
+    
+    def _deduplicate(self, chunks: List[ContextChunk]):
+        """Drop repeated chunks, keeping the highest-ranked copy"""
+        unique: List[ContextChunk] = []
+        shingles: List[set] = []
+        seen_ids = set()
+        duplicates = 0
+        
+        for chunk in chunks:
+            if chunk.chunk_id and chunk.chunk_id in seen_ids:
+                duplicates += 1
+                continue
+            chunk_shingles = self._shingles(chunk.content)
+            if any(self._containment(chunk_shingles, kept) >= self.duplicate_threshold for kept in shingles):
+                duplicates += 1
+                continue
+            if chunk.chunk_id:
+                seen_ids.add(chunk.chunk_id)
+            unique.append(chunk)
+            shingles.append(chunk_shingles)
+        
+        return unique, duplicates
+    
+    @staticmethod
+    def _shingles(text: str, size: int = 3) -> set:
+        words = _WORD_PATTERN.findall(text.lower())
+        if len(words) < size:
+            return {tuple(words)} if words else set()
+        return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+    
+    @staticmethod
+    def _containment(a: set, b: set) -> float:
+        if not a or not b:
+            return 0.0
+        return len(a & b) / min(len(a), len(b))
+    
+    def _trim_overlaps(self, chunks: List[ContextChunk]):
+        """Remove the text adjacent chunks of one document share at their boundary"""
+        by_document: Dict[str, List[ContextChunk]] = {}
+        for chunk in chunks:
+            if chunk.document_id:
+                by_document.setdefault(chunk.document_id, []).append(chunk)
+        
+        trimmed = {}
+        for document_chunks in by_document.values():
+            document_chunks.sort(key=lambda chunk: chunk.chunk_index)
+            for previous, current in zip(document_chunks, document_chunks[1:]):
+                if previous.chunk_index < 0 or current.chunk_index != previous.chunk_index + 1:
+                    continue
+                previous_text = trimmed.get(id(previous), previous.content)
+                overlap = self._boundary_overlap(previous_text, current.content)
+                if overlap:
+                    trimmed[id(current)] = current.content[overlap:].lstrip()
+        
+        result = []
+        trimmed_tokens = 0
+        for chunk in chunks:
+            content = trimmed.get(id(chunk))
+            if content is None:
+                result.append(chunk)
+                continue
+            trimmed_tokens += self._cost(chunk)
+            if content:
+                chunk = ContextChunk(
+                    content=content,
+                    score=chunk.score,
+                    chunk_id=chunk.chunk_id,
+                    document_id=chunk.document_id,
+                    chunk_index=chunk.chunk_index,
+                    title=chunk.title,
+                    metadata=chunk.metadata
+                )
+                trimmed_tokens -= self._cost(chunk)
+                result.append(chunk)
+        
+        return result, trimmed_tokens
+    
+    def _boundary_overlap(self, previous: str, current: str, probe_length: int = 24) -> int:
+        """Length of the longest suffix of previous that current starts with"""
+        probe = current[:probe_length]
+        if len(probe) < probe_length:
+            return 0
+        start = max(0, len(previous) - self.max_overlap_chars)
+        index = previous.find(probe, start)
+        while index != -1:
+            if current.startswith(previous[index:]):
+                return len(previous) - index
+            index = previous.find(probe, index + 1)
+        return 0
+    
+    @staticmethod
+    def _reading_order(chunks: List[ContextChunk]) -> List[ContextChunk]:
+        """Group chunks by document (best document first), each in document order"""
+        document_rank: Dict[str, float] = {}
+        for chunk in chunks:
+            key = chunk.document_id or chunk.chunk_id or str(id(chunk))
+            document_rank[key] = max(document_rank.get(key, 0.0), chunk.score)
+        
+        def sort_key(chunk: ContextChunk):
+            key = chunk.document_id or chunk.chunk_id or str(id(chunk))
+            return (-document_rank[key], key, chunk.chunk_index)
+        
+        return sorted(chunks, key=sort_key)
@@ -0,0 +1,787 @@
+"""
+Conversation Context Store
+
+Bounded storage for conversation contexts. The in-process store is an LRU
+with a byte cap and idle TTL, lock-striped for threaded workers; the SQLite
+and Redis stores are shared, so every worker sees the same conversation.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Redis client is only needed for the Redis backend
+HAS_REDIS = False
+redis = None
+try:
+    import redis
+    HAS_REDIS = True
+except ImportError:
+    pass
+
+# Raised by redis when a WATCHed key changes; catches nothing without redis
+_WATCH_ERROR = redis.WatchError if HAS_REDIS else ()
+
+logger = logging.getLogger(__name__)
+
+
+class ContextStoreError(Exception):
+    """Context store error"""
+    pass
+
+
+class ContextStore(MutableMapping):
+    """
+    Base class for conversation context storage
+    
+    Stores behave like a dict of context_id -> context, so existing callers
+    keep working, and add modify() for atomic read-modify-write updates.
+    """
+    
+    backend = "base"
+    
+    def modify(
+        self,
+        context_id: str,
+        func: Callable[[Any], None],
+        default_factory: Callable[[], Any] = None
+    ) -> Any:
+        """
+        Atomically load a context, apply func to it and store it back
+        
+        Args:
+            context_id: Conversation context identifier
+            func: Callable that mutates the context in place
+            default_factory: Creates the context when it does not exist
+        
+        Returns:
+            The updated context
+        """
+        raise NotImplementedError
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get store statistics"""
+        raise NotImplementedError
+    
+    def close(self):
+        """Release backend resources"""
+        pass
+
+
+@dataclass
+class _StoreEntry:
+    """Stored context with LRU bookkeeping"""
+    value: Any
+    size_bytes: int
+    last_access: float
+
+
+class _Stripe:
+    """One lock-protected LRU segment of a MemoryContextStore"""
+    
+    def __init__(self, max_bytes: int, max_entries: Optional[int]):
+        self.lock = threading.Lock()
+        self.entries: OrderedDict = OrderedDict()
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.capacity_evictions = 0
+        self.ttl_evictions = 0
+
+
+class MemoryContextStore(ContextStore):
+    """In-process LRU context store with a byte cap and idle TTL"""
+    
+    backend = "memory"
+    
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_entries: Optional[int] = None,
+        idle_ttl_seconds: float = 86400,
+        stripes: int = 16,
+        sizer: Callable[[Any], int] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Initialize the store
+        
+        Args:
+            max_bytes: Approximate memory cap across all stripes
+            max_entries: Optional cap on the number of contexts
+            idle_ttl_seconds: Contexts not accessed for this long are dropped
+            stripes: Number of independently locked LRU segments
+            sizer: Estimates a context's size in bytes
+            clock: Time source, replaceable in tests
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.sizer = sizer or _estimate_size
+        self.clock = clock
+        
+        stripes = max(1, stripes)
+        stripe_entries = max(1, max_entries // stripes) if max_entries else None
+        self._stripes = [
+            _Stripe(max(1, max_bytes // stripes), stripe_entries)
+            for _ in range(stripes)
+        ]
+    
+    def _stripe(self, context_id: str) -> _Stripe:
+        return self._stripes[hash(context_id) % len(self._stripes)]
+    
+    def _is_expired(self, entry: _StoreEntry, now: float) -> bool:
+        return bool(self.idle_ttl_seconds) and now - entry.last_access > self.idle_ttl_seconds
+    
+    def _lookup(self, stripe: _Stripe, context_id: str, now: float) -> Optional[_StoreEntry]:
+        """Find a live entry and mark it most recently used; caller holds the lock"""
+        entry = stripe.entries.get(context_id)
+        if entry is None:
+            return None
+        if self._is_expired(entry, now):
+            self._remove(stripe, context_id)
+            stripe.ttl_evictions += 1
+            return None
+        entry.last_access = now
+        stripe.entries.move_to_end(context_id)
+        return entry
+    
+    def _store(self, stripe: _Stripe, context_id: str, value: Any, now: float):
+        """Insert or replace an entry and enforce limits; caller holds the lock"""
+        size_bytes = self.sizer(value)
+        existing = stripe.entries.get(context_id)
+        if existing is not None:
+            stripe.total_bytes -= existing.size_bytes
+        stripe.entries[context_id] = _StoreEntry(value, size_bytes, now)
+        stripe.entries.move_to_end(context_id)
+        stripe.total_bytes += size_bytes
+        self._evict(stripe, now)
+    
+    def _evict(self, stripe: _Stripe, now: float):
+        """Drop idle entries, then least recently used ones over capacity"""
+        # Entries are in access order, so expired ones are at the front
+        while stripe.entries:
+            context_id, entry = next(iter(stripe.entries.items()))
+            if not self._is_expired(entry, now):
+                break
+            self._remove(stripe, context_id)
+            stripe.ttl_evictions += 1
+        
+        # Always keep the most recent entry, even if it alone exceeds the cap
+        while len(stripe.entries) > 1 and (
+            stripe.total_bytes > stripe.max_bytes or
+            (stripe.max_entries is not None and len(stripe.entries) > stripe.max_entries)
+        ):
+            context_id = next(iter(stripe.entries))
+            self._remove(stripe, context_id)
+            stripe.capacity_evictions += 1
+    
+    def _remove(self, stripe: _Stripe, context_id: str) -> _StoreEntry:
+        entry = stripe.entries.pop(context_id)
+        stripe.total_bytes -= entry.size_bytes
+        return entry
+    
+    def __getitem__(self, context_id: str) -> Any:
+        stripe = self._stripe(context_id)
+        with stripe.lock:
+            entry = self._lookup(stripe, context_id, self.clock())
+            if entry is None:
+                stripe.misses += 1
+                raise KeyError(context_id)
+            stripe.hits += 1
+            return entry.value
+    
+    def __setitem__(self, context_id: str, value: Any):
+        stripe = self._stripe(context_id)
+        with stripe.lock:
+            self._store(stripe, context_id, value, self.clock())
+    
+    def __delitem__(self, context_id: str):
+        stripe = self._stripe(context_id)
+        with stripe.lock:
+            if context_id not in stripe.entries:
+                raise KeyError(context_id)
+            self._remove(stripe, context_id)
+    
+    def __contains__(self, context_id: object) -> bool:
+        stripe = self._stripe(context_id)
+        with stripe.lock:
+            entry = stripe.entries.get(context_id)
+            return entry is not None and not self._is_expired(entry, self.clock())
+    
+    def __iter__(self) -> Iterator[str]:
+        # Snapshot keys so callers may delete while iterating
+        keys: List[str] = []
+        for stripe in self._stripes:
+            with stripe.lock:
+                keys.extend(stripe.entries.keys())
+        return iter(keys)
+    
+    def __len__(self) -> int:
+        return sum(len(stripe.entries) for stripe in self._stripes)
+    
+    def modify(
+        self,
+        context_id: str,
+        func: Callable[[Any], None],
+        default_factory: Callable[[], Any] = None
+    ) -> Any:
+        """Atomically load, mutate and re-store a context under its stripe lock"""
+        stripe = self._stripe(context_id)
+        with stripe.lock:
+            now = self.clock()
+            entry = self._lookup(stripe, context_id, now)
+            if entry is not None:
+                stripe.hits += 1
+                value = entry.value
+            elif default_factory is not None:
+                stripe.misses += 1
+                value = default_factory()
+            else:
+                stripe.misses += 1
+                raise KeyError(context_id)
+            
+            func(value)
+            # Re-store so the size estimate tracks the grown context
+            self._store(stripe, context_id, value, now)
+            return value
+    
+    def sweep_expired(self) -> int:
+        """
+        Remove every idle entry
+        
+        Returns:
+            Number of entries removed
+        """
+        removed = 0
+        now = self.clock()
+        for stripe in self._stripes:
+            with stripe.lock:
+                expired = [
+                    context_id for context_id, entry in stripe.entries.items()
+                    if self._is_expired(entry, now)
+                ]
+                for context_id in expired:
+                    self._remove(stripe, context_id)
+                stripe.ttl_evictions += len(expired)
+                removed += len(expired)
+        return removed
+    
+    def clear(self):
+        for stripe in self._stripes:
+            with stripe.lock:
+                stripe.entries.clear()
+                stripe.total_bytes = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get store statistics"""
+        hits = misses = capacity_evictions = ttl_evictions = 0
+        entries = total_bytes = 0
+        for stripe in self._stripes:
+            with stripe.lock:
+                hits += stripe.hits
+                misses += stripe.misses
+                capacity_evictions += stripe.capacity_evictions
+                ttl_evictions += stripe.ttl_evictions
+                entries += len(stripe.entries)
+                total_bytes += stripe.total_bytes
+        
+        lookups = hits + misses
+        return {
+            "backend": self.backend,
+            "entries": entries,
+            "bytes": total_bytes,
+            "max_bytes": self.max_bytes,
+            "max_entries": self.max_entries,
+            "idle_ttl_seconds": self.idle_ttl_seconds,
+            "stripes": len(self._stripes),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "evictions": capacity_evictions + ttl_evictions,
+            "capacity_evictions": capacity_evictions,
+            "ttl_evictions": ttl_evictions
+        }
+
+
+class SQLiteContextStore(ContextStore):
+    """Context store in a SQLite file shared by all workers on a host"""
+    
+    backend = "sqlite"
+    
+    def __init__(
+        self,
+        path: str,
+        encoder: Callable[[Any], Dict[str, Any]],
+        decoder: Callable[[Dict[str, Any]], Any],
+        max_entries: Optional[int] = 100000,
+        idle_ttl_seconds: float = 86400,
+        evict_interval: int = 100,
+        timeout: float = 30.0,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Initialize the store
+        
+        Args:
+            path: SQLite database file
+            encoder: Converts a context to a JSON-serializable dict
+            decoder: Rebuilds a context from that dict
+            max_entries: Cap on stored contexts, least recently used go first
+            idle_ttl_seconds: Contexts not accessed for this long are dropped
+            evict_interval: Enforce limits every N writes
+            timeout: Seconds to wait for another worker's write lock
+            clock: Time source, replaceable in tests
+        """
+        self.path = path
+        self.encoder = encoder
+        self.decoder = decoder
+        self.max_entries = max_entries
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.evict_interval = max(1, evict_interval)
+        self.timeout = timeout
+        self.clock = clock
+        
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.capacity_evictions = 0
+        self.ttl_evictions = 0
+        
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversation_contexts ("
+            "context_id TEXT PRIMARY KEY, "
+            "payload BLOB NOT NULL, "
+            "size_bytes INTEGER NOT NULL, "
+            "last_access REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_conversation_contexts_last_access "
+            "ON conversation_contexts (last_access)"
+        )
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread connection; sqlite3 connections are not shared across threads"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    def _encode(self, value: Any) -> bytes:
+        return zlib.compress(json.dumps(self.encoder(value), default=str).encode("utf-8"))
+    
+    def _decode(self, payload: bytes) -> Any:
+        return self.decoder(json.loads(zlib.decompress(payload).decode("utf-8")))
+    
+    def _cutoff(self, now: float) -> float:
+        return now - self.idle_ttl_seconds if self.idle_ttl_seconds else float("-inf")
+    
+    def _count(self, counter: str, amount: int = 1):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+    
+    def _load(self, conn: sqlite3.Connection, context_id: str, now: float) -> Optional[Any]:
+        row = conn.execute(
+            "SELECT payload, last_access FROM conversation_contexts WHERE context_id = ?",
+            (context_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] < self._cutoff(now):
+            conn.execute("DELETE FROM conversation_contexts WHERE context_id = ?", (context_id,))
+            self._count("ttl_evictions")
+            return None
+        return self._decode(row[0])
+    
+    def _write(self, conn: sqlite3.Connection, context_id: str, value: Any, now: float):
+        payload = self._encode(value)
+        conn.execute(
+            "INSERT OR REPLACE INTO conversation_contexts "
+            "(context_id, payload, size_bytes, last_access) VALUES (?, ?, ?, ?)",
+            (context_id, payload, len(payload), now)
+        )
+    
+    def _after_write(self):
+        with self._stats_lock:
+            self._writes += 1
+            due = self._writes % self.evict_interval == 0
+        if due:
+            self.enforce_limits()
+    
+    def enforce_limits(self):
+        """Drop idle contexts, then least recently used ones beyond max_entries"""
+        conn = self._connection()
+        now = self.clock()
+        expired = conn.execute(
+            "DELETE FROM conversation_contexts WHERE last_access < ?",
+            (self._cutoff(now),)
+        ).rowcount
+        if expired:
+            self._count("ttl_evictions", expired)
+        
+        if self.max_entries:
+            evicted = conn.execute(
+                "DELETE FROM conversation_contexts WHERE context_id IN ("
+                "SELECT context_id FROM conversation_contexts "
+                "ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+            if evicted:
+                self._count("capacity_evictions", evicted)
+    
+    def __getitem__(self, context_id: str) -> Any:
+        conn = self._connection()
+        now = self.clock()
+        value = self._load(conn, context_id, now)
+        if value is None:
+            self._count("misses")
+            raise KeyError(context_id)
+        conn.execute(
+            "UPDATE conversation_contexts SET last_access = ? WHERE context_id = ?",
+            (now, context_id)
+        )
+        self._count("hits")
+        return value
+    
+    def __setitem__(self, context_id: str, value: Any):
+        self._write(self._connection(), context_id, value, self.clock())
+        self._after_write()
+    
+    def __delitem__(self, context_id: str):
+        deleted = self._connection().execute(
+            "DELETE FROM conversation_contexts WHERE context_id = ?", (context_id,)
+        ).rowcount
+        if not deleted:
+            raise KeyError(context_id)
+    
+    def __contains__(self, context_id: object) -> bool:
+        row = self._connection().execute(
+            "SELECT 1 FROM conversation_contexts WHERE context_id = ? AND last_access >= ?",
+            (context_id, self._cutoff(self.clock()))
+        ).fetchone()
+        return row is not None
+    
+    def __iter__(self) -> Iterator[str]:
+        rows = self._connection().execute(
+            "SELECT context_id FROM conversation_contexts WHERE last_access >= ?",
+            (self._cutoff(self.clock()),)
+        ).fetchall()
+        return iter([row[0] for row in rows])
+    
+    def __len__(self) -> int:
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM conversation_contexts WHERE last_access >= ?",
+            (self._cutoff(self.clock()),)
+        ).fetchone()[0]
+    
+    def modify(
+        self,
+        context_id: str,
+        func: Callable[[Any], None],
+        default_factory: Callable[[], Any] = None
+    ) -> Any:
+        """Load, mutate and write back a context inside one write transaction"""
+        conn = self._connection()
+        # BEGIN IMMEDIATE takes the write lock up front, serializing workers
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = self.clock()
+            value = self._load(conn, context_id, now)
+            if value is not None:
+                self._count("hits")
+            elif default_factory is not None:
+                self._count("misses")
+                value = default_factory()
+            else:
+                self._count("misses")
+                raise KeyError(context_id)
+            
+            func(value)
+            self._write(conn, context_id, value, now)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        
+        self._after_write()
+        return value
+    
+    def clear(self):
+        self._connection().execute("DELETE FROM conversation_contexts")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get store statistics (hit and eviction counters are per process)"""
+        row = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM conversation_contexts"
+        ).fetchone()
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.backend,
+                "path": self.path,
+                "entries": row[0],
+                "bytes": row[1],
+                "max_entries": self.max_entries,
+                "idle_ttl_seconds": self.idle_ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.capacity_evictions + self.ttl_evictions,
+                "capacity_evictions": self.capacity_evictions,
+                "ttl_evictions": self.ttl_evictions
+            }
+    
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.ProgrammingError:
+                    # Connection belongs to another, already finished thread
+                    pass
+            self._connections = []
+        self._local = threading.local()
+
+
+class RedisContextStore(ContextStore):
+    """
+    Context store in Redis (or any Redis-protocol server)
+    
+    Idle TTL is a key expiry refreshed on access; the memory cap is the
+    server's maxmemory with an LRU eviction policy.
+    """
+    
+    backend = "redis"
+    
+    def __init__(
+        self,
+        encoder: Callable[[Any], Dict[str, Any]],
+        decoder: Callable[[Dict[str, Any]], Any],
+        client: Any = None,
+        url: str = "redis://localhost:6379/0",
+        key_prefix: str = "ai_context:",
+        idle_ttl_seconds: int = 86400,
+        max_retries: int = 10
+    ):
+        """
+        Initialize the store
+        
+        Args:
+            encoder: Converts a context to a JSON-serializable dict
+            decoder: Rebuilds a context from that dict
+            client: Existing redis client; created from url when omitted
+            url: Redis connection URL
+            key_prefix: Namespace for context keys
+            idle_ttl_seconds: Key expiry, refreshed on every access
+            max_retries: Optimistic-lock retries for modify()
+        """
+        if client is None:
+            if not HAS_REDIS:
+                raise ContextStoreError("redis package is required for the Redis context store")
+            client = redis.Redis.from_url(url)
+        
+        self.client = client
+        self.encoder = encoder
+        self.decoder = decoder
+        self.key_prefix = key_prefix
+        self.idle_ttl_seconds = int(idle_ttl_seconds) if idle_ttl_seconds else None
+        self.max_retries = max_retries
+        
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.conflicts = 0
+    
+    def _key(self, context_id: str) -> str:
+        return f"{self.key_prefix}{context_id}"
+    
+    def _encode(self, value: Any) -> bytes:
+        return zlib.compress(json.dumps(self.encoder(value), default=str).encode("utf-8"))
+    
+    def _decode(self, payload: bytes) -> Any:
+        return self.decoder(json.loads(zlib.decompress(payload).decode("utf-8")))
+    
+    def _count(self, counter: str):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+    
+    def __getitem__(self, context_id: str) -> Any:
+        key = self._key(context_id)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(key)
+        if self.idle_ttl_seconds:
+            pipe.expire(key, self.idle_ttl_seconds)
+        payload = pipe.execute()[0]
+        if payload is None:
+            self._count("misses")
+            raise KeyError(context_id)
+        self._count("hits")
+        return self._decode(payload)
+    
+    def __setitem__(self, context_id: str, value: Any):
+        self.client.set(self._key(context_id), self._encode(value), ex=self.idle_ttl_seconds)
+    
+    def __delitem__(self, context_id: str):
+        if not self.client.delete(self._key(context_id)):
+            raise KeyError(context_id)
+    
+    def __contains__(self, context_id: object) -> bool:
+        return bool(self.client.exists(self._key(context_id)))
+    
+    def __iter__(self) -> Iterator[str]:
+        prefix_length = len(self.key_prefix)
+        for key in self.client.scan_iter(match=f"{self.key_prefix}*"):
+            if isinstance(key, bytes):
+                key = key.decode("utf-8")
+            yield key[prefix_length:]
+    
+    def __len__(self) -> int:
+        return sum(1 for _ in self.client.scan_iter(match=f"{self.key_prefix}*"))
+    
+    def modify(
+        self,
+        context_id: str,
+        func: Callable[[Any], None],
+        default_factory: Callable[[], Any] = None
+    ) -> Any:
+        """Load, mutate and write back a context with WATCH/MULTI optimistic locking"""
+        key = self._key(context_id)
+        for _ in range(self.max_retries):
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(key)
+                    payload = pipe.get(key)
+                    if payload is not None:
+                        value = self._decode(payload)
+                    elif default_factory is not None:
+                        value = default_factory()
+                    else:
+                        self._count("misses")
+                        raise KeyError(context_id)
+                    
+                    func(value)
+                    pipe.multi()
+                    pipe.set(key, self._encode(value), ex=self.idle_ttl_seconds)
+                    pipe.execute()
+                    self._count("hits" if payload is not None else "misses")
+                    return value
+                except _WATCH_ERROR:
+                    # Another worker changed the context; retry on fresh state
+                    self._count("conflicts")
+        
+        raise ContextStoreError(f"Too many concurrent updates to context {context_id}")
+    
+    def clear(self):
+        keys = list(self.client.scan_iter(match=f"{self.key_prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get store statistics, including server-side eviction counters"""
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "backend": self.backend,
+                "key_prefix": self.key_prefix,
+                "idle_ttl_seconds": self.idle_ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "conflicts": self.conflicts
+            }
+        
+        try:
+            server_stats = self.client.info("stats")
+            stats["capacity_evictions"] = server_stats.get("evicted_keys", 0)
+            stats["ttl_evictions"] = server_stats.get("expired_keys", 0)
+            stats["evictions"] = stats["capacity_evictions"] + stats["ttl_evictions"]
+        except Exception as e:
+            logger.warning(f"Could not read Redis eviction stats: {e}")
+        
+        return stats
+    
+    def close(self):
+        try:
+            self.client.close()
+        except Exception as e:
+            logger.warning(f"Error closing Redis client: {e}")
+
+
+def _estimate_size(value: Any) -> int:
+    """Estimate a stored value's memory footprint in bytes"""
+    estimate_size = getattr(value, "estimate_size", None)
+    if callable(estimate_size):
+        return estimate_size()
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 1024
+
+
+def create_context_store(
+    config: Dict[str, Any],
+    encoder: Callable[[Any], Dict[str, Any]],
+    decoder: Callable[[Dict[str, Any]], Any]
+) -> ContextStore:
+    """
+    Create a context store from configuration
+    
+    Args:
+        config: Store configuration; 'backend' is 'memory', 'sqlite' or 'redis'
+        encoder: Converts a context to a JSON-serializable dict
+        decoder: Rebuilds a context from that dict
+    
+    Returns:
+        Configured ContextStore
+    """
+    backend = config.get('backend', 'memory')
+    idle_ttl_seconds = config.get('idle_ttl_seconds', 86400)
+    
+    if backend == 'memory':
+        return MemoryContextStore(
+            max_bytes=config.get('max_bytes', 64 * 1024 * 1024),
+            max_entries=config.get('max_entries'),
+            idle_ttl_seconds=idle_ttl_seconds,
+            stripes=config.get('stripes', 16)
+        )
+    if backend == 'sqlite':
+        return SQLiteContextStore(
+            path=config.get('path', 'data/conversation_contexts.db'),
+            encoder=encoder,
+            decoder=decoder,
+            max_entries=config.get('max_entries', 100000),
+            idle_ttl_seconds=idle_ttl_seconds
+        )
+    if backend == 'redis':
+        return RedisContextStore(
+            encoder=encoder,
+            decoder=decoder,
+            url=config.get('url', os.getenv('REDIS_URL', 'redis://localhost:6379/0')),
+            key_prefix=config.get('key_prefix', 'ai_context:'),
+            idle_ttl_seconds=idle_ttl_seconds
+        )
+    
+    raise ContextStoreError(f"Unknown context store backend: {backend}")
@@ -0,0 +1,254 @@
+"""
+Decision Similarity Index
+
+In-memory nearest-neighbour index over embeddings of past decisions
+(context plus decision text), used to offer a prior decision when a user
+asks nearly the same question again. Vectors are unit-length float32 rows
+of one matrix, so a lookup is a single matrix-vector product; lookups
+scoped to one user only touch that user's rows.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DecisionMatch:
+    """Indexed decision close to a query"""
+    decision_id: int
+    similarity: float
+    user_id: Optional[str] = None
+    executive_type: Optional[str] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "decision_id": self.decision_id,
+            "similarity": round(self.similarity, 4),
+            "user_id": self.user_id,
+            "executive_type": self.executive_type
+        }
+
+
+def normalize_vector(embedding: Sequence[float]) -> np.ndarray:
+    """Unit-length float32 copy of an embedding, so cosine similarity is a dot product"""
+    vector = np.asarray(embedding, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector.copy()
+
+
+def encode_vector(embedding: Sequence[float]) -> bytes:
+    """Serialize an embedding as unit-length float32 bytes for storage"""
+    return normalize_vector(embedding).tobytes()
+
+
+def decode_vector(payload: bytes) -> np.ndarray:
+    return np.frombuffer(payload, dtype=np.float32)
+
+
+class DecisionIndex:
+    """Exact cosine-similarity index of decision embeddings"""
+    
+    def __init__(self, dimensions: int = None, initial_capacity: int = 1024):
+        """
+        Initialize the index
+        
+        Args:
+            dimensions: Embedding size; taken from the first vector added when omitted
+            initial_capacity: Rows allocated up front; the matrix doubles as it fills
+        """
+        self.dimensions = dimensions
+        self._capacity = max(1, initial_capacity)
+        self._vectors: Optional[np.ndarray] = None
+        self._ids = np.zeros(self._capacity, dtype=np.int64)
+        self._users: List[Optional[str]] = []
+        self._executives: List[Optional[str]] = []
+        self._size = 0
+        self._positions: Dict[int, int] = {}  # decision_id -> row
+        self._rows_by_user: Dict[str, set] = {}
+        self._lock = threading.RLock()
+        self.logger = logging.getLogger(__name__)
+        
+        # Counters
+        self.lookups = 0
+        self.lookup_seconds = 0.0
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def __contains__(self, decision_id: int) -> bool:
+        return decision_id in self._positions
+    
+    def _ensure_capacity(self, rows: int):
+        if self._vectors is None:
+            self._vectors = np.zeros((self._capacity, self.dimensions), dtype=np.float32)
+        if rows <= self._capacity:
+            return
+        capacity = self._capacity
+        while capacity < rows:
+            capacity *= 2
+        vectors = np.zeros((capacity, self.dimensions), dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[:self._size] = self._ids[:self._size]
+        self._vectors, self._ids, self._capacity = vectors, ids, capacity
+    
+    def add(self, decision_id: int, embedding: Sequence[float], user_id: Any = None, executive_type: str = None):
+        """
+        Add a decision, replacing its earlier vector if already indexed
+        
+        Args:
+            decision_id: Decision primary key
+            embedding: Embedding of the decision's context and text
+            user_id: Owner, used to scope lookups
+            executive_type: Executive that made the decision
+        """
+        vector = normalize_vector(embedding)
+        user = str(user_id) if user_id is not None else None
+        with self._lock:
+            if self.dimensions is None:
+                self.dimensions = vector.shape[0]
+            if vector.shape[0] != self.dimensions:
+                raise ValueError(f"Expected {self.dimensions}-dimensional embedding, got {vector.shape[0]}")
+            
+            row = self._positions.get(decision_id)
+            if row is None:
+                self._ensure_capacity(self._size + 1)
+                row = self._size
+                self._size += 1
+                self._users.append(user)
+                self._executives.append(executive_type)
+                self._positions[decision_id] = row
+            else:
+                self._rows_by_user.get(self._users[row], set()).discard(row)
+                self._users[row] = user
+                self._executives[row] = executive_type
+            
+            self._vectors[row] = vector
+            self._ids[row] = decision_id
+            self._rows_by_user.setdefault(user, set()).add(row)
+    
+    def remove(self, decision_id: int) -> bool:
+        """Drop a decision; the last row moves into its slot"""
+        with self._lock:
+            row = self._positions.pop(decision_id, None)
+            if row is None:
+                return False
+            last = self._size - 1
+            self._rows_by_user[self._users[row]].discard(row)
+            if row != last:
+                moved_id = int(self._ids[last])
+                moved_user = self._users[last]
+                self._vectors[row] = self._vectors[last]
+                self._ids[row] = moved_id
+                self._users[row] = moved_user
+                self._executives[row] = self._executives[last]
+                self._positions[moved_id] = row
+                self._rows_by_user[moved_user].discard(last)
+                self._rows_by_user[moved_user].add(row)
+            self._users.pop()
+            self._executives.pop()
+            self._size = last
+            return True
+    
+    def count(self, user_id: Any = None) -> int:
+        """Indexed decisions, optionally only one user's"""
+        with self._lock:
+            if user_id is None:
+                return self._size
+            return len(self._rows_by_user.get(str(user_id), ()))
+    
+    def search(
+        self,
+        embedding: Sequence[float],
+        k: int = 5,
+        user_id: Any = None,
+        executive_type: str = None,
+        min_similarity: float = -1.0
+    ) -> List[DecisionMatch]:
+        """
+        Find the decisions most similar to an embedding
+        
+        Args:
+            embedding: Query embedding
+            k: Maximum matches
+            user_id: Only match this user's decisions
+            executive_type: Only match this executive's decisions
+            min_similarity: Drop matches below this cosine similarity
+        
+        Returns:
+            Matches, most similar first
+        """
+        query = normalize_vector(embedding)
+        with self._lock:
+            start = time.perf_counter()
+            try:
+                if self._size == 0 or k <= 0 or query.shape[0] != self.dimensions:
+                    return []
+                
+                if user_id is not None:
+                    rows = self._rows_by_user.get(str(user_id))
+                    if not rows:
+                        return []
+                    rows = np.fromiter(rows, dtype=np.int64, count=len(rows))
+                    scores = self._vectors[rows] @ query
+                else:
+                    rows = None
+                    scores = self._vectors[:self._size] @ query
+                
+                if executive_type is not None:
+                    candidates = rows if rows is not None else range(self._size)
+                    mask = np.fromiter(
+                        (self._executives[row] == executive_type for row in candidates),
+                        dtype=bool,
+                        count=len(scores)
+                    )
+                    scores = np.where(mask, scores, -np.inf)
+                
+                k = min(k, len(scores))
+                top = np.argpartition(-scores, k - 1)[:k]
+                top = top[np.argsort(-scores[top], kind="stable")]
+                
+                matches = []
+                for index in top:
+                    similarity = float(scores[index])
+                    if not np.isfinite(similarity) or similarity < min_similarity:
+                        continue
+                    row = int(rows[index]) if rows is not None else int(index)
+                    matches.append(DecisionMatch(
+                        decision_id=int(self._ids[row]),
+                        similarity=similarity,
+                        user_id=self._users[row],
+                        executive_type=self._executives[row]
+                    ))
+                return matches
+            finally:
+                self.lookups += 1
+                self.lookup_seconds += time.perf_counter() - start
+    
+    def clear(self):
+        """Remove all decisions"""
+        with self._lock:
+            self._size = 0
+            self._positions.clear()
+            self._rows_by_user.clear()
+            self._users.clear()
+            self._executives.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index statistics"""
+        with self._lock:
+            return {
+                "decisions": self._size,
+                "users": sum(1 for rows in self._rows_by_user.values() if rows),
+                "dimensions": self.dimensions,
+                "memory_bytes": int(self._vectors.nbytes) if self._vectors is not None else 0,
+                "lookups": self.lookups,
+                "avg_lookup_ms": self.lookup_seconds / self.lookups * 1000 if self.lookups else 0.0
+            }
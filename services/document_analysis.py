@@ -27,6 +27,8 @@ try:
 except ImportError:
     HAS_OPENAI = False
 
+from services.openai_clients import get_openai_client
+
 logger = logging.getLogger(__name__)
 
 
@@ -148,7 +150,12 @@ class DocumentAnalysisService:
         
         # Initialize OpenAI client
         if self.openai_api_key and HAS_OPENAI:
-            self.openai_client = OpenAI(api_key=self.openai_api_key)
+            self.openai_client = get_openai_client(
+                'analysis',
+                api_key=self.openai_api_key,
+                timeout=config.get('analysis_timeout'),
+                client_class=OpenAI
+            )
             self.logger.info("OpenAI client initialized for document analysis")
         else:
             self.openai_client = None
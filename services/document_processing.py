@@ -41,6 +41,13 @@ import re
 
 logger = logging.getLogger(__name__)
 
+# Embedding and chunking settings passed through to the vector service when configured
+VECTOR_SERVICE_OPTIONS = (
+    'chunk_size', 'chunk_overlap', 'embedding_timeout', 'embedding_batch_tokens',
+    'embedding_batch_size', 'embedding_concurrency', 'embedding_max_retries', 'embedding_cache',
+    'vector_backend', 'vector_index', 'lexical_index', 'search_mode', 'rrf_k', 'hybrid_candidates', 'lexical_fallback'
+)
+
 
 class DocumentType(Enum):
     """Document type classifications"""
@@ -304,18 +311,7 @@ class DocumentProcessingService:
         self.logger.info(f"Extracting context from document {document_id} for query: {query[:100]}")
         
         try:
-            # Import here to avoid circular imports
-            from services.vector_database import VectorDatabaseService
-            
-            # Get vector database configuration
-            vector_config = {
-                'openai_api_key': self.config.get('openai_api_key'),
-                'embedding_model': self.config.get('embedding_model', 'text-embedding-3-small'),
-                'chroma_path': self.config.get('chroma_path', './chroma_db'),
-                'collection_name': self.config.get('collection_name', 'ai_executive_documents')
-            }
-            
-            vector_service = VectorDatabaseService(vector_config)
+            vector_service = self._get_vector_service()
             
             # Search for relevant context
             search_results = vector_service.get_document_context(
@@ -372,18 +368,7 @@ class DocumentProcessingService:
         self.logger.info(f"Searching documents for query: {query[:100]}")
         
         try:
-            # Import here to avoid circular imports
-            from services.vector_database import VectorDatabaseService
-            
-            # Get vector database configuration
-            vector_config = {
-                'openai_api_key': self.config.get('openai_api_key'),
-                'embedding_model': self.config.get('embedding_model', 'text-embedding-3-small'),
-                'chroma_path': self.config.get('chroma_path', './chroma_db'),
-                'collection_name': self.config.get('collection_name', 'ai_executive_documents')
-            }
-            
-            vector_service = VectorDatabaseService(vector_config)
+            vector_service = self._get_vector_service()
             
             # Build metadata filter
             metadata_filter = {}
@@ -1030,21 +1015,28 @@ class DocumentProcessingService:
             
             return DocumentType.OTHER
     
+    def _get_vector_service(self):
+        """Shared vector service for the configured ChromaDB path and collection"""
+        # Import here to avoid circular imports
+        from services.vector_database import get_vector_database_service
+        
+        # Get vector database configuration
+        vector_config = {
+            'openai_api_key': self.config.get('openai_api_key'),
+            'embedding_model': self.config.get('embedding_model', 'text-embedding-3-small'),
+            'chroma_path': self.config.get('chroma_path', './chroma_db'),
+            'collection_name': self.config.get('collection_name', 'ai_executive_documents')
+        }
+        for key in VECTOR_SERVICE_OPTIONS:
+            if key in self.config:
+                vector_config[key] = self.config[key]
+        
+        return get_vector_database_service(vector_config)
+    
     def _generate_embeddings(self, document: Document) -> str:
         """Generate vector embeddings for document using vector database service"""
         try:
-            # Import here to avoid circular imports
-            from services.vector_database import VectorDatabaseService
-            
-            # Get vector database configuration
-            vector_config = {
-                'openai_api_key': self.config.get('openai_api_key'),
-                'embedding_model': self.config.get('embedding_model', 'text-embedding-3-small'),
-                'chroma_path': self.config.get('chroma_path', './chroma_db'),
-                'collection_name': self.config.get('collection_name', 'ai_executive_documents')
-            }
-            
-            vector_service = VectorDatabaseService(vector_config)
+            vector_service = self._get_vector_service()
             
             # Create embeddings for the document
             chunk_ids = vector_service.create_document_embeddings(
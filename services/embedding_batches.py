@@ -0,0 +1,225 @@
+"""
+Embedding Batches
+
+Packs texts into multi-input embeddings requests sized by a token budget and
+sends the requests with bounded concurrency. Embeddings come back in input
+order, and a failed request is retried on its own without resending the
+batches that succeeded.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# OpenAI accepts at most this many inputs in one embeddings request
+MAX_INPUTS_PER_REQUEST = 2048
+
+
+@dataclass
+class EmbeddingBatch:
+    """Consecutive texts sent in one embeddings request"""
+    start: int  # Index of the first text in the caller's list
+    texts: List[str]
+    tokens: int
+    
+    @property
+    def end(self) -> int:
+        return self.start + len(self.texts)
+
+
+class EmbeddingBatchError(Exception):
+    """Embedding batches that still failed after their retries"""
+    
+    def __init__(self, message: str, failed_batches: List[EmbeddingBatch], cause: Exception):
+        super().__init__(message)
+        self.failed_batches = failed_batches
+        self.cause = cause
+
+
+def plan_embedding_batches(
+    texts: List[str],
+    count_tokens: Callable[[str], int],
+    max_batch_tokens: int = 20000,
+    max_batch_inputs: int = 256
+) -> List[EmbeddingBatch]:
+    """
+    Split texts into consecutive batches within a token budget
+    
+    Args:
+        texts: Texts to embed, in order
+        count_tokens: Token counter for the embedding model
+        max_batch_tokens: Token budget per request; a longer text is sent alone
+        max_batch_inputs: Maximum texts per request
+    
+    Returns:
+        Batches covering the texts in order
+    """
+    max_batch_inputs = max(1, min(max_batch_inputs, MAX_INPUTS_PER_REQUEST))
+    batches = []
+    current: List[str] = []
+    current_tokens = 0
+    start = 0
+    
+    for index, text in enumerate(texts):
+        tokens = count_tokens(text)
+        if current and (current_tokens + tokens > max_batch_tokens or len(current) >= max_batch_inputs):
+            batches.append(EmbeddingBatch(start, current, current_tokens))
+            start, current, current_tokens = index, [], 0
+        current.append(text)
+        current_tokens += tokens
+    
+    if current:
+        batches.append(EmbeddingBatch(start, current, current_tokens))
+    return batches
+
+
+class EmbeddingBatcher:
+    """Embeds many texts with batched, concurrent requests"""
+    
+    def __init__(
+        self,
+        embed_batch: Callable[[List[str]], List[List[float]]],
+        count_tokens: Callable[[str], int],
+        max_batch_tokens: int = 20000,
+        max_batch_inputs: int = 256,
+        concurrency: int = 4,
+        max_retries: int = 3,
+        retry_delay: float = 1.0,
+        retryable: Callable[[Exception], bool] = None,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Initialize the batcher
+        
+        Args:
+            embed_batch: Sends one embeddings request and returns one vector per text, in order
+            count_tokens: Token counter for the embedding model
+            max_batch_tokens: Token budget per request
+            max_batch_inputs: Maximum texts per request
+            concurrency: Maximum requests in flight
+            max_retries: Retry rounds for failed batches before giving up
+            retry_delay: Delay before the first retry round, doubled for each further round
+            retryable: Whether an error is worth retrying (defaults to every error)
+            sleep: Sleep function, replaceable in tests
+        """
+        self.embed_batch = embed_batch
+        self.count_tokens = count_tokens
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_inputs = max_batch_inputs
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.retryable = retryable or (lambda error: True)
+        self.sleep = sleep
+        self.logger = logging.getLogger(__name__)
+        
+        # Metrics
+        self._lock = threading.Lock()
+        self.texts_embedded = 0
+        self.requests = 0
+        self.retried_batches = 0
+        self.failed_batches = 0
+        self.tokens = 0
+        self.seconds = 0.0
+    
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts in as few requests as the token budget allows
+        
+        Args:
+            texts: Texts to embed
+        
+        Returns:
+            One embedding per text, in input order
+        
+        Raises:
+            EmbeddingBatchError: If a batch fails with a non-retryable error or
+                is still failing after max_retries retry rounds
+        """
+        if not texts:
+            return []
+        
+        start_time = time.time()
+        batches = plan_embedding_batches(texts, self.count_tokens, self.max_batch_tokens, self.max_batch_inputs)
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        
+        pending = batches
+        attempt = 0
+        while pending:
+            failures = self._send(pending, embeddings)
+            if not failures:
+                break
+            
+            attempt += 1
+            fatal = [(batch, error) for batch, error in failures if not self.retryable(error)]
+            if fatal or attempt > self.max_retries:
+                batch, error = (fatal or failures)[0]
+                with self._lock:
+                    self.failed_batches += len(failures)
+                raise EmbeddingBatchError(
+                    f"{len(failures)} of {len(batches)} embedding batches failed: {error}",
+                    [batch for batch, _ in failures],
+                    error
+                ) from error
+            
+            delay = self.retry_delay * 2 ** (attempt - 1)
+            self.logger.warning(
+                f"Retrying {len(failures)} of {len(batches)} embedding batches in {delay:.1f}s: {failures[0][1]}"
+            )
+            with self._lock:
+                self.retried_batches += len(failures)
+            self.sleep(delay)
+            pending = [batch for batch, _ in failures]
+        
+        with self._lock:
+            self.texts_embedded += len(texts)
+            self.tokens += sum(batch.tokens for batch in batches)
+            self.seconds += time.time() - start_time
+        return embeddings
+    
+    def _send(self, batches: List[EmbeddingBatch], embeddings: List[Optional[List[float]]]) -> List[Tuple[EmbeddingBatch, Exception]]:
+        """Send batches concurrently, filling in their embeddings; returns the batches that failed"""
+        def send(batch: EmbeddingBatch):
+            with self._lock:
+                self.requests += 1
+            vectors = self.embed_batch(batch.texts)
+            if len(vectors) != len(batch.texts):
+                raise ValueError(f"Expected {len(batch.texts)} embeddings, got {len(vectors)}")
+            embeddings[batch.start:batch.end] = vectors
+        
+        failures = []
+        if len(batches) == 1 or self.concurrency == 1:
+            for batch in batches:
+                try:
+                    send(batch)
+                except Exception as e:
+                    failures.append((batch, e))
+            return failures
+        
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches)), thread_name_prefix="embeddings") as executor:
+            futures = [(batch, executor.submit(send, batch)) for batch in batches]
+            for batch, future in futures:
+                error = future.exception()
+                if error is not None:
+                    failures.append((batch, error))
+        return failures
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get batching statistics"""
+        with self._lock:
+            return {
+                "texts_embedded": self.texts_embedded,
+                "requests": self.requests,
+                "retried_batches": self.retried_batches,
+                "failed_batches": self.failed_batches,
+                "tokens": self.tokens,
+                "texts_per_second": round(self.texts_embedded / self.seconds, 1) if self.seconds > 0 else 0.0,
+                "max_batch_tokens": self.max_batch_tokens,
+                "max_batch_inputs": self.max_batch_inputs,
+                "concurrency": self.concurrency
+            }
@@ -0,0 +1,248 @@
+"""
+Embedding Cache
+
+Content-addressed store of embedding vectors in a local SQLite file. Entries
+are keyed by the embedding model and the SHA-256 of the whitespace-normalized
+text, so boilerplate sections, re-uploaded revisions and repeated queries are
+embedded once. The least recently used entries are evicted beyond a size
+limit.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_CHUNK = 500
+
+
+def normalize_embedding_text(text: str) -> str:
+    """Collapse whitespace runs (including newlines) to single spaces"""
+    return " ".join(text.split())
+
+
+def embedding_text_digest(text: str) -> str:
+    """SHA-256 of the normalized text"""
+    return hashlib.sha256(normalize_embedding_text(text).encode("utf-8")).hexdigest()
+
+
+def encode_embedding(vector: Sequence[float]) -> bytes:
+    """Pack a vector as float32 bytes"""
+    return array("f", vector).tobytes()
+
+
+def decode_embedding(blob: bytes) -> List[float]:
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class EmbeddingCache:
+    """Embedding vectors by (model, text digest) in a SQLite file shared by all workers on a host"""
+    
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 200000,
+        timeout: float = 30.0,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Initialize the cache
+        
+        Args:
+            path: SQLite database file
+            max_entries: Entries kept; the least recently used are evicted beyond it
+            timeout: Seconds to wait for another worker's write lock
+            clock: Time source for recency, replaceable in tests
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.clock = clock
+        self.logger = logging.getLogger(__name__)
+        
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._conn_lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, "
+            "digest TEXT NOT NULL, "
+            "dimensions INTEGER NOT NULL, "
+            "vector BLOB NOT NULL, "
+            "last_used REAL NOT NULL, "
+            "PRIMARY KEY (model, digest))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up cached embeddings, marking the hits as recently used
+        
+        Args:
+            model: Embedding model
+            texts: Texts to look up
+        
+        Returns:
+            One embedding per text, or None where it is not cached
+        """
+        digests = [embedding_text_digest(text) for text in texts]
+        unique = list(dict.fromkeys(digests))
+        found: Dict[str, List[float]] = {}
+        
+        try:
+            with self._conn_lock:
+                for start in range(0, len(unique), _LOOKUP_CHUNK):
+                    chunk = unique[start:start + _LOOKUP_CHUNK]
+                    rows = self._conn.execute(
+                        f"SELECT digest, vector FROM embeddings WHERE model = ? AND digest IN "
+                        f"({', '.join('?' * len(chunk))})",
+                        (model, *chunk)
+                    ).fetchall()
+                    found.update((digest, decode_embedding(blob)) for digest, blob in rows)
+                if found:
+                    now = self.clock()
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE model = ? AND digest = ?",
+                        [(now, model, digest) for digest in found]
+                    )
+        except sqlite3.Error as e:
+            self.logger.warning(f"Embedding cache lookup failed: {e}")
+        
+        results = [found.get(digest) for digest in digests]
+        hits = sum(1 for result in results if result is not None)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+    
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model, [text])[0]
+    
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]):
+        """
+        Store embeddings, evicting the least recently used entries beyond max_entries
+        
+        Args:
+            model: Embedding model the vectors came from
+            texts: Embedded texts
+            vectors: One embedding per text
+        """
+        now = self.clock()
+        rows = {}
+        for text, vector in zip(texts, vectors):
+            digest = embedding_text_digest(text)
+            rows[digest] = (model, digest, len(vector), encode_embedding(vector), now)
+        try:
+            with self._conn_lock:
+                conn = self._conn
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    before = conn.total_changes
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO embeddings (model, digest, dimensions, vector, last_used) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        list(rows.values())
+                    )
+                    inserted = conn.total_changes - before
+                    evicted = 0
+                    if self._entries + inserted > self.max_entries:
+                        # Other workers share the file, so recount before evicting
+                        entries = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                        excess = entries - self.max_entries
+                        if excess > 0:
+                            conn.execute(
+                                "DELETE FROM embeddings WHERE rowid IN "
+                                "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                                (excess,)
+                            )
+                            evicted = excess
+                        self._entries = entries - max(0, excess)
+                    else:
+                        self._entries += inserted
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            self.logger.warning(f"Embedding cache store failed: {e}")
+            return
+        
+        with self._lock:
+            self.stores += inserted
+            self.evictions += evicted
+    
+    def put(self, model: str, text: str, vector: List[float]):
+        self.put_many(model, [text], [vector])
+    
+    def clear(self):
+        """Remove every cached embedding"""
+        with self._conn_lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._entries = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics for this process"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "entries": self._entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions
+            }
+    
+    def close(self):
+        with self._conn_lock:
+            self._conn.close()
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(config: Dict[str, Any] = None) -> EmbeddingCache:
+    """
+    Get the process-wide embedding cache for a database file
+    
+    Args:
+        config: Cache configuration (path, max_entries, timeout); the first
+            configuration seen for a path wins
+    
+    Returns:
+        Shared EmbeddingCache
+    """
+    config = config or {}
+    path = os.path.abspath(config.get('path', 'data/embedding_cache.db'))
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = EmbeddingCache(
+                path,
+                max_entries=config.get('max_entries', 200000),
+                timeout=config.get('timeout', 30.0)
+            )
+        return cache
@@ -0,0 +1,418 @@
+"""
+Lexical Index
+
+BM25 inverted index over chunk text, for the exact figures, product codes
+and names that vector search tends to miss. Chunks are indexed as they are
+ingested: each add call writes an append-only segment holding the
+segment's vocabulary and its postings (row and term frequency per term) as
+memory-mapped arrays. Deleted and replaced chunks are tombstoned, and a
+background thread merges segments of similar size and drops tombstoned
+rows, so every chunk is rewritten a logarithmic number of times.
+
+Document frequencies count tombstoned rows until their segment is
+compacted, as in Lucene, which keeps deletes cheap at a small cost in idf
+accuracy.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.segmented_index import SegmentedIndex
+
+logger = logging.getLogger(__name__)
+
+# Words, numbers and codes; '.', ',', '-', '/' and apostrophes may join
+# parts, so "4.2", "1,200", "sku-4471" and "q3/2024" stay single tokens
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.,\-/'][a-z0-9]+)*")
+_CODE_SEPARATORS = re.compile(r"[\-/']")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in into is it its of on or "
+    "that the their there these this to was were will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased index terms for text
+    
+    Compound tokens are kept whole and also split into their parts, and
+    figures with thousands separators are also indexed without them, so
+    "SKU-4471" matches "sku-4471", "sku" and "4471" and "1,200" matches "1200".
+    """
+    terms = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        if ',' in token:
+            terms.append(token.replace(',', ''))
+        if _CODE_SEPARATORS.search(token):
+            terms.extend(part for part in _CODE_SEPARATORS.split(token) if part and part not in STOPWORDS)
+    return terms
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuse rankings by summing 1 / (k + rank) for each id
+    
+    Args:
+        rankings: Ranked id lists, best first
+        k: Damping constant; larger values flatten the contribution of top ranks
+    
+    Returns:
+        (id, fused score) pairs, best first
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, id_ in enumerate(ranking, start=1):
+            scores[id_] = scores.get(id_, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+class _Postings:
+    """Term -> (rows, term frequencies) arrays, rows ascending within a term"""
+    
+    def __init__(self, terms: List[str], offsets: np.ndarray, rows: np.ndarray, tfs: np.ndarray):
+        self.terms = terms
+        self.offsets = offsets
+        self.rows = rows
+        self.tfs = tfs
+    
+    @classmethod
+    def build(cls, terms: List[str], term_ids: np.ndarray, rows: np.ndarray, tfs: np.ndarray) -> '_Postings':
+        """Postings from unordered (term id, row, tf) triples, dropping terms without postings"""
+        used = np.zeros(len(terms), dtype=bool)
+        used[term_ids] = True
+        remap = np.cumsum(used) - 1
+        term_ids = remap[term_ids]
+        terms = [term for term, keep in zip(terms, used) if keep]
+        
+        order = np.lexsort((rows, term_ids))
+        term_ids = term_ids[order]
+        offsets = np.searchsorted(term_ids, np.arange(len(terms) + 1)).astype(np.int64)
+        return cls(terms, offsets, rows[order].astype(np.int32), np.minimum(tfs[order], 65535).astype(np.uint16))
+    
+    def term_ids(self) -> np.ndarray:
+        """Term id of every posting"""
+        return np.repeat(np.arange(len(self.terms)), np.diff(self.offsets))
+
+
+class _Segment:
+    """Immutable rows of the index; only the live flags change after writing"""
+    
+    def __init__(self, name: str, ids: List[str], document_ids: List[Optional[str]], lengths: np.ndarray, postings: _Postings):
+        self.name = name
+        self.ids = ids
+        self.document_ids = document_ids
+        self.lengths = lengths
+        self.postings = postings
+        self.vocabulary = {term: position for position, term in enumerate(postings.terms)}
+        self.live = np.ones(len(ids), dtype=bool)
+        self._document_rows: Optional[Dict[str, np.ndarray]] = None
+    
+    @property
+    def rows(self) -> int:
+        return len(self.ids)
+    
+    def document_frequency(self, term: str) -> int:
+        position = self.vocabulary.get(term)
+        if position is None:
+            return 0
+        return int(self.postings.offsets[position + 1] - self.postings.offsets[position])
+    
+    def document_mask(self, document_ids: Iterable[str]) -> np.ndarray:
+        """Rows belonging to any of the documents"""
+        if self._document_rows is None:
+            rows_by_document: Dict[str, List[int]] = {}
+            for row, document_id in enumerate(self.document_ids):
+                rows_by_document.setdefault(document_id, []).append(row)
+            self._document_rows = {key: np.array(rows) for key, rows in rows_by_document.items()}
+        mask = np.zeros(self.rows, dtype=bool)
+        for document_id in document_ids:
+            rows = self._document_rows.get(document_id)
+            if rows is not None:
+                mask[rows] = True
+        return mask
+    
+    def score(self, weights: Dict[str, float], k1: float, b: float, average_length: float) -> Optional[np.ndarray]:
+        """BM25 score of every row for terms weighted by idf, or None if no term occurs"""
+        scores = None
+        for term, idf in weights.items():
+            position = self.vocabulary.get(term)
+            if position is None:
+                continue
+            start, stop = self.postings.offsets[position], self.postings.offsets[position + 1]
+            rows = self.postings.rows[start:stop]
+            tfs = self.postings.tfs[start:stop].astype(np.float32)
+            norms = k1 * (1 - b + b * self.lengths[rows] / average_length)
+            if scores is None:
+                scores = np.zeros(self.rows, dtype=np.float32)
+            scores[rows] += idf * tfs * (k1 + 1) / (tfs + norms)
+        return scores
+
+
+class LexicalIndex(SegmentedIndex):
+    """Persistent BM25 index over chunk text"""
+    
+    kind = "lexical"
+    segment_suffixes = (".json", ".lengths.npy", ".offsets.npy", ".rows.npy", ".tfs.npy")
+    
+    def __init__(
+        self,
+        path: str,
+        k1: float = 1.2,
+        b: float = 0.75,
+        max_segments: int = 10,
+        compaction_deleted_ratio: float = 0.2,
+        background_compaction: bool = True
+    ):
+        """
+        Open or create an index directory
+        
+        Args:
+            path: Directory holding the manifest and segment files
+            k1: BM25 term frequency saturation
+            b: BM25 length normalization
+            max_segments: Segment count that triggers a merge
+            compaction_deleted_ratio: Share of tombstoned rows in a segment that
+                triggers rewriting it
+            background_compaction: Compact on a background thread rather than
+                inside the add or delete call that triggered it
+        """
+        super().__init__(path, max_segments, compaction_deleted_ratio, background_compaction)
+        self.k1 = k1
+        self.b = b
+        self._total_length = 0
+        self._load()
+    
+    def add(self, ids: List[str], texts: List[str], document_ids: Optional[List[Optional[str]]] = None):
+        """
+        Index chunks as a new segment, replacing chunks with the same ids
+        
+        Args:
+            ids: Chunk ids
+            texts: Chunk text per id
+            document_ids: Owning document per id, for document-scoped searches
+        
+        Raises:
+            ValueError: If the lengths differ
+        """
+        if not ids:
+            return
+        document_ids = document_ids if document_ids is not None else [None] * len(ids)
+        if not len(ids) == len(texts) == len(document_ids):
+            raise ValueError("ids, texts and document_ids must have the same length")
+        
+        # The last occurrence of a repeated id wins
+        last = list({id_: row for row, id_ in enumerate(ids)}.values())
+        ids, texts, document_ids = ([values[row] for row in last] for values in (ids, texts, document_ids))
+        
+        vocabulary: Dict[str, int] = {}
+        term_ids: List[int] = []
+        lengths = np.empty(len(ids), dtype=np.int32)
+        for row, text in enumerate(texts):
+            terms = tokenize(text or "")
+            lengths[row] = len(terms)
+            term_ids.extend(vocabulary.setdefault(term, len(vocabulary)) for term in terms)
+        rows = np.repeat(np.arange(len(ids), dtype=np.int64), lengths)
+        keys, tfs = np.unique(np.array(term_ids, dtype=np.int64) * len(ids) + rows, return_counts=True)
+        postings = _Postings.build(list(vocabulary), keys // len(ids), keys % len(ids), tfs)
+        
+        with self._write_lock:
+            segment = self._write_segment(self._take_segment_name(), ids, document_ids, lengths, postings)
+            with self._lock:
+                for row, id_ in enumerate(segment.ids):
+                    self._tombstone(id_)
+                    self._locations[id_] = (segment, row)
+                self._total_length += int(lengths.sum())
+                self._segments.append(segment)
+                self._write_manifest()
+        self._maybe_compact()
+    
+    def search(
+        self,
+        query: str,
+        n_results: int = 10,
+        document_ids: Optional[List[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Chunks ranked by BM25 score for the query terms
+        
+        Args:
+            query: Query text
+            n_results: Maximum chunks
+            document_ids: Only search chunks of these documents
+        
+        Returns:
+            (chunk id, score) pairs, best first; chunks without any query term are omitted
+        """
+        with self._lock:
+            segments = list(self._segments)
+            live_rows = len(self._locations)
+            total_length = self._total_length
+            self.queries += 1
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or live_rows == 0 or n_results <= 0:
+            return []
+        
+        average_length = max(total_length / live_rows, 1.0)
+        weights = {}
+        for term in terms:
+            frequency = sum(segment.document_frequency(term) for segment in segments)
+            if frequency:
+                weights[term] = math.log(1 + (live_rows - frequency + 0.5) / (frequency + 0.5))
+        if not weights:
+            return []
+        
+        candidates = []
+        for segment in segments:
+            scores = segment.score(weights, self.k1, self.b, average_length)
+            if scores is None:
+                continue
+            mask = segment.live & (scores > 0)
+            if document_ids is not None:
+                mask &= segment.document_mask(document_ids)
+            rows = np.flatnonzero(mask)
+            if len(rows) > n_results:
+                rows = rows[np.argpartition(-scores[rows], n_results - 1)[:n_results]]
+            candidates.extend((segment.ids[row], float(scores[row])) for row in rows)
+        
+        candidates.sort(key=lambda candidate: -candidate[1])
+        return candidates[:n_results]
+    
+    def delete(self, ids: List[str]):
+        """Tombstone chunks by id"""
+        with self._write_lock:
+            with self._lock:
+                deleted = sum(self._tombstone(id_) for id_ in ids)
+                if deleted:
+                    self._write_manifest()
+        self._maybe_compact()
+    
+    def reset(self):
+        """Delete every chunk and segment file"""
+        with self._compaction_lock, self._write_lock, self._lock:
+            for segment in self._segments:
+                self._remove_segment_files(segment.name)
+            self._segments = []
+            self._locations = {}
+            self._total_length = 0
+            self._write_manifest()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index statistics"""
+        with self._lock:
+            segments = list(self._segments)
+            rows = sum(segment.rows for segment in segments)
+            live = len(self._locations)
+            return {
+                "segments": len(segments),
+                "rows": rows,
+                "live_rows": live,
+                "deleted_rows": rows - live,
+                "terms": sum(len(segment.postings.terms) for segment in segments),
+                "postings": sum(len(segment.postings.rows) for segment in segments),
+                "disk_bytes": self._disk_bytes(),
+                "queries": self.queries,
+                "compactions": self.compactions,
+                "compaction_seconds": round(self.compaction_seconds, 3)
+            }
+    
+    def _tombstone(self, id_: str) -> int:
+        """Mark the live row for an id dead and drop its length from the total; caller holds _lock"""
+        location = self._locations.get(id_)
+        if not super()._tombstone(id_):
+            return 0
+        segment, row = location
+        self._total_length -= int(segment.lengths[row])
+        return 1
+    
+    def _merge_segments(
+        self,
+        name: str,
+        merged: List[_Segment],
+        snapshot: List[np.ndarray]
+    ) -> Tuple[Optional[_Segment], List[Tuple[_Segment, int]]]:
+        ids, document_ids, lengths, sources = [], [], [], []
+        vocabulary: Dict[str, int] = {}
+        term_parts, row_parts, tf_parts = [], [], []
+        base = 0
+        for segment, live in zip(merged, snapshot):
+            kept = np.flatnonzero(live)
+            new_rows = np.cumsum(live) - 1 + base
+            term_map = np.array([vocabulary.setdefault(term, len(vocabulary)) for term in segment.postings.terms], dtype=np.int64)
+            keep = live[segment.postings.rows]
+            term_parts.append(term_map[segment.postings.term_ids()[keep]] if len(term_map) else np.empty(0, dtype=np.int64))
+            row_parts.append(new_rows[segment.postings.rows[keep]])
+            tf_parts.append(np.asarray(segment.postings.tfs[keep]))
+            ids.extend(segment.ids[row] for row in kept)
+            document_ids.extend(segment.document_ids[row] for row in kept)
+            lengths.append(segment.lengths[kept])
+            sources.extend((segment, int(row)) for row in kept)
+            base += len(kept)
+        
+        if not ids:
+            return None, sources
+        postings = _Postings.build(
+            list(vocabulary), np.concatenate(term_parts), np.concatenate(row_parts), np.concatenate(tf_parts)
+        )
+        return self._write_segment(name, ids, document_ids, np.concatenate(lengths), postings), sources
+    
+    def _write_segment(
+        self,
+        name: str,
+        ids: List[str],
+        document_ids: List[Optional[str]],
+        lengths: np.ndarray,
+        postings: _Postings
+    ) -> _Segment:
+        """Write a segment's files and open it memory-mapped"""
+        np.save(self._segment_path(name, ".lengths.npy"), lengths.astype(np.int32))
+        np.save(self._segment_path(name, ".offsets.npy"), postings.offsets)
+        np.save(self._segment_path(name, ".rows.npy"), postings.rows)
+        np.save(self._segment_path(name, ".tfs.npy"), postings.tfs)
+        with open(self._segment_path(name, ".json"), 'w') as f:
+            json.dump({'ids': ids, 'document_ids': document_ids, 'terms': postings.terms}, f)
+        return self._open_segment(name)
+    
+    def _open_segment(self, name: str) -> _Segment:
+        with open(self._segment_path(name, ".json")) as f:
+            fields = json.load(f)
+        
+        def mapped(suffix):
+            # A plain ndarray view of the map skips np.memmap's per-slice overhead
+            return np.asarray(np.load(self._segment_path(name, suffix), mmap_mode='r'))
+        
+        postings = _Postings(fields['terms'], np.load(self._segment_path(name, ".offsets.npy")), mapped(".rows.npy"), mapped(".tfs.npy"))
+        return _Segment(name, fields['ids'], fields['document_ids'], np.load(self._segment_path(name, ".lengths.npy")), postings)
+    
+    def _disk_bytes(self) -> int:
+        return sum(
+            os.path.getsize(os.path.join(self.path, filename))
+            for filename in os.listdir(self.path)
+            if os.path.isfile(os.path.join(self.path, filename))
+        )
+    
+    def _load(self):
+        super()._load()
+        self._total_length = sum(int(segment.lengths[segment.live].sum()) for segment in self._segments)
+    
+    def _merge_start(self) -> int:
+        """
+        Merge the newest segments back to the first one much larger than all
+        of them together, so segment sizes stay roughly geometric; caller holds _lock
+        """
+        segments = self._segments
+        start = len(segments) - 1
+        newer = segments[start].rows
+        while start > 0 and segments[start - 1].rows <= 2 * newer:
+            start -= 1
+            newer += segments[start].rows
+        return min(start, len(segments) - 2)
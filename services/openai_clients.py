@@ -0,0 +1,315 @@
+"""
+Shared OpenAI Clients
+
+Process-wide factory for OpenAI SDK clients. Every service that talks to
+OpenAI gets its client here, so all of them share keep-alive connection
+pools (HTTP/2 when the h2 package is installed) instead of each paying for
+its own TCP and TLS handshakes. Connection reuse is tracked per pool.
+"""
+
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+HAS_OPENAI = False
+OpenAI = None
+AsyncOpenAI = None
+try:
+    from openai import OpenAI, AsyncOpenAI
+    HAS_OPENAI = True
+except ImportError:
+    pass
+
+HAS_HTTPX = False
+httpx = None
+try:
+    import httpx
+    HAS_HTTPX = True
+except ImportError:
+    pass
+
+HAS_HTTP2 = False
+try:
+    import h2  # noqa: F401  (httpx enables HTTP/2 only when h2 is importable)
+    HAS_HTTP2 = True
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+# Per-service request timeouts in seconds, used when a call site does not pass one
+DEFAULT_SERVICE_TIMEOUTS = {
+    'chat': 30.0,
+    'embeddings': 20.0,
+    'analysis': 60.0
+}
+
+
+class ConnectionStats:
+    """Counts requests and newly opened connections for one pool"""
+    
+    # httpcore trace events emitted only when a connection is opened
+    CONNECT_EVENTS = ("connection.connect_tcp.complete", "connection.connect_unix_socket.complete")
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+    
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+    
+    def record_event(self, event_name: str):
+        if event_name in self.CONNECT_EVENTS:
+            with self._lock:
+                self.new_connections += 1
+    
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            reused = max(0, self.requests - self.new_connections)
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused_connections": reused,
+                "connection_reuse_rate": reused / self.requests if self.requests else 0.0
+            }
+
+
+class OpenAIClientFactory:
+    """Hands out OpenAI clients that share pooled HTTP connections"""
+    
+    def __init__(self, config: Dict[str, Any] = None):
+        """
+        Initialize the factory
+        
+        Args:
+            config: Pool configuration (max_connections, max_keepalive_connections,
+                keepalive_expiry, http2, timeouts per service name)
+        """
+        config = config or {}
+        self.max_connections = config.get('max_connections', 100)
+        self.max_keepalive_connections = config.get('max_keepalive_connections', 20)
+        self.keepalive_expiry = config.get('keepalive_expiry', 60.0)
+        self.http2 = HAS_HTTP2 and config.get('http2', True)
+        self.timeouts = {**DEFAULT_SERVICE_TIMEOUTS, **config.get('timeouts', {})}
+        
+        self._lock = threading.Lock()
+        self._http_clients: Dict[Optional[str], Any] = {}  # base_url -> httpx.Client
+        self._async_http_clients = weakref.WeakKeyDictionary()  # event loop -> {base_url: httpx.AsyncClient}
+        self._clients: Dict[Tuple, Any] = {}
+        self._async_clients = weakref.WeakKeyDictionary()  # event loop -> {key: client}
+        self._stats: Dict[Optional[str], ConnectionStats] = {}
+        self.logger = logging.getLogger(__name__)
+    
+    def timeout_for(self, service: str, timeout: float = None) -> float:
+        """Explicit timeout, else the configured timeout for the service"""
+        if timeout is not None:
+            return timeout
+        return self.timeouts.get(service, DEFAULT_SERVICE_TIMEOUTS['chat'])
+    
+    def _pool_stats(self, base_url: Optional[str]) -> ConnectionStats:
+        stats = self._stats.get(base_url)
+        if stats is None:
+            stats = self._stats[base_url] = ConnectionStats()
+        return stats
+    
+    def _limits(self):
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+    
+    def _get_http_client(self, base_url: Optional[str]):
+        """Shared sync connection pool for an endpoint (call with the lock held)"""
+        http_client = self._http_clients.get(base_url)
+        if http_client is None:
+            stats = self._pool_stats(base_url)
+            
+            def trace(event_name, info):
+                stats.record_event(event_name)
+            
+            def on_request(request):
+                stats.record_request()
+                request.extensions["trace"] = trace
+            
+            http_client = httpx.Client(
+                limits=self._limits(),
+                http2=self.http2,
+                follow_redirects=True,
+                event_hooks={"request": [on_request]}
+            )
+            self._http_clients[base_url] = http_client
+        return http_client
+    
+    def _get_async_http_client(self, base_url: Optional[str], loop):
+        """Shared async connection pool for an endpoint on one event loop (call with the lock held)"""
+        pools = self._async_http_clients.setdefault(loop, {})
+        http_client = pools.get(base_url)
+        if http_client is None:
+            stats = self._pool_stats(base_url)
+            
+            async def trace(event_name, info):
+                stats.record_event(event_name)
+            
+            async def on_request(request):
+                stats.record_request()
+                request.extensions["trace"] = trace
+            
+            http_client = httpx.AsyncClient(
+                limits=self._limits(),
+                http2=self.http2,
+                follow_redirects=True,
+                event_hooks={"request": [on_request]}
+            )
+            pools[base_url] = http_client
+        return http_client
+    
+    def get_client(
+        self,
+        service: str,
+        api_key: str = None,
+        base_url: str = None,
+        timeout: float = None,
+        client_class=None,
+        **kwargs
+    ):
+        """
+        Get a shared synchronous client
+        
+        Args:
+            service: Calling service name, used to pick the default timeout
+            api_key: API key
+            base_url: Optional OpenAI-compatible endpoint
+            timeout: Request timeout; defaults to the service's configured timeout
+            client_class: SDK client class (defaults to openai.OpenAI)
+            **kwargs: Extra SDK client options (e.g. max_retries)
+        
+        Returns:
+            OpenAI client sharing the endpoint's connection pool
+        """
+        client_class = client_class or OpenAI
+        timeout = self.timeout_for(service, timeout)
+        key = (client_class, api_key, base_url, timeout, tuple(sorted(kwargs.items())))
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                if HAS_HTTPX:
+                    kwargs["http_client"] = self._get_http_client(base_url)
+                client = client_class(api_key=api_key, base_url=base_url, timeout=timeout, **kwargs)
+                self._clients[key] = client
+            return client
+    
+    def get_async_client(
+        self,
+        service: str,
+        api_key: str = None,
+        base_url: str = None,
+        timeout: float = None,
+        client_class=None,
+        **kwargs
+    ):
+        """
+        Get a shared asynchronous client for the running event loop
+        
+        Async connections belong to the event loop that opened them, so pools
+        are shared per loop. Called outside a running loop, the client gets a
+        pool of its own.
+        
+        Args:
+            service: Calling service name, used to pick the default timeout
+            api_key: API key
+            base_url: Optional OpenAI-compatible endpoint
+            timeout: Request timeout; defaults to the service's configured timeout
+            client_class: SDK client class (defaults to openai.AsyncOpenAI)
+            **kwargs: Extra SDK client options (e.g. max_retries)
+        
+        Returns:
+            AsyncOpenAI client sharing the loop's connection pool
+        """
+        client_class = client_class or AsyncOpenAI
+        timeout = self.timeout_for(service, timeout)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return client_class(api_key=api_key, base_url=base_url, timeout=timeout, **kwargs)
+        
+        key = (client_class, api_key, base_url, timeout, tuple(sorted(kwargs.items())))
+        with self._lock:
+            clients = self._async_clients.setdefault(loop, {})
+            client = clients.get(key)
+            if client is None:
+                if HAS_HTTPX:
+                    kwargs["http_client"] = self._get_async_http_client(base_url, loop)
+                client = client_class(api_key=api_key, base_url=base_url, timeout=timeout, **kwargs)
+                clients[key] = client
+            return client
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Connection pool statistics, overall and per endpoint"""
+        with self._lock:
+            pools = {base_url or "default": stats.to_dict() for base_url, stats in self._stats.items()}
+            clients = len(self._clients) + sum(len(clients) for clients in self._async_clients.values())
+        
+        requests = sum(pool["requests"] for pool in pools.values())
+        reused = sum(pool["reused_connections"] for pool in pools.values())
+        return {
+            "clients": clients,
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "requests": requests,
+            "new_connections": sum(pool["new_connections"] for pool in pools.values()),
+            "connection_reuse_rate": reused / requests if requests else 0.0,
+            "pools": pools
+        }
+    
+    def close(self):
+        """Close the shared sync pools and forget all clients"""
+        with self._lock:
+            for http_client in self._http_clients.values():
+                http_client.close()
+            self._http_clients.clear()
+            self._clients.clear()
+            self._async_clients = weakref.WeakKeyDictionary()
+            self._async_http_clients = weakref.WeakKeyDictionary()
+
+
+_factory: Optional[OpenAIClientFactory] = None
+_factory_lock = threading.Lock()
+
+
+def get_openai_client_factory() -> OpenAIClientFactory:
+    """Get the process-wide client factory"""
+    global _factory
+    if _factory is None:
+        with _factory_lock:
+            if _factory is None:
+                _factory = OpenAIClientFactory()
+    return _factory
+
+
+def configure_openai_clients(config: Dict[str, Any]) -> OpenAIClientFactory:
+    """
+    Replace the process-wide factory with one built from configuration
+    
+    Call once at startup, before services are created; clients handed out
+    earlier keep their original pools.
+    """
+    global _factory
+    with _factory_lock:
+        _factory = OpenAIClientFactory(config)
+    return _factory
+
+
+def get_openai_client(service: str, api_key: str = None, base_url: str = None, timeout: float = None, **kwargs):
+    """Shared synchronous OpenAI client; see OpenAIClientFactory.get_client"""
+    return get_openai_client_factory().get_client(service, api_key, base_url, timeout, **kwargs)
+
+
+def get_async_openai_client(service: str, api_key: str = None, base_url: str = None, timeout: float = None, **kwargs):
+    """Shared asynchronous OpenAI client; see OpenAIClientFactory.get_async_client"""
+    return get_openai_client_factory().get_async_client(service, api_key, base_url, timeout, **kwargs)
@@ -6,7 +6,8 @@ Provides dependency injection and service lifecycle management.
 """
 
 import logging
-from typing import Dict, Any, Optional, Type, TypeVar
+import sys
+from typing import Callable, Dict, Any, Optional, Type, TypeVar
 from dataclasses import dataclass
 
 from config.settings import config_manager
@@ -40,6 +41,7 @@ class ServiceRegistry:
     
     def __init__(self):
         self._services: Dict[str, ServiceInfo] = {}
+        self._shutdown_hooks: Dict[str, Callable[[], None]] = {}
         self._initialized = False
         
     def register_service(
@@ -63,6 +65,19 @@ class ServiceRegistry:
         )
         logger.info(f"Registered service: {name}")
         
+    def register_shutdown_hook(self, name: str, hook: Callable[[], None]) -> None:
+        """
+        Register a hook run by shutdown_all after the services are shut down
+        
+        Used for process-wide resources shared by several services, such as
+        the vector database connections.
+        
+        Args:
+            name: Resource name
+            hook: Function releasing the resource
+        """
+        self._shutdown_hooks[name] = hook
+        
     def get_service(self, name: str) -> Any:
         """
         Get a service instance
@@ -133,6 +148,13 @@ class ServiceRegistry:
                 except Exception as e:
                     logger.error(f"Error shutting down service {service_info.name}: {e}")
                     
+        for name, hook in self._shutdown_hooks.items():
+            try:
+                hook()
+                logger.info(f"Shared resource {name} released successfully")
+            except Exception as e:
+                logger.error(f"Error releasing shared resource {name}: {e}")
+                    
         self._initialized = False
         logger.info("All services shut down")
         
@@ -150,6 +172,8 @@ class ServiceRegistry:
                 'class': service_info.service_class.__name__
             }
             
+        status['shutdown_hooks'] = list(self._shutdown_hooks)
+            
         return status
         
     def _initialize_service(self, service_info: ServiceInfo) -> None:
@@ -251,6 +275,19 @@ class ServiceManager:
             'erp_integration',
             ERPIntegrationService
         )
+        
+        # Vector services are shared across requests and services for the app's lifetime
+        self.registry.register_shutdown_hook(
+            'vector_database',
+            _shutdown_vector_services
+        )
+
+
+def _shutdown_vector_services() -> None:
+    """Release the shared vector services, if any were opened"""
+    vector_database = sys.modules.get('services.vector_database')
+    if vector_database is not None:
+        vector_database.shutdown_vector_database_services()
 
 
 # Global service manager instance
@@ -0,0 +1,270 @@
+"""
+Segmented Index
+
+Storage layout shared by the vector and lexical indexes. Rows are written in
+immutable, append-only segment files; a JSON manifest, replaced atomically,
+lists the live segments and the tombstoned rows of each. Replacing or
+deleting a row only tombstones it, and compaction merges segments into one
+new segment without the dead rows, on a background thread by default.
+
+Subclasses define the segment files (write, open and the file suffixes),
+how merged segments are rebuilt, and which segments the size policy merges.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+MANIFEST = "manifest.json"
+
+
+class SegmentedIndex:
+    """Append-only segments with tombstones, an atomic manifest and background compaction"""
+    
+    # Name used in log messages and the compaction thread name
+    kind = "segmented"
+    # Files making up one segment, as suffixes of its name
+    segment_suffixes: Tuple[str, ...] = (".json",)
+    
+    def __init__(
+        self,
+        path: str,
+        max_segments: int,
+        compaction_deleted_ratio: float,
+        background_compaction: bool
+    ):
+        """
+        Set up an empty index over a directory; subclasses call _load() once
+        their own state is initialized
+        
+        Args:
+            path: Directory holding the manifest and segment files
+            max_segments: Segment count that triggers merging segments
+            compaction_deleted_ratio: Share of tombstoned rows in a segment that
+                triggers rewriting it
+            background_compaction: Compact on a background thread rather than
+                inside the add or delete call that triggered it
+        """
+        self.path = path
+        self.max_segments = max(2, max_segments)
+        self.compaction_deleted_ratio = compaction_deleted_ratio
+        self.background_compaction = background_compaction
+        self.logger = logging.getLogger(type(self).__module__)
+        
+        # _write_lock serializes changes; _lock guards the segment list and
+        # id map, which searches snapshot without waiting for file writes
+        self._write_lock = threading.Lock()
+        self._compaction_lock = threading.Lock()
+        self._lock = threading.RLock()
+        self._segments: List[Any] = []
+        self._locations: Dict[str, Tuple[Any, int]] = {}
+        self._next_segment = 0
+        
+        # Metrics
+        self.queries = 0
+        self.compactions = 0
+        self.compaction_seconds = 0.0
+        
+        self._compaction_requested = threading.Event()
+        self._closed = False
+        self._compaction_thread: Optional[threading.Thread] = None
+        
+        os.makedirs(path, exist_ok=True)
+    
+    def count(self) -> int:
+        return len(self._locations)
+    
+    def compact(self, full: bool = False) -> bool:
+        """
+        Merge segments and drop tombstoned rows
+        
+        Args:
+            full: Rewrite every segment into one rather than following the
+                compaction policy
+        
+        Returns:
+            Whether anything was compacted
+        """
+        with self._compaction_lock:
+            with self._lock:
+                start = 0 if full and self._segments else self._compaction_start()
+                if start is None:
+                    return False
+                merged = self._segments[start:]
+                snapshot = [segment.live.copy() for segment in merged]
+            
+            started = time.time()
+            with self._write_lock:
+                name = self._take_segment_name()
+            compacted, sources = self._merge_segments(name, merged, snapshot)
+            
+            with self._write_lock, self._lock:
+                if compacted is not None:
+                    # Rows deleted or replaced while merging stay dead
+                    for row, (source, source_row) in enumerate(sources):
+                        id_ = compacted.ids[row]
+                        location = self._locations.get(id_)
+                        if location is not None and location[0] is source and location[1] == source_row:
+                            self._locations[id_] = (compacted, row)
+                        else:
+                            compacted.live[row] = False
+                self._segments = self._segments[:start] + ([compacted] if compacted else []) + self._segments[start + len(merged):]
+                self._write_manifest()
+            for segment in merged:
+                self._remove_segment_files(segment.name)
+            
+            elapsed = time.time() - started
+            with self._lock:
+                self.compactions += 1
+                self.compaction_seconds += elapsed
+            self.logger.info(f"Compacted {len(merged)} {self.kind} segments into {len(sources)} rows in {elapsed:.2f}s")
+            return True
+    
+    def close(self):
+        """Stop background compaction and release the memory maps"""
+        self._closed = True
+        self._compaction_requested.set()
+        if self._compaction_thread is not None:
+            self._compaction_thread.join()
+        with self._compaction_lock, self._lock:
+            self._segments = []
+            self._locations = {}
+    
+    def _merge_segments(self, name: str, merged: List[Any], snapshot: List[np.ndarray]) -> Tuple[Optional[Any], List[Tuple[Any, int]]]:
+        """
+        Write the live rows of merged segments as one new segment
+        
+        Args:
+            name: Name for the new segment
+            merged: Segments being merged, oldest first
+            snapshot: Live flags of each merged segment when the merge started
+        
+        Returns:
+            The new segment (None if no row was live) and, per row of it, the
+            (segment, row) it was copied from
+        """
+        raise NotImplementedError
+    
+    def _merge_start(self) -> int:
+        """First segment to merge when there are more than max_segments; caller holds _lock"""
+        raise NotImplementedError
+    
+    def _open_segment(self, name: str) -> Any:
+        raise NotImplementedError
+    
+    def _tombstone(self, id_: str) -> int:
+        """Mark the live row for an id dead; caller holds _lock"""
+        location = self._locations.pop(id_, None)
+        if location is None:
+            return 0
+        location[0].live[location[1]] = False
+        return 1
+    
+    def _take_segment_name(self) -> str:
+        """Next segment file name; caller holds _write_lock"""
+        self._next_segment += 1
+        return f"seg-{self._next_segment:08d}"
+    
+    def _segment_path(self, name: str, suffix: str) -> str:
+        return os.path.join(self.path, f"{name}{suffix}")
+    
+    def _remove_segment_files(self, name: str):
+        for suffix in self.segment_suffixes:
+            path = self._segment_path(name, suffix)
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def _manifest_fields(self) -> Dict[str, Any]:
+        """Index-specific manifest entries, restored by _restore_manifest"""
+        return {}
+    
+    def _restore_manifest(self, manifest: Dict[str, Any]):
+        """Apply the entries written by _manifest_fields"""
+    
+    def _write_manifest(self):
+        """Persist the segment list and tombstones atomically; caller holds _lock"""
+        manifest = {
+            'version': 1,
+            **self._manifest_fields(),
+            'next_segment': self._next_segment,
+            'segments': [segment.name for segment in self._segments],
+            'tombstones': {
+                segment.name: np.flatnonzero(~segment.live).tolist()
+                for segment in self._segments if not segment.live.all()
+            }
+        }
+        path = os.path.join(self.path, MANIFEST)
+        with open(path + ".tmp", 'w') as f:
+            json.dump(manifest, f)
+        os.replace(path + ".tmp", path)
+    
+    def _load(self):
+        """Open the segments listed in the manifest and rebuild the id map"""
+        path = os.path.join(self.path, MANIFEST)
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            manifest = json.load(f)
+        
+        self._restore_manifest(manifest)
+        self._next_segment = manifest['next_segment']
+        for name in manifest['segments']:
+            segment = self._open_segment(name)
+            segment.live[manifest['tombstones'].get(name, [])] = False
+            for row in np.flatnonzero(segment.live):
+                self._tombstone(segment.ids[row])
+                self._locations[segment.ids[row]] = (segment, int(row))
+            self._segments.append(segment)
+        
+        # Files of segments written or compacted away without reaching the manifest
+        known = set(manifest['segments'])
+        for filename in os.listdir(self.path):
+            if filename.startswith("seg-") and filename.split('.')[0] not in known:
+                os.remove(os.path.join(self.path, filename))
+        self.logger.info(
+            f"Opened {self.kind} index at {self.path}: {len(self._locations)} rows in {len(self._segments)} segments"
+        )
+    
+    def _compaction_start(self) -> Optional[int]:
+        """First segment to merge under the compaction policy, or None; caller holds _lock"""
+        segments = self._segments
+        for position, segment in enumerate(segments):
+            if 1 - np.count_nonzero(segment.live) / segment.rows > self.compaction_deleted_ratio:
+                return position
+        if len(segments) <= self.max_segments:
+            return None
+        return self._merge_start()
+    
+    def _maybe_compact(self):
+        with self._lock:
+            if self._compaction_start() is None:
+                return
+        if not self.background_compaction:
+            self.compact()
+            return
+        if self._compaction_thread is None:
+            self._compaction_thread = threading.Thread(
+                target=self._compaction_loop,
+                name=f"{self.kind}-index-compaction",
+                daemon=True
+            )
+            self._compaction_thread.start()
+        self._compaction_requested.set()
+    
+    def _compaction_loop(self):
+        while True:
+            self._compaction_requested.wait()
+            self._compaction_requested.clear()
+            if self._closed:
+                return
+            try:
+                while self.compact():
+                    if self._closed:
+                        return
+            except Exception as e:
+                self.logger.error(f"{self.kind.capitalize()} index compaction failed: {e}")
@@ -0,0 +1,303 @@
+"""
+Structured Output
+
+JSON schema for executive decisions, the matching ``response_format`` for
+models that support structured outputs, and an incremental parser that pulls
+top-level fields out of a JSON object while it is still being streamed. The
+parser also recovers the completed fields of truncated or fenced output, so a
+response only falls back to line-based parsing when it has no usable JSON.
+"""
+
+import json
+import logging
+import re
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Fields a decision cannot be persisted without
+REQUIRED_DECISION_FIELDS = ("decision", "rationale", "confidence_score")
+
+# Structured output modes a model may support, best first
+STRUCTURED_OUTPUT_JSON_SCHEMA = "json_schema"
+STRUCTURED_OUTPUT_JSON_OBJECT = "json_object"
+
+_LEVELS = ["low", "medium", "high", "critical"]
+_STRING_LIST = {"type": "array", "items": {"type": "string"}}
+
+# Mirrors the decision prompt's JSON format, in the same order: the analysis
+# fields come before the decision, as the prompt asks
+EXECUTIVE_RESPONSE_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "situation_assessment": {"type": "string"},
+        "strategic_considerations": _STRING_LIST,
+        "options_analysis": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "option": {"type": "string"},
+                    "pros": _STRING_LIST,
+                    "cons": _STRING_LIST
+                },
+                "required": ["option", "pros", "cons"],
+                "additionalProperties": False
+            }
+        },
+        "decision": {"type": "string"},
+        "rationale": {"type": "string"},
+        "implementation_steps": _STRING_LIST,
+        "timeline": {"type": "string"},
+        "confidence_score": {"type": "number"},
+        "priority": {"type": "string", "enum": _LEVELS},
+        "category": {"type": "string"},
+        "risk_level": {"type": "string", "enum": _LEVELS},
+        "financial_impact": {"type": ["number", "null"]},
+        "risks": _STRING_LIST,
+        "mitigation_strategies": _STRING_LIST,
+        "success_metrics": _STRING_LIST,
+        "next_review_date": {"type": "string"}
+    },
+    # Strict mode requires every property to be listed
+    "required": [
+        "situation_assessment", "strategic_considerations", "options_analysis", "decision",
+        "rationale", "implementation_steps", "timeline", "confidence_score", "priority",
+        "category", "risk_level", "financial_impact", "risks", "mitigation_strategies",
+        "success_metrics", "next_review_date"
+    ],
+    "additionalProperties": False
+}
+
+
+def build_response_format(mode: Optional[str], schema: Dict[str, Any], name: str = "executive_response") -> Optional[Dict[str, Any]]:
+    """
+    Chat completions response_format for a model's structured output mode
+    
+    Args:
+        mode: "json_schema", "json_object" or None for models without either
+        schema: JSON schema the response must follow
+        name: Schema name reported to the API
+    
+    Returns:
+        The response_format parameter, or None to send the request unconstrained
+    """
+    if mode == STRUCTURED_OUTPUT_JSON_SCHEMA:
+        return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+    if mode == STRUCTURED_OUTPUT_JSON_OBJECT:
+        return {"type": "json_object"}
+    return None
+
+
+_STRING_SPECIAL = re.compile(r'["\\]')
+_SCALAR_END = re.compile(r'[,}\s]')
+
+# Parser states
+_BEFORE_OBJECT = 0
+_EXPECT_KEY = 1
+_EXPECT_COLON = 2
+_EXPECT_VALUE = 3
+_IN_SCALAR = 4
+_IN_NESTED = 5
+_EXPECT_COMMA = 6
+_DONE = 7
+
+
+class IncrementalJSONParser:
+    """
+    Extract the top-level fields of a JSON object as its text arrives
+    
+    Each character is scanned once across all feed() calls. A field is
+    reported when its value is complete; nested objects and arrays are decoded
+    whole once they close. Text before the opening brace (prose, a ```json
+    fence) and after the closing brace is ignored.
+    """
+    
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._state = _BEFORE_OBJECT
+        self._in_string = False
+        self._escape = False
+        self._depth = 0  # Nesting inside the current value
+        self._key: Optional[str] = None
+        self._token_start = 0
+        self.fields: Dict[str, Any] = {}
+        self.invalid_fields = 0
+    
+    @property
+    def complete(self) -> bool:
+        """Whether the top-level object has closed"""
+        return self._state == _DONE
+    
+    def has_fields(self, names: Iterable[str] = REQUIRED_DECISION_FIELDS) -> bool:
+        return all(name in self.fields for name in names)
+    
+    def feed(self, text: str) -> Dict[str, Any]:
+        """
+        Consume more response text
+        
+        Args:
+            text: Next delta of the response
+        
+        Returns:
+            Fields whose values completed within this delta
+        """
+        if self._state == _DONE or not text:
+            return {}
+        self._text += text
+        completed: Dict[str, Any] = {}
+        text = self._text
+        pos = self._pos
+        end = len(text)
+        
+        while pos < end:
+            if self._in_string:
+                # Jump to the next quote or backslash instead of stepping through the string
+                if self._escape:
+                    self._escape = False
+                    pos += 1
+                    continue
+                match = _STRING_SPECIAL.search(text, pos)
+                if match is None:
+                    pos = end
+                    break
+                pos = match.start()
+                if text[pos] == "\\":
+                    self._escape = True
+                    pos += 1
+                    continue
+                self._in_string = False
+                pos += 1
+                if self._state == _EXPECT_KEY:
+                    self._key = self._decode(text[self._token_start:pos])
+                    self._state = _EXPECT_COLON
+                elif self._state == _EXPECT_VALUE:
+                    self._store(text[self._token_start:pos], completed)
+                continue
+            
+            char = text[pos]
+            state = self._state
+            
+            if state == _IN_NESTED:
+                if char == '"':
+                    self._in_string = True
+                elif char in "{[":
+                    self._depth += 1
+                elif char in "}]":
+                    self._depth -= 1
+                    if self._depth == 0:
+                        self._store(text[self._token_start:pos + 1], completed)
+                pos += 1
+                continue
+            
+            if state == _IN_SCALAR:
+                match = _SCALAR_END.search(text, pos)
+                if match is None:
+                    pos = end
+                    break
+                pos = match.start()
+                self._store(text[self._token_start:pos], completed)
+                continue  # The delimiter is handled in the EXPECT_COMMA state
+            
+            if char in " \t\r\n":
+                pos += 1
+                continue
+            
+            if state == _BEFORE_OBJECT:
+                if char == "{":
+                    self._state = _EXPECT_KEY
+            elif state == _EXPECT_KEY:
+                if char == '"':
+                    self._token_start = pos
+                    self._in_string = True
+                elif char == "}":
+                    self._state = _DONE
+                    break
+            elif state == _EXPECT_COLON:
+                if char == ":":
+                    self._state = _EXPECT_VALUE
+            elif state == _EXPECT_VALUE:
+                self._token_start = pos
+                if char == '"':
+                    self._in_string = True
+                elif char in "{[":
+                    self._depth = 1
+                    self._state = _IN_NESTED
+                else:
+                    self._state = _IN_SCALAR
+                    continue  # Rescan this character as part of the scalar
+            elif state == _EXPECT_COMMA:
+                if char == ",":
+                    self._state = _EXPECT_KEY
+                elif char == "}":
+                    self._state = _DONE
+                    break
+            pos += 1
+        
+        # Keep only the unfinished token so long streams are not re-copied on every delta
+        token_open = self._in_string or self._state in (_IN_SCALAR, _IN_NESTED)
+        keep = self._token_start if token_open else pos
+        self._text = text[keep:]
+        self._token_start -= keep
+        self._pos = pos - keep
+        return completed
+    
+    def partial_field(self) -> Tuple[Optional[str], Optional[str]]:
+        """The top-level string field being streamed and its text so far, if any"""
+        if self._state != _EXPECT_VALUE or not self._in_string:
+            return None, None
+        raw = self._text[self._token_start + 1:]
+        # Drop a trailing, incomplete escape sequence before decoding
+        backslash = raw.rfind("\\", max(0, len(raw) - 6))
+        if backslash != -1:
+            raw = raw[:backslash]
+        try:
+            return self._key, json.loads(f'"{raw}"')
+        except ValueError:
+            return self._key, raw
+    
+    def _store(self, raw: str, completed: Dict[str, Any]):
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            self.invalid_fields += 1
+            logger.debug(f"Skipping malformed value for field {self._key!r}")
+        else:
+            self.fields[self._key] = value
+            completed[self._key] = value
+        self._state = _EXPECT_COMMA
+        self._depth = 0
+    
+    @staticmethod
+    def _decode(raw: str) -> str:
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return raw.strip('"')
+
+
+def parse_json_object(content: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    Parse a model response expected to be a JSON object
+    
+    Args:
+        content: Full response text
+    
+    Returns:
+        Tuple of (fields, complete). Well-formed JSON parses in one json.loads
+        call; otherwise the completed fields of a fenced, prefixed or truncated
+        object are recovered. Fields is None when no object was found.
+    """
+    try:
+        data = json.loads(content)
+        if isinstance(data, dict):
+            return data, True
+    except (TypeError, ValueError):
+        pass
+    
+    parser = IncrementalJSONParser()
+    parser.feed(content or "")
+    if not parser.fields:
+        return None, False
+    return parser.fields, parser.complete
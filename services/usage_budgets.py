@@ -0,0 +1,383 @@
+"""
+Usage Budgets
+
+Per-user and per-tenant limits on OpenAI usage: tokens per minute, dollars
+per day and concurrent calls. A request reserves its estimated tokens and
+cost before it is sent (prompt tokens plus the completion budget, priced at
+the routed model), so one heavy user cannot monopolize the account's
+capacity. The reservation is settled with the actual usage when the call
+finishes.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.usage_ledger import UsageLedger, SCOPE_USER, SCOPE_TENANT
+
+logger = logging.getLogger(__name__)
+
+# Budget subjects
+SUBJECT_USER = "user"
+SUBJECT_TENANT = "tenant"
+
+# Limits
+LIMIT_TOKENS_PER_MINUTE = "tokens_per_minute"
+LIMIT_DOLLARS_PER_DAY = "dollars_per_day"
+LIMIT_CONCURRENT = "max_concurrent"
+
+
+class BudgetExceededError(Exception):
+    """A request does not fit its user's or tenant's budget"""
+    
+    def __init__(self, message: str, subject: str, key: str, limit: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.subject = subject
+        self.key = key
+        self.limit = limit
+        self.retry_after = retry_after
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "subject": self.subject,
+            "key": self.key,
+            "limit": self.limit,
+            "retry_after": round(self.retry_after, 1) if self.retry_after is not None else None,
+            "message": str(self)
+        }
+
+
+@dataclass
+class BudgetLimits:
+    """Limits for one user or tenant; None means unlimited"""
+    tokens_per_minute: Optional[int] = None
+    dollars_per_day: Optional[float] = None
+    max_concurrent: Optional[int] = None
+    
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "BudgetLimits":
+        config = config or {}
+        return cls(
+            tokens_per_minute=config.get(LIMIT_TOKENS_PER_MINUTE),
+            dollars_per_day=config.get(LIMIT_DOLLARS_PER_DAY),
+            max_concurrent=config.get(LIMIT_CONCURRENT)
+        )
+    
+    @property
+    def unlimited(self) -> bool:
+        return self.tokens_per_minute is None and self.dollars_per_day is None and self.max_concurrent is None
+
+
+@dataclass
+class _SubjectState:
+    """Live consumption of one user or tenant in this process"""
+    limits: BudgetLimits
+    token_allowance: float = 0.0
+    last_refill: float = 0.0
+    in_flight: int = 0
+    reserved_cost: float = 0.0
+    spent: Dict[str, float] = field(default_factory=dict)  # day -> dollars, without a ledger
+    rejections: Dict[str, int] = field(default_factory=dict)
+
+
+class BudgetReservation:
+    """Tokens, cost and a concurrency slot held for one request; settle it when the request ends"""
+    
+    def __init__(self, budgets: "UsageBudgets", subjects: List[Tuple[str, str]], tokens: int, cost: float):
+        self._budgets = budgets
+        self.subjects = subjects
+        self.tokens = tokens
+        self.cost = cost
+        self._settled = False
+    
+    def settle(self, actual_tokens: Optional[int] = None, actual_cost: Optional[float] = None):
+        """
+        Release the reservation, refunding what the request did not use
+        
+        Args:
+            actual_tokens: Tokens the call consumed (0 or None when nothing was sent)
+            actual_cost: Dollars the call cost
+        """
+        if not self._settled:
+            self._settled = True
+            self._budgets._settle(self, actual_tokens or 0, actual_cost or 0.0)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.settle()
+
+
+class UsageBudgets:
+    """Enforces per-user and per-tenant usage budgets before requests are sent"""
+    
+    def __init__(
+        self,
+        user_limits: BudgetLimits = None,
+        tenant_limits: BudgetLimits = None,
+        overrides: Dict[str, BudgetLimits] = None,
+        user_tenants: Dict[str, str] = None,
+        ledger: Optional[UsageLedger] = None,
+        clock: Callable[[], float] = time.monotonic,
+        wall_clock: Callable[[], float] = time.time
+    ):
+        """
+        Initialize the budgets
+        
+        Args:
+            user_limits: Default limits for every user
+            tenant_limits: Default limits for every tenant
+            overrides: Limits for specific subjects, keyed "user:<id>" or "tenant:<id>"
+            user_tenants: Tenant of each user id; users without one only have user budgets
+            ledger: Usage ledger for dollars spent today across all workers;
+                without one, spend is counted in this process only
+            clock: Monotonic time source for token refills
+            wall_clock: Time source for the UTC day of dollar budgets
+        """
+        self.user_limits = user_limits or BudgetLimits()
+        self.tenant_limits = tenant_limits or BudgetLimits()
+        self.overrides = overrides or {}
+        self.user_tenants = {str(user): str(tenant) for user, tenant in (user_tenants or {}).items()}
+        self.ledger = ledger
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.logger = logging.getLogger(__name__)
+        
+        self._lock = threading.Lock()
+        self._states: Dict[Tuple[str, str], _SubjectState] = {}
+        self._tenant_resolver: Optional[Callable[[Any], Optional[str]]] = None
+        
+        # Metrics
+        self.reservations = 0
+        self.rejections = 0
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], ledger: Optional[UsageLedger] = None) -> "UsageBudgets":
+        """
+        Build budgets from configuration
+        
+        Args:
+            config: {'user': {limits}, 'tenant': {limits}, 'overrides': {'user:7': {limits}},
+                'user_tenants': {user_id: tenant_id}}
+            ledger: Usage ledger shared with the AI service
+        """
+        return cls(
+            user_limits=BudgetLimits.from_config(config.get('user')),
+            tenant_limits=BudgetLimits.from_config(config.get('tenant')),
+            overrides={key: BudgetLimits.from_config(limits) for key, limits in config.get('overrides', {}).items()},
+            user_tenants=config.get('user_tenants'),
+            ledger=ledger
+        )
+    
+    def set_tenant_resolver(self, resolver: Callable[[Any], Optional[str]]):
+        """Look tenants up with a callable instead of the static user_tenants map"""
+        self._tenant_resolver = resolver
+    
+    def tenant_for(self, user_id: Any) -> Optional[str]:
+        if user_id is None:
+            return None
+        if self._tenant_resolver is not None:
+            tenant = self._tenant_resolver(user_id)
+            return str(tenant) if tenant is not None else None
+        return self.user_tenants.get(str(user_id))
+    
+    def limits_for(self, subject: str, key: str) -> BudgetLimits:
+        override = self.overrides.get(f"{subject}:{key}")
+        if override is not None:
+            return override
+        return self.user_limits if subject == SUBJECT_USER else self.tenant_limits
+    
+    def _subjects(self, user_id: Any) -> List[Tuple[str, str]]:
+        subjects = [(SUBJECT_USER, str(user_id))]
+        tenant = self.tenant_for(user_id)
+        if tenant is not None:
+            subjects.append((SUBJECT_TENANT, tenant))
+        return subjects
+    
+    def _state(self, subject: Tuple[str, str], now: float) -> _SubjectState:
+        """Subject state with its token bucket refilled (call with the lock held)"""
+        state = self._states.get(subject)
+        limits = self.limits_for(*subject)
+        if state is None:
+            state = self._states[subject] = _SubjectState(
+                limits=limits,
+                token_allowance=float(limits.tokens_per_minute or 0),
+                last_refill=now
+            )
+        state.limits = limits
+        if limits.tokens_per_minute:
+            elapsed = now - state.last_refill
+            state.token_allowance = min(
+                float(limits.tokens_per_minute),
+                state.token_allowance + elapsed * limits.tokens_per_minute / 60.0
+            )
+        state.last_refill = now
+        return state
+    
+    def _today(self) -> str:
+        return datetime.fromtimestamp(self.wall_clock(), tz=timezone.utc).strftime("%Y-%m-%d")
+    
+    def _spent_today(self, subject: Tuple[str, str], state: _SubjectState, day: str) -> float:
+        """Dollars already spent today, not counting reservations in flight"""
+        if self.ledger is not None:
+            scope = SCOPE_USER if subject[0] == SUBJECT_USER else SCOPE_TENANT
+            return self.ledger.get_totals(scope, subject[1], day).cost
+        return state.spent.get(day, 0.0)
+    
+    def _violation(
+        self,
+        subject: Tuple[str, str],
+        state: _SubjectState,
+        tokens: int,
+        cost: float,
+        day: str
+    ) -> Optional[BudgetExceededError]:
+        limits = state.limits
+        kind, key = subject
+        if limits.max_concurrent is not None and state.in_flight >= limits.max_concurrent:
+            return BudgetExceededError(
+                f"{kind} {key} already has {state.in_flight} requests in flight", kind, key, LIMIT_CONCURRENT
+            )
+        if limits.tokens_per_minute:
+            # A request larger than the whole budget waits for a full bucket rather than forever
+            needed = min(tokens, limits.tokens_per_minute)
+            if state.token_allowance < needed:
+                retry_after = (needed - state.token_allowance) * 60.0 / limits.tokens_per_minute
+                return BudgetExceededError(
+                    f"{kind} {key} is over its {limits.tokens_per_minute} tokens/minute budget",
+                    kind, key, LIMIT_TOKENS_PER_MINUTE, retry_after
+                )
+        if limits.dollars_per_day is not None:
+            spent = self._spent_today(subject, state, day) + state.reserved_cost
+            if spent + cost > limits.dollars_per_day:
+                now = datetime.fromtimestamp(self.wall_clock(), tz=timezone.utc)
+                retry_after = 86400 - (now.hour * 3600 + now.minute * 60 + now.second)
+                return BudgetExceededError(
+                    f"{kind} {key} has spent ${spent:.2f} of its ${limits.dollars_per_day:.2f} daily budget",
+                    kind, key, LIMIT_DOLLARS_PER_DAY, retry_after
+                )
+        return None
+    
+    def check(self, user_id: Any, tokens: int, cost: float) -> Optional[BudgetExceededError]:
+        """
+        Whether a request would fit, without reserving anything
+        
+        Returns:
+            The first budget it would exceed, or None
+        """
+        with self._lock:
+            now = self.clock()
+            day = self._today()
+            for subject in self._subjects(user_id):
+                violation = self._violation(subject, self._state(subject, now), tokens, cost, day)
+                if violation is not None:
+                    return violation
+        return None
+    
+    def reserve(self, user_id: Any, tokens: int, cost: float) -> BudgetReservation:
+        """
+        Reserve a request's estimated usage against its user's and tenant's budgets
+        
+        Args:
+            user_id: Requesting user
+            tokens: Prompt tokens plus the completion budget
+            cost: Estimated dollars at the routed model's prices
+        
+        Returns:
+            BudgetReservation to settle when the request finishes
+        
+        Raises:
+            BudgetExceededError: If any budget would be exceeded; nothing is reserved
+        """
+        subjects = self._subjects(user_id)
+        with self._lock:
+            now = self.clock()
+            day = self._today()
+            states = [self._state(subject, now) for subject in subjects]
+            for subject, state in zip(subjects, states):
+                violation = self._violation(subject, state, tokens, cost, day)
+                if violation is not None:
+                    self.rejections += 1
+                    state.rejections[violation.limit] = state.rejections.get(violation.limit, 0) + 1
+                    raise violation
+            
+            for state in states:
+                state.in_flight += 1
+                state.reserved_cost += cost
+                if state.limits.tokens_per_minute:
+                    state.token_allowance -= min(tokens, state.limits.tokens_per_minute)
+            self.reservations += 1
+        return BudgetReservation(self, subjects, tokens, cost)
+    
+    def _settle(self, reservation: BudgetReservation, actual_tokens: int, actual_cost: float):
+        with self._lock:
+            now = self.clock()
+            day = self._today()
+            for subject in reservation.subjects:
+                state = self._state(subject, now)
+                state.in_flight = max(0, state.in_flight - 1)
+                state.reserved_cost = max(0.0, state.reserved_cost - reservation.cost)
+                limits = state.limits
+                if limits.tokens_per_minute:
+                    # Refund the part of the completion budget the response did not use
+                    reserved = min(reservation.tokens, limits.tokens_per_minute)
+                    state.token_allowance = min(
+                        float(limits.tokens_per_minute),
+                        state.token_allowance + max(0, reserved - actual_tokens)
+                    )
+                if self.ledger is None and actual_cost:
+                    # Keep only today's running total
+                    state.spent = {day: state.spent.get(day, 0.0) + actual_cost}
+    
+    def get_usage(self, user_id: Any) -> Dict[str, Any]:
+        """
+        Current budget consumption of a user and their tenant
+        
+        Returns:
+            Per subject: limits, tokens available this minute, dollars spent
+            today (including requests in flight), calls in flight and rejections
+        """
+        usage = {}
+        with self._lock:
+            now = self.clock()
+            day = self._today()
+            for subject in self._subjects(user_id):
+                state = self._state(subject, now)
+                limits = state.limits
+                spent = self._spent_today(subject, state, day)
+                usage[subject[0]] = {
+                    "key": subject[1],
+                    "limits": {
+                        LIMIT_TOKENS_PER_MINUTE: limits.tokens_per_minute,
+                        LIMIT_DOLLARS_PER_DAY: limits.dollars_per_day,
+                        LIMIT_CONCURRENT: limits.max_concurrent
+                    },
+                    "tokens_available": int(state.token_allowance) if limits.tokens_per_minute else None,
+                    "dollars_spent_today": round(spent, 6),
+                    "dollars_reserved": round(state.reserved_cost, 6),
+                    "dollars_remaining_today": (
+                        round(max(0.0, limits.dollars_per_day - spent - state.reserved_cost), 6)
+                        if limits.dollars_per_day is not None else None
+                    ),
+                    "in_flight": state.in_flight,
+                    "rejections": dict(state.rejections),
+                    "day": day
+                }
+        return usage
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get budget statistics for this process"""
+        with self._lock:
+            return {
+                "enabled": True,
+                "subjects": len(self._states),
+                "reservations": self.reservations,
+                "rejections": self.rejections,
+                "in_flight": sum(
+                    state.in_flight for (subject, _), state in self._states.items() if subject == SUBJECT_USER
+                )
+            }
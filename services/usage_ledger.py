@@ -0,0 +1,691 @@
+"""
+Usage Ledger
+
+Persistent record of OpenAI token usage and cost. Calls are buffered in
+memory and written in batches by a background thread, so recording usage
+never waits on the database. Every flush also updates per-user,
+per-tenant, per-executive, per-model and per-day rollup rows, which makes usage
+totals and billing lookups primary-key reads instead of table scans.
+
+Records and rollups go to the application database by default, so every
+host shares one ledger; a SQLite file store remains for single-host setups
+and tests.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+# Rollup scopes; "total" has the single key ALL_KEYS
+SCOPE_TOTAL = "total"
+SCOPE_USER = "user"
+SCOPE_TENANT = "tenant"
+SCOPE_EXECUTIVE = "executive"
+SCOPE_MODEL = "model"
+
+# Key and day used for rows that aggregate over all keys or all days
+ALL_KEYS = "*"
+ALL_DAYS = "*"
+
+_COUNTERS = ("requests", "prompt_tokens", "completion_tokens", "total_tokens", "cost")
+
+
+@dataclass
+class UsageRecord:
+    """Token usage and cost of one OpenAI call"""
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    cost: float
+    user_id: Optional[str] = None
+    executive_type: Optional[str] = None
+    request_type: str = "completion"
+    timestamp: float = field(default_factory=time.time)
+    tenant_id: Optional[str] = None  # Rolled up only; not a usage_records column
+    
+    @property
+    def day(self) -> str:
+        """UTC calendar day the call belongs to"""
+        return datetime.fromtimestamp(self.timestamp, tz=timezone.utc).strftime("%Y-%m-%d")
+    
+    def rollup_keys(self) -> List[Tuple[str, str, str]]:
+        """(scope, key, day) rows this record adds to, for its day and all time"""
+        keys = [(SCOPE_TOTAL, ALL_KEYS), (SCOPE_MODEL, self.model)]
+        if self.user_id is not None:
+            keys.append((SCOPE_USER, str(self.user_id)))
+        if self.tenant_id is not None:
+            keys.append((SCOPE_TENANT, str(self.tenant_id)))
+        if self.executive_type:
+            keys.append((SCOPE_EXECUTIVE, self.executive_type))
+        day = self.day
+        return [(scope, key, period) for scope, key in keys for period in (day, ALL_DAYS)]
+
+
+@dataclass
+class UsageTotals:
+    """Aggregated usage for one rollup row"""
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    cost: float = 0.0
+    
+    def add_record(self, record: UsageRecord):
+        self.requests += 1
+        self.prompt_tokens += record.prompt_tokens
+        self.completion_tokens += record.completion_tokens
+        self.total_tokens += record.total_tokens
+        self.cost += record.cost
+    
+    def add(self, other: "UsageTotals"):
+        for name in _COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "cost": round(self.cost, 6)
+        }
+
+
+class SQLiteLedgerStore:
+    """Usage records and rollups in a SQLite file, for a single host or tests"""
+    
+    backend = "sqlite"
+    ready = True
+    
+    def __init__(self, path: str, timeout: float = 30.0):
+        """
+        Open the database file, creating its tables
+        
+        Args:
+            path: SQLite database file
+            timeout: Seconds to wait for another worker's write lock
+        """
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS usage_records ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "timestamp REAL NOT NULL, "
+            "day TEXT NOT NULL, "
+            "user_id TEXT, "
+            "executive_type TEXT, "
+            "model TEXT NOT NULL, "
+            "request_type TEXT NOT NULL, "
+            "prompt_tokens INTEGER NOT NULL, "
+            "completion_tokens INTEGER NOT NULL, "
+            "total_tokens INTEGER NOT NULL, "
+            "cost REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_usage_records_user_time ON usage_records (user_id, timestamp)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS usage_rollups ("
+            "scope TEXT NOT NULL, "
+            "key TEXT NOT NULL, "
+            "day TEXT NOT NULL, "
+            "requests INTEGER NOT NULL, "
+            "prompt_tokens INTEGER NOT NULL, "
+            "completion_tokens INTEGER NOT NULL, "
+            "total_tokens INTEGER NOT NULL, "
+            "cost REAL NOT NULL, "
+            "PRIMARY KEY (scope, key, day))"
+        )
+    
+    def init_app(self, app):
+        """The file needs no application"""
+    
+    def write(self, batch: List[UsageRecord], deltas: Dict[Tuple[str, str, str], UsageTotals]):
+        """Insert records and apply rollup deltas in one transaction"""
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO usage_records (timestamp, day, user_id, executive_type, model, request_type, "
+                "prompt_tokens, completion_tokens, total_tokens, cost) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        record.timestamp, record.day, record.user_id, record.executive_type, record.model,
+                        record.request_type, record.prompt_tokens, record.completion_tokens,
+                        record.total_tokens, record.cost
+                    )
+                    for record in batch
+                ]
+            )
+            conn.executemany(
+                "INSERT INTO usage_rollups (scope, key, day, requests, prompt_tokens, completion_tokens, "
+                "total_tokens, cost) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (scope, key, day) DO UPDATE SET "
+                "requests = requests + excluded.requests, "
+                "prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                "completion_tokens = completion_tokens + excluded.completion_tokens, "
+                "total_tokens = total_tokens + excluded.total_tokens, "
+                "cost = cost + excluded.cost",
+                [
+                    (scope, key, day, totals.requests, totals.prompt_tokens, totals.completion_tokens,
+                     totals.total_tokens, totals.cost)
+                    for (scope, key, day), totals in deltas.items()
+                ]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def read_totals(self, rollup_key: Tuple[str, str, str]) -> UsageTotals:
+        """Flushed usage for one (scope, key, day) row"""
+        row = self._conn.execute(
+            "SELECT requests, prompt_tokens, completion_tokens, total_tokens, cost FROM usage_rollups "
+            "WHERE scope = ? AND key = ? AND day = ?",
+            rollup_key
+        ).fetchone()
+        return UsageTotals(*row) if row else UsageTotals()
+    
+    def read_daily_totals(self, scope: str, key: str, start_day: str, end_day: str) -> Dict[str, UsageTotals]:
+        """Flushed per-day usage for one key between two days (inclusive)"""
+        rows = self._conn.execute(
+            "SELECT day, requests, prompt_tokens, completion_tokens, total_tokens, cost FROM usage_rollups "
+            "WHERE scope = ? AND key = ? AND day >= ? AND day <= ? AND day != ? ORDER BY day",
+            (scope, key, start_day, end_day, ALL_DAYS)
+        ).fetchall()
+        return {row[0]: UsageTotals(*row[1:]) for row in rows}
+    
+    def read_records(
+        self,
+        user_id: Optional[str],
+        start: Optional[float],
+        end: Optional[float],
+        limit: int
+    ) -> List[UsageRecord]:
+        """Flushed records, newest first"""
+        clauses, params = [], []
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("timestamp < ?")
+            params.append(end)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        rows = self._conn.execute(
+            "SELECT model, prompt_tokens, completion_tokens, total_tokens, cost, user_id, executive_type, "
+            f"request_type, timestamp FROM usage_records {where}ORDER BY timestamp DESC LIMIT ?",
+            (*params, limit)
+        ).fetchall()
+        return [UsageRecord(*row) for row in rows]
+    
+    def close(self):
+        self._conn.close()
+
+
+class DatabaseLedgerStore:
+    """
+    Usage records and rollups in the application database, shared by every host
+    
+    Writes go through the models' TokenUsageRecord and TokenUsageRollup tables
+    (migration 006). The store is not ready until init_app() binds the Flask
+    app; until then the ledger keeps records buffered.
+    """
+    
+    backend = "database"
+    
+    def __init__(self, app=None):
+        self.app = app
+    
+    @property
+    def ready(self) -> bool:
+        return self.app is not None
+    
+    def init_app(self, app):
+        """Bind the Flask app whose database the ledger writes to"""
+        self.app = app
+    
+    def write(self, batch: List[UsageRecord], deltas: Dict[Tuple[str, str, str], UsageTotals]):
+        """Insert records and apply rollup deltas in one transaction"""
+        from models import db, TokenUsageRecord
+        
+        # A fresh app context gets its own session, separate from any request's
+        with self.app.app_context():
+            try:
+                db.session.execute(
+                    insert(TokenUsageRecord.__table__),
+                    [
+                        {
+                            "timestamp": record.timestamp,
+                            "day": record.day,
+                            "user_id": record.user_id,
+                            "executive_type": record.executive_type,
+                            "model": record.model,
+                            "request_type": record.request_type,
+                            "prompt_tokens": record.prompt_tokens,
+                            "completion_tokens": record.completion_tokens,
+                            "total_tokens": record.total_tokens,
+                            "cost": record.cost
+                        }
+                        for record in batch
+                    ]
+                )
+                self._apply_deltas(db.session, deltas)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+    
+    def _apply_deltas(self, session, deltas: Dict[Tuple[str, str, str], UsageTotals]):
+        """Add rollup deltas, as one upsert where the dialect supports it"""
+        from models import TokenUsageRollup
+        
+        rows = [
+            {"scope": scope, "key": key, "day": day, **{name: getattr(totals, name) for name in _COUNTERS}}
+            for (scope, key, day), totals in deltas.items()
+        ]
+        dialect = session.get_bind().dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            if dialect == "sqlite":
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            table = TokenUsageRollup.__table__
+            statement = dialect_insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.scope, table.c.key, table.c.day],
+                set_={name: table.c[name] + statement.excluded[name] for name in _COUNTERS}
+            )
+            session.execute(statement, rows)
+            return
+        
+        # Other dialects lock and update each row; a row first created by another
+        # host at the same moment fails this flush, which the ledger retries
+        for row in rows:
+            rollup = session.get(TokenUsageRollup, (row["scope"], row["key"], row["day"]), with_for_update=True)
+            if rollup is None:
+                session.add(TokenUsageRollup(**row))
+            else:
+                for name in _COUNTERS:
+                    setattr(rollup, name, getattr(rollup, name) + row[name])
+    
+    def read_totals(self, rollup_key: Tuple[str, str, str]) -> UsageTotals:
+        """Flushed usage for one (scope, key, day) row"""
+        if not self.ready:
+            return UsageTotals()
+        from models import db, TokenUsageRollup
+        
+        with self.app.app_context():
+            rollup = db.session.get(TokenUsageRollup, rollup_key)
+            return self._totals(rollup) if rollup is not None else UsageTotals()
+    
+    def read_daily_totals(self, scope: str, key: str, start_day: str, end_day: str) -> Dict[str, UsageTotals]:
+        """Flushed per-day usage for one key between two days (inclusive)"""
+        if not self.ready:
+            return {}
+        from models import TokenUsageRollup
+        
+        with self.app.app_context():
+            rollups = TokenUsageRollup.query.filter(
+                TokenUsageRollup.scope == scope,
+                TokenUsageRollup.key == key,
+                TokenUsageRollup.day >= start_day,
+                TokenUsageRollup.day <= end_day,
+                TokenUsageRollup.day != ALL_DAYS
+            ).order_by(TokenUsageRollup.day).all()
+            return {rollup.day: self._totals(rollup) for rollup in rollups}
+    
+    def read_records(
+        self,
+        user_id: Optional[str],
+        start: Optional[float],
+        end: Optional[float],
+        limit: int
+    ) -> List[UsageRecord]:
+        """Flushed records, newest first"""
+        if not self.ready:
+            return []
+        from models import TokenUsageRecord
+        
+        with self.app.app_context():
+            query = TokenUsageRecord.query
+            if user_id is not None:
+                query = query.filter(TokenUsageRecord.user_id == user_id)
+            if start is not None:
+                query = query.filter(TokenUsageRecord.timestamp >= start)
+            if end is not None:
+                query = query.filter(TokenUsageRecord.timestamp < end)
+            rows = query.order_by(TokenUsageRecord.timestamp.desc()).limit(limit).all()
+            return [
+                UsageRecord(
+                    model=row.model,
+                    prompt_tokens=row.prompt_tokens,
+                    completion_tokens=row.completion_tokens,
+                    total_tokens=row.total_tokens,
+                    cost=row.cost,
+                    user_id=row.user_id,
+                    executive_type=row.executive_type,
+                    request_type=row.request_type,
+                    timestamp=row.timestamp
+                )
+                for row in rows
+            ]
+    
+    @staticmethod
+    def _totals(rollup) -> UsageTotals:
+        return UsageTotals(*(getattr(rollup, name) for name in _COUNTERS))
+    
+    def close(self):
+        """Connections belong to the application's engine"""
+
+
+LedgerStore = Union[SQLiteLedgerStore, DatabaseLedgerStore]
+
+# Errors a store raises when the database is unavailable; the batch is kept and retried
+STORE_ERRORS = (sqlite3.Error, SQLAlchemyError)
+
+
+class UsageLedger:
+    """Buffered usage records and rollups, written in batches to a ledger store"""
+    
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        flush_interval: float = 2.0,
+        flush_batch_size: int = 200,
+        max_buffer_records: int = 100000,
+        timeout: float = 30.0,
+        clock: Callable[[], float] = time.time,
+        store: Optional[LedgerStore] = None
+    ):
+        """
+        Initialize the ledger and start its flush thread
+        
+        Args:
+            path: SQLite database file, used when no store is given
+            flush_interval: Seconds between background flushes
+            flush_batch_size: Buffered records that trigger an early flush
+            max_buffer_records: Records kept while the database is unavailable;
+                the oldest are dropped beyond it
+            timeout: Seconds to wait for another worker's write lock
+            clock: Time source for record timestamps, replaceable in tests
+            store: Where records and rollups are written
+        """
+        if store is None:
+            if path is None:
+                raise ValueError("UsageLedger needs a path or a store")
+            store = SQLiteLedgerStore(path, timeout=timeout)
+        self.store = store
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_batch_size = max(1, flush_batch_size)
+        self.max_buffer_records = max_buffer_records
+        self.timeout = timeout
+        self.clock = clock
+        self.logger = logging.getLogger(__name__)
+        
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # One flush at a time
+        self._store_lock = threading.Lock()
+        self._buffer: List[UsageRecord] = []
+        self._pending: Dict[Tuple[str, str, str], UsageTotals] = defaultdict(UsageTotals)
+        self._flushing: Dict[Tuple[str, str, str], UsageTotals] = {}
+        self.recorded = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.flush_failures = 0
+        self.dropped = 0
+        self.last_flush_seconds = 0.0
+        
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="usage-ledger-flush", daemon=True)
+        self._thread.start()
+    
+    def init_app(self, app):
+        """Bind the Flask app for stores that write to the application database"""
+        self.store.init_app(app)
+        self._wakeup.set()
+    
+    def record(
+        self,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cost: float,
+        user_id: Any = None,
+        executive_type: str = None,
+        request_type: str = "completion",
+        total_tokens: int = None,
+        tenant_id: Any = None
+    ) -> UsageRecord:
+        """
+        Buffer one call's usage; the database write happens in the background
+        
+        Returns:
+            The buffered UsageRecord
+        """
+        record = UsageRecord(
+            model=model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=total_tokens if total_tokens is not None else prompt_tokens + completion_tokens,
+            cost=cost,
+            user_id=str(user_id) if user_id is not None else None,
+            executive_type=executive_type,
+            request_type=request_type,
+            timestamp=self.clock(),
+            tenant_id=str(tenant_id) if tenant_id is not None else None
+        )
+        with self._lock:
+            self._buffer.append(record)
+            for key in record.rollup_keys():
+                self._pending[key].add_record(record)
+            self.recorded += 1
+            if len(self._buffer) > self.max_buffer_records:
+                self._drop_oldest(len(self._buffer) - self.max_buffer_records)
+            full = len(self._buffer) >= self.flush_batch_size
+        if full:
+            self._wakeup.set()
+        return record
+    
+    def _drop_oldest(self, count: int):
+        """Discard the oldest buffered records (call with the lock held)"""
+        for record in self._buffer[:count]:
+            for key in record.rollup_keys():
+                totals = self._pending[key]
+                totals.requests -= 1
+                totals.prompt_tokens -= record.prompt_tokens
+                totals.completion_tokens -= record.completion_tokens
+                totals.total_tokens -= record.total_tokens
+                totals.cost -= record.cost
+        del self._buffer[:count]
+        self.dropped += count
+        self.logger.error(f"Usage ledger buffer full; dropped {count} records")
+    
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.logger.error(f"Usage ledger flush thread error: {e}")
+    
+    def flush(self) -> int:
+        """
+        Write buffered records and their rollup deltas in one transaction
+        
+        Returns:
+            Number of records written
+        """
+        if not self.store.ready:
+            return 0
+        with self._flush_lock:
+            with self._lock:
+                if not self._buffer:
+                    return 0
+                batch, self._buffer = self._buffer, []
+                deltas, self._pending = self._pending, defaultdict(UsageTotals)
+                self._flushing = deltas
+            
+            start = time.perf_counter()
+            try:
+                # Rollup readers hold the store lock too, so they never see a
+                # committed batch that is also still counted as unflushed
+                with self._store_lock:
+                    self._write(batch, deltas)
+                    with self._lock:
+                        self._flushing = {}
+            except STORE_ERRORS as e:
+                self.logger.error(f"Usage ledger flush failed, will retry: {e}")
+                with self._lock:
+                    # Put the batch back in front of anything recorded meanwhile
+                    self._buffer = batch + self._buffer
+                    for key, totals in self._pending.items():
+                        deltas[key].add(totals)
+                    self._pending = defaultdict(UsageTotals, deltas)
+                    self._flushing = {}
+                    self.flush_failures += 1
+                    if len(self._buffer) > self.max_buffer_records:
+                        self._drop_oldest(len(self._buffer) - self.max_buffer_records)
+                return 0
+            
+            with self._lock:
+                self.flushed += len(batch)
+                self.flushes += 1
+                self.last_flush_seconds = time.perf_counter() - start
+            return len(batch)
+    
+    def _write(self, batch: List[UsageRecord], deltas: Dict[Tuple[str, str, str], UsageTotals]):
+        """Insert records and apply rollup deltas (call with the store lock held)"""
+        self.store.write(batch, deltas)
+    
+    def get_totals(self, scope: str = SCOPE_TOTAL, key: Any = ALL_KEYS, day: str = ALL_DAYS) -> UsageTotals:
+        """
+        Usage for one rollup row, including records not yet flushed by this process
+        
+        Args:
+            scope: SCOPE_TOTAL, SCOPE_USER, SCOPE_TENANT, SCOPE_EXECUTIVE or SCOPE_MODEL
+            key: User id, tenant id, executive type or model (ALL_KEYS for SCOPE_TOTAL)
+            day: UTC day as YYYY-MM-DD, or ALL_DAYS
+        """
+        rollup_key = (scope, str(key), day)
+        with self._store_lock:
+            totals = self.store.read_totals(rollup_key)
+            with self._lock:
+                for unflushed in (self._flushing, self._pending):
+                    if rollup_key in unflushed:
+                        totals.add(unflushed[rollup_key])
+        return totals
+    
+    def get_daily_totals(self, scope: str, key: Any, start_day: str, end_day: str) -> Dict[str, UsageTotals]:
+        """Per-day usage for one key between two UTC days (inclusive), e.g. for a billing period"""
+        with self._store_lock:
+            daily = self.store.read_daily_totals(scope, str(key), start_day, end_day)
+            with self._lock:
+                for unflushed in (self._flushing, self._pending):
+                    for (row_scope, row_key, day), totals in unflushed.items():
+                        if row_scope == scope and row_key == str(key) and day != ALL_DAYS and start_day <= day <= end_day:
+                            daily.setdefault(day, UsageTotals()).add(totals)
+        return dict(sorted(daily.items()))
+    
+    def get_records(
+        self,
+        user_id: Any = None,
+        start: float = None,
+        end: float = None,
+        limit: int = 1000
+    ) -> List[UsageRecord]:
+        """Flushed records, newest first, optionally for one user and time range"""
+        with self._store_lock:
+            return self.store.read_records(str(user_id) if user_id is not None else None, start, end, limit)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Buffer and flush statistics for this process"""
+        with self._lock:
+            return {
+                "backend": self.store.backend,
+                "path": self.path,
+                "buffered": len(self._buffer),
+                "recorded": self.recorded,
+                "flushed": self.flushed,
+                "flushes": self.flushes,
+                "flush_failures": self.flush_failures,
+                "dropped": self.dropped,
+                "last_flush_seconds": round(self.last_flush_seconds, 4)
+            }
+    
+    def close(self):
+        """Stop the flush thread and write whatever is still buffered"""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join(timeout=self.timeout)
+        self.flush()
+        with self._store_lock:
+            self.store.close()
+
+
+_ledgers: Dict[str, UsageLedger] = {}
+_ledgers_lock = threading.Lock()
+
+
+def get_usage_ledger(config: Dict[str, Any] = None) -> UsageLedger:
+    """
+    Get the process-wide ledger for a backend
+    
+    Every service configured with the same backend (and, for SQLite, the same
+    path) shares one ledger and flush thread; the first configuration seen
+    wins. A 'database' ledger buffers until init_app() binds the Flask app.
+    
+    Args:
+        config: Ledger configuration ('backend' is 'database' or 'sqlite', path,
+            flush_interval, flush_batch_size, max_buffer_records, timeout)
+    
+    Returns:
+        Shared UsageLedger
+    """
+    config = config or {}
+    backend = config.get('backend', 'database')
+    if backend == 'database':
+        registry_key, path = backend, None
+    elif backend == 'sqlite':
+        registry_key = path = os.path.abspath(config.get('path', 'data/usage_ledger.db'))
+    else:
+        raise ValueError(f"Unknown usage ledger backend: {backend}")
+    
+    timeout = config.get('timeout', 30.0)
+    with _ledgers_lock:
+        ledger = _ledgers.get(registry_key)
+        if ledger is None or ledger._stopped.is_set():
+            store = DatabaseLedgerStore() if backend == 'database' else SQLiteLedgerStore(path, timeout=timeout)
+            ledger = _ledgers[registry_key] = UsageLedger(
+                path,
+                flush_interval=config.get('flush_interval', 2.0),
+                flush_batch_size=config.get('flush_batch_size', 200),
+                max_buffer_records=config.get('max_buffer_records', 100000),
+                timeout=timeout,
+                store=store
+            )
+        return ledger
@@ -7,6 +7,8 @@ using ChromaDB and OpenAI embeddings.
 
 import logging
 import os
+import threading
+import time
 import uuid
 from typing import List, Dict, Optional, Any, Tuple
 from dataclasses import dataclass
@@ -18,8 +20,18 @@ from chromadb.config import Settings
 import openai
 from openai import OpenAI
 
+from services.openai_clients import get_openai_client
+from services.embedding_batches import EmbeddingBatcher, plan_embedding_batches
+from services.embedding_cache import EmbeddingCache, get_embedding_cache, normalize_embedding_text
+from services.vector_index import VectorIndex
+from services.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from services.ai_integration import count_text_tokens
+
 logger = logging.getLogger(__name__)
 
+# search_similar_content modes: embeddings only, BM25 only, or both fused by rank
+SEARCH_MODES = ('vector', 'lexical', 'hybrid')
+
 
 @dataclass
 class DocumentChunk:
@@ -39,9 +51,11 @@ class SearchResult:
     chunk_id: str
     document_id: str
     content: str
-    similarity_score: float
+    similarity_score: float  # Normalized BM25 score for chunks found only lexically
     metadata: Dict[str, Any]
     chunk_index: int
+    lexical_score: Optional[float] = None  # BM25 score, in lexical and hybrid searches
+    fusion_score: Optional[float] = None  # Reciprocal rank fusion score, in hybrid searches
 
 
 @dataclass
@@ -54,7 +68,12 @@ class EmbeddingStats:
 
 
 class VectorDatabaseService:
-    """Service for vector database operations and semantic search"""
+    """
+    Service for vector database operations and semantic search
+    
+    Instances are thread-safe and meant to be long-lived; use
+    get_vector_database_service to share one per ChromaDB path and collection.
+    """
     
     def __init__(self, config: Dict[str, Any]):
         self.config = config
@@ -70,8 +89,73 @@ class VectorDatabaseService:
         # ChromaDB setup
         self.chroma_path = config.get('chroma_path', './chroma_db')
         os.makedirs(self.chroma_path, exist_ok=True)
+        self._collection_lock = threading.Lock()
+        
+        # 'numpy' stores vectors in an in-process VectorIndex under chroma_path
+        # instead of a ChromaDB collection; both answer the same calls
+        self.vector_backend = config.get('vector_backend', 'chroma')
+        if self.vector_backend == 'numpy':
+            self.chroma_client = None
+            self.collection = self._open_vector_index()
+        elif self.vector_backend == 'chroma':
+            self._open_chroma_collection()
+        else:
+            raise ValueError(f"Unknown vector backend: {self.vector_backend}")
+        
+        # Initialize OpenAI client
+        if self.openai_api_key:
+            self.openai_client = get_openai_client(
+                'embeddings',
+                api_key=self.openai_api_key,
+                timeout=config.get('embedding_timeout'),
+                client_class=OpenAI
+            )
+            self.logger.info("OpenAI client initialized for embeddings")
+        else:
+            self.openai_client = None
+            self.logger.warning("OpenAI API key not provided - embeddings will not work")
         
-        # Initialize ChromaDB client
+        # Document chunks are embedded in multi-input requests sent concurrently
+        self.embedding_batcher = EmbeddingBatcher(
+            self._create_embeddings,
+            count_tokens=lambda text: count_text_tokens(text, self.embedding_model),
+            max_batch_tokens=config.get('embedding_batch_tokens', 20000),
+            max_batch_inputs=config.get('embedding_batch_size', 256),
+            concurrency=config.get('embedding_concurrency', 4),
+            max_retries=config.get('embedding_max_retries', 3),
+            retryable=self._is_retryable_embedding_error
+        )
+        
+        # Identical chunk and query texts are embedded once and served from a local cache
+        cache_config = config.get('embedding_cache')
+        self.embedding_cache: Optional[EmbeddingCache] = get_embedding_cache(cache_config) if cache_config else None
+        self._embedding_stats_lock = threading.Lock()
+        self.query_embedding_requests = 0
+        self.embedding_requests_saved = 0
+        self.embedding_inputs_saved = 0
+        
+        # Optional BM25 index over chunk text for lexical and hybrid search
+        lexical_config = config.get('lexical_index')
+        self.lexical_index: Optional[LexicalIndex] = None
+        if lexical_config:
+            lexical_config = lexical_config if isinstance(lexical_config, dict) else {}
+            self.lexical_index = LexicalIndex(
+                lexical_config.get('path', os.path.join(self.chroma_path, f"{self.collection_name}.lexical")),
+                k1=lexical_config.get('k1', 1.2),
+                b=lexical_config.get('b', 0.75),
+                max_segments=lexical_config.get('max_segments', 10)
+            )
+        self.search_mode = config.get('search_mode', 'hybrid' if self.lexical_index else 'vector')
+        if self.search_mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {self.search_mode}")
+        self.rrf_k = config.get('rrf_k', 60)
+        self.hybrid_candidates = config.get('hybrid_candidates', 4)  # Per ranking, as a multiple of n_results
+        self.lexical_fallback = config.get('lexical_fallback', True)
+        self.search_counts = {mode: 0 for mode in SEARCH_MODES}
+        self.lexical_fallbacks = 0
+    
+    def _open_chroma_collection(self):
+        """Open the ChromaDB client and get or create the collection"""
         self.chroma_client = chromadb.PersistentClient(
             path=self.chroma_path,
             settings=Settings(
@@ -80,7 +164,6 @@ class VectorDatabaseService:
             )
         )
         
-        # Get or create collection
         try:
             self.collection = self.chroma_client.get_collection(name=self.collection_name)
             self.logger.info(f"Using existing ChromaDB collection: {self.collection_name}")
@@ -90,14 +173,20 @@ class VectorDatabaseService:
                 metadata={"description": "AI Executive Suite document embeddings"}
             )
             self.logger.info(f"Created new ChromaDB collection: {self.collection_name}")
-        
-        # Initialize OpenAI client
-        if self.openai_api_key:
-            self.openai_client = OpenAI(api_key=self.openai_api_key)
-            self.logger.info("OpenAI client initialized for embeddings")
-        else:
-            self.openai_client = None
-            self.logger.warning("OpenAI API key not provided - embeddings will not work")
+    
+    def _open_vector_index(self) -> VectorIndex:
+        """Open the NumPy vector index for the collection"""
+        options = self.config.get('vector_index', {})
+        return VectorIndex(
+            os.path.join(self.chroma_path, f"{self.collection_name}.vectors"),
+            name=self.collection_name,
+            dtype=options.get('dtype', 'float32'),
+            exact_threshold=options.get('exact_threshold', 20000),
+            nprobe=options.get('nprobe', 48),
+            ivf_lists=options.get('ivf_lists'),
+            max_segments=options.get('max_segments', 8),
+            compaction_deleted_ratio=options.get('compaction_deleted_ratio', 0.2)
+        )
     
     def create_document_embeddings(
         self, 
@@ -133,19 +222,22 @@ class VectorDatabaseService:
             chunks = self._split_text_into_chunks(content)
             self.logger.info(f"Split document into {len(chunks)} chunks")
             
-            # Create embeddings for each chunk
+            # Create embeddings in batched requests (skipping cached chunks); they come back in chunk order
+            start_time = time.time()
+            embeddings = self._embed_texts(chunks)
+            elapsed = time.time() - start_time
+            self.logger.info(
+                f"Embedded {len(chunks)} chunks in {elapsed:.2f}s "
+                f"({len(chunks) / elapsed if elapsed > 0 else 0:.1f} chunks/s)"
+            )
+            
             chunk_ids = []
-            embeddings = []
             chunk_contents = []
             chunk_metadatas = []
             
             for i, chunk_content in enumerate(chunks):
                 chunk_id = f"{document_id}_chunk_{i}"
                 chunk_ids.append(chunk_id)
-                
-                # Create embedding
-                embedding = self._create_embedding(chunk_content)
-                embeddings.append(embedding)
                 chunk_contents.append(chunk_content)
                 
                 # Prepare metadata
@@ -165,6 +257,8 @@ class VectorDatabaseService:
                 documents=chunk_contents,
                 metadatas=chunk_metadatas
             )
+            if self.lexical_index is not None:
+                self.lexical_index.add(chunk_ids, chunk_contents, [document_id] * len(chunk_ids))
             
             self.logger.info(f"Successfully created {len(chunk_ids)} embeddings for document {document_id}")
             return chunk_ids
@@ -178,31 +272,53 @@ class VectorDatabaseService:
         query: str, 
         n_results: int = 5,
         document_ids: Optional[List[str]] = None,
-        metadata_filter: Optional[Dict[str, Any]] = None
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        mode: Optional[str] = None
     ) -> List[SearchResult]:
         """
-        Search for similar content using semantic search
+        Search for similar content using semantic, lexical or hybrid search
         
         Args:
             query: Search query text
             n_results: Number of results to return
             document_ids: Optional list of document IDs to search within
             metadata_filter: Optional metadata filters
+            mode: 'vector', 'lexical' or 'hybrid' (defaults to the configured
+                search_mode); hybrid falls back to lexical when the query
+                cannot be embedded, unless lexical_fallback is disabled
             
         Returns:
-            List of search results ordered by similarity
+            List of search results ordered by similarity, or by fused rank in hybrid mode
             
         Raises:
-            ValueError: If OpenAI client is not configured
+            ValueError: If the mode needs an OpenAI client or lexical index that is not configured
         """
-        if not self.openai_client:
-            raise ValueError("OpenAI client not configured - cannot perform semantic search")
+        mode = mode or self.search_mode
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        if mode != 'vector' and self.lexical_index is None:
+            raise ValueError("Lexical index not configured - cannot perform lexical search")
+        if mode != 'lexical' and not self.openai_client:
+            if mode != 'hybrid' or not self.lexical_fallback:
+                raise ValueError("OpenAI client not configured - cannot perform semantic search")
+            mode = self._fall_back_to_lexical("OpenAI client not configured")
+        with self._embedding_stats_lock:
+            self.search_counts[mode] += 1
         
         try:
-            self.logger.info(f"Searching for similar content: {query[:100]}...")
+            self.logger.info(f"Searching for similar content ({mode}): {query[:100]}...")
+            
+            if mode == 'lexical':
+                return self._lexical_search(query, n_results, document_ids, metadata_filter)
             
             # Create embedding for query
-            query_embedding = self._create_embedding(query)
+            try:
+                query_embedding = self._embed_query(query)
+            except Exception as e:
+                if mode != 'hybrid' or not self.lexical_fallback:
+                    raise
+                self._fall_back_to_lexical(f"query embedding failed: {e}")
+                return self._lexical_search(query, n_results, document_ids, metadata_filter)
             
             # Build where clause for filtering
             where_clause = {}
@@ -212,10 +328,11 @@ class VectorDatabaseService:
             if metadata_filter:
                 where_clause.update(metadata_filter)
             
-            # Search in ChromaDB
+            # Search in ChromaDB; hybrid search fuses deeper rankings
+            candidates = n_results if mode == 'vector' else n_results * self.hybrid_candidates
             results = self.collection.query(
                 query_embeddings=[query_embedding],
-                n_results=n_results,
+                n_results=candidates,
                 where=where_clause if where_clause else None
             )
             
@@ -241,6 +358,10 @@ class VectorDatabaseService:
                     )
                     search_results.append(search_result)
             
+            if mode == 'hybrid':
+                lexical_results = self._lexical_search(query, candidates, document_ids, metadata_filter)
+                search_results = self._fuse_rankings(search_results, lexical_results, n_results)
+            
             self.logger.info(f"Found {len(search_results)} similar content pieces")
             return search_results
             
@@ -248,6 +369,109 @@ class VectorDatabaseService:
             self.logger.error(f"Error searching for similar content: {str(e)}")
             raise
     
+    def _fall_back_to_lexical(self, reason: str) -> str:
+        """Record a hybrid search answered lexically"""
+        self.logger.warning(f"Hybrid search falling back to lexical only: {reason}")
+        with self._embedding_stats_lock:
+            self.lexical_fallbacks += 1
+        return 'lexical'
+    
+    def _lexical_search(
+        self,
+        query: str,
+        n_results: int,
+        document_ids: Optional[List[str]],
+        metadata_filter: Optional[Dict[str, Any]]
+    ) -> List[SearchResult]:
+        """
+        BM25 search over chunk text, with content and metadata from the collection
+        
+        Args:
+            query: Search query text
+            n_results: Number of results to return
+            document_ids: Optional list of document IDs to search within
+            metadata_filter: Optional metadata filters, applied to extra BM25 candidates
+            
+        Returns:
+            Search results ordered by BM25 score; similarity_score is the score
+            relative to the best match
+        """
+        hits = self.lexical_index.search(
+            query,
+            n_results * self.hybrid_candidates if metadata_filter else n_results,
+            document_ids=document_ids
+        )
+        if not hits:
+            return []
+        
+        stored = self.collection.get(
+            ids=[chunk_id for chunk_id, _ in hits],
+            where=metadata_filter or None,
+            include=['documents', 'metadatas']
+        )
+        chunks = {
+            chunk_id: (content, metadata or {})
+            for chunk_id, content, metadata in zip(stored['ids'], stored['documents'], stored['metadatas'])
+        }
+        
+        best = hits[0][1]
+        search_results = []
+        for chunk_id, score in hits:
+            if chunk_id not in chunks:
+                continue  # Filtered out by metadata
+            content, metadata = chunks[chunk_id]
+            search_results.append(SearchResult(
+                chunk_id=chunk_id,
+                document_id=metadata.get('document_id', ''),
+                content=content,
+                similarity_score=score / best,
+                metadata=metadata,
+                chunk_index=metadata.get('chunk_index', 0),
+                lexical_score=score
+            ))
+        return search_results[:n_results]
+    
+    def _fuse_rankings(
+        self,
+        vector_results: List[SearchResult],
+        lexical_results: List[SearchResult],
+        n_results: int
+    ) -> List[SearchResult]:
+        """Merge vector and lexical rankings by reciprocal rank fusion"""
+        fused = reciprocal_rank_fusion(
+            [[result.chunk_id for result in vector_results], [result.chunk_id for result in lexical_results]],
+            k=self.rrf_k
+        )
+        lexical_scores = {result.chunk_id: result.lexical_score for result in lexical_results}
+        # Chunks found by both keep their vector similarity
+        by_id = {result.chunk_id: result for result in lexical_results}
+        by_id.update((result.chunk_id, result) for result in vector_results)
+        
+        search_results = []
+        for chunk_id, score in fused[:n_results]:
+            result = by_id[chunk_id]
+            result.lexical_score = lexical_scores.get(chunk_id)
+            result.fusion_score = score
+            search_results.append(result)
+        return search_results
+    
+    def get_search_stats(self) -> Dict[str, Any]:
+        """
+        Search statistics
+        
+        Returns:
+            Default mode, searches per mode, hybrid searches answered lexically
+            and lexical index statistics
+        """
+        with self._embedding_stats_lock:
+            stats = {
+                "mode": self.search_mode,
+                "searches": dict(self.search_counts),
+                "lexical_fallbacks": self.lexical_fallbacks
+            }
+        stats["lexical_index"] = self.lexical_index.get_stats() if self.lexical_index is not None else {"enabled": False}
+        return stats
+    
     def get_document_context(
         self, 
         document_id: str, 
@@ -289,6 +513,8 @@ class VectorDatabaseService:
             
             if results['ids']:
                 self.collection.delete(ids=results['ids'])
+                if self.lexical_index is not None:
+                    self.lexical_index.delete(results['ids'])
                 self.logger.info(f"Deleted {len(results['ids'])} embeddings for document {document_id}")
             
             return True
@@ -337,11 +563,18 @@ class VectorDatabaseService:
             True if successful
         """
         try:
-            self.chroma_client.delete_collection(name=self.collection_name)
-            self.collection = self.chroma_client.create_collection(
-                name=self.collection_name,
-                metadata={"description": "AI Executive Suite document embeddings"}
-            )
+            with self._collection_lock:
+                if self.lexical_index is not None:
+                    self.lexical_index.reset()
+                if self.vector_backend == 'numpy':
+                    self.collection.reset()
+                    self.logger.info(f"Reset collection: {self.collection_name}")
+                    return True
+                self.chroma_client.delete_collection(name=self.collection_name)
+                self.collection = self.chroma_client.create_collection(
+                    name=self.collection_name,
+                    metadata={"description": "AI Executive Suite document embeddings"}
+                )
             self.logger.info(f"Reset collection: {self.collection_name}")
             return True
             
@@ -362,7 +595,7 @@ class VectorDatabaseService:
         try:
             response = self.openai_client.embeddings.create(
                 model=self.embedding_model,
-                input=text.replace('\n', ' ')  # Clean text
+                input=normalize_embedding_text(text)  # Clean text
             )
             return response.data[0].embedding
             
@@ -370,6 +603,108 @@ class VectorDatabaseService:
             self.logger.error(f"Error creating embedding: {str(e)}")
             raise
     
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeddings for document chunks, sending only texts that are not cached
+        
+        Args:
+            texts: Chunk texts
+            
+        Returns:
+            One embedding per text, in order
+        """
+        if self.embedding_cache is None:
+            return self.embedding_batcher.embed(texts)
+        
+        normalized = [normalize_embedding_text(text) for text in texts]
+        embeddings = self.embedding_cache.get_many(self.embedding_model, normalized)
+        # Each distinct uncached text is sent once, even if it repeats within the document
+        missing = list(dict.fromkeys(text for text, embedding in zip(normalized, embeddings) if embedding is None))
+        
+        # Requests saved: batches the whole document would take minus batches actually sent
+        token_counts = {text: self.embedding_batcher.count_tokens(text) for text in dict.fromkeys(normalized)}
+        batch_tokens = self.embedding_batcher.max_batch_tokens
+        batch_inputs = self.embedding_batcher.max_batch_inputs
+        sent = len(plan_embedding_batches(missing, token_counts.__getitem__, batch_tokens, batch_inputs))
+        needed = len(plan_embedding_batches(normalized, token_counts.__getitem__, batch_tokens, batch_inputs))
+        
+        if missing:
+            vectors = self.embedding_batcher.embed(missing)
+            self.embedding_cache.put_many(self.embedding_model, missing, vectors)
+            by_text = dict(zip(missing, vectors))
+            embeddings = [
+                embedding if embedding is not None else by_text[text]
+                for text, embedding in zip(normalized, embeddings)
+            ]
+        
+        with self._embedding_stats_lock:
+            self.embedding_requests_saved += needed - sent
+            self.embedding_inputs_saved += len(normalized) - len(missing)
+        if len(missing) < len(normalized):
+            self.logger.info(f"Embedding cache served {len(normalized) - len(missing)}/{len(normalized)} chunks")
+        return embeddings
+    
+    def _embed_query(self, query: str) -> List[float]:
+        """Embedding for a search query, from the cache when the same query was embedded before"""
+        if self.embedding_cache is None:
+            with self._embedding_stats_lock:
+                self.query_embedding_requests += 1
+            return self._create_embedding(query)
+        
+        normalized = normalize_embedding_text(query)
+        embedding = self.embedding_cache.get(self.embedding_model, normalized)
+        with self._embedding_stats_lock:
+            if embedding is None:
+                self.query_embedding_requests += 1
+            else:
+                self.embedding_requests_saved += 1
+                self.embedding_inputs_saved += 1
+        if embedding is None:
+            embedding = self._create_embedding(normalized)
+            self.embedding_cache.put(self.embedding_model, normalized, embedding)
+        return embedding
+    
+    def get_embedding_stats(self) -> Dict[str, Any]:
+        """
+        Embedding request statistics
+        
+        Returns:
+            Requests sent and saved by the cache, inputs served from the cache,
+            batching statistics and cache statistics (hit rate, entries, evictions)
+        """
+        with self._embedding_stats_lock:
+            stats = {
+                "requests": self.embedding_batcher.get_stats()["requests"] + self.query_embedding_requests,
+                "requests_saved": self.embedding_requests_saved,
+                "inputs_saved": self.embedding_inputs_saved
+            }
+        stats["batching"] = self.embedding_batcher.get_stats()
+        stats["cache"] = self.embedding_cache.get_stats() if self.embedding_cache is not None else {"enabled": False}
+        return stats
+    
+    def _create_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Create embeddings for several texts in one OpenAI request
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            Embedding vectors in the order of texts
+        """
+        response = self.openai_client.embeddings.create(
+            model=self.embedding_model,
+            input=[normalize_embedding_text(text) for text in texts]  # Clean text
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    
+    @staticmethod
+    def _is_retryable_embedding_error(error: Exception) -> bool:
+        """Rate limits, timeouts and server errors are retried; invalid requests are not"""
+        return not isinstance(error, (
+            openai.BadRequestError, openai.AuthenticationError, openai.PermissionDeniedError, ValueError
+        ))
+    
     def _split_text_into_chunks(self, text: str) -> List[str]:
         """
         Split text into chunks for embedding
@@ -425,4 +760,78 @@ class VectorDatabaseService:
             
         except Exception as e:
             self.logger.error(f"Error optimizing collection: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+    
+    def shutdown(self):
+        """Release the vector store; the instance must not be used afterwards"""
+        with self._collection_lock:
+            if self.vector_backend == 'numpy':
+                self.collection.close()
+            if self.lexical_index is not None:
+                self.lexical_index.close()
+            self.collection = None
+            self.chroma_client = None
+        self.logger.info(f"Released vector collection: {self.collection_name}")
+
+
+_vector_services: Dict[Tuple[str, str, str], VectorDatabaseService] = {}
+_vector_services_lock = threading.Lock()
+
+
+def get_vector_database_service(config: Dict[str, Any]) -> VectorDatabaseService:
+    """
+    Get the process-wide vector service for a ChromaDB path, collection and
+    vector backend
+    
+    Opening the ChromaDB client and collection and building the OpenAI client
+    happen once per (chroma_path, collection_name, vector_backend); later calls
+    only pay for the embedding and the query.
+    
+    Args:
+        config: VectorDatabaseService configuration
+    
+    Returns:
+        Shared VectorDatabaseService
+    
+    Raises:
+        ValueError: If the shared service for the collection embeds with a
+            different model than the configuration asks for
+    """
+    key = (
+        os.path.abspath(config.get('chroma_path', './chroma_db')),
+        config.get('collection_name', 'ai_executive_documents'),
+        config.get('vector_backend', 'chroma')
+    )
+    with _vector_services_lock:
+        service = _vector_services.get(key)
+        if service is None:
+            service = _vector_services[key] = VectorDatabaseService(config)
+            logger.info(f"Opened shared vector service for {key[1]} at {key[0]} ({key[2]})")
+            return service
+    
+    # A collection holds the vectors of one embedding model; querying it with
+    # another model's embeddings would compare incompatible vectors
+    embedding_model = config.get('embedding_model', 'text-embedding-3-small')
+    if embedding_model != service.embedding_model:
+        raise ValueError(
+            f"Vector service for {key[1]} at {key[0]} embeds with {service.embedding_model}, "
+            f"not {embedding_model}"
+        )
+    if config.get('lexical_index') != service.config.get('lexical_index'):
+        logger.warning(
+            f"Vector service for {key[1]} at {key[0]} was opened with lexical_index="
+            f"{service.config.get('lexical_index')!r}; ignoring {config.get('lexical_index')!r}"
+        )
+    return service
+
+
+def shutdown_vector_database_services():
+    """Shut down every shared vector service; later calls to get_vector_database_service open new ones"""
+    with _vector_services_lock:
+        services = list(_vector_services.values())
+        _vector_services.clear()
+    for service in services:
+        try:
+            service.shutdown()
+        except Exception as e:
+            logger.error(f"Error shutting down vector service {service.collection_name}: {e}")
@@ -0,0 +1,661 @@
+"""
+Vector Index
+
+In-process vector store on NumPy that VectorDatabaseService can use in place
+of a ChromaDB collection: it answers the same add/query/get/delete/count
+calls with the same result shapes, without Chroma's client and process
+model. Vectors are unit-normalized and kept in append-only segments, each a
+memory-mapped matrix (float32, or float16/int8 to cut memory and disk) plus
+the ids, documents and metadata of its rows.
+
+Segments below a size threshold are searched exactly with one BLAS
+matrix-vector product. Larger segments carry an IVF index: rows are grouped
+by their nearest k-means centroid and stored contiguously per group, and a
+query scans only the groups whose centroids are nearest to it. Metadata
+filters are answered from per-segment bitmaps built once per metadata key.
+Deleted and replaced rows are tombstoned, and a background thread merges
+small segments and drops tombstoned rows.
+"""
+
+import json
+import logging
+import operator
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.segmented_index import SegmentedIndex
+
+logger = logging.getLogger(__name__)
+
+# Storage types for vectors; int8 keeps one float32 scale per row
+DTYPES = {'float32': np.float32, 'float16': np.float16, 'int8': np.int8}
+
+# Rows converted to float32 at a time when scoring quantized segments
+_SCORE_BLOCK = 32768
+
+_RANGE_OPERATORS = {'$gt': operator.gt, '$gte': operator.ge, '$lt': operator.lt, '$lte': operator.le}
+
+
+def normalize_vectors(vectors: Any) -> np.ndarray:
+    """Float32 rows scaled to unit length (zero rows stay zero)"""
+    matrix = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def quantize_vectors(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Convert unit float32 rows to the storage type
+    
+    Args:
+        vectors: Float32 matrix
+        dtype: 'float32', 'float16' or 'int8'
+    
+    Returns:
+        Stored matrix and, for int8, the per-row scale restoring the values
+    """
+    if dtype == 'int8':
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+    return vectors.astype(DTYPES[dtype]), None
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first"""
+    if k < len(scores):
+        positions = np.argpartition(-scores, k - 1)[:k]
+    else:
+        positions = np.arange(len(scores))
+    return positions[np.argsort(-scores[positions], kind='stable')]
+
+
+class IVFIndex:
+    """
+    Inverted file index over a segment whose rows are ordered by list
+    
+    Rows assigned to centroid j occupy offsets[j]:offsets[j + 1], so probing
+    a list reads one contiguous slice of the memory-mapped matrix.
+    """
+    
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray):
+        self.centroids = centroids
+        self.offsets = offsets
+    
+    @property
+    def lists(self) -> int:
+        return len(self.centroids)
+    
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        lists: Optional[int] = None,
+        iterations: int = 10,
+        sample_size: int = 64,
+        seed: int = 0
+    ) -> Tuple['IVFIndex', np.ndarray]:
+        """
+        Cluster unit vectors with spherical k-means
+        
+        Args:
+            vectors: Float32 unit rows
+            lists: Number of lists (defaults to the square root of the row count)
+            iterations: k-means iterations
+            sample_size: Training rows per list
+            seed: Random seed for the initial centroids and the training sample
+        
+        Returns:
+            The index and the row order that groups rows by list
+        """
+        rows = len(vectors)
+        lists = max(1, min(lists or int(np.sqrt(rows)), rows))
+        rng = np.random.default_rng(seed)
+        
+        sample = vectors[rng.choice(rows, size=min(rows, lists * sample_size), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=lists)
+            empty = counts == 0
+            if empty.any():
+                # Reseed empty lists from random training rows
+                sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = normalize_vectors(sums)
+        
+        assignment = np.empty(rows, dtype=np.int64)
+        for start in range(0, rows, _SCORE_BLOCK):
+            assignment[start:start + _SCORE_BLOCK] = np.argmax(vectors[start:start + _SCORE_BLOCK] @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.searchsorted(assignment[order], np.arange(lists + 1))
+        return cls(centroids, offsets), order
+    
+    def probe(self, query: np.ndarray, nprobe: int) -> List[Tuple[int, int]]:
+        """Row ranges of the nprobe lists nearest to a unit query"""
+        nprobe = min(nprobe, self.lists)
+        nearest = _top_k(self.centroids @ query, nprobe)
+        merged: List[Tuple[int, int]] = []
+        for start, stop in sorted((int(self.offsets[j]), int(self.offsets[j + 1])) for j in nearest):
+            if merged and merged[-1][1] == start:
+                merged[-1] = (merged[-1][0], stop)  # Neighbouring lists read as one slice
+            elif stop > start:
+                merged.append((start, stop))
+        return merged
+    
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            np.savez(f, centroids=self.centroids, offsets=self.offsets)
+    
+    @classmethod
+    def load(cls, path: str) -> 'IVFIndex':
+        with np.load(path) as data:
+            return cls(data['centroids'], data['offsets'])
+
+
+class _Segment:
+    """Immutable rows of the index; only the live flags change after writing"""
+    
+    def __init__(
+        self,
+        name: str,
+        ids: List[str],
+        documents: List[Optional[str]],
+        metadatas: List[Optional[Dict[str, Any]]],
+        matrix: np.ndarray,
+        scales: Optional[np.ndarray],
+        index: Optional[IVFIndex]
+    ):
+        self.name = name
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.matrix = matrix
+        self.scales = scales
+        self.index = index
+        self.live = np.ones(len(ids), dtype=bool)
+        # While being written by compaction: the (segment, row) each row was copied from
+        self.sources: Optional[List[Tuple['_Segment', int]]] = None
+        self._bitmaps: Dict[str, Tuple[Dict[Any, np.ndarray], np.ndarray]] = {}
+        self._bitmaps_lock = threading.Lock()
+    
+    @property
+    def rows(self) -> int:
+        return len(self.ids)
+    
+    def vectors(self, rows: Any = slice(None)) -> np.ndarray:
+        """Rows as float32"""
+        vectors = np.asarray(self.matrix[rows], dtype=np.float32)
+        if self.scales is not None:
+            vectors = vectors * self.scales[rows][:, None]
+        return vectors
+    
+    def score(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Cosine similarity of a unit query to rows of the segment
+        
+        Args:
+            query: Float32 unit vector
+            rows: Row numbers to score (all rows when omitted)
+        """
+        if rows is not None:
+            scores = np.asarray(self.matrix[rows], dtype=np.float32) @ query
+            return scores * self.scales[rows] if self.scales is not None else scores
+        if self.matrix.dtype == np.float32:
+            return self.matrix @ query
+        return self.score_range(query, 0, self.rows)
+    
+    def score_range(self, query: np.ndarray, start: int, stop: int) -> np.ndarray:
+        """Cosine similarity of a unit query to a contiguous run of rows"""
+        if self.matrix.dtype == np.float32:
+            return self.matrix[start:stop] @ query
+        scores = np.empty(stop - start, dtype=np.float32)
+        for block in range(start, stop, _SCORE_BLOCK):
+            end = min(block + _SCORE_BLOCK, stop)
+            scores[block - start:end - start] = self.matrix[block:end].astype(np.float32) @ query
+        if self.scales is not None:
+            scores *= self.scales[start:stop]
+        return scores
+    
+    def bitmap(self, key: str) -> Tuple[Dict[Any, np.ndarray], np.ndarray]:
+        """Row masks per value of a metadata key, and the mask of rows having the key"""
+        bitmaps = self._bitmaps.get(key)
+        if bitmaps is None:
+            with self._bitmaps_lock:
+                bitmaps = self._bitmaps.get(key)
+                if bitmaps is None:
+                    rows_by_value: Dict[Any, List[int]] = {}
+                    for row, metadata in enumerate(self.metadatas):
+                        if metadata and key in metadata:
+                            rows_by_value.setdefault(metadata[key], []).append(row)
+                    values = {}
+                    present = np.zeros(self.rows, dtype=bool)
+                    for value, rows in rows_by_value.items():
+                        mask = np.zeros(self.rows, dtype=bool)
+                        mask[rows] = True
+                        values[value] = mask
+                        present[rows] = True
+                    bitmaps = self._bitmaps[key] = (values, present)
+        return bitmaps
+    
+    def filter(self, where: Dict[str, Any]) -> np.ndarray:
+        """
+        Rows matching a Chroma-style metadata filter
+        
+        Supports $and/$or, implicit AND across keys, plain equality and the
+        $eq, $ne, $in, $nin, $gt, $gte, $lt and $lte operators.
+        
+        Raises:
+            ValueError: For an unsupported operator
+        """
+        mask = np.ones(self.rows, dtype=bool)
+        for key, condition in where.items():
+            if key in ('$and', '$or'):
+                masks = [self.filter(clause) for clause in condition]
+                combined = np.logical_and.reduce(masks) if key == '$and' else np.logical_or.reduce(masks)
+                mask &= combined
+                continue
+            
+            values, present = self.bitmap(key)
+            nothing = np.zeros(self.rows, dtype=bool)
+            operators = condition if isinstance(condition, dict) else {'$eq': condition}
+            for op, operand in operators.items():
+                if op == '$eq':
+                    mask &= values.get(operand, nothing)
+                elif op == '$ne':
+                    mask &= present & ~values.get(operand, nothing)
+                elif op in ('$in', '$nin'):
+                    matched = np.logical_or.reduce([values.get(value, nothing) for value in operand] or [nothing])
+                    mask &= matched if op == '$in' else present & ~matched
+                elif op in _RANGE_OPERATORS:
+                    compare = _RANGE_OPERATORS[op]
+                    matched = [
+                        rows for value, rows in values.items()
+                        if isinstance(value, (int, float)) and not isinstance(value, bool) and compare(value, operand)
+                    ]
+                    mask &= np.logical_or.reduce(matched or [nothing])
+                else:
+                    raise ValueError(f"Unsupported metadata filter operator: {op}")
+        return mask
+
+
+class VectorIndex(SegmentedIndex):
+    """NumPy vector store with the ChromaDB collection calls VectorDatabaseService uses"""
+    
+    kind = "vector"
+    segment_suffixes = (".npy", ".scales.npy", ".json", ".ivf.npz")
+    
+    def __init__(
+        self,
+        path: str,
+        name: str = None,
+        dtype: str = 'float32',
+        exact_threshold: int = 20000,
+        nprobe: int = 48,
+        ivf_lists: Optional[int] = None,
+        max_segments: int = 8,
+        compaction_deleted_ratio: float = 0.2,
+        background_compaction: bool = True
+    ):
+        """
+        Open or create an index directory
+        
+        Args:
+            path: Directory holding the manifest and segment files
+            name: Collection name, reported like a Chroma collection's
+            dtype: Vector storage type for new segments: 'float32', 'float16' or 'int8'
+            exact_threshold: Segments with more rows get an IVF index; filtered
+                searches matching at most this many rows in a segment are exact
+            nprobe: IVF lists scanned per query
+            ivf_lists: IVF lists per indexed segment (defaults to sqrt(rows))
+            max_segments: Segment count that triggers merging small segments
+            compaction_deleted_ratio: Share of tombstoned rows in a segment that
+                triggers rewriting it
+            background_compaction: Compact on a background thread rather than
+                inside the add or delete call that triggered it
+        
+        Raises:
+            ValueError: If dtype is not supported
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        
+        super().__init__(path, max_segments, compaction_deleted_ratio, background_compaction)
+        self.name = name or os.path.basename(os.path.abspath(path))
+        self.metadata: Dict[str, Any] = {"backend": "numpy", "hnsw:space": "cosine"}
+        self.dtype = dtype
+        self.exact_threshold = exact_threshold
+        self.nprobe = nprobe
+        self.ivf_lists = ivf_lists
+        self.dimensions: Optional[int] = None
+        
+        # Metrics
+        self.exact_scans = 0
+        self.ivf_scans = 0
+        
+        self._load()
+    
+    def add(
+        self,
+        ids: List[str],
+        embeddings: Sequence[Sequence[float]],
+        documents: Optional[List[str]] = None,
+        metadatas: Optional[List[Dict[str, Any]]] = None
+    ):
+        """
+        Append rows as a new segment, replacing rows with the same ids
+        
+        Args:
+            ids: Row ids
+            embeddings: One vector per id
+            documents: Optional text per id
+            metadatas: Optional metadata per id
+        
+        Raises:
+            ValueError: If the lengths differ or the dimensions do not match the index
+        """
+        if not ids:
+            return
+        documents = documents if documents is not None else [None] * len(ids)
+        metadatas = metadatas if metadatas is not None else [None] * len(ids)
+        if not len(ids) == len(embeddings) == len(documents) == len(metadatas):
+            raise ValueError("ids, embeddings, documents and metadatas must have the same length")
+        
+        vectors = normalize_vectors(embeddings)
+        # The last occurrence of a repeated id wins
+        last = list({id_: row for row, id_ in enumerate(ids)}.values())
+        if len(last) < len(ids):
+            vectors = vectors[last]
+            ids, documents, metadatas = ([values[row] for row in last] for values in (ids, documents, metadatas))
+        
+        with self._write_lock:
+            self._check_dimensions(vectors.shape[1])
+            segment = self._write_segment(self._take_segment_name(), list(ids), list(documents), list(metadatas), vectors)
+            with self._lock:
+                self.dimensions = vectors.shape[1]
+                for row, id_ in enumerate(segment.ids):
+                    self._tombstone(id_)
+                    self._locations[id_] = (segment, row)
+                self._segments.append(segment)
+                self._write_manifest()
+        self._maybe_compact()
+    
+    upsert = add
+    
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Nearest rows by cosine distance for each query vector
+        
+        Args:
+            query_embeddings: Query vectors
+            n_results: Rows per query
+            where: Optional metadata filter
+            include: Fields to return besides ids (default metadatas,
+                documents and distances; embeddings on request)
+        
+        Returns:
+            Chroma-shaped results: one list per query under each field
+        """
+        include = include if include is not None else ['metadatas', 'documents', 'distances']
+        queries = normalize_vectors(query_embeddings)
+        if self.dimensions is not None and queries.shape[1] != self.dimensions:
+            raise ValueError(f"Query has {queries.shape[1]} dimensions, index has {self.dimensions}")
+        
+        results: Dict[str, Any] = {'ids': []}
+        for field in ('documents', 'metadatas', 'distances', 'embeddings'):
+            results[field] = [] if field in include else None
+        
+        for query in queries:
+            hits = self._search(query, n_results, where)
+            results['ids'].append([segment.ids[row] for _, segment, row in hits])
+            if 'distances' in include:
+                results['distances'].append([1.0 - score for score, _, _ in hits])
+            self._fill(results, include, [(segment, row) for _, segment, row in hits], nested=True)
+        return results
+    
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        include: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Stored rows by id and/or metadata filter
+        
+        Args:
+            ids: Rows to fetch, in this order (missing ids are skipped)
+            where: Optional metadata filter
+            limit: Maximum rows
+            offset: Rows to skip
+            include: Fields to return besides ids (default metadatas and documents)
+        
+        Returns:
+            Chroma-shaped results with one entry per row under each field
+        """
+        include = include if include is not None else ['metadatas', 'documents']
+        matches = self._match(ids, where)[offset:]
+        if limit is not None:
+            matches = matches[:limit]
+        
+        results: Dict[str, Any] = {'ids': [segment.ids[row] for segment, row in matches]}
+        for field in ('documents', 'metadatas', 'embeddings'):
+            results[field] = [] if field in include else None
+        self._fill(results, include, matches, nested=False)
+        return results
+    
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None):
+        """Tombstone rows by id and/or metadata filter"""
+        if ids is None and where is None:
+            return
+        with self._write_lock:
+            with self._lock:
+                deleted = 0
+                for segment, row in self._match(ids, where):
+                    deleted += self._tombstone(segment.ids[row])
+                if deleted:
+                    self._write_manifest()
+        self._maybe_compact()
+    
+    def reset(self):
+        """Delete every row and segment file"""
+        with self._compaction_lock, self._write_lock, self._lock:
+            for segment in self._segments:
+                self._remove_segment_files(segment.name)
+            self._segments = []
+            self._locations = {}
+            self.dimensions = None
+            self._write_manifest()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index statistics"""
+        with self._lock:
+            segments = list(self._segments)
+            rows = sum(segment.rows for segment in segments)
+            live = len(self._locations)
+            return {
+                "backend": "numpy",
+                "dtype": self.dtype,
+                "dimensions": self.dimensions,
+                "segments": len(segments),
+                "indexed_segments": sum(1 for segment in segments if segment.index is not None),
+                "rows": rows,
+                "live_rows": live,
+                "deleted_rows": rows - live,
+                "vector_bytes": sum(segment.matrix.nbytes for segment in segments),
+                "queries": self.queries,
+                "exact_scans": self.exact_scans,
+                "ivf_scans": self.ivf_scans,
+                "compactions": self.compactions,
+                "compaction_seconds": round(self.compaction_seconds, 3)
+            }
+    
+    def _search(self, query: np.ndarray, k: int, where: Optional[Dict[str, Any]]) -> List[Tuple[float, _Segment, int]]:
+        """Top k live rows across segments as (score, segment, row)"""
+        with self._lock:
+            segments = list(self._segments)
+            self.queries += 1
+        if k <= 0:
+            return []
+        
+        candidates = []
+        for segment in segments:
+            mask = segment.live if where is None else segment.live & segment.filter(where)
+            matching = int(np.count_nonzero(mask))
+            if matching == 0:
+                continue
+            
+            rows = None
+            if segment.index is not None and matching > self.exact_threshold:
+                ranges = segment.index.probe(query, self.nprobe)
+                rows = np.concatenate([np.arange(start, stop) for start, stop in ranges])
+                scores = np.concatenate([segment.score_range(query, start, stop) for start, stop in ranges])
+                keep = mask[rows]
+                rows, scores = rows[keep], scores[keep]
+                with self._lock:
+                    self.ivf_scans += 1
+                if len(rows) < k:
+                    rows = None  # The probed lists are too sparse after filtering
+            if rows is None:
+                if matching * 2 > segment.rows:
+                    scores = segment.score(query)
+                    scores = np.where(mask, scores, -np.inf)
+                    rows = np.arange(segment.rows)
+                else:
+                    rows = np.flatnonzero(mask)
+                    scores = segment.score(query, rows)
+                with self._lock:
+                    self.exact_scans += 1
+            
+            top = _top_k(scores, min(k, matching))
+            candidates.extend((float(scores[i]), segment, int(rows[i])) for i in top)
+        
+        candidates.sort(key=lambda candidate: -candidate[0])
+        return candidates[:k]
+    
+    def _match(self, ids: Optional[List[str]], where: Optional[Dict[str, Any]]) -> List[Tuple[_Segment, int]]:
+        """Live (segment, row) pairs for ids and/or a filter, in id order or storage order"""
+        with self._lock:
+            if ids is not None:
+                matches = [self._locations[id_] for id_ in ids if id_ in self._locations]
+                if where is not None:
+                    masks = {}
+                    for segment, _ in matches:
+                        if segment.name not in masks:
+                            masks[segment.name] = segment.filter(where)
+                    matches = [(segment, row) for segment, row in matches if masks[segment.name][row]]
+                return matches
+            
+            matches = []
+            for segment in self._segments:
+                mask = segment.live if where is None else segment.live & segment.filter(where)
+                matches.extend((segment, int(row)) for row in np.flatnonzero(mask))
+            return matches
+    
+    @staticmethod
+    def _fill(results: Dict[str, Any], include: List[str], rows: List[Tuple[_Segment, int]], nested: bool):
+        """Append the requested fields for rows to results"""
+        fields = {
+            'documents': lambda segment, row: segment.documents[row],
+            'metadatas': lambda segment, row: segment.metadatas[row],
+            'embeddings': lambda segment, row: segment.vectors([row])[0].tolist()
+        }
+        for field, value in fields.items():
+            if field in include:
+                values = [value(segment, row) for segment, row in rows]
+                if nested:
+                    results[field].append(values)
+                else:
+                    results[field].extend(values)
+    
+    def _merge_segments(
+        self,
+        name: str,
+        merged: List[_Segment],
+        snapshot: List[np.ndarray]
+    ) -> Tuple[Optional[_Segment], List[Tuple[_Segment, int]]]:
+        rows = [(segment, int(row)) for segment, live in zip(merged, snapshot) for row in np.flatnonzero(live)]
+        if not rows:
+            return None, rows
+        compacted = self._write_segment(
+            name,
+            [segment.ids[row] for segment, row in rows],
+            [segment.documents[row] for segment, row in rows],
+            [segment.metadatas[row] for segment, row in rows],
+            np.concatenate([segment.vectors(np.flatnonzero(live)) for segment, live in zip(merged, snapshot)]),
+            sources=rows
+        )
+        # An IVF segment stores its rows reordered by list
+        sources, compacted.sources = compacted.sources, None
+        return compacted, sources
+    
+    def _check_dimensions(self, dimensions: int):
+        if self.dimensions is not None and dimensions != self.dimensions:
+            raise ValueError(f"Embedding has {dimensions} dimensions, index has {self.dimensions}")
+    
+    def _write_segment(
+        self,
+        name: str,
+        ids: List[str],
+        documents: List[Optional[str]],
+        metadatas: List[Optional[Dict[str, Any]]],
+        vectors: np.ndarray,
+        sources: Optional[List[Tuple[_Segment, int]]] = None
+    ) -> _Segment:
+        """Write a segment's files and open it memory-mapped"""
+        index = None
+        if len(ids) > self.exact_threshold:
+            index, order = IVFIndex.build(vectors, self.ivf_lists)
+            vectors = vectors[order]
+            ids, documents, metadatas = ([values[row] for row in order] for values in (ids, documents, metadatas))
+            if sources is not None:
+                sources = [sources[row] for row in order]
+            index.save(self._segment_path(name, ".ivf.npz"))
+        
+        matrix, scales = quantize_vectors(vectors, self.dtype)
+        np.save(self._segment_path(name, ".npy"), matrix)
+        if scales is not None:
+            np.save(self._segment_path(name, ".scales.npy"), scales)
+        with open(self._segment_path(name, ".json"), 'w') as f:
+            json.dump({'ids': ids, 'documents': documents, 'metadatas': metadatas}, f)
+        
+        segment = self._open_segment(name, index)
+        segment.sources = sources
+        return segment
+    
+    def _open_segment(self, name: str, index: Optional[IVFIndex] = None) -> _Segment:
+        with open(self._segment_path(name, ".json")) as f:
+            rows = json.load(f)
+        # A plain ndarray view of the map skips np.memmap's per-slice overhead
+        matrix = np.asarray(np.load(self._segment_path(name, ".npy"), mmap_mode='r'))
+        scales_path = self._segment_path(name, ".scales.npy")
+        scales = np.load(scales_path) if os.path.exists(scales_path) else None
+        index_path = self._segment_path(name, ".ivf.npz")
+        if index is None and os.path.exists(index_path):
+            index = IVFIndex.load(index_path)
+        return _Segment(name, rows['ids'], rows['documents'], rows['metadatas'], matrix, scales, index)
+    
+    def _manifest_fields(self) -> Dict[str, Any]:
+        return {'dimensions': self.dimensions}
+    
+    def _restore_manifest(self, manifest: Dict[str, Any]):
+        self.dimensions = manifest['dimensions']
+    
+    def _merge_start(self) -> int:
+        """Leave a large base segment alone while the newer ones are small; caller holds _lock"""
+        segments = self._segments
+        base, rest = segments[0].rows, sum(segment.rows for segment in segments[1:])
+        return 1 if base > 4 * rest else 0
@@ -0,0 +1,419 @@
+"""
+Local OpenAI-compatible stand-in server
+
+Serves /v1/chat/completions (including server-sent event streaming),
+/v1/embeddings and /v1/models with configurable latency distributions,
+token counts and error injection, so the real request path can be
+exercised and benchmarked without network access.
+
+Point the application at it with the openai 'base_url' config (or the
+OPENAI_BASE_URL environment variable), e.g.:
+
+    python -m tests.performance.openai_standin --port 8089 --latency-ms 400 --jitter-ms 150
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 python app.py
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+
+@dataclass
+class LatencyDistribution:
+    """Latency distribution in seconds"""
+    kind: str = "fixed"  # fixed, uniform, normal or lognormal
+    mean: float = 0.0
+    spread: float = 0.0  # Half-width for uniform, standard deviation otherwise
+
+    def sample(self, rng: random.Random) -> float:
+        """Draw one latency, never negative"""
+        if self.kind == "fixed" or self.spread <= 0:
+            value = self.mean
+        elif self.kind == "uniform":
+            value = rng.uniform(self.mean - self.spread, self.mean + self.spread)
+        elif self.kind == "normal":
+            value = rng.gauss(self.mean, self.spread)
+        elif self.kind == "lognormal":
+            # Parameterised so the distribution has the requested mean and standard deviation
+            sigma2 = math.log(1 + (self.spread / self.mean) ** 2) if self.mean > 0 else 0.0
+            value = rng.lognormvariate(math.log(self.mean) - sigma2 / 2, math.sqrt(sigma2)) if self.mean > 0 else 0.0
+        else:
+            raise ValueError(f"Unknown latency distribution: {self.kind}")
+        return max(0.0, value)
+
+
+@dataclass
+class StandInConfig:
+    """Behaviour of the stand-in server"""
+    latency: LatencyDistribution = field(default_factory=LatencyDistribution)
+    token_latency: LatencyDistribution = field(default_factory=LatencyDistribution)  # Between streamed chunks
+    completion_tokens: int = 200
+    completion_tokens_spread: int = 0
+    embedding_dimensions: int = 1536
+    error_rate: float = 0.0
+    error_statuses: List[int] = field(default_factory=lambda: [429, 500, 503])
+    seed: Optional[int] = None
+    # Builds the assistant message from the request body; defaults to a decision JSON payload
+    content_factory: Optional[Callable[[Dict[str, Any], int], str]] = None
+
+
+ERROR_TYPES = {
+    400: "invalid_request_error",
+    401: "invalid_api_key",
+    429: "rate_limit_exceeded",
+    500: "server_error",
+    503: "service_unavailable"
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+
+def default_completion_content(body: Dict[str, Any], completion_tokens: int) -> str:
+    """Decision payload in the JSON shape the executive prompts ask for"""
+    last_message = body.get("messages", [{}])[-1].get("content", "")
+    digest = hashlib.sha256(str(last_message).encode()).hexdigest()
+    payload = {
+        "decision": f"Proceed with a phased rollout ({digest[:8]})",
+        "rationale": "",
+        "confidence_score": 0.6 + int(digest[8:10], 16) / 255 * 0.35,
+        "priority": "high",
+        "category": "strategic",
+        "risk_level": "medium",
+        "financial_impact": None
+    }
+    # Pad the rationale so the content is roughly completion_tokens long
+    filler_words = max(0, completion_tokens - estimate_tokens(json.dumps(payload)))
+    payload["rationale"] = " ".join(["analysis"] * (filler_words * 4 // 9))
+    return json.dumps(payload)
+
+
+class StandInStats:
+    """Thread-safe request counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Dict[str, int] = {}
+        self.errors_injected = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def record(self, endpoint: str, prompt_tokens: int = 0, completion_tokens: int = 0, error: bool = False):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            if error:
+                self.errors_injected += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "errors_injected": self.errors_injected,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens
+            }
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """Request handler; the owning OpenAIStandInServer is self.server.standin"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {
+                "object": "list",
+                "data": [{"id": "gpt-4", "object": "model", "owned_by": "standin"}]
+            })
+        else:
+            self._send_error(404, f"Unknown path {self.path}")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_error(400, "Request body is not valid JSON")
+            return
+
+        standin = self.server.standin
+        path = self.path.rstrip("/")
+        if path.endswith("/chat/completions"):
+            endpoint = "chat.completions"
+        elif path.endswith("/embeddings"):
+            endpoint = "embeddings"
+        else:
+            self._send_error(404, f"Unknown path {self.path}")
+            return
+
+        time.sleep(standin.sample_latency())
+
+        status = standin.sample_error()
+        if status:
+            standin.stats.record(endpoint, error=True)
+            self._send_error(status, "Injected error from OpenAI stand-in")
+            return
+
+        if endpoint == "embeddings":
+            self._handle_embeddings(body)
+        elif body.get("stream"):
+            self._handle_stream(body)
+        else:
+            self._handle_completion(body)
+
+    def _handle_completion(self, body: Dict[str, Any]):
+        standin = self.server.standin
+        prompt_tokens = standin.prompt_tokens(body)
+        completion_tokens = standin.sample_completion_tokens()
+        content = standin.content(body, completion_tokens)
+        standin.stats.record("chat.completions", prompt_tokens, completion_tokens)
+
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        })
+
+    def _handle_stream(self, body: Dict[str, Any]):
+        standin = self.server.standin
+        prompt_tokens = standin.prompt_tokens(body)
+        completion_tokens = standin.sample_completion_tokens()
+        content = standin.content(body, completion_tokens)
+        standin.stats.record("chat.completions.stream", prompt_tokens, completion_tokens)
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "gpt-4")
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, usage: Dict[str, int] = None):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else [],
+            }
+            if usage is not None:
+                payload["usage"] = usage
+            return f"data: {json.dumps(payload)}\n\n".encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        self._write_chunk(chunk({"role": "assistant", "content": ""}))
+        # Roughly one chunk per token
+        pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+        for piece in pieces:
+            delay = standin.sample_token_latency()
+            if delay:
+                time.sleep(delay)
+            self._write_chunk(chunk({"content": piece}))
+        self._write_chunk(chunk({}, finish_reason="stop"))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self._write_chunk(chunk(None, usage={
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _handle_embeddings(self, body: Dict[str, Any]):
+        standin = self.server.standin
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        dimensions = body.get("dimensions") or standin.config.embedding_dimensions
+        prompt_tokens = sum(estimate_tokens(str(text)) for text in inputs)
+        standin.stats.record("embeddings", prompt_tokens)
+
+        self._send_json(200, {
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": index, "embedding": embed_text(str(text), dimensions)}
+                for index, text in enumerate(inputs)
+            ],
+            "model": body.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens}
+        })
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Dict[str, str] = None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: int, message: str):
+        headers = {"Retry-After": "0"} if status == 429 else None
+        self._send_json(status, {
+            "error": {
+                "message": message,
+                "type": ERROR_TYPES.get(status, "server_error"),
+                "param": None,
+                "code": ERROR_TYPES.get(status)
+            }
+        }, headers)
+
+
+def embed_text(text: str, dimensions: int) -> List[float]:
+    """Deterministic unit vector for a text, so identical inputs embed identically"""
+    rng = random.Random(hashlib.sha256(text.encode()).digest())
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dimensions)]
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+class OpenAIStandInServer:
+    """OpenAI-compatible HTTP server running on a background thread"""
+
+    def __init__(self, config: StandInConfig = None, host: str = "127.0.0.1", port: int = 0):
+        """
+        Initialize the server
+
+        Args:
+            config: Latency, token and error behaviour
+            host: Interface to bind
+            port: Port to bind; 0 picks a free port
+        """
+        self.config = config or StandInConfig()
+        self.stats = StandInStats()
+        self._rng = random.Random(self.config.seed)
+        self._rng_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _StandInHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.standin = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> 'OpenAIStandInServer':
+        """Start serving on a daemon thread"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="openai-standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serve on the calling thread until interrupted"""
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def stop(self):
+        """Stop serving and release the socket"""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> 'OpenAIStandInServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def sample_latency(self) -> float:
+        with self._rng_lock:
+            return self.config.latency.sample(self._rng)
+
+    def sample_token_latency(self) -> float:
+        with self._rng_lock:
+            return self.config.token_latency.sample(self._rng)
+
+    def sample_error(self) -> Optional[int]:
+        """Status code to inject for this request, if any"""
+        with self._rng_lock:
+            if self.config.error_rate and self._rng.random() < self.config.error_rate:
+                return self._rng.choice(self.config.error_statuses)
+        return None
+
+    def sample_completion_tokens(self) -> int:
+        spread = self.config.completion_tokens_spread
+        with self._rng_lock:
+            offset = self._rng.randint(-spread, spread) if spread else 0
+        return max(1, self.config.completion_tokens + offset)
+
+    def prompt_tokens(self, body: Dict[str, Any]) -> int:
+        messages = body.get("messages", [])
+        return sum(estimate_tokens(str(message.get("content", ""))) + 4 for message in messages) + 2
+
+    def content(self, body: Dict[str, Any], completion_tokens: int) -> str:
+        factory = self.config.content_factory or default_completion_content
+        return factory(body, completion_tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default="lognormal", choices=["fixed", "uniform", "normal", "lognormal"])
+    parser.add_argument("--latency-ms", type=float, default=400.0, help="Mean time to first byte")
+    parser.add_argument("--jitter-ms", type=float, default=150.0, help="Spread of the latency distribution")
+    parser.add_argument("--token-latency-ms", type=float, default=0.0, help="Delay between streamed chunks")
+    parser.add_argument("--completion-tokens", type=int, default=200)
+    parser.add_argument("--completion-tokens-spread", type=int, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-statuses", default="429,500,503")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    config = StandInConfig(
+        latency=LatencyDistribution(args.latency, args.latency_ms / 1000, args.jitter_ms / 1000),
+        token_latency=LatencyDistribution("fixed", args.token_latency_ms / 1000),
+        completion_tokens=args.completion_tokens,
+        completion_tokens_spread=args.completion_tokens_spread,
+        error_rate=args.error_rate,
+        error_statuses=[int(status) for status in args.error_statuses.split(",") if status],
+        seed=args.seed
+    )
+    server = OpenAIStandInServer(config, host=args.host, port=args.port)
+    print(f"OpenAI stand-in listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(server.stats.to_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
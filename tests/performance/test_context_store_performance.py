@@ -0,0 +1,61 @@
+"""
+Memory benchmark for bounded conversation context storage
+"""
+
+import gc
+import os
+import time
+import pytest
+
+from services.ai_integration import ContextManager
+from services.context_store import MemoryContextStore
+
+
+CONTEXT_COUNT = int(os.getenv("CONTEXT_STORE_BENCH_COUNT", "1000000"))
+STORE_MAX_BYTES = 32 * 1024 * 1024
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+class TestContextStoreMemory:
+    """Memory stays flat as distinct context_ids keep arriving"""
+
+    def test_steady_memory_under_distinct_context_ids(self):
+        psutil = pytest.importorskip("psutil")
+        process = psutil.Process(os.getpid())
+
+        store = MemoryContextStore(max_bytes=STORE_MAX_BYTES, idle_ttl_seconds=3600)
+        context_manager = ContextManager(max_context_tokens=1000, max_history_length=10, store=store)
+
+        checkpoints = {}
+        checkpoint_every = max(1, CONTEXT_COUNT // 10)
+        start_time = time.time()
+
+        for i in range(CONTEXT_COUNT):
+            context_manager.add_message(
+                f"context-{i}",
+                "user",
+                f"Quarterly planning question {i} about pricing and hiring"
+            )
+            if (i + 1) % checkpoint_every == 0:
+                gc.collect()
+                checkpoints[i + 1] = process.memory_info().rss / 1024 / 1024  # MB
+
+        elapsed = time.time() - start_time
+        stats = store.get_stats()
+
+        rss_values = list(checkpoints.values())
+        # Ignore the warm-up phase while the store fills to its cap
+        steady_growth = rss_values[-1] - rss_values[len(rss_values) // 2]
+
+        print(f"\nContext Store Memory Benchmark ({CONTEXT_COUNT} context_ids):")
+        print(f"  Elapsed: {elapsed:.1f}s ({CONTEXT_COUNT / elapsed:.0f} inserts/s)")
+        for count, rss in checkpoints.items():
+            print(f"  {count:>9} contexts: RSS {rss:.1f}MB")
+        print(f"  Store entries: {stats['entries']}, bytes: {stats['bytes']}")
+        print(f"  Evictions: {stats['evictions']} (capacity {stats['capacity_evictions']}, ttl {stats['ttl_evictions']})")
+
+        assert stats["bytes"] <= STORE_MAX_BYTES
+        assert stats["entries"] < CONTEXT_COUNT
+        assert stats["capacity_evictions"] == CONTEXT_COUNT - stats["entries"]
+        assert steady_growth < 20, f"RSS grew {steady_growth:.1f}MB after the store reached its cap"
@@ -0,0 +1,115 @@
+"""
+Recall and latency benchmark for the similar-decision index
+
+Decisions are synthetic word sequences embedded as the normalized sum of fixed
+random word vectors, so a paraphrase (dropped, added and reordered words)
+lands near its source the way a real embedding model places reworded
+questions. Recall@1 counts queries whose closest match is the decision they
+were paraphrased from.
+"""
+
+import os
+import time
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from services.decision_index import DecisionIndex
+
+
+INDEX_SIZES = [int(size) for size in os.getenv("DECISION_INDEX_BENCH_SIZES", "10000,100000").split(",")]
+DIMENSIONS = 256
+VOCABULARY = 5000
+WORDS_PER_DECISION = 40
+USERS = 100
+QUERIES = 200
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class SyntheticDecisions:
+    """Bag-of-words embeddings over a fixed random vocabulary"""
+
+    def __init__(self, seed=7):
+        self.rng = np.random.default_rng(seed)
+        self.word_vectors = self.rng.standard_normal((VOCABULARY, DIMENSIONS)).astype(np.float32)
+
+    def decision(self):
+        return self.rng.integers(0, VOCABULARY, WORDS_PER_DECISION)
+
+    def paraphrase(self, words):
+        kept = words[self.rng.random(len(words)) > 0.5]
+        added = self.rng.integers(0, VOCABULARY, 20)
+        return self.rng.permutation(np.concatenate([kept, added]))
+
+    def embed(self, words):
+        vector = self.word_vectors[words].sum(axis=0)
+        return vector / np.linalg.norm(vector)
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+class TestDecisionIndexPerformance:
+    """Paraphrased questions find their decision quickly at realistic index sizes"""
+
+    @pytest.mark.parametrize("size", INDEX_SIZES)
+    def test_recall_and_latency(self, size):
+        data = SyntheticDecisions()
+        index = DecisionIndex(dimensions=DIMENSIONS)
+        decisions = []
+
+        start_time = time.time()
+        for decision_id in range(size):
+            words = data.decision()
+            decisions.append(words)
+            index.add(decision_id, data.embed(words), user_id=decision_id % USERS,
+                      executive_type=("ceo", "cto", "cfo")[decision_id % 3])
+        build_seconds = time.time() - start_time
+
+        query_ids = data.rng.choice(size, QUERIES, replace=False)
+        queries = [data.embed(data.paraphrase(decisions[decision_id])) for decision_id in query_ids]
+
+        def run(**filters):
+            hits, latencies = 0, []
+            for decision_id, query in zip(query_ids, queries):
+                user_filters = {key: value(decision_id) for key, value in filters.items()}
+                start = time.perf_counter()
+                matches = index.search(query, k=5, **user_filters)
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits += bool(matches) and matches[0].decision_id == decision_id
+            return hits / len(query_ids), latencies
+
+        global_recall, global_latencies = run()
+        user_recall, user_latencies = run(user_id=lambda decision_id: decision_id % USERS)
+        scoped_recall, scoped_latencies = run(
+            user_id=lambda decision_id: decision_id % USERS,
+            executive_type=lambda decision_id: ("ceo", "cto", "cfo")[decision_id % 3]
+        )
+
+        # Pure-Python scan, the approach of the per-scope semantic cache, on a sample
+        sample = [index._vectors[row].tolist() for row in range(min(size, 2000))]
+        scan_start = time.perf_counter()
+        for query in queries[:20]:
+            query_list = query.tolist()
+            max(range(len(sample)), key=lambda row: sum(a * b for a, b in zip(sample[row], query_list)))
+        scan_ms = (time.perf_counter() - scan_start) / 20 * 1000 * size / len(sample)
+
+        stats = index.get_stats()
+        print(f"\nDecision Index Benchmark ({size} decisions, {DIMENSIONS} dims):")
+        print(f"  Build: {build_seconds:.2f}s, memory {stats['memory_bytes'] / 1024 / 1024:.1f}MB")
+        print(f"  All decisions:     recall@1 {global_recall:.3f}, p50 {percentile(global_latencies, 50):.2f}ms, "
+              f"p95 {percentile(global_latencies, 95):.2f}ms")
+        print(f"  Per user:          recall@1 {user_recall:.3f}, p50 {percentile(user_latencies, 50):.2f}ms, "
+              f"p95 {percentile(user_latencies, 95):.2f}ms")
+        print(f"  Per user+exec:     recall@1 {scoped_recall:.3f}, p50 {percentile(scoped_latencies, 50):.2f}ms, "
+              f"p95 {percentile(scoped_latencies, 95):.2f}ms")
+        print(f"  Pure-Python scan (extrapolated): {scan_ms:.1f}ms per lookup")
+
+        assert global_recall >= 0.95
+        assert user_recall >= global_recall
+        assert scoped_recall >= global_recall
+        assert percentile(user_latencies, 95) < 20
+        assert percentile(global_latencies, 50) < scan_ms
@@ -0,0 +1,163 @@
+"""
+Embedding throughput benchmark for document uploads
+
+Runs VectorDatabaseService.create_document_embeddings against the local
+OpenAI stand-in server, once configured like the old per-chunk path (one
+input per request, one request at a time) and once with token-budgeted
+batches sent concurrently, and reports chunks/second for each. A revision
+re-upload run reports the embedding cache's hit rate and requests saved.
+
+Tuning (environment variables):
+    EMBED_BENCH_CHUNKS       chunks per document (default 300)
+    EMBED_BENCH_LATENCY_MS   upstream latency per request (default 50)
+    EMBED_BENCH_ERROR_RATE   upstream error rate for the retry run (default 0.2)
+"""
+
+import os
+import time
+import pytest
+from unittest.mock import patch
+
+from tests.performance.openai_standin import OpenAIStandInServer, StandInConfig, LatencyDistribution, embed_text
+from services.embedding_cache import normalize_embedding_text
+
+
+CHUNKS = int(os.getenv("EMBED_BENCH_CHUNKS", "300"))
+LATENCY_MS = float(os.getenv("EMBED_BENCH_LATENCY_MS", "50"))
+ERROR_RATE = float(os.getenv("EMBED_BENCH_ERROR_RATE", "0.2"))
+DIMENSIONS = 256
+
+SEQUENTIAL = {'embedding_batch_size': 1, 'embedding_concurrency': 1}
+BATCHED = {}
+
+
+def make_document(chunks, revision=0, revised_every=10):
+    """Text that splits into about the requested number of 1000-character chunks"""
+    sentence = "Revenue grew in the enterprise segment while churn held steady. "
+    paragraph = sentence * 13  # About 850 characters, so chunks overlap by 200 as configured
+    return "".join(
+        f"Section {index}{f' (revision {revision})' if revision and index % revised_every == 0 else ''}. {paragraph}"
+        for index in range(chunks)
+    )
+
+
+@pytest.fixture(scope="module")
+def vector_module():
+    pytest.importorskip("chromadb")
+    pytest.importorskip("openai")
+    from services import vector_database
+    return vector_database
+
+
+def run_upload(vector_module, standin, tmp_path, name, options, service=None, revision=0):
+    with patch.dict(os.environ, {"OPENAI_BASE_URL": standin.base_url}):
+        service = service or vector_module.VectorDatabaseService({
+            'openai_api_key': 'test-key',
+            'chroma_path': str(tmp_path / name),
+            'collection_name': f'bench_{name}',
+            **options
+        })
+        document = make_document(CHUNKS, revision)
+        chunks = service._split_text_into_chunks(document)
+
+        start = time.perf_counter()
+        chunk_ids = service.create_document_embeddings("bench-doc", document)
+        elapsed = time.perf_counter() - start
+
+    stored = service.collection.get(ids=chunk_ids, include=["embeddings"])
+    by_id = dict(zip(stored["ids"], stored["embeddings"]))
+    return service, chunks, chunk_ids, by_id, elapsed
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+class TestEmbeddingBatchPerformance:
+    """Batched, concurrent embeddings make uploads much faster without reordering chunks"""
+
+    def test_chunks_per_second(self, vector_module, tmp_path):
+        config = StandInConfig(
+            latency=LatencyDistribution("normal", LATENCY_MS / 1000, LATENCY_MS / 5000),
+            embedding_dimensions=DIMENSIONS,
+            seed=7
+        )
+        results = {}
+        with OpenAIStandInServer(config) as standin:
+            for name, options in (("sequential", SEQUENTIAL), ("batched", BATCHED)):
+                requests_before = standin.stats.to_dict()["requests"].get("embeddings", 0)
+                service, chunks, chunk_ids, by_id, elapsed = run_upload(
+                    vector_module, standin, tmp_path, name, options
+                )
+                requests = standin.stats.to_dict()["requests"].get("embeddings", 0) - requests_before
+                results[name] = (len(chunks) / elapsed, requests, elapsed)
+
+                # Every chunk is stored with its own embedding, in order
+                assert chunk_ids == [f"bench-doc_chunk_{index}" for index in range(len(chunks))]
+                for index in (0, len(chunks) // 2, len(chunks) - 1):
+                    expected = embed_text(normalize_embedding_text(chunks[index]), DIMENSIONS)
+                    assert list(by_id[chunk_ids[index]]) == pytest.approx(expected, abs=1e-6)
+
+        print(f"\nEmbedding Benchmark ({len(chunks)} chunks, {LATENCY_MS:.0f}ms upstream latency):")
+        for name, (rate, requests, elapsed) in results.items():
+            print(f"  {name:<10} {rate:8.1f} chunks/s  {requests:4d} requests  {elapsed:6.2f}s")
+        print(f"  Speedup: {results['batched'][0] / results['sequential'][0]:.1f}x")
+
+        assert results["sequential"][1] == len(chunks)
+        assert results["batched"][1] < len(chunks) / 10
+        assert results["batched"][0] > results["sequential"][0] * 5
+
+    def test_retries_failed_batches(self, vector_module, tmp_path):
+        config = StandInConfig(
+            latency=LatencyDistribution("fixed", LATENCY_MS / 1000),
+            embedding_dimensions=DIMENSIONS,
+            error_rate=ERROR_RATE,
+            error_statuses=[500, 503],
+            seed=11
+        )
+        with OpenAIStandInServer(config) as standin:
+            service, chunks, chunk_ids, by_id, elapsed = run_upload(
+                vector_module, standin, tmp_path, "retries",
+                {'embedding_batch_tokens': 2000}
+            )
+            stats = standin.stats.to_dict()
+
+        batcher_stats = service.embedding_batcher.get_stats()
+        print(f"\nEmbedding retries ({ERROR_RATE:.0%} upstream errors): {stats['errors_injected']} errors injected, "
+              f"{batcher_stats['retried_batches']} batches retried, {len(chunks) / elapsed:.1f} chunks/s")
+
+        assert len(by_id) == len(chunks)
+        for index in range(len(chunks)):
+            expected = embed_text(normalize_embedding_text(chunks[index]), DIMENSIONS)
+            assert list(by_id[chunk_ids[index]]) == pytest.approx(expected, abs=1e-6)
+
+    def test_reupload_served_from_cache(self, vector_module, tmp_path):
+        config = StandInConfig(latency=LatencyDistribution("fixed", LATENCY_MS / 1000), embedding_dimensions=DIMENSIONS)
+        options = {'embedding_cache': {'path': str(tmp_path / "embedding_cache.db")}}
+        with OpenAIStandInServer(config) as standin:
+            service, chunks, _, _, first_elapsed = run_upload(vector_module, standin, tmp_path, "cached", options)
+            first_requests = service.get_embedding_stats()["requests"]
+            first_inputs = standin.stats.to_dict()["prompt_tokens"]
+
+            # A revision changing every tenth section, uploaded again
+            service, chunks, chunk_ids, by_id, elapsed = run_upload(
+                vector_module, standin, tmp_path, "cached", options, service=service, revision=1
+            )
+            stats = service.get_embedding_stats()
+
+            service.search_similar_content("How did churn develop?")
+            service.search_similar_content("How  did churn\ndevelop?")
+            query_stats = service.get_embedding_stats()
+
+        cache_stats = stats["cache"]
+        print(f"\nEmbedding cache, revision re-upload ({len(chunks)} chunks):")
+        print(f"  First upload:  {first_requests} requests, {first_elapsed:.2f}s")
+        print(f"  Re-upload:     {stats['requests'] - first_requests} requests, {elapsed:.2f}s, "
+              f"{stats['inputs_saved']} chunks from cache, {stats['requests_saved']} requests saved")
+        print(f"  Hit rate:      {cache_stats['hit_rate']:.1%} ({cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']})")
+        print(f"  Embedded tokens: {first_inputs} on first upload, "
+              f"{standin.stats.to_dict()['prompt_tokens'] - first_inputs} since")
+
+        assert stats["inputs_saved"] >= len(chunks) * 0.8
+        assert query_stats["requests_saved"] == stats["requests_saved"] + 1
+        for index in range(len(chunks)):
+            expected = embed_text(normalize_embedding_text(chunks[index]), DIMENSIONS)
+            assert list(by_id[chunk_ids[index]]) == pytest.approx(expected, abs=1e-6)
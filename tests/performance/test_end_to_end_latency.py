@@ -0,0 +1,267 @@
+"""
+End-to-end latency benchmark for executive decision routes
+
+Drives the real Flask routes -> AIIntegrationService -> OpenAIClient ->
+Decision persistence path against the local OpenAI stand-in server, at
+configurable concurrency, and reports throughput and p50/p95/p99 latency
+per endpoint.
+
+Tuning (environment variables):
+    E2E_BENCH_REQUESTS      requests per endpoint (default 40)
+    E2E_BENCH_CONCURRENCY   concurrent clients (default 8)
+    E2E_BENCH_LATENCY       fixed|uniform|normal|lognormal (default lognormal)
+    E2E_BENCH_LATENCY_MS    mean upstream latency (default 300)
+    E2E_BENCH_JITTER_MS     upstream latency spread (default 100)
+    E2E_BENCH_TOKEN_MS      delay between streamed chunks (default 2)
+    E2E_BENCH_TOKENS        completion tokens per response (default 200)
+    E2E_BENCH_ERROR_RATE    upstream error rate for the error-injection run (default 0.2)
+"""
+
+import json
+import math
+import os
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from tests.performance.openai_standin import OpenAIStandInServer, StandInConfig, LatencyDistribution
+
+
+REQUESTS_PER_ENDPOINT = int(os.getenv("E2E_BENCH_REQUESTS", "40"))
+CONCURRENCY = int(os.getenv("E2E_BENCH_CONCURRENCY", "8"))
+ERROR_RATE = float(os.getenv("E2E_BENCH_ERROR_RATE", "0.2"))
+
+ENDPOINTS = {
+    "ceo_decision": ("/api/executive/ceo/decision", 1),
+    "cto_decision": ("/api/executive/cto/decision", 1),
+    "cfo_decision": ("/api/executive/cfo/decision", 1),
+    "panel_decision": ("/api/executive/panel/decision", 3),
+    "stream_decision": ("/api/executive/ceo/decision/stream", 1),
+}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+@pytest.fixture(scope="module")
+def standin():
+    config = StandInConfig(
+        latency=LatencyDistribution(
+            os.getenv("E2E_BENCH_LATENCY", "lognormal"),
+            float(os.getenv("E2E_BENCH_LATENCY_MS", "300")) / 1000,
+            float(os.getenv("E2E_BENCH_JITTER_MS", "100")) / 1000
+        ),
+        token_latency=LatencyDistribution("fixed", float(os.getenv("E2E_BENCH_TOKEN_MS", "2")) / 1000),
+        completion_tokens=int(os.getenv("E2E_BENCH_TOKENS", "200")),
+        completion_tokens_spread=50,
+        seed=42
+    )
+    with OpenAIStandInServer(config) as server:
+        yield server
+
+
+@pytest.fixture(scope="module")
+def bench_app(standin, tmp_path_factory):
+    """Real application wired to the stand-in, with one logged-in user per client thread"""
+    pytest.importorskip("flask")
+    db_path = tmp_path_factory.mktemp("e2e_bench") / "bench.db"
+    with patch.dict(os.environ, {
+        "DATABASE_URL": f"sqlite:///{db_path}?timeout=30",
+        "OPENAI_BASE_URL": standin.base_url
+    }):
+        from app import create_app
+        from models import db, User
+        from routes import executive_routes
+        from services.ai_integration import AIIntegrationService
+
+        app = create_app()
+    app.config["TESTING"] = True
+
+    ai_service = AIIntegrationService({
+        "openai": {
+            "api_key": "sk-standin",
+            "base_url": standin.base_url,
+            "model": "gpt-4",
+            "max_tokens": 500,
+            "timeout": 30
+        }
+    })
+    previous_services = (executive_routes.ai_service, executive_routes.doc_service, executive_routes.vector_service)
+    executive_routes.ai_service = ai_service
+    executive_routes.doc_service = None
+    executive_routes.vector_service = None
+
+    with app.app_context():
+        db.create_all()
+        user_ids = []
+        for i in range(CONCURRENCY):
+            user = User(username=f"bench-user-{i}", email=f"bench-{i}@example.com", password_hash="x")
+            db.session.add(user)
+            db.session.commit()
+            user_ids.append(user.id)
+
+    yield app, user_ids, ai_service
+
+    ai_service.shutdown()
+    executive_routes.ai_service, executive_routes.doc_service, executive_routes.vector_service = previous_services
+    with app.app_context():
+        db.drop_all()
+
+
+def run_endpoint(app, user_ids, name, path, requests):
+    """Fire requests at one endpoint from CONCURRENCY logged-in clients"""
+    local = threading.local()
+    next_user = iter(user_ids)
+    user_lock = threading.Lock()
+
+    def get_client():
+        if not hasattr(local, "client"):
+            with user_lock:
+                user_id = next(next_user)
+            local.client = app.test_client()
+            with local.client.session_transaction() as sess:
+                sess["_user_id"] = str(user_id)
+                sess["_fresh"] = True
+        return local.client
+
+    def make_request(i):
+        client = get_client()
+        payload = {
+            "title": f"{name} benchmark {i}",
+            "context": f"Scenario {name}-{i}: should we expand into a new regional market next quarter?",
+            "category": "strategic",
+            "priority": "high"
+        }
+        start = time.perf_counter()
+        response = client.post(path, json=payload)
+        body = response.get_data(as_text=True)  # Drains streamed responses
+        elapsed = time.perf_counter() - start
+        ok = response.status_code == 201 or (response.status_code == 200 and "event: decision" in body)
+        return elapsed, ok
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        results = list(executor.map(make_request, range(requests)))
+    wall_time = time.perf_counter() - wall_start
+
+    latencies = [elapsed for elapsed, _ in results]
+    return {
+        "requests": requests,
+        "successes": sum(1 for _, ok in results if ok),
+        "throughput": requests / wall_time,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "mean": statistics.mean(latencies)
+    }
+
+
+def print_report(title, report, standin):
+    print(f"\n{title} (concurrency {CONCURRENCY}):")
+    print(f"  {'endpoint':<16} {'ok':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, result in report.items():
+        print(
+            f"  {name:<16} {result['successes']:>3}/{result['requests']:<3} {result['throughput']:>8.1f} "
+            f"{result['p50'] * 1000:>8.0f} {result['p95'] * 1000:>8.0f} {result['p99'] * 1000:>8.0f}"
+        )
+    print(f"  Upstream: {standin.stats.to_dict()}")
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+class TestEndToEndLatency:
+    """Latency of the real decision path against a local OpenAI stand-in"""
+
+    def test_decision_routes(self, bench_app, standin):
+        app, user_ids, ai_service = bench_app
+        from models import Decision
+
+        with app.app_context():
+            decisions_before = Decision.query.count()
+
+        report = {}
+        for name, (path, decisions_per_request) in ENDPOINTS.items():
+            report[name] = run_endpoint(app, user_ids, name, path, REQUESTS_PER_ENDPOINT)
+
+        with app.app_context():
+            persisted = Decision.query.count() - decisions_before
+
+        print_report("End-to-End Decision Latency", report, standin)
+
+        expected = sum(
+            report[name]["successes"] * decisions_per_request
+            for name, (_, decisions_per_request) in ENDPOINTS.items()
+        )
+        assert persisted == expected
+        for name, result in report.items():
+            assert result["successes"] == result["requests"], f"{name} had failed requests"
+            assert result["p50"] >= standin.config.latency.mean * 0.5
+
+    def test_decision_routes_with_upstream_errors(self, bench_app, standin):
+        app, user_ids, ai_service = bench_app
+        standin.config.error_rate = ERROR_RATE
+        try:
+            report = {
+                name: run_endpoint(app, user_ids, name, path, REQUESTS_PER_ENDPOINT)
+                for name, (path, _) in ENDPOINTS.items()
+                if name != "panel_decision"
+            }
+        finally:
+            standin.config.error_rate = 0.0
+
+        print_report(f"End-to-End Decision Latency ({ERROR_RATE:.0%} upstream errors)", report, standin)
+
+        assert standin.stats.errors_injected > 0
+        # Single-executive routes fall back or retry rather than failing the request
+        for name in ("ceo_decision", "cto_decision", "cfo_decision"):
+            assert report[name]["successes"] == report[name]["requests"]
+
+
+@pytest.mark.performance
+class TestOpenAIStandIn:
+    """The stand-in speaks the OpenAI wire format"""
+
+    def _post(self, server, path, body):
+        request = urllib.request.Request(
+            server.base_url + path,
+            data=json.dumps(body).encode(),
+            headers={"Content-Type": "application/json"}
+        )
+        return urllib.request.urlopen(request, timeout=10)
+
+    def test_completion_stream_and_embeddings(self):
+        with OpenAIStandInServer(StandInConfig(completion_tokens=50, seed=1)) as server:
+            messages = [{"role": "user", "content": "Should we hire?"}]
+
+            completion = json.load(self._post(server, "/chat/completions", {"model": "gpt-4", "messages": messages}))
+            content = completion["choices"][0]["message"]["content"]
+            assert json.loads(content)["decision"]
+            assert completion["usage"]["completion_tokens"] == 50
+
+            stream = self._post(server, "/chat/completions", {
+                "model": "gpt-4", "messages": messages, "stream": True, "stream_options": {"include_usage": True}
+            }).read().decode()
+            events = [json.loads(line[len("data: "):]) for line in stream.split("\n\n") if line and "[DONE]" not in line]
+            streamed = "".join(event["choices"][0]["delta"].get("content", "") for event in events if event["choices"])
+            assert streamed == content
+            assert events[-1]["usage"]["completion_tokens"] == 50
+
+            embeddings = json.load(self._post(server, "/embeddings", {"input": ["a", "b", "a"], "dimensions": 8}))
+            vectors = [item["embedding"] for item in embeddings["data"]]
+            assert len(vectors) == 3 and len(vectors[0]) == 8
+            assert vectors[0] == vectors[2] != vectors[1]
+
+    def test_error_injection(self):
+        with OpenAIStandInServer(StandInConfig(error_rate=1.0, error_statuses=[429])) as server:
+            with pytest.raises(urllib.error.HTTPError) as error:
+                self._post(server, "/chat/completions", {"messages": []})
+            assert error.value.code == 429
+            assert server.stats.to_dict()["errors_injected"] == 1
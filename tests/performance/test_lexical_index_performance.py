@@ -0,0 +1,130 @@
+"""
+Ingestion, latency and size benchmark for the BM25 lexical index
+
+Indexes synthetic chunks one document at a time, as ingestion does, with
+zipfian vocabulary plus product codes and figures, then reports ingestion
+rate, on-disk index size, query latency for word, code and
+document-filtered queries, and the cost of fusing a lexical ranking with a
+vector ranking.
+
+Tuning (environment variables):
+    LEXICAL_BENCH_CHUNKS    indexed chunks (default 1000000)
+    LEXICAL_BENCH_QUERIES   queries per measurement (default 200)
+"""
+
+import os
+import time
+import numpy as np
+import pytest
+
+from services.lexical_index import LexicalIndex, reciprocal_rank_fusion
+
+
+CHUNKS = int(os.getenv("LEXICAL_BENCH_CHUNKS", "1000000"))
+QUERIES = int(os.getenv("LEXICAL_BENCH_QUERIES", "200"))
+CHUNKS_PER_DOCUMENT = 50
+WORDS_PER_CHUNK = 150
+VOCABULARY = 50000
+K = 10
+
+
+def make_chunks(rng, start, count):
+    """Zipfian word chunks, each naming one product code and one figure"""
+    ranks = np.minimum(rng.zipf(1.2, size=(count, WORDS_PER_CHUNK)), VOCABULARY)
+    return [
+        " ".join(f"w{rank}" for rank in row) + f" SKU-{start + i:07d} revenue {rng.integers(1, 10 ** 6):,}"
+        for i, row in enumerate(ranks)
+    ]
+
+
+def percentile_ms(latencies, q):
+    return float(np.percentile(latencies, q)) * 1000
+
+
+def timed(queries, search):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+@pytest.fixture(scope="module")
+def loaded_index(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    index = LexicalIndex(str(tmp_path_factory.mktemp("lexical") / "index"))
+    start = time.perf_counter()
+    for offset in range(0, CHUNKS, CHUNKS_PER_DOCUMENT):
+        document_id = f"doc{offset // CHUNKS_PER_DOCUMENT}"
+        count = min(CHUNKS_PER_DOCUMENT, CHUNKS - offset)
+        index.add(
+            ids=[f"{document_id}_chunk_{i}" for i in range(count)],
+            texts=make_chunks(rng, offset, count),
+            document_ids=[document_id] * count
+        )
+    ingestion = time.perf_counter() - start
+    index.compact()
+    yield index, ingestion
+    index.close()
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+class TestLexicalIndexPerformance:
+    """Ingestion keeps up with chunking, queries stay interactive at scale"""
+
+    def test_ingestion_size_and_latency(self, loaded_index):
+        index, ingestion = loaded_index
+        rng = np.random.default_rng(1)
+        stats = index.get_stats()
+
+        word_queries = [
+            " ".join(f"w{rank}" for rank in np.minimum(rng.zipf(1.2, size=4), VOCABULARY) + 5)
+            for _ in range(QUERIES)
+        ]
+        codes = rng.integers(CHUNKS, size=QUERIES)
+        code_queries = [f"what was the revenue for sku-{code:07d}" for code in codes]
+        documents = [[f"doc{code // CHUNKS_PER_DOCUMENT}"] for code in codes]
+
+        results = {
+            "words": timed(word_queries, lambda query: index.search(query, K)),
+            "product code": timed(code_queries, lambda query: index.search(query, K)),
+            "one document": timed(
+                list(zip(word_queries, documents)),
+                lambda query: index.search(query[0], K, document_ids=query[1])
+            ),
+        }
+
+        print(f"\nLexical index ({CHUNKS} chunks, {stats['segments']} segments):")
+        print(f"  ingestion      {CHUNKS / ingestion:10.0f} chunks/s")
+        print(f"  index size     {stats['disk_bytes'] / 2 ** 20:10.1f} MB "
+              f"({stats['disk_bytes'] / CHUNKS:.0f} bytes/chunk, {stats['terms']} terms, {stats['postings']} postings)")
+        print(f"  {'query':<16}{'p50 ms':>8}{'p95 ms':>8}")
+        for name, latencies in results.items():
+            print(f"  {name:<16}{percentile_ms(latencies, 50):8.2f}{percentile_ms(latencies, 95):8.2f}")
+
+        hits = [index.search(query, 1) for query in code_queries]
+        expected = [f"doc{code // CHUNKS_PER_DOCUMENT}_chunk_{code % CHUNKS_PER_DOCUMENT}" for code in codes]
+        assert [found[0][0] for found in hits] == expected
+        assert stats["live_rows"] == CHUNKS
+
+    def test_fusion_overhead(self, loaded_index):
+        index, _ = loaded_index
+        rng = np.random.default_rng(2)
+        candidates = K * 4
+        lexical = [
+            [id_ for id_, _ in index.search(f"w{rng.integers(5, 500)} w{rng.integers(5, 500)}", candidates)]
+            for _ in range(QUERIES)
+        ]
+        vector = [
+            [f"doc{row // CHUNKS_PER_DOCUMENT}_chunk_{row % CHUNKS_PER_DOCUMENT}"
+             for row in rng.integers(CHUNKS, size=candidates)]
+            for _ in range(QUERIES)
+        ]
+
+        latencies = timed(list(zip(vector, lexical)), lambda rankings: reciprocal_rank_fusion(rankings)[:K])
+
+        print(f"\nReciprocal rank fusion of two {candidates}-candidate rankings:")
+        print(f"  p50 {percentile_ms(latencies, 50) * 1000:.1f} us  p95 {percentile_ms(latencies, 95) * 1000:.1f} us")
+        assert percentile_ms(latencies, 95) < 5
@@ -0,0 +1,104 @@
+"""
+Import-time and construction-time benchmark for PromptManager templates
+"""
+
+import os
+import subprocess
+import sys
+import time
+import pytest
+
+from services.ai_integration import PromptManager, PromptTemplate, DefaultPromptRegistry
+
+
+CONSTRUCTIONS = int(os.getenv("PROMPT_MANAGER_BENCH_COUNT", "2000"))
+FORMAT_CALLS = 20000
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+IMPORT_PROBE = """
+import time
+start = time.perf_counter()
+import services.ai_integration as ai
+imported = time.perf_counter()
+ai.PromptManager()
+first = time.perf_counter()
+ai.PromptManager()
+second = time.perf_counter()
+print(ai._default_prompt_registry is not None, imported - start, first - imported, second - first)
+"""
+
+
+@pytest.mark.performance
+class TestPromptManagerPerformance:
+    """Default templates are built once per process and shared"""
+
+    def test_import_does_not_build_templates(self):
+        probe = IMPORT_PROBE.replace(
+            "import services.ai_integration as ai",
+            "import services.ai_integration as ai\nassert ai._default_prompt_registry is None"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", probe],
+            cwd=REPO_ROOT,
+            env={**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [REPO_ROOT, os.getenv("PYTHONPATH")]))},
+            capture_output=True,
+            text=True,
+            timeout=120
+        )
+        assert result.returncode == 0, result.stderr
+
+        loaded, import_time, first_time, second_time = result.stdout.split()
+        print("\nPromptManager Import Benchmark:")
+        print(f"  Module import: {float(import_time) * 1000:.1f}ms")
+        print(f"  First PromptManager() (builds registry): {float(first_time) * 1000:.3f}ms")
+        print(f"  Second PromptManager(): {float(second_time) * 1000:.3f}ms")
+
+        assert loaded == "True"
+
+    def test_construction_reuses_shared_registry(self):
+        PromptManager()  # Warm the shared registry
+
+        start_time = time.perf_counter()
+        for _ in range(CONSTRUCTIONS):
+            PromptManager()
+        shared_time = time.perf_counter() - start_time
+
+        # What every construction used to pay: rebuilding the full catalogue
+        start_time = time.perf_counter()
+        for _ in range(CONSTRUCTIONS):
+            DefaultPromptRegistry(PromptManager._build_default_templates())
+        rebuild_time = time.perf_counter() - start_time
+
+        print(f"\nPromptManager Construction Benchmark ({CONSTRUCTIONS} instances):")
+        print(f"  Shared registry: {shared_time / CONSTRUCTIONS * 1e6:.1f}us per instance")
+        print(f"  Rebuilt catalogue: {rebuild_time / CONSTRUCTIONS * 1e6:.1f}us per instance")
+        print(f"  Speedup: {rebuild_time / shared_time:.1f}x")
+
+        assert shared_time * 5 < rebuild_time
+
+    def test_precompiled_format(self):
+        source = PromptManager().get_template("decision_prompt").template
+        template = PromptTemplate(source, ["context"])
+        kwargs = {
+            "executive_type": "CEO",
+            "context": "Should we expand into the European market next year?",
+            "document_context": "Market research summary",
+            "conversation_history": "Previous discussion about pricing"
+        }
+
+        start_time = time.perf_counter()
+        for _ in range(FORMAT_CALLS):
+            template.format(**kwargs)
+        compiled_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        for _ in range(FORMAT_CALLS):
+            source.format(**kwargs)
+        str_format_time = time.perf_counter() - start_time
+
+        print(f"\nPrompt Formatting Benchmark ({FORMAT_CALLS} calls):")
+        print(f"  Precompiled: {compiled_time / FORMAT_CALLS * 1e6:.2f}us per call")
+        print(f"  str.format: {str_format_time / FORMAT_CALLS * 1e6:.2f}us per call")
+
+        assert template.format(**kwargs) == source.format(**kwargs)
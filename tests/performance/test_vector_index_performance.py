@@ -0,0 +1,151 @@
+"""
+Recall and throughput benchmark for the NumPy vector index backend
+
+Loads clustered synthetic embeddings into VectorIndex with exact search,
+with IVF search at each storage type, and into a ChromaDB collection, then
+reports recall@10 against exact float64 search and queries per second,
+unfiltered and filtered to one document's chunks.
+
+Tuning (environment variables):
+    VECTOR_BENCH_ROWS         stored vectors (default 50000)
+    VECTOR_BENCH_DIMENSIONS   vector dimensions (default 256)
+    VECTOR_BENCH_QUERIES      queries per measurement (default 200)
+"""
+
+import os
+import time
+import numpy as np
+import pytest
+
+from services.vector_index import VectorIndex, normalize_vectors
+
+
+ROWS = int(os.getenv("VECTOR_BENCH_ROWS", "50000"))
+DIMENSIONS = int(os.getenv("VECTOR_BENCH_DIMENSIONS", "256"))
+QUERIES = int(os.getenv("VECTOR_BENCH_QUERIES", "200"))
+K = 10
+CHUNKS_PER_DOCUMENT = 50
+
+
+def make_vectors(count, seed, rank=32):
+    """Unit vectors near a low-dimensional subspace, like chunk embeddings"""
+    rng = np.random.default_rng(seed)
+    basis = np.random.default_rng(0).normal(size=(rank, DIMENSIONS))
+    vectors = rng.normal(size=(count, rank)) @ basis + rng.normal(scale=1.0, size=(count, DIMENSIONS))
+    return normalize_vectors(vectors)
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    vectors = make_vectors(ROWS, seed=1)
+    queries = make_vectors(QUERIES, seed=2)
+    ids = [f"doc{i // CHUNKS_PER_DOCUMENT}_chunk_{i % CHUNKS_PER_DOCUMENT}" for i in range(ROWS)]
+    metadatas = [{'document_id': f"doc{i // CHUNKS_PER_DOCUMENT}", 'chunk_index': i % CHUNKS_PER_DOCUMENT} for i in range(ROWS)]
+    scores = queries.astype(np.float64) @ vectors.astype(np.float64).T
+    truth = [set(np.argsort(-row)[:K]) for row in scores]
+    return vectors, queries, ids, metadatas, truth
+
+
+def measure(collection, dataset, where=None):
+    """Recall@K and queries per second for one collection"""
+    vectors, queries, ids, metadatas, truth = dataset
+    row_of = {id_: row for row, id_ in enumerate(ids)}
+
+    start = time.perf_counter()
+    found = [collection.query(query_embeddings=[query.tolist()], n_results=K, where=where)['ids'][0] for query in queries]
+    elapsed = time.perf_counter() - start
+
+    recall = None
+    if where is None:
+        recall = float(np.mean([len({row_of[id_] for id_ in hits} & expected) / K for hits, expected in zip(found, truth)]))
+    return recall, len(queries) / elapsed
+
+
+def load_index(path, dataset, **options):
+    vectors, queries, ids, metadatas, truth = dataset
+    index = VectorIndex(path, background_compaction=False, **options)
+    start = time.perf_counter()
+    index.add(ids=ids, embeddings=vectors, metadatas=metadatas)
+    return index, time.perf_counter() - start
+
+
+def report(title, results):
+    print(f"\n{title} ({ROWS} x {DIMENSIONS}, recall@{K}):")
+    print(f"  {'backend':<22}{'load s':>8}{'recall':>8}{'qps':>10}{'filtered qps':>14}{'vector MB':>11}")
+    for name, (load, recall, qps, filtered_qps, megabytes) in results.items():
+        print(f"  {name:<22}{load:8.2f}{recall:8.3f}{qps:10.0f}{filtered_qps:14.0f}{megabytes:11.1f}")
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+class TestVectorIndexPerformance:
+    """Exact search is exact, IVF keeps recall high at a multiple of the throughput"""
+
+    def test_recall_and_qps(self, dataset, tmp_path):
+        configurations = {
+            "numpy exact float32": {'exact_threshold': ROWS},
+            "numpy ivf float32": {'exact_threshold': 1000},
+            "numpy ivf float16": {'exact_threshold': 1000, 'dtype': 'float16'},
+            "numpy ivf int8": {'exact_threshold': 1000, 'dtype': 'int8'},
+        }
+        where = {'document_id': 'doc7'}
+        results = {}
+        for name, options in configurations.items():
+            index, load = load_index(str(tmp_path / name.replace(" ", "_")), dataset, **options)
+            recall, qps = measure(index, dataset)
+            _, filtered_qps = measure(index, dataset, where)
+            results[name] = (load, recall, qps, filtered_qps, index.get_stats()["vector_bytes"] / 2 ** 20)
+            index.close()
+
+        report("NumPy vector index", results)
+
+        assert results["numpy exact float32"][1] > 0.999
+        assert results["numpy ivf float32"][1] > 0.9
+        assert results["numpy ivf int8"][1] > 0.85
+        assert results["numpy ivf float32"][2] > results["numpy exact float32"][2]
+
+    def test_nprobe_tradeoff(self, dataset, tmp_path):
+        index, _ = load_index(str(tmp_path / "sweep"), dataset, exact_threshold=1000)
+        lists = index._segments[0].index.lists
+
+        print(f"\nIVF lists probed ({lists} lists, {ROWS} x {DIMENSIONS}):")
+        recalls = []
+        for nprobe in (8, 16, 32, 48, 64, 96):
+            index.nprobe = nprobe
+            recall, qps = measure(index, dataset)
+            recalls.append(recall)
+            print(f"  nprobe {nprobe:3d} ({nprobe / lists:5.1%} of lists)  recall {recall:.3f}  {qps:7.0f} qps")
+        index.close()
+
+        assert recalls == sorted(recalls)
+
+    def test_against_chroma(self, dataset, tmp_path):
+        chromadb = pytest.importorskip("chromadb")
+        vectors, queries, ids, metadatas, truth = dataset
+        where = {'document_id': 'doc7'}
+        results = {}
+
+        index, load = load_index(str(tmp_path / "numpy"), dataset, exact_threshold=1000)
+        recall, qps = measure(index, dataset)
+        _, filtered_qps = measure(index, dataset, where)
+        results["numpy ivf float32"] = (load, recall, qps, filtered_qps, index.get_stats()["vector_bytes"] / 2 ** 20)
+        index.close()
+
+        client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+        collection = client.create_collection(name="bench", metadata={"hnsw:space": "cosine"})
+        batch = getattr(client, "get_max_batch_size", lambda: 5000)()
+        start = time.perf_counter()
+        for offset in range(0, ROWS, batch):
+            collection.add(
+                ids=ids[offset:offset + batch],
+                embeddings=vectors[offset:offset + batch].tolist(),
+                metadatas=metadatas[offset:offset + batch]
+            )
+        load = time.perf_counter() - start
+        recall, qps = measure(collection, dataset)
+        _, filtered_qps = measure(collection, dataset, where)
+        results["chroma hnsw"] = (load, recall, qps, filtered_qps, vectors.nbytes / 2 ** 20)
+
+        report("NumPy vector index vs ChromaDB", results)
+
+        assert results["numpy ivf float32"][1] > 0.9
@@ -4,6 +4,9 @@ Unit tests for AI Integration Service
 
 import pytest
 import json
+import time
+import asyncio
+import threading
 from unittest.mock import Mock, patch, MagicMock
 from datetime import datetime
 from dataclasses import asdict
@@ -22,7 +25,17 @@ from services.ai_integration import (
     ConversationMessage,
     OpenAIError,
     TokenLimitError,
-    RateLimitError
+    RateLimitError,
+    ResponseCache,
+    SemanticCache,
+    PanelResponse,
+    BatchDecisionRequest,
+    RequestCoalescer,
+    ModelCatalog,
+    ModelRouter,
+    RateLimiter,
+    RequestPriority,
+    get_rate_limiter
 )
 
 
@@ -171,7 +184,7 @@ class TestOpenAIClient:
     def client(self, mock_config):
         with patch('services.ai_integration.OpenAI'), \
              patch('services.ai_integration.AsyncOpenAI'), \
-             patch('services.ai_integration.tiktoken.encoding_for_model') as mock_tiktoken:
+             patch('services.ai_integration.get_token_encoder') as mock_tiktoken:
             
             mock_encoder = Mock()
             mock_encoder.encode.return_value = [1, 2, 3, 4, 5]  # 5 tokens
@@ -185,6 +198,17 @@ class TestOpenAIClient:
         assert client.temperature == 0.7
         assert client.max_retries == 3
     
+    def test_client_builds_without_tokenizer(self, mock_config):
+        # e.g. offline, when the encoding cannot be downloaded
+        with patch('services.ai_integration.OpenAI'), \
+             patch('services.ai_integration.AsyncOpenAI'), \
+             patch('services.ai_integration.tiktoken.encoding_for_model', side_effect=OSError("offline")), \
+             patch.dict('services.ai_integration._token_encoders', clear=True):
+            client = OpenAIClient(mock_config)
+        
+        assert client.tokenizer is None
+        assert client.count_tokens("x" * 40) == 10
+    
     def test_count_tokens(self, client):
         tokens = client.count_tokens("Hello world")
         assert tokens == 5  # Mocked to return 5 tokens
@@ -228,6 +252,41 @@ class TestOpenAIClient:
         assert response.token_usage.completion_tokens == 50
         assert response.token_usage.total_tokens == 150
     
+    def test_count_tokens_memoized(self, client):
+        client.count_tokens("Hello world")
+        client.count_tokens("Hello world")
+        
+        assert client.tokenizer.encode.call_count == 1
+    
+    def test_generate_completion_uses_precomputed_prompt_tokens(self, client):
+        mock_response = Mock()
+        mock_response.choices = [Mock()]
+        mock_response.choices[0].message.content = "Test response"
+        mock_response.choices[0].finish_reason = "stop"
+        mock_response.usage.completion_tokens = 50
+        mock_response.usage.total_tokens = 92
+        mock_response.id = "test-id"
+        client.client.chat.completions.create = Mock(return_value=mock_response)
+        
+        response = client.generate_completion([{"role": "user", "content": "Hello"}], prompt_tokens=42)
+        
+        assert response.token_usage.prompt_tokens == 42
+        client.tokenizer.encode.assert_not_called()
+    
+    def test_generate_completion_max_tokens_override(self, client):
+        mock_response = Mock()
+        mock_response.choices = [Mock()]
+        mock_response.choices[0].message.content = "Short summary"
+        mock_response.choices[0].finish_reason = "stop"
+        mock_response.usage.completion_tokens = 20
+        mock_response.usage.total_tokens = 30
+        mock_response.id = "test-id"
+        client.client.chat.completions.create = Mock(return_value=mock_response)
+        
+        client.generate_completion([{"role": "user", "content": "Summarize"}], max_tokens=50)
+        
+        assert client.client.chat.completions.create.call_args[1]["max_tokens"] == 50
+    
     def test_generate_completion_token_limit_error(self, client):
         # Create a message that would exceed token limits
         long_messages = [{"role": "user", "content": "x" * 10000}]
@@ -247,6 +306,42 @@ class TestOpenAIClient:
         
         with pytest.raises(OpenAIError, match="Authentication failed"):
             client.generate_completion(messages)
+    
+    def _stream_chunk(self, content=None, finish_reason=None, usage=None):
+        chunk = Mock()
+        chunk.id = "stream-id"
+        chunk.usage = usage
+        if content is None and finish_reason is None:
+            chunk.choices = []
+        else:
+            choice = Mock()
+            choice.delta.content = content
+            choice.finish_reason = finish_reason
+            chunk.choices = [choice]
+        return chunk
+    
+    def test_generate_completion_stream(self, client):
+        usage = Mock()
+        usage.completion_tokens = 3
+        client.client.chat.completions.create = Mock(return_value=iter([
+            self._stream_chunk('{"decision": '),
+            self._stream_chunk('"Go"}'),
+            self._stream_chunk(None, finish_reason="stop"),
+            self._stream_chunk(usage=usage)
+        ]))
+        
+        stream = client.generate_completion_stream([{"role": "user", "content": "Hello"}])
+        deltas = list(stream)
+        
+        assert deltas == ['{"decision": ', '"Go"}']
+        assert stream.response.content == '{"decision": "Go"}'
+        assert stream.response.token_usage.completion_tokens == 3
+        assert stream.response.metadata["finish_reason"] == "stop"
+        assert stream.response.metadata["streamed"] is True
+        assert stream.time_to_first_token is not None
+        
+        call_kwargs = client.client.chat.completions.create.call_args[1]
+        assert call_kwargs["stream"] is True
 
 
 class TestAIIntegrationService:
@@ -438,5 +533,859 @@ class TestAIIntegrationService:
         assert "timestamp" in stats
 
 
+class TestResponseCache:
+    """Test ResponseCache functionality"""
+    
+    def _response(self, content="cached"):
+        return AIResponse(
+            content=content,
+            model='gpt-4',
+            token_usage=TokenUsage(100, 50, 150, 0.005),
+            response_time=1.5
+        )
+    
+    def test_make_key_is_canonical(self):
+        key_a = ResponseCache.make_key(model='gpt-4', messages=[{"role": "user", "content": "Hi"}])
+        key_b = ResponseCache.make_key(messages=[{"role": "user", "content": "Hi"}], model='gpt-4')
+        key_c = ResponseCache.make_key(model='gpt-4', messages=[{"role": "user", "content": "Hello"}])
+        
+        assert key_a == key_b
+        assert key_a != key_c
+    
+    def test_get_and_set(self):
+        cache = ResponseCache()
+        assert cache.get("key") is None
+        
+        cache.set("key", self._response())
+        assert cache.get("key").content == "cached"
+        
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+    
+    def test_lru_eviction(self):
+        cache = ResponseCache(max_entries=2)
+        cache.set("a", self._response("a"))
+        cache.set("b", self._response("b"))
+        cache.get("a")  # "b" is now least recently used
+        cache.set("c", self._response("c"))
+        
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get_stats()["evictions"] == 1
+    
+    def test_byte_size_cap(self):
+        cache = ResponseCache(max_bytes=1000)
+        cache.set("a", self._response("x" * 600))
+        cache.set("b", self._response("y" * 600))
+        
+        assert cache.get("a") is None
+        assert cache.get_stats()["size_bytes"] <= 1000
+        
+        # Responses larger than the whole cache are never stored
+        cache.set("huge", self._response("z" * 5000))
+        assert cache.get("huge") is None
+    
+    @patch('services.ai_integration.time.time')
+    def test_ttl_expiry(self, mock_time):
+        cache = ResponseCache(ttl_seconds=10)
+        mock_time.return_value = 100
+        cache.set("key", self._response())
+        
+        mock_time.return_value = 111
+        assert cache.get("key") is None
+        assert cache.get_stats()["expirations"] == 1
+    
+    def test_invalidate_template(self):
+        cache = ResponseCache()
+        cache.set("a", self._response(), templates=["ceo_system", "decision_prompt"])
+        cache.set("b", self._response(), templates=["cto_system", "decision_prompt"])
+        
+        assert cache.invalidate_template("ceo_system") == 1
+        assert cache.get("a") is None
+        assert cache.get("b") is not None
+
+
+class TestAIIntegrationServiceResponseCache:
+    """Test response caching in AIIntegrationService"""
+    
+    @pytest.fixture
+    def service(self):
+        with patch('services.ai_integration.OpenAIClient') as mock_client_class:
+            mock_client = Mock()
+            mock_client.model = 'gpt-4'
+            mock_client_class.return_value = mock_client
+            
+            service = AIIntegrationService({'openai': {'api_key': 'test-key'}})
+        
+        service.openai_client.generate_completion = Mock(side_effect=lambda messages, **kwargs: AIResponse(
+            content='{"decision": "Cached decision", "rationale": "Because", "confidence_score": 0.8}',
+            model='gpt-4',
+            token_usage=TokenUsage(100, 50, 150, 0.005),
+            response_time=1.5
+        ))
+        return service
+    
+    def test_repeat_request_is_served_from_cache(self, service):
+        first = service.generate_executive_response(executive_type="ceo", context="Expand to Europe?")
+        second = service.generate_executive_response(executive_type="ceo", context="Expand to Europe?")
+        
+        assert service.openai_client.generate_completion.call_count == 1
+        assert first.metadata["cache_hit"] is False
+        assert second.metadata["cache_hit"] is True
+        assert second.decision == "Cached decision"
+        
+        # Cache hits do not count towards token usage
+        assert service.total_tokens_used == 150
+    
+    def test_different_executive_is_not_shared(self, service):
+        service.generate_executive_response(executive_type="ceo", context="Expand to Europe?")
+        service.generate_executive_response(executive_type="cfo", context="Expand to Europe?")
+        
+        assert service.openai_client.generate_completion.call_count == 2
+    
+    def test_bypass_refreshes_entry(self, service):
+        service.generate_executive_response(executive_type="ceo", context="Expand to Europe?")
+        response = service.generate_executive_response(
+            executive_type="ceo", context="Expand to Europe?", use_cache=False
+        )
+        
+        assert service.openai_client.generate_completion.call_count == 2
+        assert response.metadata["cache_hit"] is False
+        assert service.response_cache.get_stats()["bypasses"] == 1
+    
+    def test_prompt_version_change_invalidates(self, service):
+        service.generate_executive_response(executive_type="ceo", context="Expand to Europe?")
+        
+        service.add_prompt_version("decision_prompt", "Decide: {context}", "2.0", ["context"])
+        service.set_active_prompt_version("decision_prompt", "2.0")
+        
+        assert service.response_cache.get_stats()["entries"] == 0
+        
+        service.generate_executive_response(executive_type="ceo", context="Expand to Europe?")
+        assert service.openai_client.generate_completion.call_count == 2
+    
+    def test_context_id_requests_use_cache(self, service):
+        first = service.generate_executive_response(
+            executive_type="ceo", context="Expand to Europe?", context_id="board-1"
+        )
+        fresh = service.generate_executive_response(
+            executive_type="ceo", context="Expand to Europe?", context_id="board-2"
+        )
+        
+        assert first.metadata["cache_hit"] is False
+        assert fresh.metadata["cache_hit"] is True
+        assert service.openai_client.generate_completion.call_count == 1
+        
+        # The first conversation now has history, so the same question renders a different prompt
+        followup = service.generate_executive_response(
+            executive_type="ceo", context="Expand to Europe?", context_id="board-1"
+        )
+        
+        assert followup.metadata["cache_hit"] is False
+        assert service.openai_client.generate_completion.call_count == 2
+        assert len(service.get_conversation_history("board-1")) == 4
+    
+    def test_usage_stats_include_cache(self, service):
+        stats = service.get_usage_stats()
+        assert "response_cache" in stats
+        assert stats["response_cache"]["hits"] == 0
+
+
+class TestSemanticCache:
+    """Test SemanticCache functionality"""
+    
+    def _response(self, decision="Prior decision"):
+        return ExecutiveResponse(
+            content="{}",
+            model='gpt-4',
+            token_usage=TokenUsage(100, 50, 150, 0.005),
+            response_time=1.5,
+            decision=decision,
+            rationale="Prior rationale",
+            confidence_score=0.8,
+            priority="high",
+            category="strategic",
+            executive_type="ceo"
+        )
+    
+    def test_normalize(self):
+        assert SemanticCache.normalize([3.0, 4.0]) == [0.6, 0.8]
+        assert SemanticCache.normalize([0.0, 0.0]) == [0.0, 0.0]
+    
+    def test_lookup_above_threshold(self):
+        cache = SemanticCache(similarity_threshold=0.9)
+        scope = SemanticCache.make_scope(1, "ceo", {"ceo_system": "1.0"})
+        cache.add(scope, SemanticCache.normalize([1.0, 0.0]), self._response())
+        
+        match = cache.lookup(scope, SemanticCache.normalize([0.99, 0.05]))
+        assert match is not None
+        response, similarity = match
+        assert response.decision == "Prior decision"
+        assert similarity > 0.9
+        
+        assert cache.lookup(scope, SemanticCache.normalize([0.0, 1.0])) is None
+        
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["lookups"] == 2
+        assert stats["saved_tokens"] == 150
+        assert stats["saved_cost"] == 0.005
+    
+    def test_scopes_are_isolated(self):
+        cache = SemanticCache(similarity_threshold=0.9)
+        user_1 = SemanticCache.make_scope(1, "ceo", {"ceo_system": "1.0"})
+        user_2 = SemanticCache.make_scope(2, "ceo", {"ceo_system": "1.0"})
+        cache.add(user_1, [1.0, 0.0], self._response())
+        
+        assert cache.lookup(user_2, [1.0, 0.0]) is None
+    
+    def test_bounded_per_scope(self):
+        cache = SemanticCache(max_entries_per_scope=2)
+        scope = SemanticCache.make_scope(1, "ceo", {})
+        for i in range(5):
+            cache.add(scope, [1.0, 0.0], self._response(f"Decision {i}"))
+        
+        stats = cache.get_stats()
+        assert stats["entries"] == 2
+        assert stats["evictions"] == 3
+    
+    def test_invalidate_template(self):
+        cache = SemanticCache()
+        scope = SemanticCache.make_scope(1, "ceo", {"ceo_system": "1.0", "decision_prompt": "1.0"})
+        cache.add(scope, [1.0, 0.0], self._response())
+        
+        assert cache.invalidate_template("decision_prompt") == 1
+        assert cache.get_stats()["entries"] == 0
+
+
+class TestAIIntegrationServiceSemanticCache:
+    """Test semantic caching in AIIntegrationService"""
+    
+    @pytest.fixture
+    def service(self):
+        with patch('services.ai_integration.OpenAIClient') as mock_client_class:
+            mock_client = Mock()
+            mock_client.model = 'gpt-4'
+            mock_client_class.return_value = mock_client
+            
+            service = AIIntegrationService({
+                'openai': {'api_key': 'test-key'},
+                'semantic_cache': {'enabled': True, 'similarity_threshold': 0.9}
+            })
+        
+        service.openai_client.generate_completion = Mock(side_effect=lambda messages, **kwargs: AIResponse(
+            content='{"decision": "Expand", "rationale": "Growth", "confidence_score": 0.8}',
+            model='gpt-4',
+            token_usage=TokenUsage(100, 50, 150, 0.005),
+            response_time=1.5
+        ))
+        return service
+    
+    def test_paraphrase_is_served_from_cache(self, service):
+        service.openai_client.create_embedding = Mock(side_effect=[[1.0, 0.0], [0.98, 0.1]])
+        
+        service.generate_executive_response("ceo", "Should we expand to Europe?", user_id=1)
+        response = service.generate_executive_response("ceo", "Is European expansion wise?", user_id=1)
+        
+        assert service.openai_client.generate_completion.call_count == 1
+        assert response.decision == "Expand"
+        assert response.metadata["cache_layer"] == "semantic"
+        assert service.get_usage_stats()["semantic_cache"]["saved_tokens"] == 150
+    
+    def test_other_user_is_not_served(self, service):
+        service.openai_client.create_embedding = Mock(return_value=[1.0, 0.0])
+        
+        service.generate_executive_response("ceo", "Should we expand to Europe?", user_id=1)
+        service.generate_executive_response("ceo", "Should we expand to Europe??", user_id=2)
+        
+        assert service.openai_client.generate_completion.call_count == 2
+    
+    def test_embedding_failure_falls_through(self, service):
+        service.openai_client.create_embedding = Mock(side_effect=Exception("Embedding API down"))
+        
+        response = service.generate_executive_response("ceo", "Should we expand?", user_id=1)
+        
+        assert response.decision == "Expand"
+        assert service.openai_client.generate_completion.call_count == 1
+
+
+class TestAIIntegrationServicePanel:
+    """Test concurrent board panel responses"""
+    
+    @pytest.fixture
+    def service(self):
+        with patch('services.ai_integration.OpenAIClient') as mock_client_class:
+            mock_client = Mock()
+            mock_client.model = 'gpt-4'
+            mock_client_class.return_value = mock_client
+            
+            service = AIIntegrationService({'openai': {'api_key': 'test-key'}})
+        
+        yield service
+        service.shutdown()
+    
+    def _async_completion(self, delays, failures=()):
+        async def generate_completion_async(messages, **kwargs):
+            system_prompt = messages[0]["content"]
+            executive_type = next(e for e in ("ceo", "cto", "cfo") if f"AI {e.upper()}" in system_prompt)
+            await asyncio.sleep(delays[executive_type])
+            if executive_type in failures:
+                raise Exception(f"{executive_type} unavailable")
+            return AIResponse(
+                content=json.dumps({"decision": f"{executive_type} decision", "rationale": "Because"}),
+                model='gpt-4',
+                token_usage=TokenUsage(100, 50, 150, 0.005),
+                response_time=delays[executive_type]
+            )
+        return generate_completion_async
+    
+    def test_panel_runs_executives_concurrently(self, service):
+        service.openai_client.generate_completion_async = self._async_completion(
+            {"ceo": 0.2, "cto": 0.2, "cfo": 0.2}
+        )
+        
+        start_time = time.time()
+        panel = service.generate_panel_response("Should we acquire a competitor?")
+        elapsed = time.time() - start_time
+        
+        assert isinstance(panel, PanelResponse)
+        assert set(panel.responses) == {"ceo", "cto", "cfo"}
+        assert panel.responses["cfo"].decision == "cfo decision"
+        assert panel.errors == {}
+        assert elapsed < 0.5  # Close to the slowest call, not the sum
+        assert service.total_tokens_used == 450
+    
+    def test_panel_partial_failure(self, service):
+        service.openai_client.generate_completion_async = self._async_completion(
+            {"ceo": 0.0, "cto": 0.0, "cfo": 0.0}, failures=("cto",)
+        )
+        
+        panel = service.generate_panel_response("Should we acquire a competitor?")
+        
+        assert panel.responses["ceo"].decision == "ceo decision"
+        assert "cto unavailable" in panel.errors["cto"]
+        assert panel.responses["cto"].metadata["fallback"] is True
+    
+    def test_panel_per_call_timeout(self, service):
+        service.openai_client.generate_completion_async = self._async_completion(
+            {"ceo": 0.0, "cto": 1.0, "cfo": 0.0}
+        )
+        
+        panel = service.generate_panel_response("Should we acquire a competitor?", timeout=0.1)
+        
+        assert "Timed out" in panel.errors["cto"]
+        assert "ceo" not in panel.errors
+    
+    def test_panel_subset_and_validation(self, service):
+        service.openai_client.generate_completion_async = self._async_completion(
+            {"ceo": 0.0, "cto": 0.0, "cfo": 0.0}
+        )
+        
+        panel = service.generate_panel_response("Budget review", executive_types=["cfo"])
+        assert list(panel.responses) == ["cfo"]
+        
+        with pytest.raises(ValueError):
+            service.generate_panel_response("Budget review", executive_types=["coo"])
+
+
+class TestAIIntegrationServiceBatch:
+    """Test offline batch decision generation"""
+    
+    @pytest.fixture
+    def service(self):
+        with patch('services.ai_integration.OpenAIClient') as mock_client_class:
+            mock_client = Mock()
+            mock_client.model = 'gpt-4'
+            mock_client_class.return_value = mock_client
+            
+            service = AIIntegrationService({'openai': {'api_key': 'test-key'}, 'response_cache': {'enabled': False}})
+        
+        yield service
+        service.shutdown()
+    
+    def _async_completion(self, delay=0.05, failures=()):
+        state = {"in_flight": 0, "max_in_flight": 0, "calls": 0}
+        
+        async def generate_completion_async(messages, **kwargs):
+            state["calls"] += 1
+            state["in_flight"] += 1
+            state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+            try:
+                await asyncio.sleep(delay)
+                question = messages[-1]["content"]
+                if any(failure in question for failure in failures):
+                    raise Exception("Upstream unavailable")
+                return AIResponse(
+                    content=json.dumps({"decision": "Approve", "rationale": "Because", "confidence_score": 0.9}),
+                    model='gpt-4',
+                    token_usage=TokenUsage(100, 50, 150, 0.005),
+                    response_time=delay
+                )
+            finally:
+                state["in_flight"] -= 1
+        
+        return generate_completion_async, state
+    
+    def _requests(self, count):
+        return [
+            BatchDecisionRequest(request_id=f"req-{i}", executive_type="cfo", context=f"Scenario number {i}")
+            for i in range(count)
+        ]
+    
+    def test_bounded_concurrency_and_bulk_writes(self, service):
+        service.openai_client.generate_completion_async, state = self._async_completion(delay=0.05)
+        written = []
+        
+        start_time = time.time()
+        report = service.generate_executive_responses_batch(
+            self._requests(20), concurrency=5, result_writer=written.append, write_batch_size=8
+        )
+        elapsed = time.time() - start_time
+        
+        assert state["max_in_flight"] == 5
+        assert elapsed < 20 * 0.05  # Throughput scales with concurrency, not single-call latency
+        assert report.completed == 20 and report.failed == 0
+        assert [len(chunk) for chunk in written] == [8, 8, 4]
+        assert [result.request_id for result in report.results] == [f"req-{i}" for i in range(20)]
+        assert report.results[0].response.decision == "Approve"
+    
+    def test_checkpoint_resume(self, service, tmp_path):
+        checkpoint_path = str(tmp_path / "batch.jsonl")
+        service.openai_client.generate_completion_async, state = self._async_completion(
+            delay=0.01, failures=("Scenario number 3",)
+        )
+        
+        first = service.generate_executive_responses_batch(
+            self._requests(6), concurrency=2, checkpoint_path=checkpoint_path, write_batch_size=2
+        )
+        assert first.completed == 5
+        assert first.failed == 1
+        assert first.results[3].error == "Upstream unavailable"
+        
+        # Simulate a crash that tore the last checkpoint line
+        with open(checkpoint_path, "a") as f:
+            f.write('{"request_id": "req-')
+        
+        service.openai_client.generate_completion_async, state = self._async_completion(delay=0.01)
+        written = []
+        second = service.generate_executive_responses_batch(
+            self._requests(6), concurrency=2, checkpoint_path=checkpoint_path, result_writer=written.append
+        )
+        
+        assert state["calls"] == 1
+        assert second.completed == 1 and second.resumed == 5 and second.failed == 0
+        assert [result.request_id for chunk in written for result in chunk] == ["req-3"]
+        assert second.results[0].resumed
+        assert second.results[0].to_record()["decision"] == "Approve"
+    
+    def test_rejects_duplicate_request_ids(self, service):
+        requests = self._requests(2)
+        requests[1].request_id = requests[0].request_id
+        
+        with pytest.raises(ValueError, match="unique"):
+            service.generate_executive_responses_batch(requests)
+
+
+class TestAIIntegrationServiceStreaming:
+    """Test streamed executive responses"""
+    
+    @pytest.fixture
+    def service(self):
+        with patch('services.ai_integration.OpenAIClient') as mock_client_class:
+            mock_client = Mock()
+            mock_client.model = 'gpt-4'
+            mock_client_class.return_value = mock_client
+            
+            return AIIntegrationService({'openai': {'api_key': 'test-key'}})
+    
+    def _stream(self, deltas):
+        stream = MagicMock()
+        stream.__iter__.return_value = iter(deltas)
+        stream.response = AIResponse(
+            content="".join(deltas),
+            model='gpt-4',
+            token_usage=TokenUsage(100, 50, 150, 0.005),
+            response_time=2.0
+        )
+        return stream
+    
+    def test_stream_yields_tokens_then_response(self, service):
+        service.openai_client.generate_completion_stream = Mock(return_value=self._stream(
+            ['{"decision": "Hire', ' engineers", "confidence_score": 0.9}']
+        ))
+        
+        events = list(service.stream_executive_response("cto", "Should we grow the team?"))
+        
+        assert [event["type"] for event in events] == ["token", "token", "response"]
+        assert events[-1]["response"].decision == "Hire engineers"
+        assert events[-1]["response"].confidence_score == 0.9
+        assert service.total_tokens_used == 150
+    
+    def test_stream_populates_and_uses_cache(self, service):
+        service.openai_client.generate_completion_stream = Mock(return_value=self._stream(
+            ['{"decision": "Hire engineers"}']
+        ))
+        
+        list(service.stream_executive_response("cto", "Should we grow the team?"))
+        events = list(service.stream_executive_response("cto", "Should we grow the team?"))
+        
+        assert service.openai_client.generate_completion_stream.call_count == 1
+        assert events[-1]["response"].metadata["cache_hit"] is True
+
+
+class TestRequestCoalescer:
+    """Test single-flight coalescing of identical in-flight requests"""
+    
+    def _run_concurrently(self, coalescer, key, func, callers=5):
+        results = []
+        errors = []
+        
+        def call():
+            try:
+                results.append(coalescer.run(key, func))
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        return threads, results, errors
+    
+    def test_concurrent_callers_share_one_call(self):
+        coalescer = RequestCoalescer()
+        release = threading.Event()
+        func = Mock(side_effect=lambda: release.wait(5) and "result")
+        
+        threads, results, errors = self._run_concurrently(coalescer, "key", func)
+        while coalescer.get_stats()["coalesced_calls"] < 4:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+        
+        assert func.call_count == 1
+        assert errors == []
+        assert sorted(results, key=lambda result: result[1]) == [("result", False)] + [("result", True)] * 4
+        
+        stats = coalescer.get_stats()
+        assert stats["upstream_calls"] == 1
+        assert stats["coalesced_calls"] == 4
+        assert stats["in_flight"] == 0
+    
+    def test_exception_propagates_to_all_callers(self):
+        coalescer = RequestCoalescer()
+        release = threading.Event()
+        
+        def failing():
+            release.wait(5)
+            raise OpenAIError("upstream failed")
+        
+        threads, results, errors = self._run_concurrently(coalescer, "key", failing, callers=3)
+        while coalescer.get_stats()["coalesced_calls"] < 2:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+        
+        assert results == []
+        assert len(errors) == 3
+        assert all(isinstance(error, OpenAIError) for error in errors)
+        assert coalescer.get_stats()["failed_calls"] == 1
+    
+    def test_sequential_calls_are_not_coalesced(self):
+        coalescer = RequestCoalescer()
+        func = Mock(return_value="result")
+        
+        coalescer.run("key", func)
+        coalescer.run("key", func)
+        
+        assert func.call_count == 2
+    
+    def test_async_callers_share_one_call(self):
+        coalescer = RequestCoalescer()
+        calls = []
+        
+        async def request():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+        
+        async def main():
+            return await asyncio.gather(*[coalescer.run_async("key", request) for _ in range(5)])
+        
+        results = asyncio.run(main())
+        
+        assert len(calls) == 1
+        assert [result for result, _ in results] == ["result"] * 5
+        assert sum(coalesced for _, coalesced in results) == 4
+    
+    def test_async_exception_propagates(self):
+        coalescer = RequestCoalescer()
+        
+        async def request():
+            await asyncio.sleep(0.01)
+            raise OpenAIError("upstream failed")
+        
+        async def main():
+            return await asyncio.gather(
+                *[coalescer.run_async("key", request) for _ in range(3)],
+                return_exceptions=True
+            )
+        
+        results = asyncio.run(main())
+        
+        assert all(isinstance(result, OpenAIError) for result in results)
+        assert coalescer.get_stats()["failed_calls"] == 1
+    
+    def test_openai_client_coalesces_identical_completions(self):
+        with patch('services.ai_integration.OpenAI'), \
+             patch('services.ai_integration.AsyncOpenAI'), \
+             patch('services.ai_integration.get_token_encoder') as mock_tiktoken:
+            mock_tiktoken.return_value.encode.return_value = [1, 2, 3]
+            client = OpenAIClient({'api_key': 'test-key', 'model': 'gpt-4'})
+        
+        release = threading.Event()
+        mock_response = Mock()
+        mock_response.choices = [Mock()]
+        mock_response.choices[0].message.content = "Shared answer"
+        mock_response.choices[0].finish_reason = "stop"
+        mock_response.usage.completion_tokens = 50
+        mock_response.usage.total_tokens = 150
+        mock_response.id = "shared-id"
+        client.client.chat.completions.create = Mock(
+            side_effect=lambda **kwargs: release.wait(5) and mock_response
+        )
+        
+        responses = []
+        messages = [{"role": "user", "content": "Should we expand to Europe?"}]
+        threads = [
+            threading.Thread(target=lambda: responses.append(client.generate_completion(messages)))
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        while client.coalescer.get_stats()["coalesced_calls"] < 2:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+        
+        assert client.client.chat.completions.create.call_count == 1
+        assert [response.content for response in responses] == ["Shared answer"] * 3
+        assert sum(response.metadata["coalesced"] for response in responses) == 2
+
+
+class TestModelRouter:
+    """Test model catalogue and routing"""
+    
+    @pytest.fixture
+    def catalog(self):
+        return ModelCatalog()
+    
+    def test_configured_model_when_prompt_fits(self, catalog):
+        router = ModelRouter(catalog, default_model="gpt-4", max_output_tokens=2000)
+        decision = router.route(1000)
+        
+        assert decision.model == "gpt-4"
+        assert decision.reason == "configured"
+        assert decision.fallback is False
+        assert decision.context_window == 8192
+    
+    def test_falls_back_to_larger_window(self, catalog):
+        router = ModelRouter(catalog, default_model="gpt-4", max_output_tokens=2000)
+        decision = router.route(20000)
+        
+        # Cheapest premium model with a large enough window
+        assert decision.model == "gpt-4o"
+        assert decision.reason == "context_window_fallback"
+        assert decision.fallback is True
+        assert router.get_stats()["fallbacks"] == 1
+    
+    def test_raises_when_nothing_fits(self, catalog):
+        router = ModelRouter(catalog, default_model="gpt-4", max_output_tokens=2000)
+        
+        with pytest.raises(TokenLimitError):
+            router.route(200000)
+    
+    def test_routing_by_quality_tier(self, catalog):
+        router = ModelRouter(catalog, default_model="gpt-4", max_output_tokens=500, enabled=True)
+        
+        assert router.route(300, quality="economy").model == "gpt-4o-mini"
+        assert router.route(300, quality="premium").model == "gpt-4o"
+    
+    def test_latency_strategy_uses_observed_latency(self, catalog):
+        router = ModelRouter(
+            catalog, default_model="gpt-4", max_output_tokens=500,
+            enabled=True, strategy="latency", allowed_models=["gpt-4o", "gpt-4-turbo"]
+        )
+        assert router.route(300).model == "gpt-4o"
+        
+        catalog.record_latency("gpt-4o", 9.0)
+        catalog.record_latency("gpt-4-turbo", 1.0)
+        
+        assert router.route(300).model == "gpt-4-turbo"
+    
+    def test_record_latency_smoothing(self, catalog):
+        catalog.record_latency("gpt-4", 2.0)
+        catalog.record_latency("gpt-4", 4.0)
+        
+        spec = catalog.get("gpt-4")
+        assert spec.latency == pytest.approx(2.0 + 0.2 * 2.0)
+        assert spec.latency_samples == 2
+    
+    def test_generate_completion_records_routing(self):
+        config = {'api_key': 'test-key', 'model': 'gpt-4', 'max_tokens': 500, 'routing': {'enabled': True}}
+        with patch('services.ai_integration.OpenAI'), \
+             patch('services.ai_integration.AsyncOpenAI'), \
+             patch('services.ai_integration.get_token_encoder') as mock_tiktoken:
+            mock_tiktoken.return_value.encode.return_value = [1, 2, 3]
+            client = OpenAIClient(config)
+        
+        mock_response = Mock()
+        mock_response.choices = [Mock()]
+        mock_response.choices[0].message.content = "Routed answer"
+        mock_response.choices[0].finish_reason = "stop"
+        mock_response.usage.completion_tokens = 20
+        mock_response.usage.total_tokens = 29
+        mock_response.id = "routed-id"
+        client.client.chat.completions.create = Mock(return_value=mock_response)
+        
+        response = client.generate_completion([{"role": "user", "content": "Hi"}], quality="economy")
+        
+        assert response.model == "gpt-4o-mini"
+        assert response.metadata["routing"]["model"] == "gpt-4o-mini"
+        assert response.metadata["routing"]["requested_model"] == "gpt-4"
+        assert client.client.chat.completions.create.call_args.kwargs["model"] == "gpt-4o-mini"
+        assert client.catalog.get("gpt-4o-mini").latency_samples == 1
+        assert response.token_usage.estimated_cost == pytest.approx((9 / 1000) * 0.00015 + (20 / 1000) * 0.0006)
+
+
+class TestRateLimiter:
+    """Test client-side RPM/TPM limiting, priorities and concurrency"""
+    
+    def _wait_for(self, predicate, timeout=5):
+        deadline = time.time() + timeout
+        while not predicate():
+            assert time.time() < deadline, "condition not reached"
+            time.sleep(0.005)
+    
+    def test_unlimited_admits_immediately(self):
+        limiter = RateLimiter()
+        with limiter.acquire(1000):
+            assert limiter.get_stats()["in_flight"] == 1
+        assert limiter.get_stats()["in_flight"] == 0
+        assert limiter.get_stats()["admitted"] == 1
+    
+    def test_requests_per_minute_budget(self):
+        limiter = RateLimiter(requests_per_minute=2)
+        limiter.acquire().release()
+        limiter.acquire().release()
+        
+        with pytest.raises(RateLimitError):
+            limiter.acquire(timeout=0.05)
+        assert limiter.get_stats()["timeouts"] == 1
+    
+    def test_tokens_per_minute_budget(self):
+        limiter = RateLimiter(tokens_per_minute=1000)
+        limiter.acquire(800).release()
+        
+        with pytest.raises(RateLimitError):
+            limiter.acquire(500, timeout=0.05)
+        
+        # A request larger than the whole budget is clamped rather than starved
+        assert RateLimiter(tokens_per_minute=1000).acquire(5000, timeout=0.05) is not None
+    
+    def test_concurrency_cap_and_priority_order(self):
+        limiter = RateLimiter(max_concurrent=1)
+        held = limiter.acquire()
+        order = []
+        
+        def worker(name, priority):
+            with limiter.acquire(priority=priority, timeout=5):
+                order.append(name)
+        
+        background = threading.Thread(target=worker, args=("background", RequestPriority.BACKGROUND))
+        background.start()
+        self._wait_for(lambda: limiter.get_stats()["queue_depth"] == 1)
+        interactive = threading.Thread(target=worker, args=("interactive", RequestPriority.INTERACTIVE))
+        interactive.start()
+        self._wait_for(lambda: limiter.get_stats()["queue_depth"] == 2)
+        
+        held.release()
+        background.join()
+        interactive.join()
+        
+        assert order == ["interactive", "background"]
+        stats = limiter.get_stats()
+        assert stats["max_queue_depth"] == 2
+        assert stats["admitted_by_priority"]["interactive"] == 1
+        assert stats["max_wait_time"] > 0
+    
+    def test_full_queue_sheds_lowest_priority(self):
+        limiter = RateLimiter(max_concurrent=1, max_queue_size=1)
+        held = limiter.acquire()
+        errors = []
+        
+        def background():
+            try:
+                limiter.acquire(priority=RequestPriority.BACKGROUND, timeout=5)
+            except RateLimitError as e:
+                errors.append(e)
+        
+        thread = threading.Thread(target=background)
+        thread.start()
+        self._wait_for(lambda: limiter.get_stats()["queue_depth"] == 1)
+        
+        interactive_permits = []
+        interactive = threading.Thread(
+            target=lambda: interactive_permits.append(
+                limiter.acquire(priority=RequestPriority.INTERACTIVE, timeout=5)
+            )
+        )
+        interactive.start()
+        thread.join()
+        
+        assert len(errors) == 1
+        held.release()
+        interactive.join()
+        assert len(interactive_permits) == 1
+        assert limiter.get_stats()["shed"] == 1
+        
+        # A newcomer that outranks nobody is rejected instead
+        queued = threading.Thread(target=lambda: limiter.acquire(timeout=5).release())
+        queued.start()
+        self._wait_for(lambda: limiter.get_stats()["queue_depth"] == 1)
+        with pytest.raises(RateLimitError):
+            limiter.acquire(priority=RequestPriority.BACKGROUND, timeout=5)
+        
+        interactive_permits[0].release()
+        queued.join()
+    
+    def test_async_acquire(self):
+        limiter = RateLimiter(max_concurrent=1)
+        
+        async def main():
+            async def call():
+                permit = await limiter.acquire_async()
+                await asyncio.sleep(0.01)
+                permit.release()
+            await asyncio.gather(call(), call(), call())
+        
+        asyncio.run(main())
+        
+        stats = limiter.get_stats()
+        assert stats["admitted"] == 3
+        assert stats["in_flight"] == 0
+    
+    def test_shared_limiter_per_name(self):
+        first = get_rate_limiter({"name": "test-shared", "requests_per_minute": 10})
+        second = get_rate_limiter({"name": "test-shared", "requests_per_minute": 99})
+        
+        assert first is second
+        assert first.requests_per_minute == 10
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
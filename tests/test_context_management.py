@@ -2,6 +2,7 @@
 Unit tests for Context Management System
 """
 
+import json
 import pytest
 from datetime import datetime, timedelta
 from unittest.mock import Mock, patch
@@ -10,7 +11,9 @@ from services.ai_integration import (
     ContextManager,
     ConversationContext,
     ConversationMessage,
-    AIIntegrationService
+    AIIntegrationService,
+    AIResponse,
+    TokenUsage
 )
 
 
@@ -66,6 +69,31 @@ class TestConversationContext:
         ]
         
         assert openai_format == expected
+    
+    def test_add_message_counts_tokens_once(self):
+        counter = Mock(side_effect=lambda text: len(text.split()))
+        context = ConversationContext(messages=[], token_counter=counter)
+        context.add_message("system", "You are a helpful assistant")
+        context.add_message("user", "Hello")
+        
+        assert context.messages[0].token_count == 5
+        assert context.messages[1].token_count == 1
+        assert context.total_tokens == (5 + 4) + (1 + 4)
+        assert counter.call_count == 2
+        
+        # Reading the total and prompt size does not re-tokenize
+        assert context.prompt_tokens() == context.total_tokens + 2
+        assert counter.call_count == 2
+    
+    def test_remove_message_keeps_total_exact(self):
+        context = ConversationContext(messages=[], token_counter=lambda text: len(text.split()))
+        context.add_message("user", "one two three")
+        context.add_message("assistant", "four five")
+        
+        removed = context.remove_message(0)
+        
+        assert removed.content == "one two three"
+        assert context.total_tokens == 2 + 4
 
 
 class TestContextManager:
@@ -156,6 +184,34 @@ class TestContextManager:
         system_messages = [msg for msg in context.messages if msg.role == "system"]
         assert len(system_messages) >= 1
     
+    def test_prune_context_by_tokens(self):
+        context_manager = ContextManager(max_context_tokens=60, max_history_length=100)
+        context_manager.add_message("test-context", "system", "System prompt")
+        for i in range(20):
+            context_manager.add_message("test-context", "user", f"Message number {i} " * 3)
+        
+        context = context_manager.contexts["test-context"]
+        
+        # Running total stays exact and within budget after pruning
+        assert context.total_tokens == sum(msg.token_count + 4 for msg in context.messages)
+        assert context.total_tokens <= context.max_tokens
+        assert context.messages[0].role == "system"
+        assert context.messages[-1].content.startswith("Message number 19")
+    
+    def test_count_context_tokens(self, context_manager):
+        context_manager.add_message("test-context", "system", "System prompt")
+        context_manager.add_message("test-context", "user", "User message")
+        context_manager.add_message("test-context", "assistant", "Assistant response")
+        
+        count = context_manager.count_tokens
+        assert context_manager.count_context_tokens("test-context") == (
+            count("System prompt") + count("User message") + count("Assistant response") + 3 * 4 + 2
+        )
+        assert context_manager.count_context_tokens("test-context", max_messages=1) == (
+            count("System prompt") + count("Assistant response") + 2 * 4 + 2
+        )
+        assert context_manager.count_context_tokens("missing") == 0
+    
     def test_inject_document_context(self, context_manager):
         documents = [
             "Document 1 content here",
@@ -185,6 +241,118 @@ class TestContextManager:
         assert len(content) < len(long_document) + 100  # Account for formatting
 
 
+class TestContextCompaction:
+    """Test rolling summarization of long conversations"""
+    
+    @pytest.fixture
+    def summarizer(self):
+        def summarize(previous_summary, messages):
+            # Like a model given max_tokens, keep the summary short: the five latest entries
+            entries = f"{previous_summary} [{len(messages)} turns]".split()
+            return " ".join(entries[-10:])
+        return Mock(side_effect=summarize)
+    
+    @pytest.fixture
+    def context_manager(self, summarizer):
+        manager = ContextManager(
+            max_context_tokens=10000,
+            max_history_length=100,
+            summarizer=summarizer,
+            compaction_threshold_tokens=100,
+            keep_recent_messages=4,
+            summary_max_tokens=30
+        )
+        yield manager
+        manager.shutdown()
+    
+    def _add_turns(self, context_manager, count, start=0):
+        for i in range(start, start + count):
+            role = "user" if i % 2 == 0 else "assistant"
+            context_manager.add_message("conv", role, f"Turn {i} discussing budget and hiring plans")
+            context_manager.wait_for_compactions(timeout=5)
+    
+    def test_compaction_replaces_old_turns_with_summary(self, context_manager, summarizer):
+        context_manager.add_message("conv", "system", "System prompt")
+        self._add_turns(context_manager, 12)
+        
+        context = context_manager.contexts["conv"]
+        assert summarizer.called
+        assert context.messages[0].content == "System prompt"
+        assert context.messages[1].metadata["type"] == "conversation_summary"
+        assert context.messages[-1].content.startswith("Turn 11")
+        assert context_manager.get_running_summary("conv").startswith("[")
+        
+        # Token total stays exact after compaction
+        assert context.total_tokens == sum(msg.token_count + 4 for msg in context.messages)
+        
+        stats = context_manager.get_compaction_stats()
+        assert stats["compactions"] >= 1
+        assert stats["compacted_tokens"] > 0
+    
+    def test_running_summary_carries_previous_summary(self, context_manager, summarizer):
+        self._add_turns(context_manager, 30)
+        
+        # Each compaction receives the summary produced by the one before it
+        previous_summaries = [call.args[0] for call in summarizer.call_args_list]
+        assert previous_summaries[0] == ""
+        assert all(previous_summaries[1:])
+        
+        summary = context_manager.contexts["conv"].messages[0]
+        assert summary.metadata["summarized_messages"] == context_manager.get_compaction_stats()["summarized_messages"]
+    
+    def test_prompt_size_stays_bounded(self, context_manager):
+        sizes = []
+        for batch in range(5):
+            self._add_turns(context_manager, 20, start=batch * 20)
+            sizes.append(context_manager.count_context_tokens("conv"))
+        
+        assert max(sizes) - min(sizes) < 100
+    
+    def test_long_summary_is_truncated_to_budget(self):
+        manager = ContextManager(
+            max_context_tokens=10000,
+            max_history_length=100,
+            summarizer=Mock(side_effect=lambda previous_summary, messages: "decision recorded " * 200),
+            compaction_threshold_tokens=100,
+            keep_recent_messages=4,
+            summary_max_tokens=30
+        )
+        sizes = []
+        for i in range(60):
+            manager.add_message("conv", "user", f"Turn {i} discussing budget and hiring plans")
+            manager.wait_for_compactions(timeout=5)
+            sizes.append(manager.count_context_tokens("conv"))
+        
+        assert manager.count_tokens(manager.get_running_summary("conv")) <= 30
+        assert max(sizes[20:]) <= 100 + 30 + 20
+        assert manager.get_compaction_stats()["summary_max_tokens"] == 30
+        manager.shutdown()
+    
+    def test_no_compaction_without_summarizer(self):
+        manager = ContextManager(max_context_tokens=10000, max_history_length=100, compaction_threshold_tokens=10)
+        for i in range(10):
+            manager.add_message("conv", "user", f"Message {i}")
+        
+        assert len(manager.contexts["conv"].messages) == 10
+        assert manager.get_compaction_stats()["enabled"] is False
+    
+    def test_summarizer_failure_keeps_turns(self):
+        manager = ContextManager(
+            max_context_tokens=10000,
+            max_history_length=100,
+            summarizer=Mock(side_effect=RuntimeError("model unavailable")),
+            compaction_threshold_tokens=10,
+            keep_recent_messages=2
+        )
+        for i in range(6):
+            manager.add_message("conv", "user", f"Message {i}")
+            manager.wait_for_compactions(timeout=5)
+        
+        assert len(manager.contexts["conv"].messages) == 6
+        assert manager.get_compaction_stats()["failures"] >= 1
+        manager.shutdown()
+
+
 class TestAIIntegrationServiceContextManagement:
     """Test AI Integration Service context management features"""
     
@@ -285,6 +453,53 @@ class TestAIIntegrationServiceContextManagement:
             assert "old-context" not in service.context_manager.contexts
             assert "recent-context" in service.context_manager.contexts
     
+    def test_summarize_conversation(self, service):
+        summary_response = Mock()
+        summary_response.content = " Agreed to hire two engineers. "
+        summary_response.metadata = {}
+        summary_response.token_usage.total_tokens = 80
+        summary_response.token_usage.estimated_cost = 0.002
+        service.openai_client.generate_completion.return_value = summary_response
+        
+        context = ConversationContext(messages=[])
+        context.add_message("user", "Should we hire?")
+        context.add_message("assistant", "Hire two engineers.")
+        
+        summary = service._summarize_conversation("Budget approved.", list(context.messages))
+        
+        assert summary == "Agreed to hire two engineers."
+        assert service.openai_client.generate_completion.call_args[1]["max_tokens"] == (
+            service.context_manager.summary_max_tokens
+        )
+        prompt = service.openai_client.generate_completion.call_args[0][0][1]["content"]
+        assert "Budget approved." in prompt
+        assert "USER: Should we hire?" in prompt
+        assert service.total_tokens_used == 80
+    
+    def test_executive_response_reuses_cached_history_tokens(self, service):
+        decisions = iter(["Expand into Europe first", "Start with Germany"])
+        service.openai_client.generate_completion.side_effect = lambda messages, **kwargs: AIResponse(
+            content=json.dumps({"decision": next(decisions), "rationale": "Demand", "confidence_score": 0.8}),
+            model='gpt-4',
+            token_usage=TokenUsage(100, 50, 150, 0.005),
+            response_time=1.0
+        )
+        service.generate_executive_response("ceo", "Should we expand abroad?", context_id="conv")
+        
+        count = service.context_manager.count_tokens
+        with patch.object(service.context_manager, 'count_tokens', wraps=count) as tokenizer:
+            service.generate_executive_response("ceo", "Which market first?", context_id="conv")
+        
+        # Earlier turns are counted from their cached totals, never re-tokenized
+        tokenized = [call.args[0] for call in tokenizer.call_args_list]
+        assert not any("Should we expand abroad?" in text or "Expand into Europe first" in text for text in tokenized)
+        
+        messages = service.openai_client.generate_completion.call_args[0][0]
+        prompt_tokens = service.openai_client.generate_completion.call_args[1]['prompt_tokens']
+        assert "Should we expand abroad?" in messages[-1]["content"]
+        exact = sum(count(message["content"]) + 4 for message in messages) + 2
+        assert abs(prompt_tokens - exact) <= 4
+    
     def test_usage_stats_includes_context_count(self, service):
         # Add some contexts
         service.context_manager.add_message("context1", "user", "Message 1")
@@ -0,0 +1,153 @@
+"""
+Unit tests for the token-budget document context packer
+"""
+
+import pytest
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+from services.context_packer import ContextChunk, ContextPacker, PackedContext
+from services.ai_integration import AIIntegrationService, ContextManager
+
+
+def count_words(text: str) -> int:
+    """Deterministic stand-in tokenizer: one token per whitespace-separated word"""
+    return len(text.split())
+
+
+def words(prefix: str, count: int) -> str:
+    return " ".join(f"{prefix}{i}" for i in range(count))
+
+
+@pytest.fixture
+def packer():
+    return ContextPacker(count_words)
+
+
+class TestContextPacker:
+    """Test chunk selection, deduplication and budget enforcement"""
+
+    def test_never_exceeds_budget(self, packer):
+        chunks = [ContextChunk(words(f"d{i}w", 30 + i), score=1.0 - i * 0.05, chunk_id=str(i)) for i in range(10)]
+
+        for budget in (0, 10, 45, 100, 250, 1000):
+            packed = packer.pack(chunks, budget)
+            assert packed.tokens <= budget
+            assert packed.tokens == count_words(packed.text)
+
+    def test_maximizes_total_relevance(self, packer):
+        # Greedy by score takes the single large chunk; two small ones are worth more
+        chunks = [
+            ContextChunk(words("big", 60), score=0.9, chunk_id="big"),
+            ContextChunk(words("a", 30), score=0.8, chunk_id="a"),
+            ContextChunk(words("b", 30), score=0.7, chunk_id="b")
+        ]
+
+        packed = packer.pack(chunks, 62)
+
+        assert {chunk.chunk_id for chunk in packed.chunks} == {"a", "b"}
+        assert packed.relevance == pytest.approx(1.5)
+
+    def test_removes_duplicates(self, packer):
+        text = words("shared", 40)
+        chunks = [
+            ContextChunk(text, score=0.9, chunk_id="1", document_id="doc-a"),
+            ContextChunk(text, score=0.8, chunk_id="2", document_id="doc-b"),
+            ContextChunk(text, score=0.7, chunk_id="1", document_id="doc-a"),
+            ContextChunk(words("other", 10), score=0.5, chunk_id="3")
+        ]
+
+        packed = packer.pack(chunks, 1000)
+
+        assert packed.duplicates == 2
+        assert [chunk.chunk_id for chunk in packed.chunks].count("1") == 1
+        assert "2" not in {chunk.chunk_id for chunk in packed.chunks}
+
+    def test_trims_overlap_between_adjacent_chunks(self, packer):
+        document = words("w", 400)
+        first, second = document[:1000], document[800:1800]
+        chunks = [
+            ContextChunk(first, score=0.9, chunk_id="c0", document_id="doc", chunk_index=0),
+            ContextChunk(second, score=0.8, chunk_id="c1", document_id="doc", chunk_index=1)
+        ]
+
+        packed = packer.pack(chunks, 1000)
+
+        assert packed.trimmed_tokens > 0
+        assert packed.text.count(document[800:1000]) == 1
+        assert packed.tokens < count_words(first) + count_words(second)
+
+    def test_reading_order_groups_documents(self, packer):
+        chunks = [
+            ContextChunk("late part of a", score=0.9, document_id="a", chunk_index=5, title="a.pdf"),
+            ContextChunk("early part of a", score=0.4, document_id="a", chunk_index=1, title="a.pdf"),
+            ContextChunk("only part of b", score=0.6, document_id="b", chunk_index=0, title="b.pdf")
+        ]
+
+        packed = packer.pack(chunks, 1000)
+
+        assert [chunk.content for chunk in packed.chunks] == ["early part of a", "late part of a", "only part of b"]
+        assert packed.text.startswith("[a.pdf]\nearly part of a")
+
+    def test_accepts_search_results(self, packer):
+        results = [
+            SimpleNamespace(chunk_id="x_0", document_id="x", content="alpha beta", similarity_score=0.7,
+                            metadata={"filename": "x.txt"}, chunk_index=0),
+            {"chunk_id": "y_0", "document_id": "y", "content": "gamma", "similarity_score": 0.9,
+             "metadata": {}, "chunk_index": 0}
+        ]
+
+        packed = packer.pack(results, 100)
+
+        assert isinstance(packed, PackedContext)
+        assert [chunk.chunk_id for chunk in packed.chunks] == ["y_0", "x_0"]
+        assert "[x.txt]\nalpha beta" in packed.text
+
+    def test_smaller_than_character_truncation(self, packer):
+        chunks = [ContextChunk(words(f"d{i}w", 200), score=1.0 - i * 0.1, chunk_id=str(i)) for i in range(3)]
+        legacy = "\n".join(f"\nRelevant content: {chunk.content[:500]}..." for chunk in chunks)
+
+        packed = packer.pack(chunks, count_words(legacy) // 2)
+
+        # Nothing fits whole, so the best chunk contributes its leading part
+        assert 0 < packed.tokens <= count_words(legacy) // 2
+        assert [chunk.chunk_id for chunk in packed.chunks] == ["0"]
+        assert packed.text.startswith("d0w0 d0w1") and packed.text.endswith("...")
+
+
+class TestDocumentContextBudget:
+    """Test budget integration with the context manager and AI service"""
+
+    def test_inject_document_context_with_token_budget(self):
+        manager = ContextManager(max_context_tokens=4000)
+        documents = ["x " * 400, "Second document", "Third document", "Fourth document"]
+
+        manager.inject_document_context("ctx", documents, max_tokens=50)
+
+        content = manager.contexts["ctx"].messages[0].content
+        assert "Fourth document" in content
+        assert "x x x" not in content
+        assert "..." not in content
+
+    def test_service_budget_leaves_room_for_completion(self):
+        with patch('services.ai_integration.OpenAIClient') as mock_client_class:
+            mock_client = Mock()
+            mock_client.model = 'gpt-4'
+            mock_client.max_tokens = 2000
+            mock_client.catalog.get.return_value = SimpleNamespace(context_window=8192)
+            mock_client.count_tokens.side_effect = count_words
+            mock_client.count_message_tokens.return_value = 6000
+            mock_client_class.return_value = mock_client
+            service = AIIntegrationService({'openai': {'api_key': 'test'}, 'document_context_tokens': 1500})
+
+        assert service.document_context_budget(0) == 1500
+        assert service.document_context_budget(6000) == 192
+
+        chunks = [ContextChunk(words(f"c{i}w", 100), score=0.9 - i * 0.1, chunk_id=str(i)) for i in range(5)]
+        packed = service.pack_document_context(chunks, "ceo", "Should we expand?")
+
+        assert packed.budget == 192 - count_words("\n\nRELEVANT DOCUMENTS:\n")
+        assert packed.tokens <= packed.budget
+        assert packed.chunks[0].content == chunks[0].content
+        assert [chunk.chunk_id for chunk in packed.chunks] == ["0", "1"]
+        assert packed.chunks[1].content.endswith("...")
@@ -0,0 +1,251 @@
+"""
+Unit tests for conversation context stores
+"""
+
+import os
+import threading
+import pytest
+
+from services.context_store import (
+    MemoryContextStore,
+    SQLiteContextStore,
+    RedisContextStore,
+    ContextStoreError,
+    create_context_store
+)
+from services.ai_integration import ContextManager, ConversationContext
+
+
+class FakeClock:
+    """Manually advanced time source"""
+    
+    def __init__(self, now=1000.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+
+class TestMemoryContextStore:
+    """Test the in-process LRU context store"""
+    
+    def test_set_get_delete(self):
+        store = MemoryContextStore(sizer=lambda value: 10)
+        store["a"] = "value"
+        
+        assert store["a"] == "value"
+        assert "a" in store
+        assert len(store) == 1
+        
+        del store["a"]
+        assert "a" not in store
+        assert store.get("a") is None
+    
+    def test_byte_cap_evicts_least_recently_used(self):
+        store = MemoryContextStore(max_bytes=30, stripes=1, sizer=lambda value: 10)
+        store["a"] = 1
+        store["b"] = 2
+        store["c"] = 3
+        store["a"]  # Touch "a" so "b" is least recently used
+        store["d"] = 4
+        
+        assert "b" not in store
+        assert set(store) == {"a", "c", "d"}
+        
+        stats = store.get_stats()
+        assert stats["bytes"] == 30
+        assert stats["capacity_evictions"] == 1
+    
+    def test_max_entries(self):
+        store = MemoryContextStore(max_entries=2, stripes=1, sizer=lambda value: 1)
+        for key in ["a", "b", "c"]:
+            store[key] = key
+        
+        assert len(store) == 2
+        assert "a" not in store
+    
+    def test_idle_ttl(self):
+        clock = FakeClock()
+        store = MemoryContextStore(idle_ttl_seconds=60, stripes=1, sizer=lambda value: 1, clock=clock)
+        store["idle"] = 1
+        store["active"] = 2
+        
+        clock.now += 50
+        store["active"]
+        clock.now += 20
+        
+        assert "idle" not in store
+        assert store["active"] == 2
+        assert store.sweep_expired() == 1
+        assert store.get_stats()["ttl_evictions"] == 1
+    
+    def test_modify_creates_and_updates(self):
+        store = MemoryContextStore()
+        
+        store.modify("a", lambda value: value.append(1), list)
+        result = store.modify("a", lambda value: value.append(2), list)
+        
+        assert result == [1, 2]
+        assert store["a"] == [1, 2]
+        
+        with pytest.raises(KeyError):
+            store.modify("missing", lambda value: None)
+    
+    def test_concurrent_modify(self):
+        store = MemoryContextStore(stripes=4)
+        
+        def worker():
+            for _ in range(200):
+                store.modify("shared", lambda value: value.append(1), list)
+        
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert len(store["shared"]) == 1600
+    
+    def test_stats(self):
+        store = MemoryContextStore()
+        store["a"] = 1
+        store.get("a")
+        store.get("b")
+        
+        stats = store.get_stats()
+        assert stats["backend"] == "memory"
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+
+class TestSQLiteContextStore:
+    """Test the shared SQLite context store"""
+    
+    def _store(self, path, **kwargs):
+        return SQLiteContextStore(
+            path,
+            encoder=ConversationContext.to_dict,
+            decoder=ConversationContext.from_dict,
+            **kwargs
+        )
+    
+    def _context(self, *contents):
+        context = ConversationContext(messages=[], token_counter=lambda text: len(text.split()))
+        for content in contents:
+            context.add_message("user", content)
+        return context
+    
+    def test_round_trip_preserves_token_counts(self, tmp_path):
+        store = self._store(str(tmp_path / "contexts.db"))
+        store["a"] = self._context("one two three")
+        
+        loaded = store["a"]
+        
+        assert loaded.messages[0].content == "one two three"
+        assert loaded.messages[0].token_count == 3
+        assert loaded.total_tokens == 3 + 4
+        store.close()
+    
+    def test_shared_between_store_instances(self, tmp_path):
+        path = str(tmp_path / "contexts.db")
+        worker_a = self._store(path)
+        worker_b = self._store(path)
+        
+        worker_a.modify("conv", lambda context: context.add_message("user", "hello"), self._context)
+        worker_b.modify("conv", lambda context: context.add_message("assistant", "hi"), self._context)
+        
+        assert [msg.content for msg in worker_a["conv"].messages] == ["hello", "hi"]
+        assert len(worker_b) == 1
+        worker_a.close()
+        worker_b.close()
+    
+    def test_limits(self, tmp_path):
+        clock = FakeClock()
+        store = self._store(
+            str(tmp_path / "contexts.db"),
+            max_entries=2,
+            idle_ttl_seconds=60,
+            evict_interval=1,
+            clock=clock
+        )
+        store["a"] = self._context("a")
+        clock.now += 1
+        store["b"] = self._context("b")
+        clock.now += 1
+        store["c"] = self._context("c")
+        
+        assert "a" not in store
+        assert len(store) == 2
+        
+        clock.now += 120
+        assert "b" not in store
+        store.enforce_limits()
+        
+        stats = store.get_stats()
+        assert stats["entries"] == 0
+        assert stats["capacity_evictions"] == 1
+        assert stats["ttl_evictions"] == 2
+        store.close()
+
+
+class TestContextStoreFactory:
+    """Test context store configuration"""
+    
+    def test_default_is_bounded_memory_store(self):
+        store = create_context_store({}, ConversationContext.to_dict, ConversationContext.from_dict)
+        assert isinstance(store, MemoryContextStore)
+    
+    def test_sqlite_backend(self, tmp_path):
+        store = create_context_store(
+            {"backend": "sqlite", "path": str(tmp_path / "contexts.db")},
+            ConversationContext.to_dict,
+            ConversationContext.from_dict
+        )
+        assert isinstance(store, SQLiteContextStore)
+        store.close()
+    
+    def test_unknown_backend(self):
+        with pytest.raises(ContextStoreError):
+            create_context_store({"backend": "memcached"}, None, None)
+    
+    def test_context_manager_on_shared_store(self, tmp_path):
+        path = str(tmp_path / "contexts.db")
+        manager_a = ContextManager(store=create_context_store(
+            {"backend": "sqlite", "path": path}, ConversationContext.to_dict, ConversationContext.from_dict
+        ))
+        manager_b = ContextManager(store=create_context_store(
+            {"backend": "sqlite", "path": path}, ConversationContext.to_dict, ConversationContext.from_dict
+        ))
+        
+        manager_a.add_message("conv", "system", "System prompt")
+        manager_b.add_message("conv", "user", "Hello")
+        
+        assert len(manager_a.get_context_messages("conv")) == 2
+        assert manager_a.count_context_tokens("conv") == manager_b.count_context_tokens("conv")
+
+
+@pytest.mark.external
+class TestRedisContextStore:
+    """Test the Redis context store against a live server"""
+    
+    def test_round_trip(self):
+        redis = pytest.importorskip("redis")
+        client = redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/15"))
+        try:
+            client.ping()
+        except redis.ConnectionError:
+            pytest.skip("Redis server not available")
+        
+        store = RedisContextStore(
+            ConversationContext.to_dict,
+            ConversationContext.from_dict,
+            client=client,
+            key_prefix="test_ai_context:"
+        )
+        store.clear()
+        store.modify("conv", lambda context: context.add_message("user", "hello"), lambda: ConversationContext(messages=[]))
+        
+        assert store["conv"].messages[0].content == "hello"
+        assert list(store) == ["conv"]
+        store.clear()
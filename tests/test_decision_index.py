@@ -0,0 +1,151 @@
+"""
+Unit tests for the similar-decision index
+"""
+
+import pytest
+from unittest.mock import Mock, patch
+
+np = pytest.importorskip("numpy")
+
+from services.decision_index import DecisionIndex, DecisionMatch, encode_vector, decode_vector
+from services.ai_integration import AIIntegrationService
+
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+@pytest.fixture
+def index():
+    return DecisionIndex(initial_capacity=2)
+
+
+class TestDecisionIndex:
+    """Test insertion, filtered nearest-neighbour search and removal"""
+
+    def test_search_returns_most_similar_first(self, index):
+        index.add(1, [1, 0, 0], user_id=7, executive_type="ceo")
+        index.add(2, [0.9, 0.1, 0], user_id=7, executive_type="cfo")
+        index.add(3, [0, 1, 0], user_id=7, executive_type="ceo")
+
+        matches = index.search([1, 0.05, 0], k=2)
+
+        assert [match.decision_id for match in matches] == [1, 2]
+        assert matches[0].similarity == pytest.approx(float(unit(1, 0.05, 0) @ unit(1, 0, 0)), abs=1e-6)
+        assert isinstance(matches[0], DecisionMatch)
+
+    def test_filters_by_user_and_executive(self, index):
+        index.add(1, [1, 0, 0], user_id=7, executive_type="ceo")
+        index.add(2, [1, 0, 0], user_id=8, executive_type="ceo")
+        index.add(3, [0.8, 0.2, 0], user_id=7, executive_type="cto")
+
+        assert [match.decision_id for match in index.search([1, 0, 0], k=5, user_id=8)] == [2]
+        assert [match.decision_id for match in index.search([1, 0, 0], k=5, user_id=7, executive_type="cto")] == [3]
+        assert index.search([1, 0, 0], user_id=99) == []
+
+    def test_min_similarity(self, index):
+        index.add(1, [1, 0], user_id=7)
+        index.add(2, [0, 1], user_id=7)
+
+        assert [match.decision_id for match in index.search([1, 0], k=5, min_similarity=0.5)] == [1]
+
+    def test_add_replaces_existing_decision(self, index):
+        index.add(1, [1, 0], user_id=7)
+        index.add(1, [0, 1], user_id=8)
+
+        assert len(index) == 1
+        assert index.count(7) == 0
+        assert index.search([0, 1], user_id=8)[0].similarity == pytest.approx(1.0)
+
+    def test_grows_past_initial_capacity(self, index):
+        for decision_id in range(10):
+            index.add(decision_id, [1, decision_id], user_id=decision_id % 2)
+
+        assert len(index) == 10
+        assert index.count(1) == 5
+        assert index.search([1, 9], k=1)[0].decision_id == 9
+
+    def test_remove_keeps_other_rows_searchable(self, index):
+        index.add(1, [1, 0], user_id=7)
+        index.add(2, [0, 1], user_id=7)
+        index.add(3, [1, 1], user_id=8)
+
+        assert index.remove(1) is True
+        assert index.remove(1) is False
+
+        assert 1 not in index
+        assert index.search([1, 1], k=1, user_id=8)[0].decision_id == 3
+        assert [match.decision_id for match in index.search([0, 1], k=5, user_id=7)] == [2]
+
+    def test_rejects_mismatched_dimensions(self, index):
+        index.add(1, [1, 0, 0])
+
+        with pytest.raises(ValueError):
+            index.add(2, [1, 0])
+        assert index.search([1, 0]) == []
+
+    def test_vector_round_trip(self):
+        vector = decode_vector(encode_vector([3, 4]))
+
+        assert vector.dtype == np.float32
+        assert vector.tolist() == pytest.approx([0.6, 0.8])
+
+
+class TestAIIntegrationServiceDecisionIndex:
+    """Service lookups embed the context and search the index"""
+
+    @pytest.fixture
+    def service(self):
+        with patch('services.ai_integration.OpenAIClient') as mock_client_class:
+            mock_client = Mock()
+            mock_client.model = 'gpt-4'
+            mock_client_class.return_value = mock_client
+            service = AIIntegrationService({
+                'openai': {'api_key': 'test'},
+                'decision_index': {'similarity_threshold': 0.9}
+            })
+        return service
+
+    def test_disabled_without_config(self):
+        with patch('services.ai_integration.OpenAIClient'):
+            service = AIIntegrationService({'openai': {'api_key': 'test'}})
+
+        assert service.decision_index is None
+        assert service.find_similar_decisions("Should we expand?", user_id=7) == []
+
+    def test_index_and_find_similar(self, service):
+        service.openai_client.create_embedding.side_effect = [[1.0, 0.0], [0.99, 0.05]]
+
+        embedding = service.index_decision(1, "Should we expand to Europe?", "Expand in Q3", 7, "ceo")
+        matches = service.find_similar_decisions("Should we expand into Europe?", user_id=7, executive_type="ceo")
+
+        assert embedding == [1.0, 0.0]
+        assert service.openai_client.create_embedding.call_args_list[0].args[0] == \
+            "Should we expand to Europe?\n\nExpand in Q3"
+        assert [match.decision_id for match in matches] == [1]
+        assert matches[0].similarity > 0.9
+
+    def test_skips_embedding_when_user_has_no_decisions(self, service):
+        service.index_decision(1, "ctx", "decision", 7, "ceo", embedding=[1.0, 0.0])
+
+        assert service.find_similar_decisions("ctx", user_id=8) == []
+        service.openai_client.create_embedding.assert_not_called()
+
+    def test_threshold_filters_weak_matches(self, service):
+        service.index_decision(1, "ctx", "decision", 7, "ceo", embedding=[1.0, 0.0])
+        service.openai_client.create_embedding.return_value = [0.5, 0.5]
+
+        assert service.find_similar_decisions("unrelated", user_id=7) == []
+        assert service.get_usage_stats()["decision_index"]["decisions"] == 1
+
+    def test_embed_decisions_uses_one_request(self, service):
+        service.openai_client.create_embeddings.return_value = [[1.0, 0.0], [0.0, 1.0]]
+
+        embeddings = service.embed_decisions([
+            {'context': "a", 'decision': "b"},
+            {'context': "c", 'decision': "d"}
+        ])
+
+        assert embeddings == [[1.0, 0.0], [0.0, 1.0]]
+        service.openai_client.create_embeddings.assert_called_once_with(["a\n\nb", "c\n\nd"])
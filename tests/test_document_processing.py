@@ -334,5 +334,67 @@ class TestFileUpload:
             file_upload.get_content_bytes()
 
 
+
+class TestSharedVectorService:
+    """Test that document services share one vector service per ChromaDB path and collection"""
+    
+    @pytest.fixture
+    def vector_database(self):
+        from services import vector_database
+        vector_database.shutdown_vector_database_services()
+        with patch.object(vector_database, 'VectorDatabaseService') as service_class:
+            service_class.side_effect = lambda config: Mock(
+                collection_name=config['collection_name'],
+                get_document_context=Mock(return_value=[]),
+                search_similar_content=Mock(return_value=[])
+            )
+            yield vector_database, service_class
+        vector_database.shutdown_vector_database_services()
+    
+    def make_service(self, **config):
+        return DocumentProcessingService({'upload_directory': tempfile.mkdtemp(), **config})
+    
+    def test_constructed_once_across_calls_and_instances(self, vector_database):
+        module, service_class = vector_database
+        first = self.make_service(chroma_path='/tmp/chroma_shared')
+        second = self.make_service(chroma_path='/tmp/chroma_shared')
+        
+        first.extract_context("doc123", "revenue")
+        first.search_documents("revenue")
+        second.search_documents("churn")
+        
+        assert service_class.call_count == 1
+        assert first._get_vector_service() is second._get_vector_service()
+    
+    def test_keyed_by_path_and_collection(self, vector_database):
+        module, service_class = vector_database
+        
+        default = self.make_service(chroma_path='/tmp/chroma_shared')._get_vector_service()
+        other_collection = self.make_service(chroma_path='/tmp/chroma_shared', collection_name='other')._get_vector_service()
+        other_path = self.make_service(chroma_path='/tmp/chroma_other')._get_vector_service()
+        
+        assert len({id(default), id(other_collection), id(other_path)}) == 3
+        assert service_class.call_count == 3
+    
+    def test_passes_embedding_options(self, vector_database):
+        module, service_class = vector_database
+        
+        self.make_service(embedding_concurrency=8, embedding_cache={'path': '/tmp/cache.db'})._get_vector_service()
+        
+        config = service_class.call_args[0][0]
+        assert config['embedding_concurrency'] == 8
+        assert config['embedding_cache'] == {'path': '/tmp/cache.db'}
+        assert 'chunk_size' not in config
+    
+    def test_shutdown_releases_services(self, vector_database):
+        module, service_class = vector_database
+        service = self.make_service()._get_vector_service()
+        
+        module.shutdown_vector_database_services()
+        
+        service.shutdown.assert_called_once()
+        assert self.make_service()._get_vector_service() is not service
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+Unit tests for batched embedding requests
+"""
+
+import random
+import threading
+import time
+import pytest
+
+from services.embedding_batches import (
+    EmbeddingBatcher,
+    EmbeddingBatchError,
+    plan_embedding_batches
+)
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def fake_vectors(texts):
+    """One-dimensional 'embedding' recording which text it came from"""
+    return [[float(text.split()[-1])] for text in texts]
+
+
+def texts(count, words=3):
+    return [" ".join(["word"] * (words - 1) + [str(index)]) for index in range(count)]
+
+
+class TestPlanEmbeddingBatches:
+    """Test batch sizing by token budget and input count"""
+
+    def test_respects_token_budget(self):
+        batches = plan_embedding_batches(texts(10), count_words, max_batch_tokens=9, max_batch_inputs=100)
+
+        assert [len(batch.texts) for batch in batches] == [3, 3, 3, 1]
+        assert all(batch.tokens <= 9 for batch in batches)
+        assert [batch.start for batch in batches] == [0, 3, 6, 9]
+
+    def test_respects_input_limit(self):
+        batches = plan_embedding_batches(texts(10), count_words, max_batch_tokens=1000, max_batch_inputs=4)
+
+        assert [len(batch.texts) for batch in batches] == [4, 4, 2]
+
+    def test_oversized_text_is_sent_alone(self):
+        items = ["a b", "a b c d e f g h i j", "a b"]
+
+        batches = plan_embedding_batches(items, count_words, max_batch_tokens=5)
+
+        assert [batch.texts for batch in batches] == [["a b"], ["a b c d e f g h i j"], ["a b"]]
+
+    def test_empty(self):
+        assert plan_embedding_batches([], count_words) == []
+
+
+class TestEmbeddingBatcher:
+    """Test ordering, concurrency and retries"""
+
+    def make_batcher(self, embed_batch, **kwargs):
+        options = {'max_batch_tokens': 9, 'concurrency': 4, 'retry_delay': 0.5, 'sleep': lambda seconds: None}
+        options.update(kwargs)
+        return EmbeddingBatcher(embed_batch, count_words, **options)
+
+    def test_preserves_order_with_concurrency(self):
+        rng = random.Random(3)
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def embed_batch(batch):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(rng.random() * 0.01)  # Batches finish out of order
+            with lock:
+                active.pop()
+            return fake_vectors(batch)
+
+        batcher = self.make_batcher(embed_batch)
+        embeddings = batcher.embed(texts(50))
+
+        assert embeddings == [[float(index)] for index in range(50)]
+        assert 1 < max(peak) <= 4
+        assert batcher.get_stats()["requests"] == 17
+
+    def test_retries_only_failed_batches(self):
+        calls = []
+        delays = []
+
+        def embed_batch(batch):
+            calls.append(batch[0])
+            if batch[0].endswith(" 3") and calls.count(batch[0]) == 1:
+                raise ConnectionError("reset")
+            return fake_vectors(batch)
+
+        batcher = self.make_batcher(embed_batch, sleep=delays.append)
+        embeddings = batcher.embed(texts(9))
+
+        assert embeddings == [[float(index)] for index in range(9)]
+        assert sorted(calls) == sorted(["word word 0", "word word 3", "word word 6", "word word 3"])
+        assert delays == [0.5]
+        assert batcher.get_stats()["retried_batches"] == 1
+
+    def test_gives_up_after_max_retries(self):
+        delays = []
+
+        def embed_batch(batch):
+            if batch[0].endswith(" 3"):
+                raise ConnectionError("down")
+            return fake_vectors(batch)
+
+        batcher = self.make_batcher(embed_batch, max_retries=2, sleep=delays.append)
+
+        with pytest.raises(EmbeddingBatchError) as exc_info:
+            batcher.embed(texts(9))
+
+        assert [batch.start for batch in exc_info.value.failed_batches] == [3]
+        assert isinstance(exc_info.value.cause, ConnectionError)
+        assert delays == [0.5, 1.0]
+
+    def test_non_retryable_errors_fail_fast(self):
+        def embed_batch(batch):
+            raise ValueError("bad input")
+
+        batcher = self.make_batcher(embed_batch, retryable=lambda error: not isinstance(error, ValueError))
+
+        with pytest.raises(EmbeddingBatchError):
+            batcher.embed(texts(3))
+        assert batcher.get_stats()["requests"] == 1
+
+    def test_rejects_wrong_number_of_vectors(self):
+        batcher = self.make_batcher(lambda batch: fake_vectors(batch)[:-1], max_retries=0)
+
+        with pytest.raises(EmbeddingBatchError, match="Expected 3 embeddings"):
+            batcher.embed(texts(3))
+
+    def test_empty_input_makes_no_requests(self):
+        batcher = self.make_batcher(lambda batch: pytest.fail("no request expected"))
+
+        assert batcher.embed([]) == []
@@ -0,0 +1,95 @@
+"""
+Unit tests for the content-addressed embedding cache
+"""
+
+import pytest
+
+from services.embedding_cache import (
+    EmbeddingCache,
+    get_embedding_cache,
+    normalize_embedding_text,
+    embedding_text_digest
+)
+
+
+class FakeClock:
+    """Manually advanced time source"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.db"), max_entries=3, clock=FakeClock())
+    yield cache
+    cache.close()
+
+
+class TestEmbeddingCache:
+    """Test lookups, normalization, eviction and statistics"""
+
+    def test_round_trip(self, cache):
+        cache.put_many("small", ["alpha", "beta"], [[0.5, 0.25], [1.0, -1.0]])
+
+        assert cache.get_many("small", ["beta", "gamma", "alpha"]) == [[1.0, -1.0], None, [0.5, 0.25]]
+
+    def test_keyed_on_normalized_text(self, cache):
+        cache.put("small", "Standard  disclaimer\napplies.", [0.5])
+
+        assert cache.get("small", "  Standard disclaimer applies. ") == [0.5]
+        assert normalize_embedding_text("a\n\tb  c") == "a b c"
+        assert embedding_text_digest("a  b") == embedding_text_digest("a b")
+
+    def test_keyed_on_model(self, cache):
+        cache.put("small", "alpha", [0.5])
+
+        assert cache.get("large", "alpha") is None
+
+    def test_evicts_least_recently_used(self, cache):
+        cache.put_many("small", ["a", "b", "c"], [[1.0], [2.0], [3.0]])
+        cache.get("small", "a")  # Now more recent than b and c
+
+        cache.put("small", "d", [4.0])
+
+        assert cache.get_many("small", ["a", "b", "c", "d"]) == [[1.0], None, [3.0], [4.0]]
+        assert cache.get_stats()["evictions"] == 1
+        assert cache.get_stats()["entries"] == 3
+
+    def test_duplicates_are_stored_once(self, cache):
+        cache.put_many("small", ["a", "a"], [[1.0], [1.0]])
+        cache.put("small", "a", [1.0])
+
+        assert cache.get_stats()["entries"] == 1
+        assert cache.get_stats()["stores"] == 1
+
+    def test_hit_rate(self, cache):
+        cache.put("small", "a", [1.0])
+
+        cache.get_many("small", ["a", "a", "b", "c"])
+
+        stats = cache.get_stats()
+        assert (stats["hits"], stats["misses"]) == (2, 2)
+        assert stats["hit_rate"] == 0.5
+
+    def test_persists_across_instances(self, tmp_path):
+        path = str(tmp_path / "embeddings.db")
+        first = EmbeddingCache(path)
+        first.put("small", "alpha", [0.5, 0.25])
+        first.close()
+
+        second = EmbeddingCache(path)
+        try:
+            assert second.get("small", "alpha") == [0.5, 0.25]
+            assert second.get_stats()["entries"] == 1
+        finally:
+            second.close()
+
+    def test_shared_per_path(self, tmp_path):
+        config = {'path': str(tmp_path / "shared.db")}
+
+        assert get_embedding_cache(config) is get_embedding_cache(config)
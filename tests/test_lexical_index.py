@@ -0,0 +1,146 @@
+"""
+Unit tests for the BM25 lexical index
+"""
+
+import time
+import pytest
+
+from services.lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical"), background_compaction=False)
+    yield index
+    index.close()
+
+
+def add_chunks(index):
+    index.add(
+        ids=["q3_0", "q3_1", "prod_0"],
+        texts=[
+            "Q3 revenue reached $4.2M, up from 3.1M, with churn at 2%.",
+            "Revenue grew in the enterprise segment; revenue per seat rose.",
+            "Product SKU-4471 ships to Acme Corp at 1,200 units per month."
+        ],
+        document_ids=["q3", "q3", "prod"]
+    )
+
+
+class TestTokenize:
+    """Test index terms for figures, codes and stopwords"""
+
+    def test_keeps_figures_and_codes(self):
+        terms = tokenize("SKU-4471 sold 1,200 units at $4.2M in Q3/2024")
+
+        assert "sku-4471" in terms and "sku" in terms and "4471" in terms
+        assert "1,200" in terms and "1200" in terms
+        assert "4.2m" in terms
+        assert "q3/2024" in terms and "q3" in terms
+        assert "in" not in terms and "at" not in terms
+
+
+class TestLexicalIndex:
+    """Test ranking, filters, persistence and compaction"""
+
+    def test_exact_code_lookup(self, index):
+        add_chunks(index)
+
+        assert index.search("sku-4471")[0][0] == "prod_0"
+        assert index.search("4471")[0][0] == "prod_0"
+        assert index.search("1200 units")[0][0] == "prod_0"
+        assert index.search("$4.2M")[0][0] == "q3_0"
+
+    def test_term_frequency_ranks_higher(self, index):
+        add_chunks(index)
+
+        results = index.search("revenue")
+
+        assert [chunk_id for chunk_id, _ in results] == ["q3_1", "q3_0"]
+        assert results[0][1] > results[1][1] > 0
+
+    def test_no_matching_terms(self, index):
+        add_chunks(index)
+
+        assert index.search("zebra") == []
+        assert index.search("the of and") == []
+
+    def test_document_filter(self, index):
+        add_chunks(index)
+
+        assert [chunk_id for chunk_id, _ in index.search("revenue units", document_ids=["prod"])] == ["prod_0"]
+
+    def test_replace_and_delete(self, index):
+        add_chunks(index)
+
+        index.add(ids=["prod_0"], texts=["Product SKU-9000 replaces the old line."], document_ids=["prod"])
+        assert index.search("4471") == []
+        assert index.search("sku-9000")[0][0] == "prod_0"
+
+        index.delete(["q3_0", "q3_1"])
+        assert index.search("revenue") == []
+        assert index.count() == 1
+
+    def test_persists_across_instances(self, tmp_path):
+        path = str(tmp_path / "lexical")
+        first = LexicalIndex(path, background_compaction=False)
+        add_chunks(first)
+        first.delete(["q3_1"])
+        first.close()
+
+        second = LexicalIndex(path, background_compaction=False)
+        try:
+            assert second.count() == 2
+            assert [chunk_id for chunk_id, _ in second.search("revenue")] == ["q3_0"]
+        finally:
+            second.close()
+
+    def test_compaction_keeps_results(self, tmp_path):
+        index = LexicalIndex(str(tmp_path / "lexical"), max_segments=3, background_compaction=False)
+        for number in range(12):
+            index.add(ids=[f"c{number}"], texts=[f"chunk {number} mentions code-{number}"], document_ids=[f"d{number}"])
+        index.delete(["c3"])
+
+        stats = index.get_stats()
+        assert stats["segments"] <= 3
+        assert stats["compactions"] > 0
+        assert index.search("code-7")[0][0] == "c7"
+        assert index.search("code-3") == []
+        assert index.count() == 11
+
+        index.compact(full=True)
+        assert index.get_stats()["segments"] == 1
+        assert index.get_stats()["deleted_rows"] == 0
+        assert index.search("code-11", document_ids=["d11"])[0][0] == "c11"
+        index.close()
+
+    def test_background_compaction(self, tmp_path):
+        index = LexicalIndex(str(tmp_path / "lexical"), max_segments=2)
+        for number in range(5):
+            index.add(ids=[f"c{number}"], texts=[f"chunk {number}"])
+
+        deadline = time.time() + 10
+        while index.get_stats()["segments"] > 2 and time.time() < deadline:
+            time.sleep(0.01)
+
+        assert index.get_stats()["segments"] <= 2
+        assert index.count() == 5
+        index.close()
+
+    def test_reset(self, index):
+        add_chunks(index)
+
+        index.reset()
+
+        assert index.count() == 0
+        assert index.search("revenue") == []
+
+
+class TestReciprocalRankFusion:
+    """Test fusing ranked lists"""
+
+    def test_agreement_ranks_first(self):
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a", "d"]], k=60)
+
+        assert [id_ for id_, _ in fused] == ["a", "c", "b", "d"]
+        assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
@@ -0,0 +1,123 @@
+"""
+Unit tests for the shared OpenAI client factory
+"""
+
+import asyncio
+import pytest
+from unittest.mock import Mock, patch
+
+from services import openai_clients
+from services.openai_clients import (
+    OpenAIClientFactory,
+    ConnectionStats,
+    DEFAULT_SERVICE_TIMEOUTS,
+    get_openai_client_factory,
+    configure_openai_clients
+)
+
+
+class FakeClient:
+    """Records the options an SDK client was built with"""
+
+    def __init__(self, **kwargs):
+        self.options = kwargs
+
+
+@pytest.fixture
+def factory():
+    factory = OpenAIClientFactory({'timeouts': {'analysis': 90.0}})
+    yield factory
+    factory.close()
+
+
+class TestConnectionStats:
+    """Test request and connection counting"""
+
+    def test_reuse_rate(self):
+        stats = ConnectionStats()
+        for _ in range(4):
+            stats.record_request()
+        stats.record_event("connection.connect_tcp.complete")
+        stats.record_event("http11.send_request_headers.complete")
+
+        result = stats.to_dict()
+        assert result["requests"] == 4
+        assert result["new_connections"] == 1
+        assert result["reused_connections"] == 3
+        assert result["connection_reuse_rate"] == 0.75
+
+    def test_empty(self):
+        assert ConnectionStats().to_dict()["connection_reuse_rate"] == 0.0
+
+
+class TestOpenAIClientFactory:
+    """Test client sharing and per-service configuration"""
+
+    def test_same_options_share_client(self, factory):
+        first = factory.get_client('chat', api_key='key', client_class=FakeClient)
+        second = factory.get_client('chat', api_key='key', client_class=FakeClient)
+        other_key = factory.get_client('chat', api_key='other', client_class=FakeClient)
+
+        assert first is second
+        assert other_key is not first
+        assert factory.get_stats()["clients"] == 2
+
+    def test_service_timeouts(self, factory):
+        chat = factory.get_client('chat', api_key='key', client_class=FakeClient)
+        embeddings = factory.get_client('embeddings', api_key='key', client_class=FakeClient)
+        analysis = factory.get_client('analysis', api_key='key', client_class=FakeClient)
+        explicit = factory.get_client('analysis', api_key='key', timeout=5.0, client_class=FakeClient)
+
+        assert chat.options["timeout"] == DEFAULT_SERVICE_TIMEOUTS['chat']
+        assert embeddings.options["timeout"] == DEFAULT_SERVICE_TIMEOUTS['embeddings']
+        assert analysis.options["timeout"] == 90.0
+        assert explicit.options["timeout"] == 5.0
+
+    def test_clients_share_http_pool(self, factory):
+        pytest.importorskip("httpx")
+        chat = factory.get_client('chat', api_key='key', client_class=FakeClient)
+        embeddings = factory.get_client('embeddings', api_key='key', client_class=FakeClient)
+        other_endpoint = factory.get_client(
+            'chat', api_key='key', base_url='http://localhost:9999/v1', client_class=FakeClient
+        )
+
+        assert chat.options["http_client"] is embeddings.options["http_client"]
+        assert other_endpoint.options["http_client"] is not chat.options["http_client"]
+
+    def test_async_clients_are_per_event_loop(self, factory):
+        async def get():
+            first = factory.get_async_client('chat', api_key='key', client_class=FakeClient)
+            second = factory.get_async_client('chat', api_key='key', client_class=FakeClient)
+            return first, second
+
+        first, second = asyncio.run(get())
+        third, _ = asyncio.run(get())
+
+        assert first is second
+        assert third is not first
+
+    def test_configure_replaces_process_factory(self):
+        previous = openai_clients._factory
+        try:
+            configured = configure_openai_clients({'max_connections': 7})
+            assert get_openai_client_factory() is configured
+            assert configured.get_stats()["max_connections"] == 7
+        finally:
+            openai_clients._factory = previous
+
+
+class TestOpenAIClientSharing:
+    """Services built with the same settings reuse one client"""
+
+    def test_openai_client_instances_share_sdk_client(self):
+        from services.ai_integration import OpenAIClient
+
+        with patch('services.ai_integration.OpenAI') as mock_openai:
+            mock_openai.return_value = Mock()
+            config = {'api_key': 'shared-key', 'model': 'gpt-4'}
+            first = OpenAIClient(config)
+            second = OpenAIClient(config)
+
+        assert first.client is second.client
+        mock_openai.assert_called_once()
+        assert mock_openai.call_args.kwargs["timeout"] == DEFAULT_SERVICE_TIMEOUTS['chat']
@@ -3,6 +3,7 @@ Unit tests for Enhanced Prompt Engineering System
 """
 
 import pytest
+import statistics
 from datetime import datetime
 from unittest.mock import Mock, patch
 
@@ -11,7 +12,11 @@ from services.ai_integration import (
     PromptVersion,
     PromptManager,
     ABTestConfig,
-    AIIntegrationService
+    AIIntegrationService,
+    RunningStats,
+    Histogram,
+    create_ab_test_store,
+    get_default_prompt_registry
 )
 
 
@@ -37,6 +42,24 @@ class TestPromptTemplate:
         # Should fail without required variable
         with pytest.raises(ValueError, match="Missing required variables"):
             template.validate_variables()
+    
+    def test_precompiled_format_matches_str_format(self):
+        source = "{{literal}} {name!r} scored {score:.1f} on {day}"
+        template = PromptTemplate(source)
+        kwargs = {"name": "Alice", "score": 9.25, "day": datetime(2024, 1, 2)}
+        
+        assert template.format(**kwargs) == source.format(**kwargs)
+        assert PromptTemplate("No {{placeholders}}").format() == "No {placeholders}"
+        
+        with pytest.raises(ValueError, match="Missing required variable"):
+            template.format(name="Alice")
+    
+    def test_complex_fields_fall_back_to_str_format(self):
+        template = PromptTemplate("{user.name} owns {items[0]}")
+        user = Mock()
+        user.name = "Alice"
+        
+        assert template.format(user=user, items=["the plan"]) == "Alice owns the plan"
 
 
 class TestPromptVersion:
@@ -303,6 +326,105 @@ class TestPromptManager:
         assert status["version_a"] == "1.0"
         assert status["version_b"] == "2.0"
         assert "started_at" in status
+    
+    def test_default_templates_are_shared(self):
+        first = PromptManager()
+        second = PromptManager()
+        
+        assert first.get_template("ceo_system") is second.get_template("ceo_system")
+        assert first.versions["ceo_system"] is get_default_prompt_registry().versions["ceo_system"]
+        
+        with pytest.raises(TypeError):
+            get_default_prompt_registry().versions["ceo_system"]["9.9"] = None
+    
+    def test_overrides_are_per_instance(self):
+        first = PromptManager()
+        second = PromptManager()
+        
+        first.add_template_version("ceo_system", PromptTemplate("Custom CEO"), "2.0")
+        first.set_active_version("ceo_system", "2.0")
+        
+        assert first.get_executive_system_prompt("ceo") == "Custom CEO"
+        assert first.get_template("ceo_system", "1.0") is second.get_template("ceo_system")
+        assert "2.0" not in second.versions["ceo_system"]
+        assert second.active_versions["ceo_system"] == "1.0"
+        assert "2.0" not in get_default_prompt_registry().versions["ceo_system"]
+
+
+class TestABTestAccumulators:
+    """Test streaming A/B test statistics and persistence"""
+    
+    def _start_test(self, manager):
+        manager.add_template_version("test_template", PromptTemplate("Version 1"), "1.0")
+        manager.add_template_version("test_template", PromptTemplate("Version 2"), "2.0")
+        manager.start_ab_test("test_template", "1.0", "2.0")
+    
+    def test_running_stats_match_batch_statistics(self):
+        values = [0.61, 0.72, 0.93, 0.55, 0.87, 0.7]
+        stats = RunningStats()
+        for value in values:
+            stats.add(value)
+        
+        assert stats.count == len(values)
+        assert stats.mean == pytest.approx(statistics.mean(values))
+        assert stats.variance == pytest.approx(statistics.variance(values))
+        assert (stats.min, stats.max) == (0.55, 0.93)
+        assert RunningStats.from_dict(stats.to_dict()).variance == pytest.approx(stats.variance)
+    
+    def test_histogram_quantiles(self):
+        histogram = Histogram([1, 2, 5])
+        for value in [0.5, 0.8, 1.5, 3, 10]:
+            histogram.add(value)
+        
+        assert histogram.counts == [2, 1, 1, 1]
+        assert histogram.quantile(0.4) == 1
+        assert histogram.quantile(0.6) == 2
+        assert histogram.quantile(1.0) == float("inf")
+        assert Histogram([1]).quantile(0.5) is None
+    
+    def test_memory_is_bounded(self):
+        manager = PromptManager()
+        self._start_test(manager)
+        
+        for i in range(500):
+            manager.record_ab_test_result("test_template", "1.0", {
+                "confidence_score": 0.7, "response_time": 1.5, "total_tokens": 900, "user_id": f"u{i}"
+            })
+        
+        ab_config = manager.ab_tests["test_template"]
+        assert len(ab_config.results["a"]) == ab_config.max_recent_results
+        assert ab_config.stats["a"].count == 500
+        assert "user_id" not in ab_config.stats["a"].metrics
+        
+        status = manager.get_ab_test_status("test_template")
+        assert status["results_count_a"] == 500
+        assert status["variants"]["a"]["latency_p50"] == 2.0
+        assert status["variants"]["a"]["tokens_p95"] == 1000
+        assert status["analysis"]["status"] == "insufficient_data"
+    
+    def test_accumulators_survive_restart(self, tmp_path):
+        store_config = {"backend": "sqlite", "path": str(tmp_path / "ab_tests.db")}
+        manager = PromptManager(ab_test_store=create_ab_test_store(store_config))
+        self._start_test(manager)
+        
+        for i in range(5):
+            manager.record_ab_test_result("test_template", "1.0", {"confidence_score": 0.6 + i * 0.01})
+            manager.record_ab_test_result("test_template", "2.0", {"confidence_score": 0.9 + i * 0.01})
+        manager.ab_tests.close()
+        
+        restarted = PromptManager(ab_test_store=create_ab_test_store(store_config))
+        restarted.record_ab_test_result("test_template", "2.0", {"confidence_score": 0.95})
+        
+        status = restarted.get_ab_test_status("test_template")
+        assert status["results_count_a"] == 5
+        assert status["results_count_b"] == 6
+        
+        results = restarted.stop_ab_test("test_template")
+        assert results["status"] == "complete"
+        assert results["version_a_avg"] == pytest.approx(0.62)
+        assert results["winner"] == "2.0"
+        assert "test_template" not in restarted.ab_tests
+        restarted.ab_tests.close()
 
 
 class TestAIIntegrationServicePromptManagement:
@@ -0,0 +1,201 @@
+"""
+Unit tests for structured output and incremental response parsing
+"""
+
+import json
+import pytest
+from unittest.mock import MagicMock, Mock, patch
+
+from services.structured_output import (
+    EXECUTIVE_RESPONSE_SCHEMA,
+    IncrementalJSONParser,
+    build_response_format,
+    parse_json_object
+)
+from services.ai_integration import AIIntegrationService, AIResponse, OpenAIClient, TokenUsage
+
+
+RESPONSE = {
+    "situation_assessment": "Churn rose after the \"Pro\" price change\nin Q2",
+    "strategic_considerations": ["Retention", "Brand [premium]"],
+    "options_analysis": [{"option": "Revert", "pros": ["Fast"], "cons": ["Revenue {loss}"]}],
+    "decision": "Introduce a mid tier",
+    "rationale": "Keeps price-sensitive users",
+    "confidence_score": 0.82,
+    "priority": "high",
+    "category": "strategic",
+    "risk_level": "medium",
+    "financial_impact": None,
+    "next_review_date": "2026-12-01"
+}
+
+
+def feed_in_chunks(parser, text, size):
+    completed = {}
+    for start in range(0, len(text), size):
+        completed.update(parser.feed(text[start:start + size]))
+    return completed
+
+
+class TestIncrementalJSONParser:
+    """Test field extraction from streamed JSON"""
+
+    @pytest.mark.parametrize("size", [1, 3, 7, 64])
+    def test_matches_json_loads_for_any_chunking(self, size):
+        text = json.dumps(RESPONSE, indent=2)
+        parser = IncrementalJSONParser()
+
+        completed = feed_in_chunks(parser, text, size)
+
+        assert parser.complete
+        assert parser.fields == RESPONSE
+        assert completed == RESPONSE
+
+    def test_reports_fields_as_they_complete(self):
+        parser = IncrementalJSONParser()
+
+        assert parser.feed('{"decision": "Hire') == {}
+        assert parser.partial_field() == ("decision", "Hire")
+        assert parser.feed(' engineers", "confidence') == {"decision": "Hire engineers"}
+        assert parser.feed('_score": 0.9') == {}  # A number is only complete at its delimiter
+        assert parser.feed(', "rationale": "Growth"') == {"confidence_score": 0.9, "rationale": "Growth"}
+        assert parser.has_fields()
+        assert not parser.complete
+
+    def test_ignores_text_around_the_object(self):
+        parser = IncrementalJSONParser()
+
+        parser.feed('Here is my answer:\n```json\n{"decision": "Go"}\n```\nLet me know.')
+
+        assert parser.complete
+        assert parser.fields == {"decision": "Go"}
+
+    def test_skips_malformed_values(self):
+        parser = IncrementalJSONParser()
+
+        parser.feed('{"confidence_score": 0.9.1, "decision": "Go"}')
+
+        assert parser.fields == {"decision": "Go"}
+        assert parser.invalid_fields == 1
+
+
+class TestParseJsonObject:
+    """Test the fast path and recovery of damaged responses"""
+
+    def test_well_formed(self):
+        assert parse_json_object(json.dumps(RESPONSE)) == (RESPONSE, True)
+
+    def test_truncated_keeps_completed_fields(self):
+        text = json.dumps(RESPONSE)
+        fields, complete = parse_json_object(text[:text.index('"priority"') + 5])
+
+        assert not complete
+        assert fields["decision"] == "Introduce a mid tier"
+        assert fields["confidence_score"] == 0.82
+        assert "priority" not in fields
+
+    def test_no_json(self):
+        assert parse_json_object("Decision: Go\nRationale: Because") == (None, False)
+
+
+class TestResponseFormat:
+    """Test response_format selection by model capability"""
+
+    def test_formats(self):
+        schema_format = build_response_format("json_schema", EXECUTIVE_RESPONSE_SCHEMA)
+
+        assert schema_format["json_schema"]["strict"] is True
+        assert build_response_format("json_object", EXECUTIVE_RESPONSE_SCHEMA) == {"type": "json_object"}
+        assert build_response_format(None, EXECUTIVE_RESPONSE_SCHEMA) is None
+
+    def test_strict_schema_lists_every_property(self):
+        assert set(EXECUTIVE_RESPONSE_SCHEMA["required"]) == set(EXECUTIVE_RESPONSE_SCHEMA["properties"])
+
+    @pytest.fixture
+    def client(self):
+        with patch('services.ai_integration.OpenAI'), \
+             patch('services.ai_integration.AsyncOpenAI'), \
+             patch('services.ai_integration.get_token_encoder') as mock_tiktoken:
+            mock_tiktoken.return_value = Mock(encode=Mock(return_value=[1, 2, 3]))
+            return OpenAIClient({'api_key': 'test-key', 'model': 'gpt-4o'})
+
+    def test_client_requests_schema_when_model_supports_it(self, client):
+        messages = [{"role": "user", "content": "Answer as JSON"}]
+
+        kwargs = client._structured_output_kwargs("gpt-4o", messages, EXECUTIVE_RESPONSE_SCHEMA)
+        assert kwargs["response_format"]["type"] == "json_schema"
+
+        assert client._structured_output_kwargs("gpt-4-turbo", messages, EXECUTIVE_RESPONSE_SCHEMA) == {
+            "response_format": {"type": "json_object"}
+        }
+        assert client._structured_output_kwargs("gpt-4", messages, EXECUTIVE_RESPONSE_SCHEMA) == {}
+        assert client._structured_output_kwargs("gpt-4o", messages, None) == {}
+
+    def test_json_mode_needs_json_in_the_prompt(self, client):
+        messages = [{"role": "user", "content": "Answer briefly"}]
+
+        assert client._structured_output_kwargs("gpt-4-turbo", messages, EXECUTIVE_RESPONSE_SCHEMA) == {}
+
+
+class TestAIIntegrationServiceStructuredOutput:
+    """Test service parsing modes and streamed readiness"""
+
+    @pytest.fixture
+    def service(self):
+        with patch('services.ai_integration.OpenAIClient') as mock_client_class:
+            mock_client = Mock()
+            mock_client.model = 'gpt-4o'
+            mock_client_class.return_value = mock_client
+            return AIIntegrationService({'openai': {'api_key': 'test-key'}})
+
+    def _response(self, content):
+        return AIResponse(content=content, model='gpt-4o', token_usage=TokenUsage(10, 10, 20, 0.001),
+                          response_time=1.0)
+
+    def test_requests_response_schema(self, service):
+        service.openai_client.generate_completion.return_value = self._response(json.dumps(RESPONSE))
+
+        response = service.generate_executive_response("ceo", "Pricing?", use_cache=False)
+
+        kwargs = service.openai_client.generate_completion.call_args.kwargs
+        assert kwargs["response_schema"] is EXECUTIVE_RESPONSE_SCHEMA
+        assert response.decision == "Introduce a mid tier"
+        assert response.metadata["parse"] == "json"
+
+    def test_disabled_by_config(self):
+        with patch('services.ai_integration.OpenAIClient'):
+            service = AIIntegrationService({'openai': {'api_key': 'test-key'}, 'structured_output': {'enabled': False}})
+
+        assert service._executive_response_schema() is None
+
+    def test_truncated_response_keeps_model_fields(self, service):
+        text = json.dumps(RESPONSE)
+        response = service._build_executive_response("ceo", self._response(text[:text.index('"priority"')]))
+
+        assert response.decision == "Introduce a mid tier"
+        assert response.confidence_score == 0.82
+        assert response.metadata["parse"] == "partial"
+
+        response = service._build_executive_response("ceo", self._response("Decision: Go"))
+        assert response.decision == "Go"
+        assert response.metadata["parse"] == "fallback"
+
+        assert service.get_usage_stats()["structured_output"]["parsed"] == {"json": 0, "partial": 1, "fallback": 1}
+
+    def test_stream_signals_ready_before_the_end(self, service):
+        text = json.dumps(RESPONSE)
+        deltas = [text[start:start + 16] for start in range(0, len(text), 16)]
+        stream = MagicMock()
+        stream.__iter__.return_value = iter(deltas)
+        stream.response = self._response(text)
+        service.openai_client.generate_completion_stream = Mock(return_value=stream)
+
+        events = list(service.stream_executive_response("ceo", "Pricing?", use_cache=False, emit_fields=True))
+        types = [event["type"] for event in events]
+
+        assert types.count("ready") == 1
+        ready = events[types.index("ready")]
+        assert ready["fields"]["confidence_score"] == 0.82
+        assert "next_review_date" not in ready["fields"]
+        assert types.index("ready") < len(types) - 2  # Tokens still follow
+        assert events[-1]["type"] == "response"
@@ -0,0 +1,378 @@
+"""
+Unit tests for per-user and per-tenant usage budgets
+"""
+
+import asyncio
+import json
+import threading
+import time
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import Mock, patch
+
+from services.usage_budgets import (
+    UsageBudgets,
+    BudgetLimits,
+    BudgetExceededError,
+    LIMIT_TOKENS_PER_MINUTE,
+    LIMIT_DOLLARS_PER_DAY,
+    LIMIT_CONCURRENT
+)
+from services.usage_ledger import UsageLedger, SCOPE_TENANT
+from services.ai_integration import AIIntegrationService, AIResponse, OpenAIClient, RequestEstimate, TokenUsage
+
+
+NOON = datetime(2026, 3, 1, 12, tzinfo=timezone.utc).timestamp()
+
+
+class FakeClock:
+    """Manually advanced time source"""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_budgets(clock, user=None, tenant=None, **kwargs):
+    return UsageBudgets(
+        user_limits=BudgetLimits(**(user or {})),
+        tenant_limits=BudgetLimits(**(tenant or {})),
+        clock=clock,
+        wall_clock=lambda: NOON,
+        **kwargs
+    )
+
+
+class TestUsageBudgets:
+    """Test reservation, refunds and limits"""
+
+    def test_tokens_per_minute_refill(self, clock):
+        budgets = make_budgets(clock, user={'tokens_per_minute': 1000})
+
+        budgets.reserve(7, 800, 0.0).settle(800)
+        with pytest.raises(BudgetExceededError) as exc_info:
+            budgets.reserve(7, 500, 0.0)
+
+        assert exc_info.value.limit == LIMIT_TOKENS_PER_MINUTE
+        assert exc_info.value.retry_after == pytest.approx(18.0)
+
+        clock.now += 18
+        budgets.reserve(7, 500, 0.0)
+        assert budgets.get_stats()["rejections"] == 1
+
+    def test_settle_refunds_unused_tokens(self, clock):
+        budgets = make_budgets(clock, user={'tokens_per_minute': 1000})
+
+        reservation = budgets.reserve(7, 900, 0.0)
+        assert budgets.check(7, 200, 0.0) is not None
+
+        reservation.settle(300)
+        reservation.settle(300)  # Settling twice is a no-op
+        assert budgets.check(7, 700, 0.0) is None
+        assert budgets.get_usage(7)["user"]["tokens_available"] == 700
+
+    def test_concurrency_slot_released_on_exit(self, clock):
+        budgets = make_budgets(clock, user={'max_concurrent': 1})
+
+        with budgets.reserve(7, 10, 0.0):
+            with pytest.raises(BudgetExceededError) as exc_info:
+                budgets.reserve(7, 10, 0.0)
+            assert exc_info.value.limit == LIMIT_CONCURRENT
+            assert budgets.get_usage(7)["user"]["in_flight"] == 1
+
+        budgets.reserve(7, 10, 0.0)
+
+    def test_dollars_per_day_counts_spend_and_reservations(self, clock):
+        budgets = make_budgets(clock, user={'dollars_per_day': 1.0})
+
+        budgets.reserve(7, 10, 0.6).settle(10, 0.5)
+        held = budgets.reserve(7, 10, 0.3)
+
+        with pytest.raises(BudgetExceededError) as exc_info:
+            budgets.reserve(7, 10, 0.3)
+        assert exc_info.value.limit == LIMIT_DOLLARS_PER_DAY
+        assert exc_info.value.retry_after == 12 * 3600  # Until UTC midnight
+
+        usage = budgets.get_usage(7)["user"]
+        assert usage["dollars_spent_today"] == pytest.approx(0.5)
+        assert usage["dollars_reserved"] == pytest.approx(0.3)
+        assert usage["dollars_remaining_today"] == pytest.approx(0.2)
+        held.settle()
+
+    def test_tenant_budget_is_shared_by_its_users(self, clock):
+        budgets = make_budgets(clock, tenant={'max_concurrent': 1}, user_tenants={7: "acme", 8: "acme"})
+
+        budgets.reserve(7, 10, 0.0)
+
+        with pytest.raises(BudgetExceededError) as exc_info:
+            budgets.reserve(8, 10, 0.0)
+        assert (exc_info.value.subject, exc_info.value.key) == ("tenant", "acme")
+        assert budgets.get_usage(9).keys() == {"user"}  # No tenant
+        budgets.reserve(9, 10, 0.0)
+
+    def test_overrides_and_resolver(self, clock):
+        budgets = make_budgets(
+            clock,
+            user={'max_concurrent': 1},
+            overrides={"user:7": BudgetLimits(max_concurrent=2), "tenant:big": BudgetLimits()}
+        )
+        budgets.set_tenant_resolver(lambda user_id: "big" if user_id == 7 else None)
+
+        budgets.reserve(7, 10, 0.0)
+        budgets.reserve(7, 10, 0.0)
+
+        assert budgets.tenant_for(7) == "big"
+        assert budgets.get_usage(7)["user"]["limits"][LIMIT_CONCURRENT] == 2
+
+    def test_dollars_come_from_ledger(self, clock, tmp_path):
+        ledger = UsageLedger(str(tmp_path / "usage.db"), flush_interval=3600, clock=lambda: NOON)
+        try:
+            budgets = make_budgets(clock, tenant={'dollars_per_day': 1.0}, user_tenants={7: "acme"}, ledger=ledger)
+
+            # Spend recorded by another worker for another user of the tenant
+            ledger.record("gpt-4", 100, 50, 0.9, user_id=8, tenant_id="acme")
+
+            with pytest.raises(BudgetExceededError):
+                budgets.reserve(7, 10, 0.2)
+            assert budgets.get_usage(7)["tenant"]["dollars_spent_today"] == pytest.approx(0.9)
+        finally:
+            ledger.close()
+
+
+class TestLedgerTenantScope:
+    """Tenant usage is rolled up by the ledger"""
+
+    def test_tenant_totals(self, tmp_path):
+        ledger = UsageLedger(str(tmp_path / "usage.db"), flush_interval=3600, clock=lambda: NOON)
+        try:
+            ledger.record("gpt-4", 100, 50, 0.01, user_id=7, tenant_id="acme")
+            ledger.record("gpt-4", 100, 50, 0.02, user_id=8, tenant_id="acme")
+            ledger.record("gpt-4", 100, 50, 0.04, user_id=9)
+            ledger.flush()
+
+            totals = ledger.get_totals(SCOPE_TENANT, "acme", "2026-03-01")
+            assert totals.requests == 2
+            assert totals.cost == pytest.approx(0.03)
+        finally:
+            ledger.close()
+
+
+class TestRequestEstimate:
+    """Pre-flight estimates price the routed or pinned model"""
+
+    @pytest.fixture
+    def client(self):
+        with patch('services.ai_integration.OpenAI'), \
+             patch('services.ai_integration.AsyncOpenAI'), \
+             patch('services.ai_integration.get_token_encoder') as mock_tiktoken:
+            mock_tiktoken.return_value = Mock(encode=Mock(return_value=[1] * 100))
+            return OpenAIClient({'api_key': 'test-key', 'model': 'gpt-4', 'max_tokens': 500})
+
+    def test_estimate_pinned_model(self, client):
+        messages = [{"role": "user", "content": "Should we expand?"}]
+
+        default = client.estimate_request(messages)
+        cheaper = client.estimate_request(messages, model='gpt-3.5-turbo')
+
+        assert default.model == 'gpt-4'
+        assert cheaper.model == 'gpt-3.5-turbo'
+        assert default.tokens == default.prompt_tokens + 500
+        assert default.cost == pytest.approx(client.calculate_cost(default.prompt_tokens, 500, 'gpt-4'))
+        assert cheaper.cost < default.cost
+        assert client.router.get_stats()["routed"] == {}  # Estimates are not routing decisions
+
+
+def fake_estimate(messages, quality=None, model=None, prompt_tokens=None):
+    """Four characters per token; gpt-3.5-turbo costs a tenth of the default"""
+    if prompt_tokens is None:
+        prompt_tokens = sum(len(message['content']) for message in messages) // 4
+    price = 0.00001 if model == 'gpt-3.5-turbo' else 0.0001
+    return RequestEstimate(model or 'gpt-4', prompt_tokens, 100, (prompt_tokens + 100) * price)
+
+
+class TestAIIntegrationServiceBudgets:
+    """Requests are checked before they are sent and degraded instead of failing"""
+
+    DECISION = json.dumps({"decision": "Expand", "rationale": "Demand", "confidence_score": 0.8})
+
+    def make_service(self, limits, **budget_config):
+        with patch('services.ai_integration.OpenAIClient') as mock_client_class:
+            mock_client = Mock()
+            mock_client.model = 'gpt-4'
+            mock_client.estimate_request.side_effect = fake_estimate
+            mock_client.count_message_tokens.return_value = 1000
+            mock_client.generate_completion.side_effect = lambda messages, **kwargs: AIResponse(
+                content=self.DECISION,
+                model=kwargs.get('model') or 'gpt-4',
+                token_usage=TokenUsage(100, 50, 150, 0.01),
+                response_time=0.1
+            )
+            mock_client_class.return_value = mock_client
+            return AIIntegrationService({
+                'openai': {'api_key': 'test'},
+                'usage_budgets': {'user': limits, 'degrade_model': 'gpt-3.5-turbo', **budget_config}
+            })
+
+    def test_within_budget(self):
+        service = self.make_service({'dollars_per_day': 5.0})
+
+        response = service.generate_executive_response("ceo", "Expand?", use_cache=False, user_id=7)
+
+        assert "budget" not in response.metadata
+        assert "model" not in service.openai_client.generate_completion.call_args.kwargs
+        usage = service.get_budget_usage(7)["user"]
+        assert usage["in_flight"] == 0
+        assert usage["dollars_spent_today"] == pytest.approx(0.01)
+        assert usage["dollars_reserved"] == 0
+
+    def test_degrades_to_smaller_model(self):
+        service = self.make_service({'dollars_per_day': 0.2})
+
+        response = service.generate_executive_response("ceo", "Expand?", document_context="x" * 4000,
+                                                       use_cache=False, user_id=7)
+
+        assert response.metadata["budget"] == {"degraded": ["smaller_model"], "model": "gpt-3.5-turbo"}
+        assert service.openai_client.generate_completion.call_args.kwargs["model"] == 'gpt-3.5-turbo'
+
+    def test_degrades_to_shorter_context(self):
+        service = self.make_service({'dollars_per_day': 0.05})
+        document = "\n\n".join(["Quarterly revenue detail " * 40] * 40)
+
+        response = service.generate_executive_response("ceo", "Expand?", document_context=document,
+                                                       use_cache=False, user_id=7)
+
+        assert response.metadata["budget"]["degraded"] == ["smaller_model", "shorter_context"]
+        sent = service.openai_client.generate_completion.call_args.args[0]
+        assert sum(len(message['content']) for message in sent) < len(document) / 2
+
+    def test_skips_smaller_model_when_none_fits(self):
+        service = self.make_service({'dollars_per_day': 0.5}, degrade_model=None)
+        service.openai_client.catalog.models.return_value = []
+        document = "\n\n".join(["Quarterly revenue detail " * 40] * 40)
+
+        response = service.generate_executive_response("ceo", "Expand?", document_context=document,
+                                                       use_cache=False, user_id=7)
+
+        assert response.metadata["budget"]["degraded"] == ["shorter_context"]
+        assert service.openai_client.generate_completion.call_args.kwargs.get("model") is None
+
+    def test_skips_smaller_model_when_routed_model_is_cheapest(self):
+        service = self.make_service({'dollars_per_day': 0.5}, degrade_model='gpt-4')
+        document = "\n\n".join(["Quarterly revenue detail " * 40] * 40)
+
+        response = service.generate_executive_response("ceo", "Expand?", document_context=document,
+                                                       use_cache=False, user_id=7)
+
+        assert response.metadata["budget"]["degraded"] == ["shorter_context"]
+
+    def test_shorter_context_keeps_conversation_summary(self):
+        service = self.make_service({'dollars_per_day': 0.05})
+        document = "\n\n".join(["Quarterly revenue detail " * 40] * 40)
+        messages = service._build_executive_messages("ceo", "Expand?", None, document, None,
+                                                     conversation_summary="Chose APAC last quarter")
+
+        plan = service._plan_within_budget("ceo", "Expand?", None, document, None, messages, 7,
+                                           conversation_summary="Chose APAC last quarter")
+        plan.settle()
+
+        assert plan.degraded == ["smaller_model", "shorter_context"]
+        assert "Chose APAC last quarter" in "".join(message['content'] for message in plan.messages)
+
+    def test_serves_cached_answer_when_nothing_fits(self):
+        service = self.make_service({'max_concurrent': 1})
+        service.generate_executive_response("ceo", "Expand?", user_id=7)
+
+        with service.usage_budgets.reserve(7, 10, 0.0):
+            response = service.generate_executive_response("ceo", "Expand?", use_cache=False, user_id=7)
+
+        assert response.decision == "Expand"
+        assert response.metadata["budget"] == {"degraded": ["cached_answer"]}
+        assert service.openai_client.generate_completion.call_count == 1
+
+    def test_raises_when_nothing_fits(self):
+        service = self.make_service({'max_concurrent': 1})
+
+        with service.usage_budgets.reserve(7, 10, 0.0):
+            with pytest.raises(BudgetExceededError):
+                service.generate_executive_response("ceo", "Expand?", use_cache=False, user_id=7)
+
+        service.openai_client.generate_completion.assert_not_called()
+        assert service.get_usage_stats()["usage_budgets"]["rejections"] == 1
+
+    def test_panel_over_concurrency_budget(self):
+        service = self.make_service({'max_concurrent': 2})
+        release = threading.Event()
+
+        async def generate_completion_async(messages, **kwargs):
+            await asyncio.get_running_loop().run_in_executor(None, release.wait, 5)
+            return AIResponse(content=self.DECISION, model='gpt-4',
+                              token_usage=TokenUsage(100, 50, 150, 0.01), response_time=0.1)
+
+        service.openai_client.generate_completion_async = generate_completion_async
+        try:
+            future = asyncio.run_coroutine_threadsafe(
+                service.generate_panel_response_async("Expand?", use_cache=False, user_id=7),
+                service._get_event_loop()
+            )
+            time.sleep(0.2)
+            release.set()
+            panel = future.result(5)
+        finally:
+            service.shutdown()
+
+        assert len(panel.responses) == 3
+        assert len(panel.errors) == 1
+        assert "requests in flight" in next(iter(panel.errors.values()))
+        assert service.get_budget_usage(7)["user"]["in_flight"] == 0
+
+    def test_panel_serves_cached_answer_over_budget(self):
+        service = self.make_service({'max_concurrent': 1})
+        service.generate_executive_response("cto", "Expand?", user_id=7)
+        try:
+            with service.usage_budgets.reserve(7, 10, 0.0):
+                panel = service.generate_panel_response("Expand?", use_cache=False, user_id=7)
+        finally:
+            service.shutdown()
+
+        assert set(panel.errors) == {"ceo", "cfo"}
+        assert panel.responses["cto"].decision == "Expand"
+        assert panel.responses["cto"].metadata["budget"] == {"degraded": ["cached_answer"]}
+
+    def test_panel_raises_when_every_executive_is_rejected(self):
+        service = self.make_service({'max_concurrent': 1})
+        try:
+            with service.usage_budgets.reserve(7, 10, 0.0):
+                with pytest.raises(BudgetExceededError):
+                    service.generate_panel_response("Expand?", use_cache=False, user_id=7)
+        finally:
+            service.shutdown()
+
+    def test_failed_call_releases_reservation(self):
+        service = self.make_service({'max_concurrent': 1})
+        service.openai_client.generate_completion.side_effect = RuntimeError("boom")
+
+        response = service.generate_executive_response("ceo", "Expand?", use_cache=False, user_id=7)
+
+        assert response.metadata.get("fallback")
+        assert service.get_budget_usage(7)["user"]["in_flight"] == 0
+
+    def test_requests_without_user_are_not_budgeted(self):
+        service = self.make_service({'max_concurrent': 0})
+
+        service.generate_executive_response("ceo", "Expand?", use_cache=False)
+
+        service.openai_client.estimate_request.assert_not_called()
+
+    def test_disabled_without_config(self):
+        with patch('services.ai_integration.OpenAIClient'):
+            service = AIIntegrationService({'openai': {'api_key': 'test'}})
+
+        assert service.usage_budgets is None
+        assert service.get_budget_usage(7) == {"enabled": False}
@@ -0,0 +1,322 @@
+"""
+Unit tests for the persistent usage ledger
+"""
+
+import sqlite3
+import threading
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import Mock, patch
+
+from services.usage_ledger import (
+    UsageLedger,
+    DatabaseLedgerStore,
+    get_usage_ledger,
+    SCOPE_TOTAL,
+    SCOPE_USER,
+    SCOPE_EXECUTIVE,
+    SCOPE_MODEL,
+    ALL_KEYS,
+    ALL_DAYS
+)
+from services.ai_integration import AIIntegrationService, AIResponse, TokenUsage
+
+
+DAY_ONE = datetime(2026, 3, 1, 12, tzinfo=timezone.utc).timestamp()
+DAY_TWO = datetime(2026, 3, 2, 12, tzinfo=timezone.utc).timestamp()
+
+
+class FakeClock:
+    """Manually set time source"""
+
+    def __init__(self, now=DAY_ONE):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def ledger(tmp_path, clock):
+    ledger = UsageLedger(str(tmp_path / "usage.db"), flush_interval=3600, flush_batch_size=1000, clock=clock)
+    yield ledger
+    ledger.close()
+
+
+class TestUsageLedger:
+    """Test buffering, batched flushes and rollups"""
+
+    def test_record_does_not_write_until_flush(self, ledger):
+        ledger.record("gpt-4", 100, 50, 0.006, user_id=7, executive_type="ceo")
+
+        conn = sqlite3.connect(ledger.path)
+        assert conn.execute("SELECT COUNT(*) FROM usage_records").fetchone()[0] == 0
+        assert ledger.get_stats()["buffered"] == 1
+
+        assert ledger.flush() == 1
+        assert conn.execute("SELECT COUNT(*) FROM usage_records").fetchone()[0] == 1
+        assert ledger.get_stats()["buffered"] == 0
+        conn.close()
+
+    def test_rollups_by_user_executive_model_and_day(self, ledger, clock):
+        ledger.record("gpt-4", 100, 50, 0.006, user_id=7, executive_type="ceo")
+        ledger.record("gpt-4o-mini", 10, 5, 0.0001, user_id=8, executive_type="cfo")
+        ledger.flush()
+        clock.now = DAY_TWO
+        ledger.record("gpt-4", 200, 100, 0.012, user_id=7, executive_type="ceo")
+        ledger.flush()
+
+        total = ledger.get_totals()
+        assert total.requests == 3
+        assert total.total_tokens == 150 + 15 + 300
+
+        user = ledger.get_totals(SCOPE_USER, 7)
+        assert (user.requests, user.prompt_tokens, user.completion_tokens) == (2, 300, 150)
+        assert user.cost == pytest.approx(0.018)
+
+        assert ledger.get_totals(SCOPE_USER, 7, "2026-03-01").total_tokens == 150
+        assert ledger.get_totals(SCOPE_EXECUTIVE, "cfo").requests == 1
+        assert ledger.get_totals(SCOPE_MODEL, "gpt-4").requests == 2
+        assert ledger.get_totals(SCOPE_TOTAL, ALL_KEYS, "2026-03-02").requests == 1
+
+        # One rollup row per (scope, key, day); the per-batch deltas were merged by upsert
+        conn = sqlite3.connect(ledger.path)
+        rows = conn.execute(
+            "SELECT requests FROM usage_rollups WHERE scope = ? AND key = ? AND day = ?",
+            (SCOPE_USER, "7", ALL_DAYS)
+        ).fetchall()
+        conn.close()
+        assert rows == [(2,)]
+
+    def test_totals_include_unflushed_records(self, ledger):
+        ledger.record("gpt-4", 100, 50, 0.006, user_id=7)
+        ledger.flush()
+        ledger.record("gpt-4", 1, 1, 0.001, user_id=7)
+
+        assert ledger.get_totals(SCOPE_USER, 7).requests == 2
+        assert ledger.get_totals().total_tokens == 152
+
+    def test_daily_totals_for_billing_period(self, ledger, clock):
+        ledger.record("gpt-4", 100, 50, 0.006, user_id=7)
+        ledger.flush()
+        clock.now = DAY_TWO
+        ledger.record("gpt-4", 200, 100, 0.012, user_id=7)
+
+        daily = ledger.get_daily_totals(SCOPE_USER, 7, "2026-03-01", "2026-03-31")
+
+        assert list(daily) == ["2026-03-01", "2026-03-02"]
+        assert daily["2026-03-02"].total_tokens == 300
+
+    def test_records_for_user(self, ledger):
+        ledger.record("gpt-4", 100, 50, 0.006, user_id=7, executive_type="ceo")
+        ledger.record("gpt-4", 1, 1, 0.001, user_id=8)
+        ledger.flush()
+
+        records = ledger.get_records(user_id=7)
+
+        assert len(records) == 1
+        assert records[0].executive_type == "ceo"
+        assert records[0].total_tokens == 150
+
+    def test_batch_size_triggers_background_flush(self, tmp_path):
+        ledger = UsageLedger(str(tmp_path / "usage.db"), flush_interval=3600, flush_batch_size=5)
+        try:
+            flushed = threading.Event()
+            original_flush = ledger.flush
+
+            def flush():
+                written = original_flush()
+                if written:
+                    flushed.set()
+                return written
+
+            ledger.flush = flush
+            for _ in range(5):
+                ledger.record("gpt-4", 10, 10, 0.001)
+
+            assert flushed.wait(5)
+            assert ledger.get_stats()["flushed"] == 5
+        finally:
+            ledger.close()
+
+    def test_failed_flush_keeps_records(self, ledger):
+        ledger.record("gpt-4", 100, 50, 0.006, user_id=7)
+
+        with patch.object(ledger, "_write", side_effect=sqlite3.OperationalError("database is locked")):
+            assert ledger.flush() == 0
+
+        assert ledger.get_stats()["flush_failures"] == 1
+        assert ledger.get_totals(SCOPE_USER, 7).requests == 1
+        assert ledger.flush() == 1
+        assert ledger.get_totals(SCOPE_USER, 7).requests == 1
+
+    def test_buffer_cap_drops_oldest(self, tmp_path):
+        ledger = UsageLedger(str(tmp_path / "usage.db"), flush_interval=3600, flush_batch_size=1000,
+                             max_buffer_records=3)
+        try:
+            for tokens in range(5):
+                ledger.record("gpt-4", tokens, 0, 0.0)
+
+            stats = ledger.get_stats()
+            assert stats["buffered"] == 3
+            assert stats["dropped"] == 2
+            assert ledger.get_totals().prompt_tokens == 2 + 3 + 4
+        finally:
+            ledger.close()
+
+    def test_close_flushes_and_data_survives_restart(self, tmp_path):
+        path = str(tmp_path / "usage.db")
+        ledger = UsageLedger(path, flush_interval=3600)
+        ledger.record("gpt-4", 100, 50, 0.006, user_id=7)
+        ledger.close()
+
+        reopened = UsageLedger(path, flush_interval=3600)
+        try:
+            assert reopened.get_totals(SCOPE_USER, 7).total_tokens == 150
+        finally:
+            reopened.close()
+
+    def test_shared_per_path(self, tmp_path):
+        config = {'backend': 'sqlite', 'path': str(tmp_path / "shared.db"), 'flush_interval': 3600}
+        ledger = get_usage_ledger(config)
+        try:
+            assert get_usage_ledger(dict(config)) is ledger
+        finally:
+            ledger.close()
+
+
+class TestDatabaseLedgerStore:
+    """Records and rollups written through the application database"""
+
+    @pytest.fixture
+    def app(self, tmp_path):
+        from flask import Flask
+        from models import db
+
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'app.db'}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+        return app
+
+    @pytest.fixture
+    def ledger(self, clock):
+        ledger = UsageLedger(flush_interval=3600, flush_batch_size=1000, clock=clock, store=DatabaseLedgerStore())
+        yield ledger
+        ledger.close()
+
+    def test_buffers_until_app_is_bound(self, ledger, app):
+        ledger.record("gpt-4", 100, 50, 0.006, user_id=7)
+
+        assert ledger.flush() == 0
+        assert ledger.get_totals(SCOPE_USER, 7).requests == 1
+
+        ledger.init_app(app)
+        assert ledger.flush() == 1
+        assert ledger.get_stats()["backend"] == "database"
+
+    def test_rollups_and_records_in_app_database(self, ledger, app, clock):
+        from models import db, TokenUsageRecord, TokenUsageRollup
+
+        ledger.init_app(app)
+        ledger.record("gpt-4", 100, 50, 0.006, user_id=7, executive_type="ceo")
+        ledger.flush()
+        clock.now = DAY_TWO
+        ledger.record("gpt-4", 200, 100, 0.012, user_id=7, executive_type="ceo")
+        ledger.flush()
+
+        user = ledger.get_totals(SCOPE_USER, 7)
+        assert (user.requests, user.prompt_tokens, user.completion_tokens) == (2, 300, 150)
+        assert user.cost == pytest.approx(0.018)
+        assert list(ledger.get_daily_totals(SCOPE_USER, 7, "2026-03-01", "2026-03-31")) == ["2026-03-01", "2026-03-02"]
+        assert [record.total_tokens for record in ledger.get_records(user_id=7)] == [300, 150]
+
+        with app.app_context():
+            assert TokenUsageRecord.query.count() == 2
+            assert db.session.get(TokenUsageRollup, (SCOPE_EXECUTIVE, "ceo", ALL_DAYS)).requests == 2
+
+    def test_hosts_share_rollups(self, app, clock):
+        first = UsageLedger(flush_interval=3600, clock=clock, store=DatabaseLedgerStore(app))
+        second = UsageLedger(flush_interval=3600, clock=clock, store=DatabaseLedgerStore(app))
+        try:
+            first.record("gpt-4", 100, 50, 0.006, user_id=7)
+            second.record("gpt-4", 10, 5, 0.001, user_id=7)
+            first.flush()
+            second.flush()
+
+            assert first.get_totals(SCOPE_USER, 7).total_tokens == 165
+        finally:
+            first.close()
+            second.close()
+
+    def test_registry_defaults_to_database(self):
+        ledger = get_usage_ledger({'flush_interval': 3600})
+        try:
+            assert isinstance(ledger.store, DatabaseLedgerStore)
+            assert get_usage_ledger({}) is ledger
+        finally:
+            ledger.close()
+
+
+class TestAIIntegrationServiceUsageLedger:
+    """Service usage flows into the ledger"""
+
+    @pytest.fixture
+    def service(self, tmp_path):
+        with patch('services.ai_integration.OpenAIClient') as mock_client_class:
+            mock_client = Mock()
+            mock_client.model = 'gpt-4'
+            mock_client_class.return_value = mock_client
+            service = AIIntegrationService({
+                'openai': {'api_key': 'test'},
+                'usage_ledger': {'backend': 'sqlite', 'path': str(tmp_path / "usage.db"), 'flush_interval': 3600}
+            })
+        yield service
+        service.usage_ledger.close()
+
+    def _response(self, **metadata):
+        return AIResponse(
+            content="{}",
+            model="gpt-4",
+            token_usage=TokenUsage(prompt_tokens=100, completion_tokens=50, total_tokens=150, estimated_cost=0.006),
+            response_time=0.1,
+            metadata=metadata
+        )
+
+    def test_track_usage_records_to_ledger(self, service):
+        service._track_usage(self._response(), "cto", user_id=42)
+        service._track_usage(self._response(cache_hit=True), "cto", user_id=42)
+
+        assert service.get_user_usage(42)["total_tokens"] == 150
+
+        stats = service._ledger_stats()
+        assert stats["enabled"] is True
+        assert stats["total"]["requests"] == 1
+        assert stats["by_executive"]["cto"]["requests"] == 1
+
+    def test_usage_report(self, service):
+        service._track_usage(self._response(), "ceo", user_id=42)
+        service.usage_ledger.flush()
+        today = datetime.utcnow().strftime("%Y-%m-%d")
+
+        report = service.get_usage_report("user", 42, today, today)
+
+        assert report["total"]["total_tokens"] == 150
+        assert list(report["daily"]) == [today]
+
+    def test_analysis_calls_record_to_ledger(self, service):
+        service.openai_client.generate_completion.return_value = self._response()
+
+        service.get_document_insights("doc1", "What are the risks?")
+        service.analyze_decision_patterns([{"executive_type": "ceo"}])
+        service.usage_ledger.flush()
+
+        records = service.usage_ledger.get_records()
+        assert sorted(record.request_type for record in records) == ["decision_patterns", "document_insights"]
+        assert service.total_tokens_used == 300
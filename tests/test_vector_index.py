@@ -0,0 +1,214 @@
+"""
+Unit tests for the NumPy vector index backend
+"""
+
+import time
+import numpy as np
+import pytest
+
+from services.vector_index import VectorIndex, IVFIndex, normalize_vectors, quantize_vectors
+
+
+def unit(*values):
+    return normalize_vectors([values])[0].tolist()
+
+
+def clustered_vectors(count, dimensions=32, clusters=20, seed=0):
+    """Unit vectors scattered around random cluster centers"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimensions))
+    vectors = centers[rng.integers(clusters, size=count)] + rng.normal(scale=0.3, size=(count, dimensions))
+    return normalize_vectors(vectors)
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = VectorIndex(str(tmp_path / "index"), background_compaction=False)
+    yield index
+    index.close()
+
+
+def add_points(index):
+    index.add(
+        ids=["a", "b", "c"],
+        embeddings=[unit(1, 0, 0), unit(1, 1, 0), unit(0, 0, 1)],
+        documents=["alpha", "beta", "gamma"],
+        metadatas=[
+            {'document_id': 'doc1', 'chunk_index': 0},
+            {'document_id': 'doc1', 'chunk_index': 1},
+            {'document_id': 'doc2', 'chunk_index': 0}
+        ]
+    )
+
+
+class TestVectorIndex:
+    """Test the Chroma-compatible calls, filters, persistence and compaction"""
+
+    def test_query_orders_by_cosine_distance(self, index):
+        add_points(index)
+
+        results = index.query(query_embeddings=[[2, 0, 0]], n_results=2)
+
+        assert results['ids'] == [["a", "b"]]
+        assert results['documents'] == [["alpha", "beta"]]
+        assert results['distances'][0] == pytest.approx([0.0, 1 - np.sqrt(0.5)], abs=1e-6)
+        assert results['metadatas'][0][1] == {'document_id': 'doc1', 'chunk_index': 1}
+
+    def test_where_filters(self, index):
+        add_points(index)
+        query = [[1, 0, 0]]
+
+        assert index.query(query, n_results=5, where={'document_id': 'doc2'})['ids'] == [["c"]]
+        assert index.query(query, n_results=5, where={'document_id': {'$in': ['doc2', 'doc3']}})['ids'] == [["c"]]
+        assert index.query(query, n_results=5, where={'document_id': 'doc1', 'chunk_index': 1})['ids'] == [["b"]]
+        assert index.query(query, n_results=5, where={'$or': [{'chunk_index': {'$gt': 0}}, {'document_id': 'doc2'}]})['ids'] == [["b", "c"]]
+        assert index.query(query, n_results=5, where={'document_id': {'$ne': 'doc1'}})['ids'] == [["c"]]
+        with pytest.raises(ValueError, match="Unsupported"):
+            index.query(query, where={'document_id': {'$regex': 'doc'}})
+
+    def test_add_replaces_existing_ids(self, index):
+        add_points(index)
+
+        index.add(ids=["a"], embeddings=[unit(0, 1, 0)], documents=["alpha v2"], metadatas=[{'document_id': 'doc1'}])
+
+        assert index.count() == 3
+        assert index.get(ids=["a"])['documents'] == ["alpha v2"]
+        assert index.query([[0, 1, 0]], n_results=1)['ids'] == [["a"]]
+
+    def test_get_and_delete(self, index):
+        add_points(index)
+
+        assert index.get(where={'document_id': 'doc1'})['ids'] == ["a", "b"]
+        embeddings = index.get(ids=["c"], include=["embeddings"])['embeddings']
+        assert embeddings[0] == pytest.approx([0, 0, 1])
+
+        index.delete(ids=index.get(where={'document_id': 'doc1'})['ids'])
+
+        assert index.count() == 1
+        assert index.query([[1, 0, 0]], n_results=3)['ids'] == [["c"]]
+
+    def test_rejects_mismatched_dimensions(self, index):
+        add_points(index)
+
+        with pytest.raises(ValueError, match="dimensions"):
+            index.add(ids=["d"], embeddings=[[1, 0]])
+
+    def test_persists_across_instances(self, tmp_path):
+        path = str(tmp_path / "index")
+        first = VectorIndex(path, background_compaction=False)
+        add_points(first)
+        first.delete(ids=["b"])
+        first.close()
+
+        second = VectorIndex(path, background_compaction=False)
+        try:
+            assert second.count() == 2
+            assert second.query([[1, 1, 0]], n_results=3)['ids'] == [["a", "c"]]
+        finally:
+            second.close()
+
+    def test_compaction_merges_segments_and_drops_deleted_rows(self, tmp_path):
+        index = VectorIndex(str(tmp_path / "index"), max_segments=3, background_compaction=False)
+        vectors = clustered_vectors(40, dimensions=8)
+        for start in range(0, 40, 10):
+            index.add(ids=[f"v{i}" for i in range(start, start + 10)], embeddings=vectors[start:start + 10])
+
+        assert index.get_stats()["segments"] == 1
+        index.delete(ids=[f"v{i}" for i in range(15)])
+
+        stats = index.get_stats()
+        assert (stats["rows"], stats["live_rows"], stats["deleted_rows"]) == (25, 25, 0)
+        assert index.query([vectors[20]], n_results=1)['ids'] == [["v20"]]
+        assert sorted(f.name for f in (tmp_path / "index").iterdir() if f.suffix == ".npy") == [
+            f"{index._segments[0].name}.npy"
+        ]
+        index.close()
+
+    def test_background_compaction(self, tmp_path):
+        index = VectorIndex(str(tmp_path / "index"), max_segments=2)
+        vectors = clustered_vectors(30, dimensions=8)
+        for start in range(0, 30, 10):
+            index.add(ids=[f"v{i}" for i in range(start, start + 10)], embeddings=vectors[start:start + 10])
+
+        deadline = time.time() + 10
+        while index.get_stats()["compactions"] == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        index.close()
+
+        reopened = VectorIndex(str(tmp_path / "index"), background_compaction=False)
+        assert reopened.count() == 30
+        assert reopened.get_stats()["segments"] == 1
+        reopened.close()
+
+    def test_ivf_recall(self, tmp_path):
+        vectors = clustered_vectors(3000)
+        queries = clustered_vectors(50, seed=1)
+        index = VectorIndex(str(tmp_path / "index"), exact_threshold=500, nprobe=8, background_compaction=False)
+        index.add(ids=[str(i) for i in range(len(vectors))], embeddings=vectors)
+
+        found = index.query(queries, n_results=10)['ids']
+        expected = np.argsort(-(queries @ vectors.T), axis=1)[:, :10]
+
+        recall = np.mean([len(set(map(int, ids)) & set(top)) / 10 for ids, top in zip(found, expected)])
+        assert index.get_stats()["indexed_segments"] == 1
+        assert index.get_stats()["ivf_scans"] == 50
+        assert recall > 0.9
+        index.close()
+
+    def test_selective_filter_on_indexed_segment_is_exact(self, tmp_path):
+        vectors = clustered_vectors(1000)
+        index = VectorIndex(str(tmp_path / "index"), exact_threshold=100, nprobe=1, background_compaction=False)
+        index.add(
+            ids=[str(i) for i in range(1000)],
+            embeddings=vectors,
+            metadatas=[{'document_id': f"doc{i % 50}"} for i in range(1000)]
+        )
+
+        found = index.query([vectors[7]], n_results=20, where={'document_id': 'doc7'})['ids'][0]
+
+        assert sorted(map(int, found)) == list(range(7, 1000, 50))
+        index.close()
+
+    @pytest.mark.parametrize("dtype", ["float16", "int8"])
+    def test_quantized_storage(self, tmp_path, dtype):
+        vectors = clustered_vectors(500)
+        index = VectorIndex(str(tmp_path / "index"), dtype=dtype, background_compaction=False)
+        index.add(ids=[str(i) for i in range(500)], embeddings=vectors)
+
+        found = index.query(vectors[:20], n_results=1)['ids']
+
+        assert [ids[0] for ids in found] == [str(i) for i in range(20)]
+        assert index.get_stats()["vector_bytes"] == vectors.size * np.dtype(dtype).itemsize
+        index.close()
+
+    def test_quantize_round_trip(self):
+        vectors = clustered_vectors(10)
+
+        matrix, scales = quantize_vectors(vectors, 'int8')
+
+        assert np.abs(matrix * scales[:, None] - vectors).max() < 0.01
+
+    def test_reset(self, index):
+        add_points(index)
+
+        index.reset()
+
+        assert index.count() == 0
+        index.add(ids=["x"], embeddings=[[0, 1]])
+        assert index.query([[0, 1]], n_results=1)['ids'] == [["x"]]
+
+
+class TestIVFIndex:
+    """Test list layout"""
+
+    def test_rows_grouped_by_list(self):
+        vectors = clustered_vectors(400)
+
+        index, order = IVFIndex.build(vectors, lists=10)
+
+        assert sorted(order) == list(range(400))
+        assert index.offsets[0] == 0 and index.offsets[-1] == 400
+        ordered = vectors[order]
+        for j in range(index.lists):
+            rows = ordered[index.offsets[j]:index.offsets[j + 1]]
+            assert (np.argmax(rows @ index.centroids.T, axis=1) == j).all()